@@ -15,6 +15,7 @@ from pathlib import Path
 from typing import Optional, Union
 
 import draccus
+import numpy as np
 import tqdm
 
 # Append current directory so that interpreter can find experiments.robot
@@ -26,9 +27,9 @@ from experiments.robot.aloha.aloha_utils import (
     get_next_task_label,
     save_rollout_video,
 )
+from experiments.robot.image_preprocessing import resize_images_for_policy
 from experiments.robot.openvla_utils import (
     get_action_from_server,
-    resize_image_for_policy,
 )
 from experiments.robot.robot_utils import (
     DATE_TIME,
@@ -122,10 +123,10 @@ def prepare_observation(obs, resize_size):
     img = get_aloha_image(obs)
     left_wrist_img, right_wrist_img = get_aloha_wrist_images(obs)
 
-    # Resize images to size expected by model
-    img_resized = resize_image_for_policy(img, resize_size)
-    left_wrist_img_resized = resize_image_for_policy(left_wrist_img, resize_size)
-    right_wrist_img_resized = resize_image_for_policy(right_wrist_img, resize_size)
+    # Resize images to size expected by model (all cameras in one batch)
+    img_resized, left_wrist_img_resized, right_wrist_img_resized = resize_images_for_policy(
+        np.stack([img, left_wrist_img, right_wrist_img]), resize_size
+    )
 
     # Prepare observations dict
     observation = {
@@ -0,0 +1,85 @@
+"""
+benchmark_image_preprocessing.py
+
+Checks the batched numpy center crop (`image_preprocessing.center_crop_images`) against the TensorFlow reference
+(`openvla_utils.crop_and_resize`) on a saved LIBERO observation plus random images, and the batched policy resize
+(`image_preprocessing.resize_images_for_policy`) against `openvla_utils.resize_image_for_policy` on random 256px
+camera views, and times both, per image and batched over `batch_size` camera views.
+
+Usage:
+    python experiments/robot/benchmark_image_preprocessing.py --batch_size 16
+"""
+
+import pickle
+import time
+from dataclasses import dataclass
+
+import draccus
+import numpy as np
+import tensorflow as tf
+
+from experiments.robot.image_preprocessing import center_crop_images, resize_images_for_policy
+from experiments.robot.openvla_utils import OPENVLA_IMAGE_SIZE, crop_and_resize, resize_image_for_policy
+
+
+@dataclass
+class PreprocessingBenchmarkConfig:
+    # fmt: off
+    observation_path: str = "experiments/robot/libero/sample_libero_spatial_observation.pkl"  # Saved observation
+    batch_size: int = 16                             # Images per batched call (e.g. 8 observations x 2 views)
+    num_random: int = 64                             # Extra random images for the equivalence check
+    num_iters: int = 20                              # Timed iterations
+    # fmt: on
+
+
+def tf_center_crop(image: np.ndarray, crop_scale: float = 0.9) -> np.ndarray:
+    """Per-image TF crop, as `center_crop_image` did before."""
+    image = tf.image.convert_image_dtype(tf.convert_to_tensor(image), tf.float32)
+    image = crop_and_resize(image, crop_scale, 1)
+    image = tf.clip_by_value(image, 0, 1)
+    return tf.image.convert_image_dtype(image, tf.uint8, saturate=True).numpy()
+
+
+def time_ms(fn, num_iters: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(num_iters):
+        fn()
+    return (time.perf_counter() - start) / num_iters * 1e3
+
+
+@draccus.wrap()
+def benchmark_image_preprocessing(cfg: PreprocessingBenchmarkConfig) -> None:
+    with open(cfg.observation_path, "rb") as f:
+        observation = pickle.load(f)
+    images = [v for k, v in observation.items() if "image" in k and isinstance(v, np.ndarray)]
+    rng = np.random.default_rng(0)
+    size = (OPENVLA_IMAGE_SIZE, OPENVLA_IMAGE_SIZE, 3)
+    images += [rng.integers(0, 256, size, dtype=np.uint8) for _ in range(cfg.num_random)]
+    images = np.stack([image for image in images if image.shape == size])
+
+    # Equivalence: TF may fuse the lerps into FMAs, so allow a difference of one uint8 level at rounding boundaries
+    reference = np.stack([tf_center_crop(image) for image in images])
+    diff = np.abs(center_crop_images(images).astype(np.int16) - reference.astype(np.int16))
+    print(f"{len(images)} images: max |numpy - TF| = {diff.max()}, mismatched values = {(diff > 0).mean():.2e}")
+    assert diff.max() <= 1, "Batched center crop diverges from the TensorFlow reference!"
+
+    batch = images[np.arange(cfg.batch_size) % len(images)]
+    tf_ms = time_ms(lambda: [tf_center_crop(image) for image in batch], cfg.num_iters)
+    np_ms = time_ms(lambda: center_crop_images(batch), cfg.num_iters)
+    print(f"{cfg.batch_size} images: TF per-image {tf_ms:.2f} ms, numpy batched {np_ms:.2f} ms ({tf_ms / np_ms:.1f}x)")
+
+    # Resize from the LIBERO render resolution: PIL decodes the JPEG with the accurate IDCT instead of TF's fast one,
+    # so only report the difference
+    views = rng.integers(0, 256, (cfg.batch_size, 256, 256, 3), dtype=np.uint8)
+    reference = np.stack([resize_image_for_policy(view, OPENVLA_IMAGE_SIZE) for view in views])
+    diff = np.abs(resize_images_for_policy(views, OPENVLA_IMAGE_SIZE).astype(np.int16) - reference.astype(np.int16))
+    print(f"{len(views)} resized views: max |numpy - TF| = {diff.max()}, mean = {diff.mean():.3f}")
+
+    tf_ms = time_ms(lambda: [resize_image_for_policy(view, OPENVLA_IMAGE_SIZE) for view in views], cfg.num_iters)
+    np_ms = time_ms(lambda: resize_images_for_policy(views, OPENVLA_IMAGE_SIZE), cfg.num_iters)
+    print(f"{cfg.batch_size} resizes: TF per-image {tf_ms:.2f} ms, numpy batched {np_ms:.2f} ms ({tf_ms / np_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    benchmark_image_preprocessing()
@@ -0,0 +1,231 @@
+"""
+image_preprocessing.py
+
+Batched, TensorFlow-free image preprocessing for VLA inference. Every camera of every observation goes through the
+center crop and the processor's to-tensor + normalize step in one vectorized numpy / torch pass, instead of one
+TensorFlow crop and one processor call per image.
+
+`resize_images_for_policy` replaces `openvla_utils.resize_image_for_policy` (the RLDS builder's JPEG round trip,
+then tf.image.resize with lanczos3 and antialiasing) for all cameras of an observation at once. The resize follows
+TF's ScaleAndTranslate CPU kernel (same kernel spans, weights and summation order in float32; sin() may differ in
+the last bit, so a value can land on the other side of a .5 rounding boundary). The JPEG round trip
+goes through PIL: at quality 95 with 4:2:0 chroma subsampling it writes the same JPEG data as tf.image.encode_jpeg,
+but TF decodes with libjpeg's fast integer IDCT, which PIL does not expose, so decoded pixels differ from TF's by a
+few levels (about one level on average, less after downscaling).
+
+`center_crop_images` reproduces the TF pipeline of `openvla_utils.crop_and_resize` (convert_image_dtype ->
+tf.image.crop_and_resize on the centered box -> clip -> convert_image_dtype with saturation) in float32, with the
+same sampling grid and interpolation order as TF's CPU kernel. `benchmark_image_preprocessing.py` checks both against
+TensorFlow; tests/test_image_preprocessing.py checks them against scalar ports of the kernels and, when TensorFlow is
+installed, against TensorFlow itself.
+"""
+
+import io
+from functools import lru_cache
+from typing import Any, Tuple, Union
+
+import numpy as np
+import torch
+from PIL import Image
+
+# convert_image_dtype(uint8 -> float32) multiplies by float32(1 / 255)
+_UINT8_TO_UNIT_FLOAT_SCALE = np.float32(1.0 / 255)
+
+
+# Lanczos kernel of tensorflow/core/kernels/image/sampling_kernels.h (kPI is a float constant there)
+_LANCZOS3_RADIUS = np.float32(3)
+_KERNEL_PI = np.float32(3.14159265359)
+
+
+def _lanczos3(x: np.ndarray) -> np.ndarray:
+    x = np.abs(x)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weights = (
+            _LANCZOS3_RADIUS * np.sin(_KERNEL_PI * x) * np.sin(_KERNEL_PI * x / _LANCZOS3_RADIUS)
+            / (_KERNEL_PI * _KERNEL_PI * x * x)
+        )
+    weights = np.where(x.astype(np.float64) <= 1e-3, np.float32(1), weights)
+    return np.where(x > _LANCZOS3_RADIUS, np.float32(0), weights).astype(np.float32)
+
+
+@lru_cache(maxsize=None)
+def _resize_spans(in_size: int, out_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Kernel spans of tf.image.resize(method="lanczos3", antialias=True) along one axis (ComputeSpansCore in
+    tensorflow/core/kernels/image/scale_and_translate_op.cc, with scale = out_size / in_size and no translation).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (source indices, weights), each of shape (out_size, span_size); source indices
+            past the end of a span are clamped into the image and carry zero weight, like TF's zero-filled weights
+    """
+    one, half = np.float32(1), np.float32(0.5)
+    scale = np.float32(out_size) / np.float32(in_size)
+    inv_scale = np.float32(1.0 / np.float64(scale))
+    kernel_scale = max(inv_scale, one)  # antialias: widen the kernel when downsampling
+    span_size = min(2 * int(np.ceil(_LANCZOS3_RADIUS * kernel_scale)) + 1, in_size)
+
+    sample = (np.arange(out_size, dtype=np.float32) + half) * inv_scale
+    starts = np.clip(np.ceil(sample - _LANCZOS3_RADIUS * kernel_scale - half), 0, in_size - 1).astype(np.intp)
+    ends = np.clip(np.floor(sample + _LANCZOS3_RADIUS * kernel_scale - half), 0, in_size - 1).astype(np.intp) + 1
+
+    sources = starts[:, None] + np.arange(span_size)
+    kernel_pos = (sources.astype(np.float32) + half) - sample[:, None]
+    weights = np.where(sources < ends[:, None], _lanczos3(kernel_pos * (one / kernel_scale)), np.float32(0))
+
+    # Normalize with TF's left-to-right float32 sum (np.sum would add pairwise)
+    total = np.zeros(out_size, dtype=np.float32)
+    for i in range(span_size):
+        total += weights[:, i]
+    valid = np.abs(total) >= 1000 * np.finfo(np.float32).tiny
+    weights = np.where(valid[:, None], weights * (one / np.where(valid, total, one))[:, None], np.float32(0))
+    return np.minimum(sources, in_size - 1), weights.astype(np.float32)
+
+
+def _jpeg_round_trip(image: np.ndarray) -> np.ndarray:
+    """Encode at quality 95 with 4:2:0 chroma subsampling (tf.image.encode_jpeg's defaults) and decode again."""
+    buffer = io.BytesIO()
+    Image.fromarray(np.ascontiguousarray(image)).save(buffer, format="JPEG", quality=95, subsampling="4:2:0")
+    return np.asarray(Image.open(buffer).convert("RGB"))
+
+
+def resize_images_for_policy(images: np.ndarray, resize_size: Union[int, Tuple[int, int]]) -> np.ndarray:
+    """
+    Resize a batch of camera images to the policy's input size with the RLDS dataset builder's scheme (JPEG round
+    trip, then lanczos3 resize with antialiasing), without TensorFlow.
+
+    Args:
+        images: uint8 RGB array of shape (N, H, W, 3) or (H, W, 3)
+        resize_size: Target size as int (square) or (height, width) tuple
+
+    Returns:
+        np.ndarray: uint8 array of shape (N, height, width, 3) (or (height, width, 3) for a single image)
+    """
+    assert images.dtype == np.uint8 and images.ndim in (3, 4), "Expected uint8 images of shape (N, H, W, 3)!"
+    if images.ndim == 3:
+        return resize_images_for_policy(images[None], resize_size)[0]
+    if isinstance(resize_size, int):
+        resize_size = (resize_size, resize_size)
+
+    images = np.stack([_jpeg_round_trip(image) for image in images])
+
+    # Separable resize in TF's order: along each row first (GatherRows), then along each column (GatherColumns). The
+    # resized axis is moved to the front for each pass, so every kernel tap gathers whole contiguous blocks.
+    rows_src, rows_weights = _resize_spans(images.shape[1], resize_size[0])
+    cols_src, cols_weights = _resize_spans(images.shape[2], resize_size[1])
+    columns = np.ascontiguousarray(images.transpose(2, 0, 1, 3), dtype=np.float32)  # (W, N, H, C)
+    resized = np.zeros((resize_size[1], *columns.shape[1:]), dtype=np.float32)
+    for i in range(cols_weights.shape[1]):
+        tap = columns[cols_src[:, i]]
+        tap *= cols_weights[:, i, None, None, None]
+        resized += tap
+    rows = np.ascontiguousarray(resized.transpose(2, 1, 0, 3))  # (H, N, out W, C)
+    output = np.zeros((resize_size[0], *rows.shape[1:]), dtype=np.float32)
+    for i in range(rows_weights.shape[1]):
+        tap = rows[rows_src[:, i]]
+        tap *= rows_weights[:, i, None, None, None]
+        output += tap
+    output = output.transpose(1, 0, 2, 3)
+
+    # tf.round rounds half to even, like np.round
+    return np.clip(np.round(output), 0, 255).astype(np.uint8)
+
+
+@lru_cache(maxsize=None)
+def _crop_sampling_grid(size: int, crop_scale: float, out_size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Source indices and interpolation weights along one axis of tf.image.crop_and_resize for the centered box.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: (lower index, upper index, lerp weight), each of length `out_size`
+    """
+    one, two = np.float32(1), np.float32(2)
+    extent = np.clip(np.sqrt(np.float32(crop_scale)), 0, 1).astype(np.float32)
+    start = (one - extent) / two
+    end = start + extent
+
+    # CropAndResize CPU kernel: in = y1 * (H - 1) + y * (y2 - y1) * (H - 1) / (crop_h - 1), all in float32
+    if out_size > 1:
+        step = (end - start) * np.float32(size - 1) / np.float32(out_size - 1)
+        coords = start * np.float32(size - 1) + np.arange(out_size, dtype=np.float32) * step
+    else:
+        coords = np.full(1, np.float32(0.5) * (start + end) * np.float32(size - 1), dtype=np.float32)
+    assert coords.min() >= 0 and coords.max() <= size - 1, "Center crop box must lie inside the image!"
+
+    lower = np.floor(coords)
+    return lower.astype(np.intp), np.ceil(coords).astype(np.intp), (coords - lower).astype(np.float32)
+
+
+def center_crop_images(images: np.ndarray, crop_scale: float = 0.9, out_size: int = 224) -> np.ndarray:
+    """
+    Center-crop a batch of images to `crop_scale` of their area and resize the crop to `out_size`, matching the TF
+    crop used at training time (bilinear `tf.image.crop_and_resize`, then saturating conversion back to uint8).
+
+    Args:
+        images: uint8 array of shape (N, H, W, C) or (H, W, C)
+        crop_scale: Area of center crop relative to original image
+        out_size: Side length of the (square) output
+
+    Returns:
+        np.ndarray: uint8 array of shape (N, out_size, out_size, C) (or (out_size, out_size, C) for a single image)
+    """
+    assert images.dtype == np.uint8 and images.ndim in (3, 4), "Expected uint8 images of shape (N, H, W, C)!"
+    if images.ndim == 3:
+        return center_crop_images(images[None], crop_scale, out_size)[0]
+
+    top, bottom, y_lerp = _crop_sampling_grid(images.shape[1], crop_scale, out_size)
+    left, right, x_lerp = _crop_sampling_grid(images.shape[2], crop_scale, out_size)
+
+    # The horizontal lerp only depends on the source row, so run it once over all rows and then pick the top / bottom
+    # rows of each output row (same float32 ops as TF: top = tl + (tr - tl) * x_lerp, out = top + (bottom - top) * y_lerp)
+    rows = np.take(images, left, axis=2).astype(np.float32)
+    rows *= _UINT8_TO_UNIT_FLOAT_SCALE
+    right_cols = np.take(images, right, axis=2).astype(np.float32)
+    right_cols *= _UINT8_TO_UNIT_FLOAT_SCALE
+    right_cols -= rows
+    right_cols *= np.repeat(x_lerp[:, None], images.shape[3], axis=1)  # contiguous (W, C) weights broadcast faster
+    rows += right_cols
+
+    top_rows, crops = rows[:, top], rows[:, bottom]
+    crops -= top_rows
+    crops *= y_lerp[:, None, None]
+    crops += top_rows
+
+    # clip_by_value(0, 1), then convert_image_dtype(float32 -> uint8, saturate=True): scale by 255.5 and truncate
+    np.clip(crops, 0, 1, out=crops)
+    crops *= np.float32(255.5)
+    return np.minimum(crops, 255, out=crops).astype(np.uint8)
+
+
+def images_to_pixel_values(images: np.ndarray, image_processor: Any) -> torch.Tensor:
+    """
+    Processor pixel values for a batch of images, as `image_processor([PIL images])["pixel_values"]` would return.
+
+    For the Prismatic image processor on images already at its input size (its resize, center crop and letterbox
+    padding are then no-ops), ToTensor + Normalize is applied to the whole batch in torch, with the same float32
+    operations as torchvision. Anything else goes through the processor itself.
+
+    Args:
+        images: uint8 array of shape (N, H, W, 3)
+        image_processor: The processor's image processor (e.g. `processor.image_processor`)
+
+    Returns:
+        torch.Tensor: float32 pixel values of shape (N, 3 * num_backbones, H, W)
+    """
+    height, width = images.shape[1:3]
+    input_sizes = getattr(image_processor, "input_sizes", None)
+    normalize_params = getattr(image_processor, "tvf_normalize_params", None)
+    if (
+        normalize_params is None
+        or height != width
+        or any(tuple(input_size[-2:]) != (height, width) for input_size in input_sizes)
+    ):
+        pil_images = [Image.fromarray(image) for image in images]
+        return torch.as_tensor(image_processor(pil_images, return_tensors="pt")["pixel_values"])
+
+    images_t = torch.from_numpy(np.ascontiguousarray(images)).permute(0, 3, 1, 2).contiguous().float().div_(255)
+    pixel_values = torch.empty(len(images), 3 * len(normalize_params), height, width, dtype=torch.float32)
+    for idx, params in enumerate(normalize_params):
+        mean = torch.as_tensor(params["mean"], dtype=torch.float32)[:, None, None]
+        std = torch.as_tensor(params["std"], dtype=torch.float32)[:, None, None]
+        torch.sub(images_t, mean, out=pixel_values[:, 3 * idx : 3 * (idx + 1)]).div_(std)
+    return pixel_values
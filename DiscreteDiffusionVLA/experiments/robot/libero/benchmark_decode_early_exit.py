@@ -0,0 +1,122 @@
+"""
+benchmark_decode_early_exit.py
+
+Latency vs. quality curve of adaptive early exit in discrete diffusion (parallel) decoding, measured on a fixed set of
+saved LIBERO observations instead of full rollouts.
+
+Each observation is a pickled dict with `full_image`, `wrist_image`, `state` and `task_description` (the format of
+sample_libero_spatial_observation.pkl); a pickle may also hold a list of such dicts. For every confidence threshold
+the script reports per-query latency, the parallel-decoding iterations actually used, and how far the predicted
+action chunks are from the full 12-iteration schedule decoded with the same seed. Closed-loop success at a chosen
+threshold is then measured with `run_libero_eval.py --decode_confidence_threshold <t>`.
+
+Usage:
+    python experiments/robot/libero/benchmark_decode_early_exit.py \
+        --pretrained_checkpoint <CHECKPOINT_PATH> \
+        --use_discrete_diffusion True --use_l1_regression False \
+        --observations_path experiments/robot/libero/sample_libero_spatial_observation.pkl
+"""
+
+import glob
+import os
+import pickle
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+import draccus
+import numpy as np
+import torch
+
+# Append current directory so that interpreter can find experiments.robot
+sys.path.append("../..")
+from experiments.robot.libero.run_libero_eval import GenerateConfig, initialize_model
+from experiments.robot.robot_utils import get_action, set_seed_everywhere
+
+
+@dataclass
+class DecodeBenchmarkConfig(GenerateConfig):
+    # fmt: off
+    observations_path: str = "experiments/robot/libero/sample_libero_spatial_observation.pkl"  # .pkl file or directory of .pkl files
+    thresholds: List[float] = field(default_factory=lambda: [0.99, 0.95, 0.9, 0.8, 0.7, 0.5])  # Confidence thresholds to sweep
+    num_repeats: int = 5                             # Queries per observation and threshold (different seeds)
+    num_warmup: int = 2                              # Untimed queries before measuring
+    agreement_tol: float = 0.02                      # Max abs difference (fraction of q01-q99 action range) for a chunk to agree
+    use_wandb: bool = False
+    # fmt: on
+
+
+def load_observations(path: str) -> List[dict]:
+    """Loads saved observations from a pickle file or every pickle file in a directory."""
+    files = sorted(glob.glob(os.path.join(path, "*.pkl"))) if os.path.isdir(path) else [path]
+    observations = []
+    for file in files:
+        with open(file, "rb") as f:
+            data = pickle.load(f)
+        observations.extend(data if isinstance(data, list) else [data])
+    assert observations, f"No observations found at {path}!"
+    return observations
+
+
+def query(cfg: DecodeBenchmarkConfig, model, obs: dict, seed: int, processor, action_head, proprio_projector):
+    """Runs one timed policy query; returns (actions, latency in seconds, decoding iterations used)."""
+    set_seed_everywhere(seed)
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    actions = get_action(
+        cfg,
+        model,
+        dict(obs),  # get_vla_action normalizes obs["state"] in place
+        obs["task_description"],
+        processor=processor,
+        action_head=action_head,
+        proprio_projector=proprio_projector,
+        use_film=cfg.use_film,
+        use_discrete_diffusion=cfg.use_discrete_diffusion,
+    )
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    return np.asarray(actions), time.perf_counter() - start, model.last_decode_num_iters
+
+
+@draccus.wrap()
+def benchmark_decode_early_exit(cfg: DecodeBenchmarkConfig) -> None:
+    assert cfg.use_discrete_diffusion, "Early exit only applies to discrete diffusion decoding!"
+    model, action_head, proprio_projector, _, processor = initialize_model(cfg)
+    observations = load_observations(cfg.observations_path)
+    action_stats = model.norm_stats[cfg.unnorm_key]["action"]
+    action_range = np.maximum(np.array(action_stats["q99"]) - np.array(action_stats["q01"]), 1e-6)
+
+    for i in range(cfg.num_warmup):
+        query(cfg, model, observations[i % len(observations)], cfg.seed, processor, action_head, proprio_projector)
+
+    rows = []
+    reference = {}
+    for threshold in [None] + list(cfg.thresholds):
+        cfg.decode_confidence_threshold = threshold
+        latencies, iters, errors, agree = [], [], [], []
+        for obs_idx, obs in enumerate(observations):
+            for rep in range(cfg.num_repeats):
+                seed = cfg.seed + rep
+                actions, latency, num_iters = query(cfg, model, obs, seed, processor, action_head, proprio_projector)
+                latencies.append(latency)
+                iters.append(num_iters)
+                if threshold is None:
+                    reference[obs_idx, rep] = actions
+                diff = np.abs(actions - reference[obs_idx, rep]) / action_range
+                errors.append(diff.mean())
+                agree.append(diff.max() <= cfg.agreement_tol)
+        rows.append((threshold, np.mean(latencies), np.percentile(latencies, 90), np.mean(iters), np.mean(errors),
+                     np.mean(agree)))
+
+    print(f"{len(observations)} observations x {cfg.num_repeats} seeds, reference = full schedule (threshold None)")
+    print(f"{'threshold':>9} {'mean ms':>9} {'p90 ms':>9} {'iters':>6} {'L1 err':>8} {'agree':>6}")
+    for threshold, mean_s, p90_s, mean_iters, err, agreement in rows:
+        name = "none" if threshold is None else f"{threshold:.3f}"
+        print(f"{name:>9} {mean_s * 1e3:9.1f} {p90_s * 1e3:9.1f} {mean_iters:6.2f} {err:8.4f} {agreement:6.2f}")
+
+
+if __name__ == "__main__":
+    benchmark_decode_early_exit()
@@ -23,6 +23,7 @@ from libero.libero import benchmark
 
 # Append current directory so that interpreter can find experiments.robot
 sys.path.append("../..")
+from experiments.robot.image_preprocessing import resize_images_for_policy
 from experiments.robot.libero.libero_utils import (
     get_libero_dummy_action,
     get_libero_env,
@@ -36,7 +37,6 @@ from experiments.robot.openvla_utils import (
     get_noisy_action_projector,
     get_processor,
     get_proprio_projector,
-    resize_image_for_policy,
 )
 from experiments.robot.robot_utils import (
     DATE_TIME,
@@ -95,6 +95,8 @@ class GenerateConfig:
     use_film: bool = False                           # If True, uses FiLM to infuse language inputs into visual features
     use_discrete_diffusion: bool = False             # If True, uses discrete diffusion model for action generation
     topk_filter_thres: float = 0.0              # (When `use_discrete_diffusion==True`) Top-k filter threshold for discrete diffusion model   Only (1 - topk_filter_thres) logits are reserved
+    use_prefix_cache: bool = False                   # (When `use_discrete_diffusion==True`) Encode vision/prompt prefix once per step, only re-run action tokens per iteration (needs `causal_llm_backbone` in the model config)
+    decode_confidence_threshold: Optional[float] = None  # (When `use_discrete_diffusion==True`) Stop parallel decoding once all masked tokens pass this probability
 
     num_images_in_input: int = 2                     # Number of images in the VLA input (default: 1)
     use_proprio: bool = True                         # Whether to include proprio state in input
@@ -250,9 +252,8 @@ def prepare_observation(obs, resize_size):
     img = get_libero_image(obs)
     wrist_img = get_libero_wrist_image(obs)
 
-    # Resize images to size expected by model
-    img_resized = resize_image_for_policy(img, resize_size)
-    wrist_img_resized = resize_image_for_policy(wrist_img, resize_size)
+    # Resize images to size expected by model (both cameras in one batch)
+    img_resized, wrist_img_resized = resize_images_for_policy(np.stack([img, wrist_img]), resize_size)
 
     # Prepare observations dict
     observation = {
@@ -312,6 +313,7 @@ def run_episode(
     # Setup
     t = 0
     replay_images = []
+    decode_num_iters = []  # Parallel-decoding iterations used per model query (discrete diffusion only)
     max_steps = TASK_MAX_STEPS[cfg.task_suite_name]
 
     # Run episode
@@ -344,6 +346,8 @@ def run_episode(
                     use_discrete_diffusion=cfg.use_discrete_diffusion,
                 )
                 action_queue.extend(actions)
+                if cfg.use_discrete_diffusion and getattr(model, "last_decode_num_iters", None) is not None:
+                    decode_num_iters.append(model.last_decode_num_iters)
 
             # Get action from queue
             action = action_queue.popleft()
@@ -361,6 +365,13 @@ def run_episode(
     except Exception as e:
         log_message(f"Episode error: {e}", log_file)
 
+    if decode_num_iters:
+        log_message(
+            f"Decode iterations per query: mean {np.mean(decode_num_iters):.2f}, "
+            f"min {min(decode_num_iters)}, max {max(decode_num_iters)} ({len(decode_num_iters)} queries)",
+            log_file,
+        )
+
     return success, replay_images
 
 
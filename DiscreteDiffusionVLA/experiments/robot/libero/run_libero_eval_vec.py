@@ -0,0 +1,285 @@
+"""
+run_libero_eval_vec.py
+
+Evaluates a trained policy in a LIBERO simulation benchmark task suite, stepping `num_envs` environments of the
+same task in parallel (LIBERO's SubprocVectorEnv) and decoding all of their observations in one batched forward pass.
+
+Accepts the same arguments as run_libero_eval.py, plus `--num_envs`.
+"""
+
+import gc
+import os
+import sys
+from collections import deque
+from dataclasses import dataclass
+
+import draccus
+import numpy as np
+import tqdm
+import wandb
+from libero.libero import benchmark, get_libero_path
+from libero.libero.envs import DummyVectorEnv, OffScreenRenderEnv, SubprocVectorEnv
+
+# Append current directory so that interpreter can find experiments.robot
+sys.path.append("../..")
+from experiments.robot.libero.libero_utils import get_libero_dummy_action, save_rollout_video
+from experiments.robot.libero.run_libero_eval import (
+    TASK_MAX_STEPS,
+    GenerateConfig,
+    initialize_model,
+    load_initial_states,
+    log_message,
+    prepare_observation,
+    process_action,
+    setup_logging,
+    validate_config,
+)
+from experiments.robot.robot_utils import get_action_batch, get_image_resize_size, set_seed_everywhere
+
+
+@dataclass
+class VecGenerateConfig(GenerateConfig):
+    # fmt: off
+    num_envs: int = 10                               # Number of environments stepped (and decoded) together
+    save_videos: bool = True                         # Save an MP4 per episode, as run_libero_eval.py does
+    # fmt: on
+
+
+def get_libero_vec_env(task, num_envs: int, resolution: int = 256):
+    """Initializes `num_envs` copies of the task's LIBERO environment, along with the task description."""
+    task_bddl_file = os.path.join(get_libero_path("bddl_files"), task.problem_folder, task.bddl_file)
+    env_args = {"bddl_file_name": task_bddl_file, "camera_heights": resolution, "camera_widths": resolution}
+    env_fns = [lambda: OffScreenRenderEnv(**env_args) for _ in range(num_envs)]
+    env = DummyVectorEnv(env_fns) if num_envs == 1 else SubprocVectorEnv(env_fns)
+    env.seed([0] * num_envs)  # IMPORTANT: same seed as get_libero_env in every worker
+    return env, task.language
+
+
+def get_episode_initial_states(cfg: VecGenerateConfig, initial_states, all_initial_states, task_description, log_file):
+    """Initial state for each episode to run, skipping failed expert demos like run_libero_eval.run_task."""
+    episode_states = []
+    for episode_idx in range(cfg.num_trials_per_task):
+        if cfg.initial_states_path == "DEFAULT":
+            episode_states.append(initial_states[episode_idx])
+            continue
+        episode = all_initial_states[task_description.replace(" ", "_")][f"demo_{episode_idx}"]
+        if not episode["success"]:
+            log_message(f"Skipping episode {episode_idx} of '{task_description}' due to failed expert demo!", log_file)
+            continue
+        episode_states.append(np.array(episode["initial_state"]))
+    return episode_states
+
+
+def run_episode_batch(
+    cfg: VecGenerateConfig,
+    env,
+    initial_states,
+    task_description: str,
+    model,
+    resize_size,
+    processor=None,
+    action_head=None,
+    proprio_projector=None,
+    log_file=None,
+):
+    """Run one episode per initial state on envs 0..len(initial_states)-1; returns per-episode successes and frames."""
+    num_episodes = len(initial_states)
+    env_ids = list(range(num_episodes))
+    env.reset(id=env_ids)
+    obs = list(env.set_init_state(np.stack(initial_states), id=env_ids))
+
+    action_queues = [deque(maxlen=cfg.num_open_loop_steps) for _ in env_ids]
+    successes = [False] * num_episodes
+    replay_images = [[] for _ in env_ids]
+    active = list(env_ids)
+    decode_num_iters = []  # Parallel-decoding iterations used per batched model query (discrete diffusion only)
+    max_steps = TASK_MAX_STEPS[cfg.task_suite_name]
+
+    t = 0
+    try:
+        while t < max_steps + cfg.num_steps_wait and active:
+            # Do nothing for the first few timesteps to let objects stabilize
+            if t < cfg.num_steps_wait:
+                dummy = np.array([get_libero_dummy_action(cfg.model_family)] * len(active))
+                for i, o in zip(active, env.step(dummy, id=active)[0]):
+                    obs[i] = o
+                t += 1
+                continue
+
+            observations = {}
+            for i in active:
+                observations[i], img = prepare_observation(obs[i], resize_size)
+                replay_images[i].append(img)
+
+            # Requery the model for every env whose action queue ran out, in a single batched forward pass
+            requery = [i for i in active if len(action_queues[i]) == 0]
+            if requery:
+                chunks = get_action_batch(
+                    cfg,
+                    model,
+                    [observations[i] for i in requery],
+                    task_description,
+                    processor=processor,
+                    action_head=action_head,
+                    proprio_projector=proprio_projector,
+                    use_film=cfg.use_film,
+                    use_discrete_diffusion=cfg.use_discrete_diffusion,
+                )
+                for i, chunk in zip(requery, chunks):
+                    action_queues[i].extend(chunk)
+                if cfg.use_discrete_diffusion and getattr(model, "last_decode_num_iters", None) is not None:
+                    decode_num_iters.append(model.last_decode_num_iters)
+
+            actions = np.stack([process_action(action_queues[i].popleft(), cfg.model_family) for i in active])
+            step_obs, _, dones, _ = env.step(actions, id=active)
+
+            still_active = []
+            for i, o, done in zip(active, step_obs, dones):
+                obs[i] = o
+                if done:
+                    successes[i] = True
+                else:
+                    still_active.append(i)
+            active = still_active
+            t += 1
+
+    except Exception as e:
+        log_message(f"Episode batch error: {e}", log_file)
+
+    if decode_num_iters:
+        log_message(
+            f"Decode iterations per query: mean {np.mean(decode_num_iters):.2f}, "
+            f"min {min(decode_num_iters)}, max {max(decode_num_iters)} ({len(decode_num_iters)} queries)",
+            log_file,
+        )
+
+    return successes, replay_images
+
+
+def run_task(
+    cfg: VecGenerateConfig,
+    task_suite,
+    task_id: int,
+    model,
+    resize_size,
+    processor=None,
+    action_head=None,
+    proprio_projector=None,
+    total_episodes=0,
+    total_successes=0,
+    log_file=None,
+):
+    """Run evaluation for a single task, `cfg.num_envs` episodes at a time."""
+    task = task_suite.get_task(task_id)
+    initial_states, all_initial_states = load_initial_states(cfg, task_suite, task_id, log_file)
+    episode_states = get_episode_initial_states(cfg, initial_states, all_initial_states, task.language, log_file)
+    if not episode_states:
+        return total_episodes, total_successes
+
+    num_envs = min(cfg.num_envs, len(episode_states))
+    env, task_description = get_libero_vec_env(task, num_envs, resolution=cfg.env_img_res)
+    log_message(f"\nTask: {task_description} ({len(episode_states)} episodes on {num_envs} envs)", log_file)
+
+    task_episodes, task_successes = 0, 0
+    try:
+        for start in tqdm.tqdm(range(0, len(episode_states), num_envs)):
+            successes, replay_images = run_episode_batch(
+                cfg,
+                env,
+                episode_states[start : start + num_envs],
+                task_description,
+                model,
+                resize_size,
+                processor,
+                action_head,
+                proprio_projector,
+                log_file,
+            )
+
+            for success, images in zip(successes, replay_images):
+                task_episodes += 1
+                total_episodes += 1
+                if success:
+                    task_successes += 1
+                    total_successes += 1
+                if cfg.save_videos and images:
+                    save_rollout_video(
+                        images, total_episodes, success=success, task_description=task_description, log_file=log_file
+                    )
+
+            log_message(f"Successes: {successes}", log_file)
+            log_message(f"# episodes completed so far: {total_episodes}", log_file)
+            log_message(f"# successes: {total_successes} ({total_successes / total_episodes * 100:.1f}%)", log_file)
+    finally:
+        try:
+            env.close()
+        except Exception as e:
+            log_message(f"Environment close warning: {e}", log_file)
+        del env
+        gc.collect()
+
+    task_success_rate = float(task_successes) / float(task_episodes) if task_episodes > 0 else 0
+    total_success_rate = float(total_successes) / float(total_episodes) if total_episodes > 0 else 0
+    log_message(f"Current task success rate: {task_success_rate}", log_file)
+    log_message(f"Current total success rate: {total_success_rate}", log_file)
+
+    if cfg.use_wandb:
+        wandb.log(
+            {
+                f"success_rate/{task_description}": task_success_rate,
+                f"num_episodes/{task_description}": task_episodes,
+            }
+        )
+
+    return total_episodes, total_successes
+
+
+@draccus.wrap()
+def eval_libero_vec(cfg: VecGenerateConfig) -> float:
+    """Main function to evaluate a trained policy on LIBERO benchmark tasks with vectorized environments."""
+    validate_config(cfg)
+    assert not cfg.use_diffusion, "Batched decoding supports L1 regression and discrete (diffusion) tokens only!"
+    set_seed_everywhere(cfg.seed)
+
+    model, action_head, proprio_projector, _, processor = initialize_model(cfg)
+    resize_size = get_image_resize_size(cfg)
+    log_file, local_log_filepath, run_id = setup_logging(cfg)
+
+    task_suite = benchmark.get_benchmark_dict()[cfg.task_suite_name]()
+    log_message(f"Task suite: {cfg.task_suite_name} (num_envs={cfg.num_envs})", log_file)
+
+    total_episodes, total_successes = 0, 0
+    for task_id in tqdm.tqdm(range(task_suite.n_tasks)):
+        total_episodes, total_successes = run_task(
+            cfg,
+            task_suite,
+            task_id,
+            model,
+            resize_size,
+            processor,
+            action_head,
+            proprio_projector,
+            total_episodes,
+            total_successes,
+            log_file,
+        )
+
+    final_success_rate = float(total_successes) / float(total_episodes) if total_episodes > 0 else 0
+    log_message("Final results:", log_file)
+    log_message(f"Total episodes: {total_episodes}", log_file)
+    log_message(f"Total successes: {total_successes}", log_file)
+    log_message(f"Overall success rate: {final_success_rate:.4f} ({final_success_rate * 100:.1f}%)", log_file)
+
+    if cfg.use_wandb:
+        wandb.log({"success_rate/total": final_success_rate, "num_episodes/total": total_episodes})
+        wandb.save(local_log_filepath)
+
+    if log_file:
+        log_file.close()
+    gc.collect()
+
+    return final_success_rate
+
+
+if __name__ == "__main__":
+    eval_libero_vec()
@@ -12,12 +12,16 @@ from typing import Any, Dict, List, Optional, Tuple, Union
 import json_numpy
 import numpy as np
 import requests
-import tensorflow as tf
 import torch
 from huggingface_hub import HfApi, hf_hub_download
 from PIL import Image
 from transformers import AutoConfig, AutoImageProcessor, AutoModelForVision2Seq, AutoProcessor
 
+from experiments.robot.image_preprocessing import (
+    center_crop_images,
+    images_to_pixel_values,
+    resize_images_for_policy,
+)
 from prismatic.extern.hf.configuration_prismatic import OpenVLAConfig
 from prismatic.extern.hf.modeling_prismatic import OpenVLAForActionPrediction
 from prismatic.extern.hf.processing_prismatic import PrismaticImageProcessor, PrismaticProcessor
@@ -27,8 +31,8 @@ from prismatic.models.projectors import NoisyActionProjector, ProprioProjector
 from prismatic.vla.constants import (
     ACTION_DIM,
     ACTION_PROPRIO_NORMALIZATION_TYPE,
+    NormalizationType,
 )
-from prismatic.vla.datasets.rlds.utils.data_utils import NormalizationType
 
 # Apply JSON numpy patch for serialization
 json_numpy.patch()
@@ -558,7 +562,8 @@ def resize_image_for_policy(img: np.ndarray, resize_size: Union[int, Tuple[int,
     """
     Resize an image to match the policy's expected input size.
 
-    Uses the same resizing scheme as in the training data pipeline for distribution matching.
+    Uses the same resizing scheme as in the training data pipeline for distribution matching. This is the TensorFlow
+    reference for `image_preprocessing.resize_images_for_policy`, which inference uses instead.
 
     Args:
         img: Numpy array containing the image
@@ -567,6 +572,8 @@ def resize_image_for_policy(img: np.ndarray, resize_size: Union[int, Tuple[int,
     Returns:
         np.ndarray: The resized image
     """
+    import tensorflow as tf
+
     assert isinstance(resize_size, int) or isinstance(resize_size, tuple)
     if isinstance(resize_size, int):
         resize_size = (resize_size, resize_size)
@@ -580,11 +587,12 @@ def resize_image_for_policy(img: np.ndarray, resize_size: Union[int, Tuple[int,
     return img.numpy()
 
 
-def crop_and_resize(image: tf.Tensor, crop_scale: float, batch_size: int) -> tf.Tensor:
+def crop_and_resize(image: "tf.Tensor", crop_scale: float, batch_size: int) -> "tf.Tensor":
     """
     Center-crop an image and resize it back to original dimensions.
 
-    Uses the same logic as in the training data pipeline for distribution matching.
+    Uses the same logic as in the training data pipeline for distribution matching. This is the TensorFlow reference
+    for `image_preprocessing.center_crop_images`, which inference uses instead.
 
     Args:
         image: TF Tensor of shape (batch_size, H, W, C) or (H, W, C) with values in [0,1]
@@ -594,6 +602,8 @@ def crop_and_resize(image: tf.Tensor, crop_scale: float, batch_size: int) -> tf.
     Returns:
         tf.Tensor: The cropped and resized image
     """
+    import tensorflow as tf
+
     # Handle 3D inputs by adding batch dimension if needed
     assert image.shape.ndims in (3, 4), "Image must be 3D or 4D tensor"
     expanded_dims = False
@@ -640,27 +650,9 @@ def center_crop_image(image: Union[np.ndarray, Image.Image]) -> Image.Image:
     Returns:
         Image.Image: Cropped PIL Image
     """
-    batch_size = 1
     crop_scale = 0.9
-
-    # Convert to TF Tensor if needed
-    if not isinstance(image, tf.Tensor):
-        image = tf.convert_to_tensor(np.array(image))
-
-    orig_dtype = image.dtype
-
-    # Convert to float32 in range [0,1]
-    image = tf.image.convert_image_dtype(image, tf.float32)
-
-    # Apply center crop and resize
-    image = crop_and_resize(image, crop_scale, batch_size)
-
-    # Convert back to original data type
-    image = tf.clip_by_value(image, 0, 1)
-    image = tf.image.convert_image_dtype(image, orig_dtype, saturate=True)
-
-    # Convert to PIL Image
-    return Image.fromarray(image.numpy()).convert("RGB")
+    image = np.asarray(Image.fromarray(np.asarray(image)).convert("RGB"))
+    return Image.fromarray(center_crop_images(image, crop_scale, OPENVLA_IMAGE_SIZE))
 
 
 def check_image_format(image: Any) -> None:
@@ -716,37 +708,66 @@ def normalize_proprio(proprio: np.ndarray, norm_stats: Dict[str, Any]) -> np.nda
     return normalized_proprio
 
 
-def prepare_images_for_vla(images: List[np.ndarray], cfg: Any) -> List[Image.Image]:
+def preprocess_images_for_vla(images: List[np.ndarray], cfg: Any) -> np.ndarray:
     """
-    Prepare images for VLA input by resizing and cropping as needed.
+    Resize (if needed) and center crop (if configured) a batch of images in one vectorized pass.
 
     Args:
         images: List of input images as numpy arrays
         cfg: Configuration object with parameters
 
     Returns:
-        List[Image.Image]: Processed images ready for the model
+        np.ndarray: uint8 array of shape (len(images), OPENVLA_IMAGE_SIZE, OPENVLA_IMAGE_SIZE, 3)
     """
-    processed_images = []
-
+    resized = []
     for image in images:
         # Validate format
         check_image_format(image)
 
         # Resize if needed
         if image.shape != (OPENVLA_IMAGE_SIZE, OPENVLA_IMAGE_SIZE, 3):
-            image = resize_image_for_policy(image, OPENVLA_IMAGE_SIZE)
+            image = resize_images_for_policy(image, OPENVLA_IMAGE_SIZE)
+        resized.append(image)
+    batch = np.stack(resized)
+
+    # Apply center crop if configured
+    if cfg.center_crop:
+        batch = center_crop_images(batch, crop_scale=0.9, out_size=OPENVLA_IMAGE_SIZE)
+
+    return batch
+
+
+def prepare_images_for_vla(images: List[np.ndarray], cfg: Any) -> List[Image.Image]:
+    """
+    Prepare images for VLA input by resizing and cropping as needed.
+
+    Args:
+        images: List of input images as numpy arrays
+        cfg: Configuration object with parameters
+
+    Returns:
+        List[Image.Image]: Processed images ready for the model
+    """
+    return [Image.fromarray(image) for image in preprocess_images_for_vla(images, cfg)]
 
-        # Convert to PIL image
-        pil_image = Image.fromarray(image).convert("RGB")
 
-        # Apply center crop if configured
-        if cfg.center_crop:
-            pil_image = center_crop_image(pil_image)
+def prepare_pixel_values_for_vla(images_per_obs: List[List[np.ndarray]], cfg: Any, processor: Any) -> torch.Tensor:
+    """
+    Pixel values for every camera view of every observation, preprocessed as one batch.
 
-        processed_images.append(pil_image)
+    Args:
+        images_per_obs: For each observation, its images (primary first, then wrist views)
+        cfg: Configuration object with parameters
+        processor: Model processor for inputs
 
-    return processed_images
+    Returns:
+        torch.Tensor: float32 pixel values of shape (num_obs, num_views * C, H, W); views are concatenated along the
+            channel dim, as the model expects
+    """
+    num_obs, num_views = len(images_per_obs), len(images_per_obs[0])
+    images = preprocess_images_for_vla([image for images in images_per_obs for image in images], cfg)
+    pixel_values = images_to_pixel_values(images, processor.image_processor)
+    return pixel_values.reshape(num_obs, num_views * pixel_values.shape[1], *pixel_values.shape[2:])
 
 
 def get_vla_action(
@@ -786,27 +807,14 @@ def get_vla_action(
         if cfg.num_images_in_input > 1:
             all_images.extend([obs[k] for k in obs.keys() if "wrist" in k])
 
-        # Process images
-        all_images = prepare_images_for_vla(all_images, cfg)
-
-        # Extract primary image and additional images
-        primary_image = all_images.pop(0)
-
         # Build VLA prompt
         prompt = f"In: What action should the robot take to {task_label.lower()}?\nOut:"
 
-        # Process primary image
-        inputs = processor(prompt, primary_image).to(DEVICE, dtype=torch.bfloat16)
-
-        # Process additional wrist images if any
-        if all_images:
-            all_wrist_inputs = [
-                processor(prompt, image_wrist).to(DEVICE, dtype=torch.bfloat16) for image_wrist in all_images
-            ]
-            # Concatenate all images
-            primary_pixel_values = inputs["pixel_values"]
-            all_wrist_pixel_values = [wrist_inputs["pixel_values"] for wrist_inputs in all_wrist_inputs]
-            inputs["pixel_values"] = torch.cat([primary_pixel_values] + all_wrist_pixel_values, dim=1)
+        # Tokenize the prompt, and preprocess all images in one pass (views concatenated along the channel dim)
+        inputs = processor.tokenizer(prompt, return_tensors="pt").to(DEVICE)
+        inputs["pixel_values"] = prepare_pixel_values_for_vla([all_images], cfg, processor).to(
+            DEVICE, dtype=torch.bfloat16
+        )
 
         # Process proprioception data if used
         proprio = None
@@ -829,6 +837,8 @@ def get_vla_action(
                 action_head=action_head,
                 use_film=use_film,
                 use_discrete_diffusion=use_discrete_diffusion,
+                use_prefix_cache=getattr(cfg, "use_prefix_cache", False),
+                decode_confidence_threshold=getattr(cfg, "decode_confidence_threshold", None),
                 )
         else:
             # Custom action head for continuous actions
@@ -842,12 +852,83 @@ def get_vla_action(
                 action_head=action_head,
                 use_film=use_film,
                 use_discrete_diffusion=use_discrete_diffusion,
+                use_prefix_cache=getattr(cfg, "use_prefix_cache", False),
+                decode_confidence_threshold=getattr(cfg, "decode_confidence_threshold", None),
             )
 
     # Return action chunk as list of actions
     return [action[i] for i in range(len(action))]
 
 
+
+def get_vla_actions_batch(
+    cfg: Any,
+    vla: torch.nn.Module,
+    processor: Any,
+    obs_batch: List[Dict[str, Any]],
+    task_label: str,
+    action_head: Optional[torch.nn.Module] = None,
+    proprio_projector: Optional[torch.nn.Module] = None,
+    use_film: bool = False,
+    use_discrete_diffusion: bool = False,
+) -> List[List[np.ndarray]]:
+    """
+    Generate action predictions for several observations of the same task in one forward pass.
+
+    Args:
+        cfg: Configuration object with parameters
+        vla: The VLA model
+        processor: Model processor for inputs
+        obs_batch: Observation dictionaries, one per environment
+        task_label: Text description of the task (shared by all observations, so prompts have equal length)
+        action_head: Optional action head for continuous actions
+        proprio_projector: Optional proprioception projector
+        use_film: Whether to use FiLM
+        use_discrete_diffusion: Whether to use discrete diffusion for action prediction
+
+    Returns:
+        List[List[np.ndarray]]: Predicted action chunk for each observation
+    """
+    with torch.inference_mode():
+        prompt = f"In: What action should the robot take to {task_label.lower()}?\nOut:"
+
+        # Per-observation images: primary first, then wrist views (same order as get_vla_action)
+        all_images = []
+        for obs in obs_batch:
+            images = [obs["full_image"]]
+            if cfg.num_images_in_input > 1:
+                images.extend([obs[k] for k in obs.keys() if "wrist" in k])
+            all_images.append(images)
+
+        # Every view of every observation is preprocessed in one pass; views are concatenated along the channel dim
+        inputs = processor.tokenizer([prompt] * len(obs_batch), return_tensors="pt").to(DEVICE)
+        inputs["pixel_values"] = prepare_pixel_values_for_vla(all_images, cfg, processor).to(
+            DEVICE, dtype=torch.bfloat16
+        )
+
+        proprio = None
+        if cfg.use_proprio:
+            # Normalize a stacked copy: the caller still owns (and may reuse) the raw `obs["state"]` arrays
+            proprio_norm_stats = vla.norm_stats[cfg.unnorm_key]["proprio"]
+            proprio = normalize_proprio(np.stack([obs["state"] for obs in obs_batch]), proprio_norm_stats)
+
+        actions, _ = vla.predict_action(
+            **inputs,
+            unnorm_key=cfg.unnorm_key,
+            do_sample=False,
+            proprio=proprio,
+            proprio_projector=proprio_projector,
+            action_head=action_head,
+            use_film=use_film,
+            use_discrete_diffusion=use_discrete_diffusion,
+            use_prefix_cache=getattr(cfg, "use_prefix_cache", False),
+            decode_confidence_threshold=getattr(cfg, "decode_confidence_threshold", None),
+        )
+
+    actions = actions.reshape(len(obs_batch), -1, actions.shape[-1])
+    return [[chunk[i] for i in range(len(chunk))] for chunk in actions]
+
+
 def get_action_from_server(
     observation: Dict[str, Any], server_endpoint: str = "http://0.0.0.0:8777/act"
 ) -> Dict[str, Any]:
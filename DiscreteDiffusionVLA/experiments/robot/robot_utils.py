@@ -11,6 +11,7 @@ import torch
 from experiments.robot.openvla_utils import (
     get_vla,
     get_vla_action,
+    get_vla_actions_batch,
 )
 
 # Initialize important constants
@@ -149,6 +150,57 @@ def get_action(
     return action
 
 
+
+def get_action_batch(
+    cfg: Any,
+    model: torch.nn.Module,
+    obs_batch: List[Dict[str, Any]],
+    task_label: str,
+    processor: Optional[Any] = None,
+    action_head: Optional[torch.nn.Module] = None,
+    proprio_projector: Optional[torch.nn.Module] = None,
+    use_film: bool = False,
+    use_discrete_diffusion: bool = False,
+) -> List[List[np.ndarray]]:
+    """
+    Query the model once for a batch of observations of the same task.
+
+    Args:
+        cfg: Configuration object with model parameters
+        model: The loaded model
+        obs_batch: Observation dictionaries, one per environment
+        task_label: Text description of the task
+        processor: Model processor for inputs
+        action_head: Optional action head for continuous actions
+        proprio_projector: Optional proprioception projector
+        use_film: Whether to use FiLM
+        use_discrete_diffusion: Whether to use discrete diffusion for action generation
+
+    Returns:
+        List[List[np.ndarray]]: Predicted action chunk for each observation
+
+    Raises:
+        ValueError: If model family is not supported
+    """
+    with torch.no_grad():
+        if cfg.model_family == "openvla":
+            actions = get_vla_actions_batch(
+                cfg=cfg,
+                vla=model,
+                processor=processor,
+                obs_batch=obs_batch,
+                task_label=task_label,
+                action_head=action_head,
+                proprio_projector=proprio_projector,
+                use_film=use_film,
+                use_discrete_diffusion=use_discrete_diffusion,
+            )
+        else:
+            raise ValueError(f"Unsupported model family: {cfg.model_family}")
+
+    return actions
+
+
 def normalize_gripper_action(action: np.ndarray, binarize: bool = True) -> np.ndarray:
     """
     Normalize gripper action from [0,1] to [-1,+1] range.
@@ -0,0 +1,316 @@
+"""
+server_utils.py
+
+Dynamic batching, binary observation transport and latency metrics for the VLA server (vla-scripts/deploy.py), plus
+a matching client. Kept free of torch / TensorFlow imports so that eval clients can use it without loading either.
+
+Binary messages are `MAGIC | uint32 header length | JSON header | raw array bytes`. The header is the message with
+every numpy array replaced by a reference to its dtype, shape and either a byte offset into the raw section or the
+name of a shared-memory segment the client wrote it to (same-host clients only, which skips copying images through
+the socket altogether). A segment name makes the server map whatever /dev/shm segment it names, so servers only
+decode those references for clients they trust (see `decode_message`).
+"""
+
+import ipaddress
+import json
+import queue
+import struct
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+MAGIC = b"OVB1"
+BINARY_CONTENT_TYPE = "application/octet-stream"
+_ARRAY_REF = "__ndarray__"
+_HEADER_LEN = struct.Struct("<I")
+
+
+# === Binary Transport ===
+class SharedMemoryArrays:
+    """
+    Client-side shared-memory segments, one per message field, reused across requests.
+
+    A segment is (re)allocated only when a field's byte size grows, so steady-state requests only memcpy each image
+    into memory the server maps directly. The client must wait for the response before writing the next observation.
+    """
+
+    def __init__(self) -> None:
+        self._segments: Dict[str, shared_memory.SharedMemory] = {}
+
+    def put(self, key: str, array: np.ndarray) -> str:
+        """Copies `array` into the segment for `key` and returns the segment name."""
+        segment = self._segments.get(key)
+        if segment is None or segment.size < array.nbytes:
+            if segment is not None:
+                segment.close()
+                segment.unlink()
+            segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            self._segments[key] = segment
+        np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+        return segment.name
+
+    def close(self) -> None:
+        for segment in self._segments.values():
+            segment.close()
+            segment.unlink()
+        self._segments.clear()
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """Maps an existing segment without letting this process's resource tracker unlink it at exit (it is owned by
+    the client that created it)."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    segment = shared_memory.SharedMemory(name=name)
+    resource_tracker.unregister(segment._name, "shared_memory")  # noqa: SLF001
+    return segment
+
+
+def encode_message(message: Dict[str, Any], shared_arrays: Optional[SharedMemoryArrays] = None) -> bytes:
+    """
+    Serialize a (possibly nested) dict of JSON values and numpy arrays into one binary message.
+
+    Args:
+        message: Message to encode; arrays may appear at any depth of nested dicts and lists
+        shared_arrays: If given, arrays are written to its shared-memory segments instead of the message body
+
+    Returns:
+        bytes: Encoded message
+    """
+    chunks: List[bytes] = []
+    offset = 0
+
+    def to_header(value: Any, path: str) -> Any:
+        nonlocal offset
+        if isinstance(value, dict):
+            return {k: to_header(v, f"{path}/{k}") for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [to_header(v, f"{path}/{i}") for i, v in enumerate(value)]
+        if isinstance(value, np.generic):
+            return value.item()
+        if not isinstance(value, np.ndarray):
+            return value
+        array = np.ascontiguousarray(value)
+        ref = {"dtype": array.dtype.str, "shape": list(array.shape)}
+        if shared_arrays is not None:
+            ref["shm"] = shared_arrays.put(path, array)
+        else:
+            ref["offset"] = offset
+            chunks.append(array.tobytes())
+            offset += array.nbytes
+        return {_ARRAY_REF: ref}
+
+    header = json.dumps(to_header(message, "")).encode()
+    return b"".join([MAGIC, _HEADER_LEN.pack(len(header)), header] + chunks)
+
+
+def is_loopback_host(host: Optional[str]) -> bool:
+    """Whether `host` (e.g. a request's client address) is a loopback IP address."""
+    try:
+        return host is not None and ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def decode_message(data: bytes, allow_shared_memory: bool = False) -> Dict[str, Any]:
+    """
+    Inverse of `encode_message`. Arrays sent inline are zero-copy, read-only views of `data`; arrays sent through
+    shared memory are copied out, so the client may reuse its segments as soon as it has the response.
+
+    Args:
+        data: Encoded message
+        allow_shared_memory: Whether to map shared-memory segments the message names; only enable this for trusted
+            (e.g. loopback) senders, as any segment on the host can be named
+
+    Returns:
+        Dict[str, Any]: Decoded message
+    """
+    if data[: len(MAGIC)] != MAGIC:
+        raise ValueError("Not a binary VLA message (bad magic)")
+    (header_len,) = _HEADER_LEN.unpack_from(data, len(MAGIC))
+    body_start = len(MAGIC) + _HEADER_LEN.size + header_len
+    header = json.loads(data[len(MAGIC) + _HEADER_LEN.size : body_start])
+    body = memoryview(data)[body_start:]
+
+    def from_header(value: Any) -> Any:
+        if isinstance(value, list):
+            return [from_header(v) for v in value]
+        if not isinstance(value, dict):
+            return value
+        if _ARRAY_REF not in value:
+            return {k: from_header(v) for k, v in value.items()}
+        ref = value[_ARRAY_REF]
+        dtype, shape = np.dtype(ref["dtype"]), tuple(ref["shape"])
+        count = int(np.prod(shape))
+        if "shm" in ref:
+            if not allow_shared_memory:
+                raise ValueError("Shared-memory array references are not accepted from this sender")
+            segment = _attach_shared_memory(ref["shm"])
+            try:
+                return np.frombuffer(segment.buf, dtype=dtype, count=count).reshape(shape).copy()
+            finally:
+                segment.close()
+        return np.frombuffer(body, dtype=dtype, count=count, offset=ref["offset"]).reshape(shape)
+
+    return from_header(header)
+
+
+# === Metrics ===
+class LatencyMetrics:
+    """
+    Thread-safe per-stage latency recorder. Keeps the last `window` samples of each stage for percentiles and a
+    running count, plus a histogram of executed batch sizes.
+    """
+
+    def __init__(self, window: int = 2000) -> None:
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+        self._counts: Dict[str, int] = defaultdict(int)
+        self._batch_sizes: Dict[int, int] = defaultdict(int)
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._samples[stage].append(seconds * 1e3)
+            self._counts[stage] += 1
+
+    def record_batch(self, batch_size: int) -> None:
+        with self._lock:
+            self._batch_sizes[batch_size] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-stage count, mean and p50 / p90 / p99 latency in milliseconds, and the batch-size histogram."""
+        with self._lock:
+            stages = {}
+            for stage, samples in self._samples.items():
+                values = np.asarray(samples)
+                p50, p90, p99 = np.percentile(values, [50, 90, 99])
+                stages[stage] = {
+                    "count": self._counts[stage],
+                    "mean_ms": float(values.mean()),
+                    "p50_ms": float(p50),
+                    "p90_ms": float(p90),
+                    "p99_ms": float(p99),
+                }
+            batch_sizes = dict(sorted(self._batch_sizes.items()))
+        num_batches = sum(batch_sizes.values())
+        return {
+            "stages": stages,
+            "batch_sizes": {str(k): v for k, v in batch_sizes.items()},
+            "mean_batch_size": sum(k * v for k, v in batch_sizes.items()) / num_batches if num_batches else 0.0,
+        }
+
+
+# === Dynamic Batching ===
+class MicroBatcher:
+    """
+    Queues requests from concurrent handlers and runs them through `process_batch` in micro-batches.
+
+    A batch is closed once it holds `max_batch_size` requests or `max_wait_s` after its first request arrived,
+    whichever comes first. Requests are grouped by key (e.g. the instruction, since a batched forward needs a shared
+    prompt) and each group is processed with one `process_batch(key, items)` call on the single worker thread, which
+    also keeps the model from being driven by several threads at once.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[Hashable, List[Any]], List[Any]],
+        max_batch_size: int,
+        max_wait_s: float,
+        metrics: Optional[LatencyMetrics] = None,
+    ) -> None:
+        assert max_batch_size >= 1, "max_batch_size must be >= 1!"
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_s
+        self.metrics = metrics or LatencyMetrics()
+        self._queue: "queue.Queue[Tuple[Hashable, Any, Future, float]]" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="vla-micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, key: Hashable, item: Any) -> Future:
+        """Enqueues one request; the returned future resolves to its entry of `process_batch`'s result."""
+        future: Future = Future()
+        self._queue.put((key, item, future, time.perf_counter()))
+        return future
+
+    def _collect(self) -> List[Tuple[Hashable, Any, Future, float]]:
+        pending = [self._queue.get()]
+        deadline = pending[0][3] + self.max_wait_s
+        while len(pending) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                pending.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return pending
+
+    def _run(self) -> None:
+        while True:
+            pending = self._collect()
+            start = time.perf_counter()
+            groups: Dict[Hashable, List[Tuple[Any, Future]]] = defaultdict(list)
+            for key, item, future, enqueued in pending:
+                self.metrics.record("queue", start - enqueued)
+                groups[key].append((item, future))
+
+            for key, group in groups.items():
+                t0 = time.perf_counter()
+                try:
+                    results = self.process_batch(key, [item for item, _ in group])
+                    assert len(results) == len(group), "process_batch must return one result per item!"
+                except Exception as e:  # noqa: BLE001
+                    for _, future in group:
+                        future.set_exception(e)
+                    continue
+                self.metrics.record("model", time.perf_counter() - t0)
+                self.metrics.record_batch(len(group))
+                for (_, future), result in zip(group, results):
+                    future.set_result(result)
+
+
+# === Client ===
+class BinaryActionClient:
+    """
+    Client for the server's `/act_binary` endpoint. Reuses one HTTP connection and, with `use_shared_memory=True`
+    (client and server on the same host), one shared-memory segment per observation field.
+    """
+
+    def __init__(self, server_endpoint: str = "http://0.0.0.0:8777/act_binary", use_shared_memory: bool = False) -> None:
+        self.server_endpoint = server_endpoint
+        self.session = requests.Session()
+        self.shared_arrays = SharedMemoryArrays() if use_shared_memory else None
+        self.last_timing: Dict[str, float] = {}
+
+    def get_action(self, observation: Dict[str, Any]) -> List[np.ndarray]:
+        """
+        Query the server for one action chunk.
+
+        Args:
+            observation: Observation dict with images, state and `instruction`
+
+        Returns:
+            List[np.ndarray]: Predicted actions
+        """
+        response = self.session.post(
+            self.server_endpoint,
+            data=encode_message(observation, self.shared_arrays),
+            headers={"Content-Type": BINARY_CONTENT_TYPE},
+        )
+        response.raise_for_status()
+        message = decode_message(response.content)
+        if "error" in message:
+            raise RuntimeError(f"VLA server error: {message['error']}")
+        self.last_timing = message["timing_ms"]
+        return list(message["action"])
+
+    def close(self) -> None:
+        self.session.close()
+        if self.shared_arrays is not None:
+            self.shared_arrays.close()
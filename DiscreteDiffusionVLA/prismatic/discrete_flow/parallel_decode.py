@@ -1,6 +1,7 @@
 import torch
 import torch.nn.functional as F
 import math
+from typing import Optional
 
 from .mask_schedule import schedule as mask_schedule
 
@@ -48,10 +49,17 @@ def decode(
     use_remask: bool = False,               # 是否使用重 mask 概率
     token_critic: torch.nn.Module = None,  # TokenCritic 模型，输出 [B, L] 的分数
     critic_noise_scale: float = 1.0,       # Critic 加噪声比例
+    confidence_threshold: Optional[float] = None,  # 自适应提前结束的置信度阈值
+    return_history: bool = False,          # 是否返回每轮迭代的 sampled 序列
 ):
     """
     非自回归 MaskGIT 推理
-    返回 final_seqs: [B, num_iter, L]，每轮迭代的 sampled 序列
+    confidence_threshold: 若设置，当所有仍为 mask 的位置上采样 token 的概率都 >= 阈值时提前结束，
+        直接采用本轮采样结果
+    return_history: True 时返回 [B, num_iter, L]（每轮迭代的 sampled 序列）；否则只返回最终序列 [B, L]
+        （mask_len 至少为 1，调度跑完前总有位置仍被 mask，只有 confidence_threshold 能提前结束；
+        提前结束时之后的轮次填入最终序列）
+    返回 (seqs, actions_hidden_states, num_steps)，num_steps 为实际运行的迭代（前向）次数
     """
     B, L = init_ids.shape
     device = init_ids.device
@@ -61,14 +69,17 @@ def decode(
 
     # State init
     cur_seqs = init_ids.clone()                         # [B, L]
-    final_seqs = torch.zeros(B, num_iter, L, dtype=init_ids.dtype, device=device)
-    final_seqs[:, 0, :] = init_ids
+    if return_history:
+        final_seqs = torch.zeros(B, num_iter, L, dtype=init_ids.dtype, device=device)
+        final_seqs[:, 0, :] = init_ids
+    num_steps = 0
 
     # 迭代解码
     for step in range(start_iter, num_iter):
         # 1) 得到 logits & 概率分布
         logits, actions_hidden_states = tokens_to_logits(cur_seqs)             # [B, L, V]
         probs = F.softmax(logits, dim=-1)               # [B, L, V]
+        num_steps += 1
 
         # 2) 并行 categorical 采样
         #    展平后采样，再 reshape
@@ -79,14 +90,25 @@ def decode(
         # 3) 仅在 mask 位置更新
         unknown_map = cur_seqs == mask_token_id         # [B, L]
         sampled = torch.where(unknown_map, sampled, cur_seqs)
+        if return_history:
+            final_seqs[:, step, :] = sampled
+
+        # 提前结束：所有仍未知位置的采样概率都超过阈值，直接接受本轮采样
+        if confidence_threshold is not None:
+            sampled_probs = probs.gather(2, sampled.unsqueeze(-1)).squeeze(-1)  # [B, L]
+            if bool(((sampled_probs >= confidence_threshold) | ~unknown_map).all()):
+                if return_history:
+                    # 剩余轮次沿用最终结果，final_seqs[:, -1] 始终是输出序列
+                    final_seqs[:, step + 1:] = sampled[:, None]
+                break
 
         # 4) 计算下轮 mask 数量
         ratio = torch.tensor(float(step + 1) / num_iter, device=device)              # scalar
         # 调度函数：给定 ratio、初始未知数，返回 mask_ratio
         mask_ratio = mask_schedule(ratio, unknown_init, mask_scheduling_method)  # [B]
         mask_len = torch.floor(unknown_init.float() * mask_ratio).long()
-        # 保证至少 1 且最多 unknown_init-1
-        mask_len = torch.clamp(mask_len, min=1, max=(unknown_init - 1).item())
+        # 保证至少 1 且最多 unknown_init-1（逐样本，支持 B > 1）
+        mask_len = torch.minimum(torch.clamp(mask_len, min=1), unknown_init - 1)
 
         # —————————————— 4) 计算每个位置得分 scores ——————————————
         if token_critic is not None:
@@ -127,10 +149,8 @@ def decode(
         next_seqs = torch.where(masking, mask_token_id, sampled)  # [B, L]
         cur_seqs = next_seqs
 
-        # 8) 存储本轮结果
-        final_seqs[:, step, :] = sampled
-
         # TODO: Important 选最后一轮 final_iters[:, -1, :] 作为最终输出, 或对多轮结果做融合
 
-    return final_seqs, actions_hidden_states
+    seqs = final_seqs if return_history else sampled
+    return seqs, actions_hidden_states, num_steps
 
@@ -153,8 +153,13 @@ class OpenVLAConfig(PrismaticConfig):
         self,
         norm_stats: Optional[Dict[str, Dict[str, Dict[str, Dict[str, List[float]]]]]] = None,
         n_action_bins: int = 256,
+        causal_llm_backbone: bool = False,
         **kwargs: str,
     ) -> None:
         self.norm_stats, self.n_action_bins = norm_stats, n_action_bins
 
+        # The pinned `transformers` fork runs Llama with bidirectional attention (for parallel decoding); only a model
+        # run with stock causal attention can reuse a prefix KV cache across decoding iterations (`use_prefix_cache`)
+        self.causal_llm_backbone = causal_llm_backbone
+
         super().__init__(**kwargs)
@@ -18,7 +18,7 @@ import torch
 import torch.nn as nn
 import transformers
 from timm.models.vision_transformer import LayerScale
-from transformers import AutoModelForCausalLM, PretrainedConfig, PreTrainedModel
+from transformers import AutoModelForCausalLM, DynamicCache, PretrainedConfig, PreTrainedModel
 from transformers.modeling_outputs import ModelOutput
 
 from prismatic.discrete_flow import (
@@ -876,6 +876,9 @@ class OpenVLAForActionPrediction(PrismaticForConditionalGeneration):
         else:
             self.topk_filter_thres = 0.0
 
+        # Number of parallel-decoding iterations (forward passes) used by the last discrete diffusion prediction
+        self.last_decode_num_iters = None
+
         # Compute vocab size for de-tokenization -- revert added "multiple of"
         self.vocab_size = self.config.text_config.vocab_size - self.config.pad_to_multiple_of
 
@@ -1069,7 +1072,7 @@ class OpenVLAForActionPrediction(PrismaticForConditionalGeneration):
         if action_head is not None:
             # L1 regression prediction
             normalized_actions = action_head.predict_action(actions_hidden_states)
-            normalized_actions = normalized_actions.reshape(NUM_ACTIONS_CHUNK, ACTION_DIM)
+            normalized_actions = normalized_actions.reshape(-1, NUM_ACTIONS_CHUNK, ACTION_DIM)
             normalized_actions = normalized_actions.float().cpu().detach().numpy()
         else:
             # Discrete token-based prediction
@@ -1085,7 +1088,7 @@ class OpenVLAForActionPrediction(PrismaticForConditionalGeneration):
             discretized_actions = self.vocab_size - predicted_action_token_ids
             discretized_actions = np.clip(discretized_actions - 1, a_min=0, a_max=self.bin_centers.shape[0] - 1)
             normalized_actions = self.bin_centers[discretized_actions]
-            normalized_actions = normalized_actions.reshape(NUM_ACTIONS_CHUNK, ACTION_DIM)
+            normalized_actions = normalized_actions.reshape(-1, NUM_ACTIONS_CHUNK, ACTION_DIM)
 
         return normalized_actions, actions_hidden_states
 
@@ -1100,9 +1103,28 @@ class OpenVLAForActionPrediction(PrismaticForConditionalGeneration):
         NUM_PROMPT_TOKENS,
         action_head=None,
         input_ids=None,
+        use_prefix_cache=False,
+        decode_confidence_threshold=None,
     ):
-        """Run L1 regression-based continuous action prediction or discrete action tokens prediction."""
+        """Run discrete diffusion (MaskGIT-style parallel decoding) action token prediction.
+
+        With `use_prefix_cache`, the BOS/patch/prompt positions are run through the backbone once and every
+        decoding iteration only runs the action chunk (plus stop token) on top of their KV cache. This is only exact
+        when prefix positions do not attend to the action tokens, so it requires `config.causal_llm_backbone`. With
+        the bidirectional attention of the pinned `transformers` fork the prefix sees the partially decoded actions,
+        its keys and values change every iteration, and there is nothing to reuse; a ValueError is raised instead.
+
+        With `decode_confidence_threshold`, decoding stops as soon as every still-masked action token is sampled with
+        at least that probability, instead of always running the full schedule. The number of iterations actually
+        run is stored in `self.last_decode_num_iters`.
+        """
         assert input_ids is not None, "Input IDs must be provided for discrete diffusion prediction!"
+        if use_prefix_cache and not self.config.causal_llm_backbone:
+            raise ValueError(
+                "`use_prefix_cache` requires a causal LLM backbone (`causal_llm_backbone=True` in the model config); "
+                "with bidirectional attention the prefix attends to the action tokens, so its KV cache changes every "
+                "decoding iteration. Disable `use_prefix_cache`."
+            )
 
         # Handle different prediction methods
         if action_head is not None:
@@ -1113,6 +1135,35 @@ class OpenVLAForActionPrediction(PrismaticForConditionalGeneration):
             # normalized_actions = normalized_actions.float().cpu().detach().numpy()
         else:
 
+            def tokens_to_logits_cached(suffix_seq: torch.LongTensor) -> torch.Tensor:
+                # Segment = last prompt token (its logits predict the first action token) + actions + stop token
+                segment_ids = torch.cat(
+                    [
+                        masked_input_ids[:, NUM_PROMPT_TOKENS : 1 + NUM_PROMPT_TOKENS],
+                        suffix_seq,
+                        masked_input_ids[:, 1 + NUM_PROMPT_TOKENS + ACTION_DIM * NUM_ACTIONS_CHUNK :],
+                    ],
+                    dim=1,
+                )
+                language_model_output = self.language_model(
+                    input_ids=None,
+                    attention_mask=multimodal_attention_mask,
+                    position_ids=None,
+                    past_key_values=prefix_cache,
+                    inputs_embeds=self.get_input_embeddings()(segment_ids),
+                    labels=None,
+                    use_cache=True,
+                    output_attentions=False,
+                    output_hidden_states=True,
+                    return_dict=True,
+                )
+                # The backbone appended the segment's keys/values to the cache; drop them again (a negative count
+                # removes trailing tokens in every `transformers` version)
+                prefix_cache.crop(-segment_ids.shape[1])
+                full_logits = language_model_output.logits[:, : ACTION_DIM * NUM_ACTIONS_CHUNK, : self.vocab_size]
+                actions_hidden_states = language_model_output.hidden_states[-1][:, : ACTION_DIM * NUM_ACTIONS_CHUNK, :]
+                return full_logits, actions_hidden_states
+
             def tokens_to_logits(suffix_seq: torch.LongTensor) -> torch.Tensor:
 
                 prefix = masked_input_ids[:, :1+NUM_PROMPT_TOKENS]
@@ -1173,21 +1224,43 @@ class OpenVLAForActionPrediction(PrismaticForConditionalGeneration):
                 :, 1+NUM_PROMPT_TOKENS:1+NUM_PROMPT_TOKENS + ACTION_DIM * NUM_ACTIONS_CHUNK
             ]  # (B, seq_len)
 
-            final_iters, actions_hidden_states = parallel_decode.decode(
+            if use_prefix_cache:
+                # Encode BOS + patches + all but the last prompt token once per observation
+                multimodal_embeddings, multimodal_attention_mask = self._build_multimodal_attention(
+                    self.get_input_embeddings()(masked_input_ids), projected_patch_embeddings, attention_mask
+                )
+                prefix_len = NUM_PATCHES + NUM_PROMPT_TOKENS
+                # Pass a DynamicCache in so it is filled in place (older backbones return legacy tuples otherwise)
+                prefix_cache = DynamicCache()
+                self.language_model(
+                    input_ids=None,
+                    attention_mask=None if multimodal_attention_mask is None else multimodal_attention_mask[:, :prefix_len],
+                    position_ids=None,
+                    past_key_values=prefix_cache,
+                    inputs_embeds=multimodal_embeddings[:, :prefix_len],
+                    labels=None,
+                    use_cache=True,
+                    output_attentions=False,
+                    output_hidden_states=False,
+                    return_dict=True,
+                )
+
+            predicted_action_token_ids, actions_hidden_states, self.last_decode_num_iters = parallel_decode.decode(
                 init_ids=cur_seqs,
-                tokens_to_logits=tokens_to_logits,
+                tokens_to_logits=tokens_to_logits_cached if use_prefix_cache else tokens_to_logits,
                 mask_token_id=self.mask_token_id,
                 num_iter=12,
                 choice_temperature=1.0,  # to_test
                 mask_scheduling_method="cosine",
                 use_remask=False,
+                confidence_threshold=decode_confidence_threshold,
             )
 
-            predicted_action_token_ids = final_iters[:, -1, :].cpu().numpy()
+            predicted_action_token_ids = predicted_action_token_ids.cpu().numpy()
             discretized_actions = self.vocab_size - predicted_action_token_ids
             discretized_actions = np.clip(discretized_actions - 1, a_min=0, a_max=self.bin_centers.shape[0] - 1)
             normalized_actions = self.bin_centers[discretized_actions]
-            normalized_actions = normalized_actions.reshape(NUM_ACTIONS_CHUNK, ACTION_DIM)
+            normalized_actions = normalized_actions.reshape(-1, NUM_ACTIONS_CHUNK, ACTION_DIM)
 
         return normalized_actions, actions_hidden_states
 
@@ -1201,6 +1274,8 @@ class OpenVLAForActionPrediction(PrismaticForConditionalGeneration):
         noisy_action_projector=None,
         use_film: bool = False,
         use_discrete_diffusion: bool = False,
+        use_prefix_cache: bool = False,
+        decode_confidence_threshold: Optional[float] = None,
         **kwargs: str,
     ) -> np.ndarray:
         """Predict actions from input sequence, with options for different prediction methods.
@@ -1214,16 +1289,23 @@ class OpenVLAForActionPrediction(PrismaticForConditionalGeneration):
             noisy_action_projector: Projector for noisy actions in diffusion-based prediction
             use_film: Whether to use FiLM conditioning
             use_discrete_diffusion: Whether to use discrete diffusion for action prediction
+            use_prefix_cache: (Discrete diffusion only) Encode the vision/prompt prefix once and reuse its KV cache
+                across decoding iterations (requires `causal_llm_backbone` in the model config)
+            decode_confidence_threshold: (Discrete diffusion only) Stop parallel decoding early once every masked
+                action token is sampled with at least this probability (None: always run the full schedule)
             **kwargs: Additional arguments including pixel_values and attention_mask
 
         Returns:
-            Tuple of (unnormalized_actions, action_hidden_states)
+            Tuple of (unnormalized_actions, action_hidden_states). Actions have shape (NUM_ACTIONS_CHUNK, ACTION_DIM)
+            for a single observation, or (B, NUM_ACTIONS_CHUNK, ACTION_DIM) for a batch (L1 regression and discrete
+            decoding only). All rows of a batch must share the same prompt length.
         """
         # If the special empty token ('') does not already appear after the colon (':') token in the prompt
         # (after "OUT:" or "ASSISTANT:"), insert it to match the inputs seen at training time
         if not torch.all(input_ids[:, -1] == 29871):
             input_ids = torch.cat(
-                (input_ids, torch.unsqueeze(torch.Tensor([29871]).long(), dim=0).to(input_ids.device)), dim=1
+                (input_ids, torch.full((input_ids.shape[0], 1), 29871, dtype=input_ids.dtype, device=input_ids.device)),
+                dim=1,
             )
 
         pixel_values = kwargs["pixel_values"]
@@ -1304,6 +1386,8 @@ class OpenVLAForActionPrediction(PrismaticForConditionalGeneration):
                     NUM_PROMPT_TOKENS,
                     action_head,
                     input_ids=input_ids,
+                    use_prefix_cache=use_prefix_cache,
+                    decode_confidence_threshold=decode_confidence_threshold,
                 )
             else:
                 # Run regression or discrete token-based prediction
@@ -1321,6 +1405,10 @@ class OpenVLAForActionPrediction(PrismaticForConditionalGeneration):
         # Unnormalize predicted actions
         actions = self._unnormalize_actions(normalized_actions, unnorm_key)
 
+        # Keep the single-observation return shape (NUM_ACTIONS_CHUNK, ACTION_DIM) for batch size 1
+        if actions.ndim == 3 and actions.shape[0] == 1:
+            actions = actions[0]
+
         return actions, actions_hidden_states
 
     @staticmethod
@@ -1 +1,8 @@
-from .materialize import get_vla_dataset_and_collator
+def __getattr__(name):
+    # Imported lazily so that `prismatic.vla.constants` (needed at inference time) does not pull in the TensorFlow
+    # RLDS data pipeline
+    if name == "get_vla_dataset_and_collator":
+        from .materialize import get_vla_dataset_and_collator
+
+        return get_vla_dataset_and_collator
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,143 @@
+"""
+`center_crop_images` against a scalar port of the TF pipeline it replaces (openvla_utils.crop_and_resize), and both it
+and `resize_images_for_policy` against TensorFlow itself when it is installed.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+from experiments.robot import image_preprocessing
+from experiments.robot.image_preprocessing import center_crop_images, resize_images_for_policy
+
+# Both sides run the same float32 operations in the same order, so the uint8 outputs must match exactly
+TOLERANCE = 0
+
+
+def tf_center_crop_reference(image, crop_scale, out_size):
+    """
+    One image through convert_image_dtype(uint8 -> float32), tf.image.crop_and_resize on the centered box (a line-by-
+    line port of the CropAndResize CPU kernel in tensorflow/core/kernels/image/crop_and_resize_op.cc, one output pixel
+    at a time), clip_by_value(0, 1) and convert_image_dtype(float32 -> uint8, saturate=True).
+    """
+    f32 = np.float32
+    image = image.astype(f32) * f32(1.0 / 255)
+    image_height, image_width = image.shape[:2]
+
+    # Box of openvla_utils.crop_and_resize: [y1, x1, y2, x2] = [offset, offset, offset + side, offset + side]
+    side = f32(np.clip(np.sqrt(f32(crop_scale)), 0, 1))
+    y1 = x1 = (f32(1) - side) / f32(2)
+    y2 = x2 = y1 + side
+
+    height_scale = (y2 - y1) * f32(image_height - 1) / f32(out_size - 1) if out_size > 1 else f32(0)
+    width_scale = (x2 - x1) * f32(image_width - 1) / f32(out_size - 1) if out_size > 1 else f32(0)
+    crops = np.zeros((out_size, out_size, image.shape[2]), dtype=f32)
+    for y in range(out_size):
+        if out_size > 1:
+            in_y = y1 * f32(image_height - 1) + f32(y) * height_scale
+        else:
+            in_y = f32(0.5) * (y1 + y2) * f32(image_height - 1)
+        assert 0 <= in_y <= image_height - 1  # the centered box never needs the extrapolation value
+        top_y_index, bottom_y_index = int(np.floor(in_y)), int(np.ceil(in_y))
+        y_lerp = in_y - f32(top_y_index)
+        for x in range(out_size):
+            if out_size > 1:
+                in_x = x1 * f32(image_width - 1) + f32(x) * width_scale
+            else:
+                in_x = f32(0.5) * (x1 + x2) * f32(image_width - 1)
+            left_x_index, right_x_index = int(np.floor(in_x)), int(np.ceil(in_x))
+            x_lerp = in_x - f32(left_x_index)
+
+            top_left, top_right = image[top_y_index, left_x_index], image[top_y_index, right_x_index]
+            bottom_left, bottom_right = image[bottom_y_index, left_x_index], image[bottom_y_index, right_x_index]
+            top = top_left + (top_right - top_left) * x_lerp
+            bottom = bottom_left + (bottom_right - bottom_left) * x_lerp
+            crops[y, x] = top + (bottom - top) * y_lerp
+
+    scaled = np.clip(crops, f32(0), f32(1)) * f32(255.5)
+    return np.minimum(scaled, f32(255)).astype(np.uint8)
+
+
+@pytest.mark.parametrize(
+    "shape, crop_scale, out_size",
+    [
+        ((2, 224, 224, 3), 0.9, 224),  # LIBERO eval: 224px agentview + wrist images, 90% area crop
+        ((1, 40, 56, 3), 0.9, 32),  # non-square input, downscaling
+        ((1, 17, 17, 1), 0.5, 40),  # upscaling a single channel
+        ((1, 12, 12, 3), 1.0, 12),  # full-image box: identity resampling
+        ((1, 9, 9, 3), 0.64, 1),  # single output pixel samples the box center
+    ],
+)
+def test_center_crop_matches_tf_crop_and_resize(shape, crop_scale, out_size):
+    rng = np.random.default_rng(0)
+    images = rng.integers(0, 256, shape, dtype=np.uint8)
+    images[0, : shape[1] // 2, : shape[2] // 3] = 255  # saturated and black regions exercise the final clip
+    images[-1, shape[1] // 2 :, shape[2] // 3 :] = 0
+
+    crops = center_crop_images(images, crop_scale, out_size)
+    assert crops.dtype == np.uint8 and crops.shape == (shape[0], out_size, out_size, shape[3])
+    for image, crop in zip(images, crops):
+        reference = tf_center_crop_reference(image, crop_scale, out_size)
+        assert np.abs(crop.astype(np.int16) - reference.astype(np.int16)).max() <= TOLERANCE
+    np.testing.assert_array_equal(center_crop_images(images[0], crop_scale, out_size), crops[0])
+
+
+def test_center_crop_matches_tensorflow():
+    tf = pytest.importorskip("tensorflow")
+    images = np.random.default_rng(0).integers(0, 256, (4, 224, 224, 3), dtype=np.uint8)
+    images[0] = 255
+
+    # openvla_utils.crop_and_resize on the centered box, for the whole batch
+    side = np.sqrt(np.float32(0.9))
+    offset = (1 - side) / 2
+    boxes = tf.constant([[offset, offset, offset + side, offset + side]] * len(images), dtype=tf.float32)
+    reference = tf.image.crop_and_resize(
+        tf.image.convert_image_dtype(images, tf.float32), boxes, tf.range(len(images)), (224, 224)
+    )
+    reference = tf.image.convert_image_dtype(tf.clip_by_value(reference, 0, 1), tf.uint8, saturate=True).numpy()
+
+    # TF may fuse the lerps into FMAs, so allow one uint8 level at rounding boundaries
+    diff = np.abs(center_crop_images(images).astype(np.int16) - reference.astype(np.int16))
+    assert diff.max() <= 1 and (diff > 0).mean() < 1e-3
+
+
+@pytest.mark.parametrize(
+    "shape, resize_size",
+    [
+        ((2, 256, 256, 3), 224),  # LIBERO eval: 256px renders of both cameras
+        ((1, 30, 20, 3), (48, 64)),  # non-square upscaling
+        ((1, 224, 224, 3), 224),  # already at size
+    ],
+)
+def test_resize_matches_tensorflow(shape, resize_size, monkeypatch):
+    tf = pytest.importorskip("tensorflow")
+    images = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+    size = (resize_size, resize_size) if isinstance(resize_size, int) else resize_size
+
+    # JPEG round trip: same encoder output, decoded with the accurate IDCT
+    for image in images:
+        reference = tf.io.decode_jpeg(tf.image.encode_jpeg(image), dct_method="INTEGER_ACCURATE").numpy()
+        np.testing.assert_array_equal(image_preprocessing._jpeg_round_trip(image), reference)
+
+    # Resize kernel on its own; sin() may differ in the last bit, which can flip a value at a .5 rounding boundary
+    monkeypatch.setattr(image_preprocessing, "_jpeg_round_trip", lambda image: image)
+    reference = tf.image.resize(images, size, method="lanczos3", antialias=True)
+    reference = tf.cast(tf.clip_by_value(tf.round(reference), 0, 255), tf.uint8).numpy()
+    diff = np.abs(resize_images_for_policy(images, resize_size).astype(np.int16) - reference.astype(np.int16))
+    assert diff.max() <= 1 and (diff > 0).mean() < 1e-3
+
+
+def test_resize_batches_cameras():
+    rng = np.random.default_rng(0)
+    images = rng.integers(0, 256, (3, 64, 48, 3), dtype=np.uint8)
+    images[1] = 90  # flat images survive the JPEG round trip and the normalized kernel unchanged
+
+    resized = resize_images_for_policy(images, (40, 32))
+    assert resized.dtype == np.uint8 and resized.shape == (3, 40, 32, 3)
+    assert (resized[1] == 90).all()
+    for image, expected in zip(images, resized):
+        np.testing.assert_array_equal(resize_images_for_policy(image, (40, 32)), expected)
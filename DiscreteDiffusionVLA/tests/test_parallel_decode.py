@@ -0,0 +1,31 @@
+"""MaskGIT decoding loop (prismatic/discrete_flow/parallel_decode.py) on a fake logits function."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+
+from prismatic.discrete_flow.parallel_decode import decode
+
+MASK, VOCAB = 0, 8
+
+
+def confident_logits(seqs):
+    # every position puts (almost) all mass on token 5
+    logits = torch.full((*seqs.shape, VOCAB), -1e4)
+    logits[..., 5] = 0.
+    return logits, None
+
+
+def test_early_exit_fills_the_remaining_history():
+    init_ids = torch.tensor([[MASK, 3, MASK, MASK], [MASK, MASK, 2, MASK]])
+    seqs, _, num_steps = decode(init_ids, confident_logits, MASK, num_iter=6,
+                                confidence_threshold=0.9, return_history=True)
+    expected = torch.tensor([[5, 3, 5, 5], [5, 5, 2, 5]])
+    assert num_steps == 1 and seqs.shape == (2, 6, 4)
+    assert (seqs == expected[:, None]).all()
+
+    final, _, _ = decode(init_ids, confident_logits, MASK, num_iter=6, confidence_threshold=0.9)
+    assert torch.equal(final, seqs[:, -1])
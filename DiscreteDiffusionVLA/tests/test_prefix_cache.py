@@ -0,0 +1,78 @@
+"""CPU checks for cached-prefix discrete diffusion decoding on a tiny randomly initialized OpenVLA."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+import torch
+
+from prismatic.extern.hf.configuration_prismatic import OpenVLAConfig
+from prismatic.extern.hf.modeling_prismatic import OpenVLAForActionPrediction
+from prismatic.vla.constants import ACTION_DIM, NUM_ACTIONS_CHUNK
+
+UNNORM_KEY = "libero_spatial_no_noops"
+
+
+@pytest.fixture(scope="module")
+def tiny_vla():
+    config = OpenVLAConfig(
+        vision_backbone_id="siglip-vit-so400m",
+        llm_backbone_id="llama2-7b-pure",
+        text_config=dict(
+            vocab_size=32064, hidden_size=32, intermediate_size=64, num_hidden_layers=2, num_attention_heads=4,
+            num_key_value_heads=2, max_position_embeddings=512, initializer_range=0.5,
+        ),
+        norm_stats={UNNORM_KEY: {"action": {"q01": [-1.0] * ACTION_DIM, "q99": [1.0] * ACTION_DIM}}},
+    )
+    # Swap the SO400M ViT for a 4-patch ViT-Tiny so the whole model runs on CPU in a fraction of a second
+    config.timm_model_ids, config.image_sizes = ["vit_tiny_patch16_224"], [32]
+    torch.manual_seed(0)
+    return OpenVLAForActionPrediction(config).eval()
+
+
+def predict(vla, **kwargs):
+    generator = torch.Generator().manual_seed(0)
+    input_ids = torch.randint(3, 29000, (2, 6), generator=generator)
+    input_ids[:, 0] = 1
+    torch.manual_seed(0)  # parallel decoding draws Gumbel noise
+    with torch.no_grad():
+        return vla.predict_action(
+            input_ids,
+            unnorm_key=UNNORM_KEY,
+            use_discrete_diffusion=True,
+            pixel_values=torch.randn(2, 3, 32, 32, generator=generator),
+            attention_mask=torch.ones_like(input_ids, dtype=torch.bool),
+            **kwargs,
+        )
+
+
+def language_model_is_causal(vla):
+    """Whether earlier positions ignore later ones (stock Llama) or not (the bidirectional fork in pyproject.toml)."""
+    probe_ids = torch.tensor([[1, 2, 3], [1, 2, 4]])
+    with torch.no_grad():
+        hidden_states = vla.language_model(input_ids=probe_ids, output_hidden_states=True).hidden_states[-1]
+    return torch.allclose(hidden_states[0, :2], hidden_states[1, :2], rtol=1e-3, atol=1e-3)
+
+
+def test_prefix_cache_matches_full_recompute(tiny_vla, monkeypatch):
+    if not language_model_is_causal(tiny_vla):
+        pytest.skip("installed transformers uses bidirectional Llama attention")
+    monkeypatch.setattr(tiny_vla.config, "causal_llm_backbone", True)
+
+    actions, hidden_states = predict(tiny_vla)
+    cached_actions, cached_hidden_states = predict(tiny_vla, use_prefix_cache=True)
+
+    assert actions.shape == (2, NUM_ACTIONS_CHUNK, ACTION_DIM)
+    assert len(np.unique(actions)) > 1
+    np.testing.assert_array_equal(cached_actions, actions)
+    torch.testing.assert_close(cached_hidden_states, hidden_states, rtol=1e-5, atol=1e-5)
+
+
+def test_prefix_cache_needs_causal_backbone_config(tiny_vla):
+    assert not tiny_vla.config.causal_llm_backbone  # default: the pinned fork attends bidirectionally
+    with pytest.raises(ValueError, match="causal_llm_backbone"):
+        predict(tiny_vla, use_prefix_cache=True)
+    predict(tiny_vla)
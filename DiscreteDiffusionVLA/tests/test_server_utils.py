@@ -0,0 +1,141 @@
+"""Binary transport and micro-batching of the VLA server (experiments/robot/server_utils.py, no torch needed)."""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+from experiments.robot.server_utils import (
+    MicroBatcher,
+    SharedMemoryArrays,
+    decode_message,
+    encode_message,
+    is_loopback_host,
+)
+
+
+def _observation(rng):
+    return {
+        "observation": {
+            "full_image": rng.integers(0, 255, (224, 224, 3), dtype=np.uint8),
+            "wrist_images": [rng.integers(0, 255, (64, 64, 3), dtype=np.uint8) for _ in range(2)],
+            "state": rng.standard_normal(8).astype(np.float32),
+            "step": np.int64(7),
+        },
+        "instruction": "put the bowl on the plate",
+        "meta": {"scores": [1.5, None, True], "empty": np.zeros((0, 3), dtype=np.float64)},
+    }
+
+
+def _assert_same(decoded, original):
+    if isinstance(original, dict):
+        assert set(decoded) == set(original)
+        for key in original:
+            _assert_same(decoded[key], original[key])
+    elif isinstance(original, list):
+        assert len(decoded) == len(original)
+        for d, o in zip(decoded, original):
+            _assert_same(d, o)
+    elif isinstance(original, np.ndarray):
+        assert decoded.dtype == original.dtype and decoded.shape == original.shape
+        np.testing.assert_array_equal(decoded, original)
+    else:
+        assert decoded == original and type(decoded) is type(original.item() if isinstance(original, np.generic) else original)
+
+
+def test_inline_arrays_round_trip_as_read_only_views():
+    message = _observation(np.random.default_rng(0))
+    data = encode_message(message)
+    decoded = decode_message(data)
+
+    _assert_same(decoded, message)
+    image = decoded["observation"]["full_image"]
+    assert not image.flags.writeable and not image.flags.owndata
+    with pytest.raises(ValueError):
+        decode_message(b"JSON" + data[4:])
+
+
+def test_shared_memory_arrays_round_trip_only_when_allowed():
+    rng = np.random.default_rng(0)
+    message = _observation(rng)
+    shared_arrays = SharedMemoryArrays()
+    try:
+        data = encode_message(message, shared_arrays)
+        assert len(data) < message["observation"]["full_image"].nbytes  # images are not in the body
+        with pytest.raises(ValueError, match="Shared-memory"):
+            decode_message(data)
+
+        decoded = decode_message(data, allow_shared_memory=True)
+        _assert_same(decoded, message)
+        # decoded arrays are copies, so the client may overwrite its segments with the next observation
+        encode_message(_observation(rng), shared_arrays)
+        _assert_same(decoded, message)
+    finally:
+        shared_arrays.close()
+
+
+def test_loopback_hosts():
+    assert is_loopback_host("127.0.0.1") and is_loopback_host("127.8.0.1") and is_loopback_host("::1")
+    assert not is_loopback_host("10.0.0.5") and not is_loopback_host("0.0.0.0")
+    assert not is_loopback_host("testclient") and not is_loopback_host(None)
+
+
+class _RecordingModel:
+    """`process_batch` that records every call and can be held on a gate to let requests pile up."""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, key, items):
+        self.gate.wait()
+        self.calls.append((key, list(items)))
+        if key == "fail":
+            raise RuntimeError("model error")
+        return [f"{key}:{item}" for item in items]
+
+
+def test_queued_requests_are_grouped_by_key_and_capped_at_max_batch_size():
+    model = _RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=4, max_wait_s=0.05)
+    model.gate.clear()
+    blocker = batcher.submit("warmup", 0)
+    time.sleep(0.1)  # the worker is now inside process_batch for the warmup request
+
+    requests = [("a", 1), ("b", 1), ("a", 2), ("fail", 1), ("a", 3), ("b", 2)]
+    futures = [batcher.submit(key, item) for key, item in requests]
+    model.gate.set()
+
+    assert blocker.result(timeout=5) == "warmup:0"
+    for (key, item), future in zip(requests, futures):
+        if key == "fail":
+            with pytest.raises(RuntimeError, match="model error"):
+                future.result(timeout=5)
+        else:
+            assert future.result(timeout=5) == f"{key}:{item}"
+    # the first four queued requests form one batch, split into one call per key; the rest form the next batch
+    assert model.calls == [("warmup", [0]), ("a", [1, 2]), ("b", [1]), ("fail", [1]), ("a", [3]), ("b", [2])]
+    assert batcher.metrics.summary()["batch_sizes"] == {"1": 4, "2": 1}
+
+
+def test_a_batch_closes_max_wait_s_after_its_first_request():
+    model = _RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=8, max_wait_s=0.2)
+
+    start = time.perf_counter()
+    first = batcher.submit("a", 1)
+    time.sleep(0.05)
+    second = batcher.submit("a", 2)  # joins the open batch
+    assert first.result(timeout=5) == "a:1" and second.result(timeout=5) == "a:2"
+    elapsed = time.perf_counter() - start
+    assert 0.2 <= elapsed < 1.0
+
+    time.sleep(0.05)
+    assert batcher.submit("a", 3).result(timeout=5) == "a:3"  # after the deadline: a batch of its own
+    assert model.calls == [("a", [1, 2]), ("a", [3])]
@@ -0,0 +1,86 @@
+"""
+benchmark_deploy_clients.py
+
+Load test for a running deploy.py server: `num_clients` processes (stand-ins for parallel LIBERO eval workers) each
+send `num_requests` queries of a saved observation back to back, over JSON `/act`, binary `/act_binary`, or binary
+with images in shared memory. Reports client-side throughput and latency, then the server's own `/metrics`.
+
+Usage:
+    python vla-scripts/deploy.py --pretrained_checkpoint <CHECKPOINT_PATH> --dynamic_batching True
+    python vla-scripts/benchmark_deploy_clients.py --num_clients 16 --transport shm
+"""
+
+import json
+import multiprocessing as mp
+import pickle
+import time
+from dataclasses import dataclass
+
+import draccus
+import json_numpy
+import numpy as np
+import requests
+
+from experiments.robot.server_utils import BinaryActionClient
+
+
+@dataclass
+class ClientBenchmarkConfig:
+    # fmt: off
+    server_url: str = "http://0.0.0.0:8777"          # Server address
+    transport: str = "binary"                        # "json" (/act), "binary" (/act_binary) or "shm" (/act_binary + shared memory)
+    num_clients: int = 16                            # Concurrent client processes
+    num_requests: int = 50                           # Timed requests per client
+    num_warmup: int = 2                              # Untimed requests per client
+    observation_path: str = "experiments/robot/libero/sample_libero_spatial_observation.pkl"  # Saved observation
+    # fmt: on
+
+
+def run_client(cfg: ClientBenchmarkConfig, observation: dict, results: "mp.Queue") -> None:
+    if cfg.transport == "json":
+        session = requests.Session()
+
+        def query(obs):
+            return session.post(f"{cfg.server_url}/act", json={"encoded": json_numpy.dumps(obs)}).json()
+
+    else:
+        client = BinaryActionClient(f"{cfg.server_url}/act_binary", use_shared_memory=cfg.transport == "shm")
+        query = client.get_action
+
+    latencies = []
+    for i in range(cfg.num_warmup + cfg.num_requests):
+        start = time.perf_counter()
+        query(observation)
+        if i >= cfg.num_warmup:
+            latencies.append(time.perf_counter() - start)
+    if cfg.transport != "json":
+        client.close()
+    results.put(latencies)
+
+
+@draccus.wrap()
+def benchmark_deploy_clients(cfg: ClientBenchmarkConfig) -> None:
+    assert cfg.transport in ("json", "binary", "shm"), f"Unknown transport {cfg.transport}!"
+    with open(cfg.observation_path, "rb") as f:
+        observation = pickle.load(f)
+    observation["instruction"] = observation.pop("task_description")
+
+    results = mp.Queue()
+    clients = [mp.Process(target=run_client, args=(cfg, observation, results)) for _ in range(cfg.num_clients)]
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    latencies = np.concatenate([results.get() for _ in clients]) * 1e3
+    wall = time.perf_counter() - start
+    for client in clients:
+        client.join()
+
+    print(f"{cfg.num_clients} clients x {cfg.num_requests} requests over {cfg.transport}")
+    print(f"  throughput: {len(latencies) / wall:.1f} req/s (incl. warmup and client start-up)")
+    print(f"  latency ms: mean {latencies.mean():.1f}  p50 {np.percentile(latencies, 50):.1f}  p99 {np.percentile(latencies, 99):.1f}")
+    print("Server /metrics:")
+    print(json.dumps(requests.get(f"{cfg.server_url}/metrics").json(), indent=2))
+
+
+if __name__ == "__main__":
+    benchmark_deploy_clients()
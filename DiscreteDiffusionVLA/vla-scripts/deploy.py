@@ -2,6 +2,13 @@
 deploy.py
 
 Starts VLA server which the client can query to get robot actions.
+
+`/act` takes JSON (json_numpy-encoded images); `/act_binary` takes the binary format of
+experiments/robot/server_utils.py, with images inline or in client-owned shared memory (see BinaryActionClient).
+Shared-memory references are only accepted from loopback clients unless `--shared_memory_from_any_host True`.
+With `--dynamic_batching True`, requests from concurrent clients (e.g. 10-20 parallel LIBERO eval workers) are
+queued and run in micro-batches of up to `--max_batch_size`, closed `--batch_timeout_ms` after their first request,
+one batched forward per instruction. `/metrics` reports per-stage latencies and the executed batch sizes.
 """
 
 import os.path
@@ -13,22 +20,25 @@ json_numpy.patch()
 import json
 import logging
 import numpy as np
+import time
 import traceback
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 
 import draccus
 import torch
 import uvicorn
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
 from PIL import Image
 from transformers import AutoModelForVision2Seq, AutoProcessor
 
 from experiments.robot.openvla_utils import (
     get_vla,
     get_vla_action,
+    get_vla_actions_batch,
     get_action_head,
     get_processor,
     get_proprio_projector,
@@ -39,6 +49,14 @@ from experiments.robot.robot_utils import (
 from experiments.robot.scene_graph_planner import (
     plan_from_scene_graph_payload,
 )
+from experiments.robot.server_utils import (
+    BINARY_CONTENT_TYPE,
+    LatencyMetrics,
+    MicroBatcher,
+    decode_message,
+    encode_message,
+    is_loopback_host,
+)
 from prismatic.vla.constants import ACTION_DIM, ACTION_TOKEN_BEGIN_IDX, IGNORE_INDEX, NUM_ACTIONS_CHUNK, PROPRIO_DIM, STOP_INDEX
 
 
@@ -77,6 +95,18 @@ class OpenVLAServer:
         # Get expected image dimensions
         self.resize_size = get_image_resize_size(cfg)
 
+        # Queue concurrent requests into batched forward passes
+        self.metrics = LatencyMetrics()
+        self.batcher = None
+        if cfg.dynamic_batching:
+            max_batch_size = cfg.max_batch_size
+            if cfg.use_diffusion and max_batch_size > 1:
+                logging.warning("Continuous diffusion (DDIM) decoding is batch-size 1 only; serving with max_batch_size=1")
+                max_batch_size = 1
+            self.batcher = MicroBatcher(
+                self._predict_action_batch, max_batch_size, cfg.batch_timeout_ms / 1e3, metrics=self.metrics
+            )
+
     def _decode_payload(self, payload: Dict[str, Any]) -> tuple[Dict[str, Any], bool]:
         if "encoded" in payload:
             assert len(payload.keys()) == 1, "Only uses encoded payload!"
@@ -92,7 +122,11 @@ class OpenVLAServer:
     def _predict_action(self, observation: Dict[str, Any], instruction: str):
         observation = dict(observation)
         observation["instruction"] = instruction
-        return get_vla_action(
+        if self.batcher is not None:
+            return self.batcher.submit(instruction, observation).result()
+
+        start = time.perf_counter()
+        action = get_vla_action(
             self.cfg,
             self.vla,
             self.processor,
@@ -102,9 +136,26 @@ class OpenVLAServer:
             proprio_projector=self.proprio_projector,
             use_film=self.cfg.use_film,
         )
+        self.metrics.record("model", time.perf_counter() - start)
+        self.metrics.record_batch(1)
+        return action
+
+    def _predict_action_batch(self, instruction: str, observations: List[Dict[str, Any]]):
+        """One forward pass for every queued observation with this instruction (they share the prompt)."""
+        return get_vla_actions_batch(
+            self.cfg,
+            self.vla,
+            self.processor,
+            observations,
+            instruction,
+            action_head=self.action_head,
+            proprio_projector=self.proprio_projector,
+            use_film=self.cfg.use_film,
+        )
 
     def get_server_action(self, payload: Dict[str, Any]) -> str:
         try:
+            start = time.perf_counter()
             payload, double_encode = self._decode_payload(payload)
 
             observation = self._resolve_observation(payload)
@@ -113,9 +164,11 @@ class OpenVLAServer:
             action = self._predict_action(observation, instruction)
 
             if double_encode:
-                return JSONResponse(json_numpy.dumps(action))
+                response = JSONResponse(json_numpy.dumps(action))
             else:
-                return JSONResponse(action)
+                response = JSONResponse(action)
+            self.metrics.record("total", time.perf_counter() - start)
+            return response
         except:  # noqa: E722
             logging.error(traceback.format_exc())
             logging.warning(
@@ -124,6 +177,41 @@ class OpenVLAServer:
             )
             return "error"
 
+    def _act_binary(self, body: bytes, client_host: Optional[str] = None) -> Response:
+        start = time.perf_counter()
+        try:
+            allow_shared_memory = self.cfg.shared_memory_from_any_host or is_loopback_host(client_host)
+            observation = self._resolve_observation(decode_message(body, allow_shared_memory=allow_shared_memory))
+            decoded = time.perf_counter()
+            action = self._predict_action(observation, observation["instruction"])
+            predicted = time.perf_counter()
+            content = encode_message(
+                {
+                    "action": np.stack(action),
+                    "timing_ms": {"decode": (decoded - start) * 1e3, "predict": (predicted - decoded) * 1e3},
+                }
+            )
+            end = time.perf_counter()
+            self.metrics.record("decode", decoded - start)
+            self.metrics.record("encode", end - predicted)
+            self.metrics.record("total", end - start)
+        except Exception as e:  # noqa: BLE001
+            logging.error(traceback.format_exc())
+            logging.warning(
+                "Your request threw an error; make sure your request complies with the expected format:\n"
+                "server_utils.encode_message({'observation': dict, 'instruction': str})\n"
+            )
+            content = encode_message({"error": repr(e)})
+        return Response(content=content, media_type=BINARY_CONTENT_TYPE)
+
+    async def get_server_action_binary(self, request: Request) -> Response:
+        body = await request.body()
+        client_host = request.client.host if request.client is not None else None
+        return await run_in_threadpool(self._act_binary, body, client_host)
+
+    def get_metrics(self) -> JSONResponse:
+        return JSONResponse(self.metrics.summary())
+
     def get_scene_graph_plan(self, payload: Dict[str, Any]) -> str:
         try:
             payload, double_encode = self._decode_payload(payload)
@@ -180,6 +268,8 @@ class OpenVLAServer:
     def run(self, host: str = "0.0.0.0", port: int = 8777) -> None:
         self.app = FastAPI()
         self.app.post("/act")(self.get_server_action)
+        self.app.post("/act_binary")(self.get_server_action_binary)
+        self.app.get("/metrics")(self.get_metrics)
         self.app.post("/plan_from_scene_graph")(self.get_scene_graph_plan)
         self.app.post("/plan_and_act_from_scene_graph")(self.get_scene_graph_plan_and_action)
         uvicorn.run(self.app, host=host, port=port)
@@ -193,6 +283,11 @@ class DeployConfig:
     host: str = "0.0.0.0"                                               # Host IP Address
     port: int = 8777                                                    # Host Port
 
+    dynamic_batching: bool = False                                      # Micro-batch concurrent requests into one forward pass
+    max_batch_size: int = 16                                            # (When `dynamic_batching==True`) Max requests per forward
+    batch_timeout_ms: float = 5.0                                       # (When `dynamic_batching==True`) Max wait after a batch's first request
+    shared_memory_from_any_host: bool = False                           # Also map /act_binary shared memory for non-loopback clients
+
     #################################################################################################################
     # Model-specific parameters
     #################################################################################################################
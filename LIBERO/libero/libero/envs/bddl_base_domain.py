@@ -13,6 +13,8 @@ import robosuite.macros as macros
 import mujoco
 
 import libero.libero.envs.bddl_utils as BDDLUtils
+from libero.libero.envs.goal_checker import GoalChecker
+from libero.libero.envs.predicates import eval_predicate_fn
 from libero.libero.envs.robots import *
 from libero.libero.envs.utils import *
 from libero.libero.envs.object_states import *
@@ -424,6 +426,15 @@ class BDDLBaseDomain(SingleArmEnv):
                 fixture_body.root_body
             )
 
+        # Compile the goal against this sim's body / site / geom ids. Problem classes that
+        # override _eval_predicate keep their own per-predicate semantics.
+        self.goal_checker = GoalChecker(
+            self,
+            self.parsed_problem["goal_state"],
+            compile_predicates=type(self)._eval_predicate
+            is BDDLBaseDomain._eval_predicate,
+        )
+
     def _setup_observables(self):
         """
         Sets up observables to be used for this environment. Creates object-based observables if enabled
@@ -778,12 +789,32 @@ class BDDLBaseDomain(SingleArmEnv):
 
     def _check_success(self):
         """
-        This needs to match with the goal description from the bddl file
+        Check if the goal is achieved. Consider conjunction goals at the moment
 
         Returns:
-            bool: True if drawer has been opened
+            bool: True if every goal predicate from the bddl file holds
         """
-        return False
+        return self.goal_checker.check()
+
+    def _eval_predicate(self, state):
+        """Evaluate a single goal predicate through the object state interface."""
+        if len(state) == 3:
+            # Checking binary logical predicates
+            predicate_fn_name = state[0]
+            object_1_name = state[1]
+            object_2_name = state[2]
+            return eval_predicate_fn(
+                predicate_fn_name,
+                self.object_states_dict[object_1_name],
+                self.object_states_dict[object_2_name],
+            )
+        elif len(state) == 2:
+            # Checking unary logical predicates
+            predicate_fn_name = state[0]
+            object_name = state[1]
+            return eval_predicate_fn(
+                predicate_fn_name, self.object_states_dict[object_name]
+            )
 
     def visualize(self, vis_settings):
         """
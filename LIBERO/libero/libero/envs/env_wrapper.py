@@ -40,21 +40,10 @@ class ControlEnv:
         renderer_config=None,
         **kwargs,
     ):
-        assert os.path.exists(
-            bddl_file_name
-        ), f"[error] {bddl_file_name} does not exist!"
-
         controller_configs = suite.load_controller_config(default_controller=controller)
 
-        problem_info = BDDLUtils.get_problem_info(bddl_file_name)
-        # Check if we're using a multi-armed environment and use env_configuration argument if so
-
-        # Create environment
-        self.problem_name = problem_info["problem_name"]
-        self.domain_name = problem_info["domain_name"]
-        self.language_instruction = problem_info["language_instruction"]
-        self.env = TASK_MAPPING[self.problem_name](
-            bddl_file_name,
+        # Everything but the task, so that load_bddl can rebuild the environment in place
+        self.env_kwargs = dict(
             robots=robots,
             controller_configs=controller_configs,
             gripper_types=gripper_types,
@@ -79,6 +68,32 @@ class ControlEnv:
             renderer_config=renderer_config,
             **kwargs,
         )
+        self.env = None
+        self.load_bddl(bddl_file_name)
+
+    def load_bddl(self, bddl_file_name):
+        """
+        Switch this environment to the task of another BDDL file, keeping every other
+        construction argument. Only the problem (and its MJCF model) is rebuilt, so a
+        worker process can be reused across tasks instead of being spawned again.
+        """
+        assert os.path.exists(
+            bddl_file_name
+        ), f"[error] {bddl_file_name} does not exist!"
+        if self.env is not None and self.bddl_file_name == bddl_file_name:
+            return
+
+        problem_info = BDDLUtils.get_problem_info(bddl_file_name)
+        # Check if we're using a multi-armed environment and use env_configuration argument if so
+
+        if self.env is not None:
+            self.env.close()
+        # Create environment
+        self.bddl_file_name = bddl_file_name
+        self.problem_name = problem_info["problem_name"]
+        self.domain_name = problem_info["domain_name"]
+        self.language_instruction = problem_info["language_instruction"]
+        self.env = TASK_MAPPING[self.problem_name](bddl_file_name, **self.env_kwargs)
 
     @property
     def obj_of_interest(self):
@@ -145,8 +160,10 @@ class ControlEnv:
         return self.env._get_observations()
 
     def close(self):
-        self.env.close()
-        del self.env
+        # Keep the attribute so a closed env can still be re-opened with load_bddl()
+        if self.env is not None:
+            self.env.close()
+            self.env = None
 
 
 class OffScreenRenderEnv(ControlEnv):
@@ -0,0 +1,188 @@
+import numpy as np
+
+from libero.libero.envs.object_states import ObjectState, SiteObjectState
+from libero.libero.envs.predicates import get_predicate_fn
+from libero.libero.envs.predicates.base_predicates import (
+    FalsePredicateFn,
+    In,
+    On,
+    TruePredicateFn,
+    Up,
+)
+
+
+def contact_geom_pairs(sim):
+    """Geom ids of every active contact as two arrays, without a Python loop over sim.data.contact."""
+    ncon = sim.data.ncon
+    contact = sim.data.contact
+    if hasattr(contact, "geom1"):
+        return np.asarray(contact.geom1)[:ncon], np.asarray(contact.geom2)[:ncon]
+    geoms = np.asarray(contact.geom)[:ncon]  # newer mujoco bindings store the pair as geom[2]
+    return geoms[:, 0], geoms[:, 1]
+
+
+class GoalChecker:
+    """
+    Compiled version of the BDDL goal of a problem.
+
+    The goal's predicates are grouped by type once, after the simulation is built, and each
+    check reads a single snapshot of the body positions, site poses and object-object contacts
+    of the current step. Object-on-object predicates are then evaluated together with numpy,
+    and site predicates reuse the snapshot instead of querying the simulation per predicate.
+
+    Predicates that cannot be compiled (articulation predicates such as open / turnon, custom
+    predicate functions, or every predicate when compile_predicates is False because the problem
+    class overrides _eval_predicate) fall back to env._eval_predicate, so the result always
+    matches the per-predicate evaluation.
+    """
+
+    def __init__(self, env, goal_state, compile_predicates=True):
+        self.env = env
+        self.goal_state = [tuple(state) for state in goal_state]
+
+        self._bodies, self._sites, self._contact_objects = {}, {}, {}
+        on_body, up_body, up_site, self._site_predicates = [], [], [], []
+        self._constant = True
+        self._fallback = []
+
+        for state in self.goal_state:
+            if not (compile_predicates and self._compile(state, on_body, up_body, up_site)):
+                self._fallback.append(list(state))
+
+        self._body_ids = np.array(
+            [env.obj_body_id[name] for name in self._bodies], dtype=np.int64
+        )
+        self._site_ids = np.array(
+            [env.sim.model.site_name2id(name) for name in self._sites], dtype=np.int64
+        )
+        self._on_body = np.array(on_body, dtype=np.int64).reshape(-1, 4)
+        self._up_body = np.array(up_body, dtype=np.int64)
+        self._up_site = np.array(up_site, dtype=np.int64)
+        self._geom_member = self._build_geom_membership()
+
+    def _body(self, name):
+        return self._bodies.setdefault(name, len(self._bodies))
+
+    def _site(self, name):
+        return self._sites.setdefault(name, len(self._sites))
+
+    def _contact_object(self, name):
+        return self._contact_objects.setdefault(name, len(self._contact_objects))
+
+    def _is_body(self, name):
+        return isinstance(
+            self.env.object_states_dict.get(name), ObjectState
+        ) and name in self.env.obj_body_id
+
+    def _is_site(self, name):
+        return isinstance(self.env.object_states_dict.get(name), SiteObjectState)
+
+    def _compile(self, state, on_body, up_body, up_site):
+        """Adds a predicate to one of the compiled groups. Returns False if it has to be evaluated per call."""
+        predicate_fn = get_predicate_fn(state[0])
+        args = state[1:]
+        if type(predicate_fn) in (TruePredicateFn, FalsePredicateFn):
+            self._constant = self._constant and type(predicate_fn) is TruePredicateFn
+            return True
+
+        if type(predicate_fn) is Up and len(args) == 1:
+            if self._is_body(args[0]):
+                up_body.append(self._body(args[0]))
+                return True
+            if self._is_site(args[0]):
+                up_site.append(self._site(args[0]))
+                return True
+            return False
+
+        if type(predicate_fn) not in (On, In) or len(args) != 2:
+            return False
+        obj_name, base_name = args
+        if not self._is_body(obj_name):
+            return False
+
+        if type(predicate_fn) is On and self._is_body(base_name):
+            # ObjectState.check_ontop: base below, in contact, and xy centers within 3cm
+            on_body.append(
+                (
+                    self._body(obj_name),
+                    self._body(base_name),
+                    self._contact_object(obj_name),
+                    self._contact_object(base_name),
+                )
+            )
+            return True
+
+        if not self._is_site(base_name):
+            return False
+        site_object = self.env.object_sites_dict[base_name]
+        if type(predicate_fn) is On:
+            if not hasattr(site_object, "under"):
+                return True  # SiteObjectState.check_ontop is always true without an `under` test
+            parent_name = self.env.object_states_dict[base_name].parent_name
+            parent_contact = None
+            if self.env.get_object(parent_name) is not None:
+                parent_contact = (
+                    self._contact_object(parent_name),
+                    self._contact_object(obj_name),
+                )
+            self._site_predicates.append(
+                (site_object.under, self._site(base_name), self._body(obj_name), parent_contact)
+            )
+        else:
+            # SiteObjectState.check_contact is always true, so In reduces to the containment test
+            self._site_predicates.append(
+                (site_object.in_box, self._site(base_name), self._body(obj_name), None)
+            )
+        return True
+
+    def _build_geom_membership(self):
+        """Boolean (ngeom, num_contact_objects) table of which object each geom belongs to."""
+        sim = self.env.sim
+        member = np.zeros((sim.model.ngeom, len(self._contact_objects)), dtype=bool)
+        for name, k in self._contact_objects.items():
+            for geom_name in self.env.get_object(name).contact_geoms:
+                try:
+                    member[sim.model.geom_name2id(geom_name), k] = True
+                except ValueError:
+                    continue
+        return member
+
+    def contact_matrix(self):
+        """Symmetric (num_contact_objects, num_contact_objects) matrix of objects in contact this step."""
+        g1, g2 = contact_geom_pairs(self.env.sim)
+        if len(g1) == 0 or self._geom_member.shape[1] == 0:
+            k = self._geom_member.shape[1]
+            return np.zeros((k, k), dtype=bool)
+        touching = (
+            self._geom_member[g1].T.astype(np.int32) @ self._geom_member[g2].astype(np.int32)
+        ) > 0
+        return touching | touching.T
+
+    def check(self):
+        results = [self._constant]
+        data = self.env.sim.data
+        body_pos = data.body_xpos[self._body_ids]
+        site_pos = data.site_xpos[self._site_ids]
+        site_mat = data.site_xmat[self._site_ids].reshape(-1, 3, 3)
+        contact = self.contact_matrix() if len(self._contact_objects) else None
+
+        if len(self._on_body):
+            obj, base, obj_c, base_c = self._on_body.T
+            on = (
+                (body_pos[base, 2] <= body_pos[obj, 2])
+                & contact[base_c, obj_c]
+                & (np.linalg.norm(body_pos[base, :2] - body_pos[obj, :2], axis=-1) < 0.03)
+            )
+            results.append(bool(on.all()))
+        if len(self._up_body):
+            results.append(bool((body_pos[self._up_body, 2] >= 1.0).all()))
+        if len(self._up_site):
+            results.append(bool((site_pos[self._up_site, 2] >= 1.0).all()))
+        for test, site, body, parent_contact in self._site_predicates:
+            result = bool(test(site_pos[site], site_mat[site], body_pos[body]))
+            if parent_contact is not None:
+                result = result and bool(contact[parent_contact])
+            results.append(result)
+        # Evaluated one by one, in goal order, like the per-predicate checker
+        results.extend(bool(self.env._eval_predicate(state)) for state in self._fallback)
+        return all(results)
@@ -8,8 +8,9 @@ import time
 
 from abc import ABC, abstractmethod
 from collections import OrderedDict
-from multiprocessing import Array, Pipe, connection
+from multiprocessing import Array, Pipe, connection, resource_tracker
 from multiprocessing.context import Process
+from multiprocessing.shared_memory import SharedMemory
 from typing import Any, Callable, List, Optional, Tuple, Union
 
 
@@ -208,6 +209,100 @@ def _setup_buf(space: gym.Space) -> Union[dict, tuple, ShArray]:
         return ShArray(space.dtype, space.shape)  # type: ignore
 
 
+def _attach_untracked(name: str) -> SharedMemory:
+    """Attach to a block owned by the parent without registering it with the resource
+    tracker, which would otherwise unlink it (or complain) when the worker exits."""
+    try:
+        return SharedMemory(name=name, track=False)  # Python >= 3.13
+    except TypeError:
+        pass
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class ObsRing:
+    """Ring of per-env observation slots in one shared memory block.
+
+    The parent creates the block once the layout of an observation (a flat dict of
+    fixed-shape arrays, e.g. the OrderedDict returned by OffScreenRenderEnv) is known.
+    The worker copies every new observation into the next slot and only sends the slot
+    index through the pipe. The parent hands out read-only numpy views of the slot.
+    A view stays valid until ``ring_size`` further observations of the same env have
+    been written, so with ``ring_size >= 2`` the observation of step t can still be
+    read while step t + 1 is simulated (see ``BaseVectorEnv.step_async``).
+    """
+
+    def __init__(
+        self,
+        layout: List[Tuple[str, Tuple[int, ...], str]],
+        ring_size: int,
+        name: Optional[str] = None,
+    ) -> None:
+        self.layout = layout
+        self.ring_size = ring_size
+        offsets, offset = [], 0
+        for _, shape, dtype in layout:
+            offset = -(-offset // 64) * 64  # keep every array cache-line aligned
+            offsets.append(offset)
+            offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+        self.slot_nbytes = -(-offset // 64) * 64
+        if name is None:
+            self.shm = SharedMemory(create=True, size=max(1, self.slot_nbytes * ring_size))
+        else:
+            self.shm = _attach_untracked(name)
+        self.slots = []
+        for slot in range(ring_size):
+            views = OrderedDict()
+            for (key, shape, dtype), offset in zip(layout, offsets):
+                views[key] = np.ndarray(
+                    shape,
+                    dtype=dtype,
+                    buffer=self.shm.buf,
+                    offset=slot * self.slot_nbytes + offset,
+                )
+            self.slots.append(views)
+
+    @staticmethod
+    def layout_of(obs: Any) -> Optional[List[Tuple[str, Tuple[int, ...], str]]]:
+        """Layout of a dict-of-arrays observation, or None if it cannot be put in a ring."""
+        if not isinstance(obs, dict) or not obs:
+            return None
+        if not all(isinstance(v, np.ndarray) and v.dtype != object for v in obs.values()):
+            return None
+        return [(k, tuple(v.shape), v.dtype.str) for k, v in obs.items()]
+
+    def matches(self, obs: Any) -> bool:
+        return self.layout_of(obs) == self.layout
+
+    def write(self, slot: int, obs: dict) -> None:
+        for key, view in self.slots[slot].items():
+            np.copyto(view, obs[key])
+
+    def read(self, slot: int) -> "OrderedDict[str, np.ndarray]":
+        views = OrderedDict()
+        for key, view in self.slots[slot].items():
+            views[key] = view.view()
+            views[key].flags.writeable = False
+        return views
+
+    def close(self, unlink: bool = False) -> None:
+        self.slots = []
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class _ObsSlot(object):
+    """Sent through the pipe in place of an observation written to an ObsRing slot."""
+
+    def __init__(self, slot: int) -> None:
+        self.slot = slot
+
+
 def _worker(
     parent: connection.Connection,
     p: connection.Connection,
@@ -227,6 +322,17 @@ def _worker(
                 _encode_obs(obs[k], buffer[k])
         return None
 
+    obs_ring: Optional[ObsRing] = None
+    next_slot = 0
+
+    def _to_ring(obs: Any) -> Any:
+        nonlocal next_slot
+        if obs_ring is None or not obs_ring.matches(obs):
+            return obs
+        slot, next_slot = next_slot, (next_slot + 1) % obs_ring.ring_size
+        obs_ring.write(slot, obs)
+        return _ObsSlot(slot)
+
     parent.close()
     env = env_fn_wrapper.data()
     try:
@@ -241,6 +347,8 @@ def _worker(
                 if obs_bufs is not None:
                     _encode_obs(env_return[0], obs_bufs)
                     env_return = (None, *env_return[1:])
+                else:
+                    env_return = (_to_ring(env_return[0]), *env_return[1:])
                 p.send(env_return)
             elif cmd == "reset":
                 retval = env.reset(**data)
@@ -256,14 +364,22 @@ def _worker(
                 if obs_bufs is not None:
                     _encode_obs(obs, obs_bufs)
                     obs = None
+                else:
+                    obs = _to_ring(obs)
                 if reset_returns_info:
                     p.send((obs, info))
                 else:
                     p.send(obs)
             elif cmd == "close":
                 p.send(env.close())
+                if obs_ring is not None:
+                    obs_ring.close()
                 p.close()
                 break
+            elif cmd == "attach_obs_ring":
+                obs_ring = ObsRing(data["layout"], data["ring_size"], name=data["name"])
+                next_slot = 0
+                p.send(True)
             elif cmd == "render":
                 p.send(env.render(**data) if hasattr(env, "render") else None)
             elif cmd == "seed":
@@ -284,7 +400,14 @@ def _worker(
                 p.send(env.get_sim_state())
             elif cmd == "set_init_state":
                 obs = env.set_init_state(data)
-                p.send(obs)
+                p.send(_to_ring(obs))
+            elif cmd == "load_bddl":
+                env.load_bddl(data)
+                # object observations change with the task, the parent sizes a new ring
+                if obs_ring is not None:
+                    obs_ring.close()
+                    obs_ring = None
+                p.send(None)
             else:
                 p.close()
                 raise NotImplementedError
@@ -349,15 +472,23 @@ class DummyEnvWorker(EnvWorker):
     def set_init_state(self, init_state):
         return self.env.set_init_state(init_state)
 
+    def load_bddl(self, bddl_file_name):
+        self.env.load_bddl(bddl_file_name)
+
 
 class SubprocEnvWorker(EnvWorker):
     """Subprocess worker used in SubprocVectorEnv and ShmemVectorEnv."""
 
     def __init__(
-        self, env_fn: Callable[[], gym.Env], share_memory: bool = False
+        self,
+        env_fn: Callable[[], gym.Env],
+        share_memory: bool = False,
+        obs_ring_size: int = 0,
     ) -> None:
         self.parent_remote, self.child_remote = Pipe()
         self.share_memory = share_memory
+        self.obs_ring_size = 0 if share_memory else obs_ring_size
+        self.obs_ring: Optional[ObsRing] = None
         self.buffer: Optional[Union[dict, tuple, ShArray]] = None
         if self.share_memory:
             dummy = env_fn()
@@ -398,6 +529,31 @@ class SubprocEnvWorker(EnvWorker):
 
         return decode_obs(self.buffer)
 
+    def _receive_obs(self, obs: Any) -> Any:
+        """Turns what the worker sent in place of an observation into the observation."""
+        if self.share_memory:
+            return self._decode_obs()
+        if isinstance(obs, _ObsSlot):
+            return self.obs_ring.read(obs.slot)
+        if self.obs_ring_size > 0 and self.obs_ring is None:
+            # First observation of this env: size the ring from it. This one still
+            # came through the pipe, every later one is written to the ring.
+            layout = ObsRing.layout_of(obs)
+            if layout is not None:
+                self.obs_ring = ObsRing(layout, self.obs_ring_size)
+                self.parent_remote.send(
+                    [
+                        "attach_obs_ring",
+                        {
+                            "name": self.obs_ring.shm.name,
+                            "layout": layout,
+                            "ring_size": self.obs_ring_size,
+                        },
+                    ]
+                )
+                self.parent_remote.recv()
+        return obs
+
     @staticmethod
     def wait(  # type: ignore
         workers: List["SubprocEnvWorker"],
@@ -438,18 +594,11 @@ class SubprocEnvWorker(EnvWorker):
         if isinstance(result, tuple):
             if len(result) == 2:
                 obs, info = result
-                if self.share_memory:
-                    obs = self._decode_obs()
-                return obs, info
+                return self._receive_obs(obs), info
             obs = result[0]
-            if self.share_memory:
-                obs = self._decode_obs()
-            return (obs, *result[1:])  # type: ignore
+            return (self._receive_obs(obs), *result[1:])  # type: ignore
         else:
-            obs = result
-            if self.share_memory:
-                obs = self._decode_obs()
-            return obs
+            return self._receive_obs(result)
 
     def reset(self, **kwargs: Any) -> Union[np.ndarray, Tuple[np.ndarray, dict]]:
         if "seed" in kwargs:
@@ -459,14 +608,9 @@ class SubprocEnvWorker(EnvWorker):
         result = self.parent_remote.recv()
         if isinstance(result, tuple):
             obs, info = result
-            if self.share_memory:
-                obs = self._decode_obs()
-            return obs, info
+            return self._receive_obs(obs), info
         else:
-            obs = result
-            if self.share_memory:
-                obs = self._decode_obs()
-            return obs
+            return self._receive_obs(result)
 
     def seed(self, seed: Optional[int] = None) -> Optional[List[int]]:
         super().seed(seed)
@@ -488,6 +632,9 @@ class SubprocEnvWorker(EnvWorker):
             pass
         # ensure the subproc is terminated
         self.process.terminate()
+        if self.obs_ring is not None:
+            self.obs_ring.close(unlink=True)
+            self.obs_ring = None
 
     def check_success(self):
         self.parent_remote.send(["check_success", None])
@@ -503,10 +650,20 @@ class SubprocEnvWorker(EnvWorker):
 
     def set_init_state(self, init_state):
         self.parent_remote.send(["set_init_state", init_state])
-        obs = self.parent_remote.recv()
-        if self.share_memory:
-            obs = self._decode_obs()
-        return obs
+        return self._receive_obs(self.parent_remote.recv())
+
+    def send_load_bddl(self, bddl_file_name):
+        self.parent_remote.send(["load_bddl", bddl_file_name])
+
+    def recv_load_bddl(self):
+        self.parent_remote.recv()
+        if self.obs_ring is not None:
+            self.obs_ring.close(unlink=True)
+            self.obs_ring = None
+
+    def load_bddl(self, bddl_file_name):
+        self.send_load_bddl(bddl_file_name)
+        self.recv_load_bddl()
 
 
 ################################################################################
@@ -600,6 +757,8 @@ class BaseVectorEnv(object):
         self.waiting_id: List[int] = []
         # all environments are ready in the beginning
         self.ready_id = list(range(self.env_num))
+        # environments sent an action by step_async whose result step_wait has not collected yet
+        self.pending_id: List[int] = []
         self.is_closed = False
 
     def _assert_is_not_closed(self) -> None:
@@ -786,14 +945,9 @@ class BaseVectorEnv(object):
         self._assert_is_not_closed()
         id = self._wrap_id(id)
         if not self.is_async:
-            assert len(action) == len(id)
-            for i, j in enumerate(id):
-                self.workers[j].send(action[i])
-            result = []
-            for j in id:
-                env_return = self.workers[j].recv()
-                env_return[-1]["env_id"] = j
-                result.append(env_return)
+            assert not self.pending_id, "Collect step_async() results with step_wait() first."
+            self.step_async(action, id)
+            return self.step_wait()
         else:
             if action is not None:
                 self._assert_id(id)
@@ -819,6 +973,12 @@ class BaseVectorEnv(object):
                 env_return[-1]["env_id"] = env_id  # Add `env_id` to info
                 result.append(env_return)
                 self.ready_id.append(env_id)
+        return self._stack_step_results(result)
+
+    @staticmethod
+    def _stack_step_results(
+        result: List[Any],
+    ) -> Union[gym_old_venv_step_type, gym_new_venv_step_type]:
         return_lists = tuple(zip(*result))
         obs_list = return_lists[0]
         try:
@@ -828,6 +988,42 @@ class BaseVectorEnv(object):
         other_stacks = map(np.stack, return_lists[1:])
         return (obs_stack, *other_stacks)  # type: ignore
 
+    def step_async(
+        self,
+        action: np.ndarray,
+        id: Optional[Union[int, List[int], np.ndarray]] = None,
+    ) -> None:
+        """Send one action to each of the environments in ``id`` and return immediately.
+
+        The environments simulate the step while the caller does other work (e.g. runs
+        the policy for other environments); ``step_wait`` collects the results. It can be
+        called several times with disjoint ids before one ``step_wait``.
+        """
+        self._assert_is_not_closed()
+        assert not self.is_async, "step_async is not supported together with wait_num / timeout."
+        id = self._wrap_id(id)
+        assert len(action) == len(id)
+        for i, j in enumerate(id):
+            assert j not in self.pending_id, f"Environment {j} is already stepping."
+            self.workers[j].send(action[i])
+            self.pending_id.append(j)
+
+    def step_wait(self) -> Union[gym_old_venv_step_type, gym_new_venv_step_type]:
+        """Wait for every step sent by ``step_async`` and return the results like ``step``.
+
+        Results are ordered as the environments were sent actions; ``info[k]["env_id"]``
+        gives the environment of row ``k``.
+        """
+        self._assert_is_not_closed()
+        assert self.pending_id, "No step_async() call to wait for."
+        result = []
+        for j in self.pending_id:
+            env_return = self.workers[j].recv()
+            env_return[-1]["env_id"] = j
+            result.append(env_return)
+        self.pending_id = []
+        return self._stack_step_results(result)
+
     def seed(
         self,
         seed: Optional[Union[int, List[int]]] = None,
@@ -896,6 +1092,12 @@ class DummyVectorEnv(BaseVectorEnv):
     def get_sim_state(self):
         return [w.get_sim_state() for w in self.workers]
 
+    def load_bddl(self, bddl_file_name: str) -> None:
+        """Switch every environment to the task of another BDDL file (see ControlEnv.load_bddl)."""
+        self._assert_is_not_closed()
+        for w in self.workers:
+            w.load_bddl(bddl_file_name)
+
     def set_init_state(
         self,
         init_state: Optional[Union[int, List[int], np.ndarray]] = None,
@@ -924,14 +1126,26 @@ class DummyVectorEnv(BaseVectorEnv):
 class SubprocVectorEnv(BaseVectorEnv):
     """Vectorized environment wrapper based on subprocess.
 
+    With ``obs_ring_size > 0``, dict observations (camera images and proprio arrays)
+    are not pickled through the pipes: each worker writes them into a shared memory
+    :class:`ObsRing` of ``obs_ring_size`` slots and the returned observations are
+    read-only views of those slots. A view is overwritten ``obs_ring_size``
+    observations later, so copy it if it must outlive that; use 2 or more when
+    overlapping the policy with ``step_async`` / ``step_wait``.
+
     .. seealso::
 
         Please refer to :class:`~tianshou.env.BaseVectorEnv` for other APIs' usage.
     """
 
-    def __init__(self, env_fns: List[Callable[[], gym.Env]], **kwargs: Any) -> None:
+    def __init__(
+        self,
+        env_fns: List[Callable[[], gym.Env]],
+        obs_ring_size: int = 0,
+        **kwargs: Any,
+    ) -> None:
         def worker_fn(fn: Callable[[], gym.Env]) -> SubprocEnvWorker:
-            return SubprocEnvWorker(fn, share_memory=False)
+            return SubprocEnvWorker(fn, share_memory=False, obs_ring_size=obs_ring_size)
 
         super().__init__(env_fns, worker_fn, **kwargs)
 
@@ -947,6 +1161,17 @@ class SubprocVectorEnv(BaseVectorEnv):
     def get_sim_state(self):
         return [w.get_sim_state() for w in self.workers]
 
+    def load_bddl(self, bddl_file_name: str) -> None:
+        """Switch every environment to the task of another BDDL file (see ControlEnv.load_bddl).
+
+        The workers rebuild their task in parallel; processes and imports are kept.
+        """
+        self._assert_is_not_closed()
+        for w in self.workers:
+            w.send_load_bddl(bddl_file_name)
+        for w in self.workers:
+            w.recv_load_bddl()
+
     def set_init_state(
         self,
         init_state: Optional[Union[int, List[int], np.ndarray]] = None,
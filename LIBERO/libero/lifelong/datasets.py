@@ -1,5 +1,9 @@
 import copy
+import json
+import os
+import shutil
 
+import h5py
 import numpy as np
 import robomimic.utils.file_utils as FileUtils
 import robomimic.utils.obs_utils as ObsUtils
@@ -24,9 +28,15 @@ def get_dataset(
     frame_stack=1,
     filter_key=None,
     hdf5_cache_mode="low_dim",
+    demo_cache_dir=None,
     *args,
     **kwargs
 ):
+    """
+    hdf5_cache_mode="memmap" serves the sequences from a memory-mapped copy of the
+    demos (see build_demo_cache), created on first use in demo_cache_dir (by default
+    next to the HDF5 file), instead of robomimic's SequenceDataset.
+    """
 
     if initialize_obs_utils:
         ObsUtils.initialize_obs_utils_with_obs_specs({"obs": obs_modality})
@@ -40,6 +50,33 @@ def get_dataset(
 
     seq_len = seq_len
     filter_key = filter_key
+    if hdf5_cache_mode == "memmap":
+        cache_dir = build_demo_cache(
+            dataset_path,
+            get_demo_cache_dir(dataset_path, demo_cache_dir),
+            obs_keys=shape_meta["all_obs_keys"],
+            dataset_keys=["actions"],
+        )
+        demos = None
+        if filter_key is not None:
+            with h5py.File(dataset_path, "r") as f:
+                demos = [
+                    elem.decode("utf-8")
+                    for elem in np.array(f["mask/{}".format(filter_key)][:])
+                ]
+        dataset = MemmapSequenceDataset(
+            cache_dir,
+            obs_keys=shape_meta["all_obs_keys"],
+            dataset_keys=["actions"],
+            frame_stack=frame_stack,
+            seq_length=seq_len,
+            pad_frame_stack=True,
+            pad_seq_length=True,
+            get_pad_mask=False,
+            demos=demos,
+        )
+        return dataset, shape_meta
+
     dataset = SequenceDataset(
         hdf5_path=dataset_path,
         obs_keys=shape_meta["all_obs_keys"],
@@ -59,6 +96,315 @@ def get_dataset(
     return dataset, shape_meta
 
 
+DEMO_CACHE_VERSION = 1
+
+
+def get_demo_cache_dir(dataset_path, cache_root=None):
+    """
+    Directory of the memory-mapped cache of an HDF5 demo file.
+    """
+    name = os.path.splitext(os.path.basename(dataset_path))[0]
+    root = cache_root or os.path.dirname(os.path.abspath(dataset_path))
+    return os.path.join(root, name + "_memmap")
+
+
+def _demo_cache_source(dataset_path):
+    stat = os.stat(dataset_path)
+    return {
+        "path": os.path.abspath(dataset_path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+    }
+
+
+def _demo_cache_file(key):
+    return key.replace("/", ".") + ".npy"
+
+
+def _load_demo_cache_meta(cache_dir):
+    meta_path = os.path.join(cache_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, "r") as f:
+        return json.load(f)
+
+
+def _demo_cache_is_valid(cache_dir, source, keys):
+    meta = _load_demo_cache_meta(cache_dir)
+    return (
+        meta is not None
+        and meta["version"] == DEMO_CACHE_VERSION
+        and meta["source"] == source
+        and all(k in meta["keys"] for k in keys)
+    )
+
+
+def build_demo_cache(dataset_path, cache_dir, obs_keys, dataset_keys=("actions",)):
+    """
+    One-time conversion of an HDF5 demo file into a columnar cache of .npy files that
+    MemmapSequenceDataset memory-maps.
+
+    Every key (dataset keys such as actions, and obs/<key> observations) is one array
+    with the frames of all demos back to back, in robomimic's demo order; meta.json
+    holds the demo names, lengths and offsets. Images keep their uint8 dtype (decoded
+    once, so reading a frame is a page-cache hit), everything else is stored as float32
+    like robomimic returns it. An existing cache is reused if it was built from the
+    same file (size and mtime) and contains the requested keys.
+    """
+    keys = list(dataset_keys) + ["obs/{}".format(k) for k in obs_keys]
+    source = _demo_cache_source(dataset_path)
+    if _demo_cache_is_valid(cache_dir, source, keys):
+        return cache_dir
+
+    tmp_dir = "{}.tmp{}".format(cache_dir, os.getpid())
+    os.makedirs(tmp_dir, exist_ok=True)
+    with h5py.File(dataset_path, "r") as f:
+        demos = list(f["data"].keys())
+        demos = [demos[i] for i in np.argsort([int(elem[5:]) for elem in demos])]
+        lengths = [int(f["data/{}".format(ep)].attrs["num_samples"]) for ep in demos]
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+
+        key_meta = {}
+        for k in keys:
+            first = "data/{}/{}".format(demos[0], k)
+            if first in f:
+                dtype = f[first].dtype
+                dtype = dtype if dtype == np.uint8 else np.dtype(np.float32)
+                shape = f[first].shape[1:]
+            else:
+                # robomimic fills missing dataset keys with zeros
+                dtype, shape = np.dtype(np.float32), (1,)
+            out = np.lib.format.open_memmap(
+                os.path.join(tmp_dir, _demo_cache_file(k)),
+                mode="w+",
+                dtype=dtype,
+                shape=(int(offsets[-1]),) + tuple(shape),
+            )
+            for ep, start, end in zip(demos, offsets[:-1], offsets[1:]):
+                hd5key = "data/{}/{}".format(ep, k)
+                out[start:end] = f[hd5key][()] if hd5key in f else 0
+            out.flush()
+            del out
+            key_meta[k] = {"dtype": dtype.str, "shape": list(shape)}
+
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(
+            {
+                "version": DEMO_CACHE_VERSION,
+                "source": source,
+                "demos": demos,
+                "lengths": lengths,
+                "offsets": offsets[:-1].tolist(),
+                "keys": key_meta,
+            },
+            f,
+        )
+    # A stale cache (other source or keys) or one without meta.json (e.g. an interrupted
+    # copy) would make the rename fail, so it is removed first
+    if os.path.isdir(cache_dir) and not _demo_cache_is_valid(cache_dir, source, keys):
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    try:
+        os.rename(tmp_dir, cache_dir)
+    except OSError:
+        # only fine if another process (e.g. a parallel run) finished the same cache first
+        if not _demo_cache_is_valid(cache_dir, source, keys):
+            raise
+        shutil.rmtree(tmp_dir)
+    return cache_dir
+
+
+class MemmapSequenceDataset(Dataset):
+    """
+    Sequence dataset over a cache written by build_demo_cache, with the sampling and
+    padding semantics of robomimic's SequenceDataset (frame_stack, seq_length,
+    pad_frame_stack, pad_seq_length, get_pad_mask).
+
+    A sequence that needs no padding is a slice of the memory-mapped arrays, so fetching
+    it copies nothing until the observations are processed for the network (uint8 ->
+    float CHW images); padded sequences gather their frames. The arrays are mapped
+    copy-on-write and reopened in every process, so the dataset is cheap to send to
+    dataloader workers.
+    """
+
+    def __init__(
+        self,
+        cache_dir,
+        obs_keys,
+        dataset_keys=("actions",),
+        frame_stack=1,
+        seq_length=1,
+        pad_frame_stack=True,
+        pad_seq_length=True,
+        get_pad_mask=False,
+        demos=None,
+        process_obs=True,
+    ):
+        self.cache_dir = cache_dir
+        self.obs_keys = tuple(obs_keys)
+        self.dataset_keys = tuple(dataset_keys)
+        self.n_frame_stack = frame_stack
+        self.seq_length = seq_length
+        self.pad_frame_stack = pad_frame_stack
+        self.pad_seq_length = pad_seq_length
+        self.get_pad_mask = get_pad_mask
+        self.process_obs = process_obs
+        assert self.n_frame_stack >= 1
+        assert self.seq_length >= 1
+
+        meta = _load_demo_cache_meta(cache_dir)
+        assert meta is not None, f"[error] no demo cache in {cache_dir}"
+        for k in self.dataset_keys + tuple("obs/" + k for k in self.obs_keys):
+            assert k in meta["keys"], f"[error] {k} is not in the demo cache"
+        demo_offsets = dict(zip(meta["demos"], meta["offsets"]))
+        demo_lengths = dict(zip(meta["demos"], meta["lengths"]))
+        if demos is None:
+            demos = meta["demos"]
+        self.demos = [demos[i] for i in np.argsort([int(elem[5:]) for elem in demos])]
+        self.n_demos = len(self.demos)
+        self._demo_offsets = np.array([demo_offsets[ep] for ep in self.demos], dtype=np.int64)
+        self._demo_lengths = np.array([demo_lengths[ep] for ep in self.demos], dtype=np.int64)
+
+        # determine the number of sequences of every demo like SequenceDataset.load_demo_info
+        num_sequences = self._demo_lengths.copy()
+        if not self.pad_frame_stack:
+            num_sequences -= self.n_frame_stack - 1
+        if not self.pad_seq_length:
+            num_sequences -= self.seq_length - 1
+        if self.pad_seq_length:
+            assert (self._demo_lengths >= 1).all()
+            num_sequences = np.maximum(num_sequences, 1)
+        else:
+            assert (num_sequences >= 1).all()
+        self.total_num_sequences = int(num_sequences.sum())
+        self._index_to_demo = np.repeat(np.arange(self.n_demos), num_sequences)
+        self._demo_start_indices = np.cumsum(num_sequences) - num_sequences
+        self._arrays = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_arrays"] = None
+        return state
+
+    @property
+    def arrays(self):
+        if self._arrays is None:
+            self._arrays = {
+                k: np.load(os.path.join(self.cache_dir, _demo_cache_file(k)), mmap_mode="c")
+                for k in self.dataset_keys + tuple("obs/" + k for k in self.obs_keys)
+            }
+        return self._arrays
+
+    def __len__(self):
+        return self.total_num_sequences
+
+    def _get_sequence(self, key, demo, begin, end):
+        """
+        Frames [begin, end) of a demo; out-of-range frames repeat the first / last frame.
+        """
+        start = self._demo_offsets[demo]
+        length = self._demo_lengths[demo]
+        data = self.arrays[key]
+        if begin >= 0 and end <= length:
+            return data[start + begin : start + end]
+        return data[start + np.clip(np.arange(begin, end), 0, length - 1)]
+
+    def __getitem__(self, index):
+        demo = self._index_to_demo[index]
+        demo_index_offset = 0 if self.pad_frame_stack else (self.n_frame_stack - 1)
+        index_in_demo = index - self._demo_start_indices[demo] + demo_index_offset
+        length = self._demo_lengths[demo]
+        begin = index_in_demo - (self.n_frame_stack - 1)
+        end = index_in_demo + self.seq_length
+
+        meta = {
+            k: self._get_sequence(k, demo, index_in_demo, end)
+            for k in self.dataset_keys
+        }
+        obs = {
+            k: self._get_sequence("obs/" + k, demo, begin, end) for k in self.obs_keys
+        }
+        if self.get_pad_mask:
+            frames = np.arange(begin, end)
+            meta["pad_mask"] = (frames[self.n_frame_stack - 1 :] < length)[:, None]
+            obs["pad_mask"] = ((frames >= 0) & (frames < length))[:, None]
+        meta["obs"] = ObsUtils.process_obs_dict(obs) if self.process_obs else obs
+        return meta
+
+
+def get_sequence_batch(sequence_dataset, indices):
+    """
+    Batched version of robomimic's SequenceDataset.__getitem__.
+
+    The sequences of a batch that come from the same demo are fetched with one read per
+    key (a contiguous slice, or one increasing selection) instead of one read per sequence,
+    which matters for image keys that hdf5_cache_mode="low_dim" leaves in the HDF5 file.
+    Returns the same list of dicts as [sequence_dataset[i] for i in indices]; configurations
+    this does not cover (goals, next_obs, obs normalization, the "all" getitem cache) fall
+    back to __getitem__.
+    """
+    ds = sequence_dataset
+    if (
+        not isinstance(ds, SequenceDataset)
+        or ds.hdf5_cache_mode == "all"
+        or ds.goal_mode is not None
+        or ds.load_next_obs
+        or ds.hdf5_normalize_obs
+    ):
+        return [ds[i] for i in indices]
+
+    num_frames_to_stack = ds.n_frame_stack - 1
+    demo_index_offset = 0 if ds.pad_frame_stack else num_frames_to_stack
+    obs_keys = ["obs/{}".format(k) for k in ds.obs_keys]
+
+    demos = {}
+    for position, index in enumerate(indices):
+        demo_id = ds._index_to_demo_id[index]
+        index_in_demo = index - ds._demo_id_to_start_indices[demo_id] + demo_index_offset
+        demos.setdefault(demo_id, []).append((position, index_in_demo))
+
+    batch = [None] * len(indices)
+    for demo_id, items in demos.items():
+        demo_length = ds._demo_id_to_demo_length[demo_id]
+        index_in_demo = np.array([index for _, index in items])
+        # frames of every sequence, out-of-range ones repeat the first / last frame
+        # like robomimic's pad_same padding
+        obs_frames = index_in_demo[:, None] + np.arange(
+            -num_frames_to_stack, ds.seq_length
+        )
+        meta_frames = index_in_demo[:, None] + np.arange(ds.seq_length)
+        obs_pad_mask = (obs_frames >= 0) & (obs_frames < demo_length)
+        meta_pad_mask = meta_frames < demo_length
+        obs_frames = np.clip(obs_frames, 0, demo_length - 1)
+        meta_frames = np.minimum(meta_frames, demo_length - 1)
+
+        needed = np.unique(np.concatenate([obs_frames.ravel(), meta_frames.ravel()]))
+        if needed[-1] - needed[0] + 1 == len(needed):
+            selection = slice(int(needed[0]), int(needed[-1]) + 1)
+        else:
+            selection = needed.tolist()  # h5py needs an increasing list
+        data = {
+            k: ds.get_dataset_for_ep(demo_id, k)[selection]
+            for k in list(ds.dataset_keys) + obs_keys
+        }
+        obs_rows = np.searchsorted(needed, obs_frames)
+        meta_rows = np.searchsorted(needed, meta_frames)
+
+        for j, (position, _) in enumerate(items):
+            meta = {
+                k: data[k][meta_rows[j]].astype("float32") for k in ds.dataset_keys
+            }
+            obs = {
+                k.split("/")[1]: data[k][obs_rows[j]].astype("float32")
+                for k in obs_keys
+            }
+            if ds.get_pad_mask:
+                meta["pad_mask"] = meta_pad_mask[j][:, None]
+                obs["pad_mask"] = obs_pad_mask[j][:, None]
+            meta["obs"] = ObsUtils.process_obs_dict(obs)
+            batch[position] = meta
+    return batch
+
+
 class SequenceVLDataset(Dataset):
     def __init__(self, sequence_dataset, task_emb):
         self.sequence_dataset = sequence_dataset
@@ -74,6 +420,12 @@ class SequenceVLDataset(Dataset):
         return_dict["task_emb"] = self.task_emb
         return return_dict
 
+    def __getitems__(self, indices):
+        batch = get_sequence_batch(self.sequence_dataset, indices)
+        for return_dict in batch:
+            return_dict["task_emb"] = self.task_emb
+        return batch
+
 
 class GroupedTaskDataset(Dataset):
     def __init__(self, sequence_datasets, task_embs):
@@ -96,29 +448,20 @@ class GroupedTaskDataset(Dataset):
         #           9       10
         #           11
         # by doing so, when we concat the dataset, every task will have equal number of demos
-        self.map_dict = {}
-        sizes = np.array(self.lengths)
-        row = 0
-        col = 0
-        for i in range(sum(sizes)):
-            while sizes[col] == 0:
-                col = col + 1
-                if col >= self.task_group_size:
-                    col -= self.task_group_size
-                    row += 1
-            self.map_dict[i] = (row, col)
-            sizes[col] -= 1
-            col += 1
-            if col >= self.task_group_size:
-                col -= self.task_group_size
-                row += 1
-        self.n_total = sum(self.lengths)
+        # the table is two flat arrays: sort every (row, task) pair by row, then by task
+        sizes = np.array(self.lengths, dtype=np.int64)
+        self.n_total = int(sizes.sum())
+        task_idx = np.repeat(np.arange(self.task_group_size), sizes)
+        row_idx = np.arange(self.n_total) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        order = np.lexsort((task_idx, row_idx))
+        self.original_idx = row_idx[order]
+        self.original_task_idx = task_idx[order]
 
     def __len__(self):
         return self.n_total
 
     def __get_original_task_idx(self, idx):
-        return self.map_dict[idx]
+        return int(self.original_idx[idx]), int(self.original_task_idx[idx])
 
     def __getitem__(self, idx):
         oi, oti = self.__get_original_task_idx(idx)
@@ -126,6 +469,21 @@ class GroupedTaskDataset(Dataset):
         return_dict["task_emb"] = self.task_embs[oti]
         return return_dict
 
+    def __getitems__(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        original_idx = self.original_idx[indices]
+        original_task_idx = self.original_task_idx[indices]
+        batch = [None] * len(indices)
+        for oti in np.unique(original_task_idx).tolist():
+            positions = np.flatnonzero(original_task_idx == oti)
+            task_batch = get_sequence_batch(
+                self.sequence_datasets[oti], original_idx[positions].tolist()
+            )
+            for position, return_dict in zip(positions, task_batch):
+                return_dict["task_emb"] = self.task_embs[oti]
+                batch[position] = return_dict
+        return batch
+
 
 class TruncatedSequenceDataset(Dataset):
     def __init__(self, sequence_dataset, buffer_size):
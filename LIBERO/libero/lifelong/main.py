@@ -22,7 +22,11 @@ from libero.libero.benchmark import get_benchmark
 from libero.lifelong.algos import get_algo_class, get_algo_list
 from libero.lifelong.models import get_policy_list
 from libero.lifelong.datasets import GroupedTaskDataset, SequenceVLDataset, get_dataset
-from libero.lifelong.metric import evaluate_loss, evaluate_success
+from libero.lifelong.metric import (
+    close_eval_env_pool,
+    evaluate_loss,
+    evaluate_success,
+)
 from libero.lifelong.utils import (
     NpEncoder,
     compute_flops,
@@ -76,6 +80,8 @@ def main(hydra_cfg):
                 obs_modality=cfg.data.obs.modality,
                 initialize_obs_utils=(i == 0),
                 seq_len=cfg.data.seq_len,
+                hdf5_cache_mode=cfg.data.get("hdf5_cache_mode", "low_dim"),
+                demo_cache_dir=cfg.data.get("demo_cache_dir", None),
             )
         except Exception as e:
             print(
@@ -260,6 +266,7 @@ def main(hydra_cfg):
                     result_summary, os.path.join(cfg.experiment_dir, f"result.pt")
                 )
 
+    close_eval_env_pool()
     print("[info] finished learning\n")
     if cfg.use_wandb:
         wandb.finish()
@@ -1,3 +1,4 @@
+import atexit
 import copy
 import gc
 import numpy as np
@@ -49,6 +50,92 @@ def raw_obs_to_tensor_obs(obs, task_emb, cfg):
     return data
 
 
+class EvalEnvPool:
+    """
+    Evaluation environments kept alive across evaluate_one_task_success calls.
+
+    Lifelong runs evaluate every seen task after each learned task, and spawning
+    num_procs OffScreenRenderEnv processes per task dominated evaluation time.
+    The pool keeps one vectorized env per (env_num, image size, obs_ring_size) and
+    switches it to the next task with load_bddl, which only rebuilds the problem's
+    MJCF model inside the existing worker processes. Init states are loaded from
+    disk once per file.
+    """
+
+    def __init__(self):
+        self.env = None
+        self.env_key = None
+        self.init_states = {}
+
+    def get_env(self, cfg, env_num, bddl_file_name):
+        obs_ring_size = cfg.eval.get("obs_ring_size", 0)
+        env_key = (env_num, cfg.data.img_h, cfg.data.img_w, obs_ring_size)
+        if self.env is not None and self.env_key == env_key:
+            self.env.load_bddl(bddl_file_name)
+            return self.env
+
+        self.close()
+        self.env = make_eval_env(cfg, env_num, bddl_file_name)
+        self.env_key = env_key
+        return self.env
+
+    def get_init_states(self, init_states_path):
+        if init_states_path not in self.init_states:
+            self.init_states[init_states_path] = torch.load(init_states_path)
+        return self.init_states[init_states_path]
+
+    def close(self):
+        if self.env is not None:
+            env, self.env, self.env_key = self.env, None, None
+            env.close()
+            gc.collect()
+
+
+_eval_env_pool = EvalEnvPool()
+atexit.register(_eval_env_pool.close)
+
+
+def close_eval_env_pool():
+    """
+    Close the evaluation environments kept alive by evaluate_one_task_success.
+    """
+    _eval_env_pool.close()
+
+
+def make_eval_env(cfg, env_num, bddl_file_name):
+    """
+    Create the vectorized evaluation environment of a task.
+    """
+    env_args = {
+        "bddl_file_name": bddl_file_name,
+        "camera_heights": cfg.data.img_h,
+        "camera_widths": cfg.data.img_w,
+    }
+
+    # Try to handle the frame buffer issue
+    env_creation = False
+
+    count = 0
+    while not env_creation and count < 5:
+        try:
+            if env_num == 1:
+                env = DummyVectorEnv(
+                    [lambda: OffScreenRenderEnv(**env_args) for _ in range(env_num)]
+                )
+            else:
+                env = SubprocVectorEnv(
+                    [lambda: OffScreenRenderEnv(**env_args) for _ in range(env_num)],
+                    obs_ring_size=cfg.eval.get("obs_ring_size", 0),
+                )
+            env_creation = True
+        except:
+            time.sleep(5)
+            count += 1
+    if count >= 5:
+        raise Exception("Failed to create environment")
+    return env
+
+
 def evaluate_one_task_success(
     cfg, algo, task, task_emb, task_id, sim_states=None, task_str=""
 ):
@@ -66,45 +153,25 @@ def evaluate_one_task_success(
         env_num = min(cfg.eval.num_procs, cfg.eval.n_eval) if cfg.eval.use_mp else 1
         eval_loop_num = (cfg.eval.n_eval + env_num - 1) // env_num
 
-        # initiate evaluation envs
-        env_args = {
-            "bddl_file_name": os.path.join(
-                cfg.bddl_folder, task.problem_folder, task.bddl_file
-            ),
-            "camera_heights": cfg.data.img_h,
-            "camera_widths": cfg.data.img_w,
-        }
-
-        env_num = min(cfg.eval.num_procs, cfg.eval.n_eval) if cfg.eval.use_mp else 1
-        eval_loop_num = (cfg.eval.n_eval + env_num - 1) // env_num
-
-        # Try to handle the frame buffer issue
-        env_creation = False
-
-        count = 0
-        while not env_creation and count < 5:
-            try:
-                if env_num == 1:
-                    env = DummyVectorEnv(
-                        [lambda: OffScreenRenderEnv(**env_args) for _ in range(env_num)]
-                    )
-                else:
-                    env = SubprocVectorEnv(
-                        [lambda: OffScreenRenderEnv(**env_args) for _ in range(env_num)]
-                    )
-                env_creation = True
-            except:
-                time.sleep(5)
-                count += 1
-        if count >= 5:
-            raise Exception("Failed to create environment")
+        # initiate evaluation envs, reusing the worker processes of the previous task
+        bddl_file_name = os.path.join(
+            cfg.bddl_folder, task.problem_folder, task.bddl_file
+        )
+        reuse_envs = cfg.eval.get("reuse_envs", False)
+        if reuse_envs:
+            env = _eval_env_pool.get_env(cfg, env_num, bddl_file_name)
+        else:
+            env = make_eval_env(cfg, env_num, bddl_file_name)
 
         ### Evaluation loop
         # get fixed init states to control the experiment randomness
         init_states_path = os.path.join(
             cfg.init_states_folder, task.problem_folder, task.init_states_file
         )
-        init_states = torch.load(init_states_path)
+        if reuse_envs:
+            init_states = _eval_env_pool.get_init_states(init_states_path)
+        else:
+            init_states = torch.load(init_states_path)
         num_success = 0
         for i in range(eval_loop_num):
             env.reset()
@@ -155,8 +222,9 @@ def evaluate_one_task_success(
                     num_success += int(dones[k])
 
         success_rate = num_success / cfg.eval.n_eval
-        env.close()
-        gc.collect()
+        if not reuse_envs:
+            env.close()
+            gc.collect()
     print(f"[info] evaluate task {task_id} takes {t.get_elapsed_time():.1f} seconds")
     return success_rate
 
@@ -0,0 +1,180 @@
+"""Memory-mapped demo cache and batched sequence reads (libero/lifelong/datasets.py) on synthetic HDF5 demos."""
+
+import json
+import os
+import shutil
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import h5py
+import numpy as np
+import pytest
+import robomimic.utils.obs_utils as ObsUtils
+from robomimic.utils.dataset import SequenceDataset
+
+from libero.lifelong.datasets import (
+    MemmapSequenceDataset,
+    build_demo_cache,
+    get_demo_cache_dir,
+    get_sequence_batch,
+)
+
+OBS_KEYS = ["agentview_rgb", "joint_states"]
+# demo_10 sorts after demo_2 numerically but before it as a string; demo_2 is shorter than most sequences
+DEMO_LENGTHS = {"demo_0": 6, "demo_2": 2, "demo_10": 9}
+
+
+def write_demos(path, seed=0):
+    rng = np.random.default_rng(seed)
+    with h5py.File(path, "w") as f:
+        for ep, length in DEMO_LENGTHS.items():
+            group = f.create_group(f"data/{ep}")
+            group.attrs["num_samples"] = length
+            group["actions"] = rng.normal(size=(length, 7))
+            group["obs/agentview_rgb"] = rng.integers(0, 256, (length, 8, 8, 3), dtype=np.uint8)
+            group["obs/joint_states"] = rng.normal(size=(length, 7))
+        f["mask/train"] = np.array([b"demo_10", b"demo_2"])
+
+
+@pytest.fixture(scope="module", autouse=True)
+def obs_specs():
+    ObsUtils.initialize_obs_utils_with_obs_specs({"obs": {"rgb": ["agentview_rgb"], "low_dim": ["joint_states"]}})
+
+
+@pytest.fixture
+def demo_path(tmp_path):
+    path = str(tmp_path / "demos.hdf5")
+    write_demos(path)
+    return path
+
+
+def sequence_dataset(path, **kwargs):
+    return SequenceDataset(
+        hdf5_path=path,
+        obs_keys=OBS_KEYS,
+        dataset_keys=["actions"],
+        load_next_obs=False,
+        goal_mode=None,
+        hdf5_cache_mode="low_dim",
+        hdf5_use_swmr=False,
+        hdf5_normalize_obs=None,
+        **kwargs,
+    )
+
+
+def assert_same_item(item, expected):
+    assert item.keys() == expected.keys()
+    for k, v in expected.items():
+        if isinstance(v, dict):
+            assert_same_item(item[k], v)
+        else:
+            assert np.asarray(item[k]).dtype == v.dtype, k
+            np.testing.assert_array_equal(item[k], v, err_msg=k)
+
+
+SAMPLING = [
+    dict(frame_stack=1, seq_length=1, pad_frame_stack=True, pad_seq_length=True),
+    dict(frame_stack=3, seq_length=4, pad_frame_stack=True, pad_seq_length=True),
+    dict(frame_stack=2, seq_length=3, pad_frame_stack=False, pad_seq_length=True),
+    dict(frame_stack=1, seq_length=2, pad_frame_stack=True, pad_seq_length=False),
+]
+
+
+@pytest.mark.parametrize("sampling", SAMPLING)
+@pytest.mark.parametrize("filter_key", [None, "train"])
+def test_memmap_dataset_matches_sequence_dataset(demo_path, tmp_path, sampling, filter_key):
+    cache_dir = build_demo_cache(demo_path, str(tmp_path / "cache"), OBS_KEYS)
+    demos = ["demo_10", "demo_2"] if filter_key else None
+    memmap = MemmapSequenceDataset(cache_dir, OBS_KEYS, get_pad_mask=True, demos=demos, **sampling)
+    reference = sequence_dataset(demo_path, get_pad_mask=True, filter_by_attribute=filter_key, **sampling)
+
+    assert len(memmap) == len(reference)
+    for i in range(len(reference)):
+        assert_same_item(memmap[i], reference[i])
+
+
+@pytest.mark.parametrize("sampling", SAMPLING)
+@pytest.mark.parametrize("get_pad_mask", [False, True])
+def test_sequence_batch_matches_getitem(demo_path, sampling, get_pad_mask):
+    dataset = sequence_dataset(demo_path, get_pad_mask=get_pad_mask, **sampling)
+    # unsorted, repeated and mixed across demos
+    indices = np.random.default_rng(0).permutation(np.tile(np.arange(len(dataset)), 2))[: len(dataset) + 3]
+
+    batch = get_sequence_batch(dataset, indices)
+    assert len(batch) == len(indices)
+    for item, index in zip(batch, indices):
+        assert_same_item(item, dataset[index])
+
+
+def test_demo_cache_layout_and_reuse(demo_path, tmp_path):
+    cache_dir = get_demo_cache_dir(demo_path, str(tmp_path / "caches"))
+    assert cache_dir == str(tmp_path / "caches" / "demos_memmap")
+    assert build_demo_cache(demo_path, cache_dir, OBS_KEYS) == cache_dir
+
+    with open(os.path.join(cache_dir, "meta.json")) as f:
+        meta = json.load(f)
+    assert meta["demos"] == ["demo_0", "demo_2", "demo_10"] and meta["lengths"] == [6, 2, 9]
+    assert meta["offsets"] == [0, 6, 8]
+    images = np.load(os.path.join(cache_dir, "obs.agentview_rgb.npy"))
+    actions = np.load(os.path.join(cache_dir, "actions.npy"))
+    assert images.dtype == np.uint8 and actions.dtype == np.float32
+    with h5py.File(demo_path, "r") as f:
+        np.testing.assert_array_equal(images[8:], f["data/demo_10/obs/agentview_rgb"][()])
+
+    # a valid cache is reused as is, without leaving temporary directories behind
+    meta_mtime = os.stat(os.path.join(cache_dir, "meta.json")).st_mtime_ns
+    assert build_demo_cache(demo_path, cache_dir, ["joint_states"]) == cache_dir
+    assert os.stat(os.path.join(cache_dir, "meta.json")).st_mtime_ns == meta_mtime
+    assert os.listdir(tmp_path / "caches") == ["demos_memmap"]
+
+
+def test_demo_cache_is_rebuilt(demo_path, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    build_demo_cache(demo_path, cache_dir, ["joint_states"])
+
+    # new keys
+    build_demo_cache(demo_path, cache_dir, OBS_KEYS)
+    assert os.path.exists(os.path.join(cache_dir, "obs.agentview_rgb.npy"))
+
+    # a changed source file
+    write_demos(demo_path, seed=1)
+    os.utime(demo_path, ns=(0, 0))
+    build_demo_cache(demo_path, cache_dir, OBS_KEYS)
+    with h5py.File(demo_path, "r") as f:
+        expected = f["data/demo_0/actions"][()].astype(np.float32)
+    np.testing.assert_array_equal(np.load(os.path.join(cache_dir, "actions.npy"))[:6], expected)
+
+    # a directory without meta.json, e.g. left over from an interrupted copy
+    shutil.rmtree(cache_dir)
+    os.makedirs(cache_dir)
+    open(os.path.join(cache_dir, "actions.npy"), "w").close()
+    build_demo_cache(demo_path, cache_dir, OBS_KEYS)
+    assert len(MemmapSequenceDataset(cache_dir, OBS_KEYS)) == sum(DEMO_LENGTHS.values())
+    assert sorted(os.listdir(tmp_path)) == ["cache", "demos.hdf5"]
+
+
+def test_demo_cache_rename_fallback(demo_path, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+
+    def finished_first(src, dst):
+        # another process renames its copy of the same cache into place first
+        shutil.copytree(src, dst)
+        raise OSError("Directory not empty")
+
+    monkeypatch.setattr(os, "rename", finished_first)
+    assert build_demo_cache(demo_path, cache_dir, OBS_KEYS) == cache_dir
+    assert sorted(os.listdir(tmp_path)) == ["cache", "demos.hdf5"]  # the temporary copy is removed
+    assert len(MemmapSequenceDataset(cache_dir, OBS_KEYS)) == sum(DEMO_LENGTHS.values())
+
+    def finished_stale(src, dst):
+        # ... but a cache that does not match is an error
+        shutil.copytree(src, dst)
+        with open(os.path.join(dst, "meta.json"), "w") as f:
+            json.dump({"version": -1}, f)
+        raise OSError("Directory not empty")
+
+    shutil.rmtree(cache_dir)
+    monkeypatch.setattr(os, "rename", finished_stale)
+    with pytest.raises(OSError):
+        build_demo_cache(demo_path, cache_dir, OBS_KEYS)
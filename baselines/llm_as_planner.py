@@ -21,7 +21,7 @@ current_dir = Path(__file__).resolve().parent
 parent_dir = current_dir.parent
 sys.path.append(str(parent_dir))
 
-from data.scene_graph import load_scene_graph, prune_sg_with_item
+from data.scene_graph import load_scene_graph_index
 from data import example
 import llm.llm as llm
 from llm import llm_utils
@@ -202,11 +202,9 @@ if __name__ == "__main__":
     items_keep_qry = qry["item_keep"]
     gt_cost = qry["gt_cost"][args.scene]
 
-    scene_exp = load_scene_graph(args.scene_example)
-    scene_exp = prune_sg_with_item(scene_exp, items_keep_exp)
+    scene_exp = load_scene_graph_index(args.scene_example).prune(items_keep_exp)
     
-    base_scene_qry = load_scene_graph(args.scene)
-    base_scene_qry = prune_sg_with_item(base_scene_qry, items_keep_qry)
+    base_scene_qry = load_scene_graph_index(args.scene).prune(items_keep_qry)
 
     curr_time = datetime.now().strftime("%Y%m%d_%H%M%S")
     log_base_path = LOG_PATH(curr_time)
@@ -15,7 +15,7 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
 
-from data.scene_graph import load_scene_graph, prune_sg_with_item, collapsed_sg, update_sg, count_rooms
+from data.scene_graph import load_scene_graph_index, count_rooms
 from data import example
 import llm.llm as llm
 from llm import llm_utils
@@ -140,9 +140,9 @@ if __name__ == "__main__":
     items_keep_qry = qry["item_keep"]
     gt_cost = qry["gt_cost"][args.scene]
 
-    scene_exp = load_scene_graph(args.scene_example)
-    scene_exp = prune_sg_with_item(scene_exp, items_keep_exp)
-    scene_qry = load_scene_graph(args.scene)
+    scene_exp = load_scene_graph_index(args.scene_example).prune(items_keep_exp)
+    index_qry = load_scene_graph_index(args.scene)
+    scene_qry = index_qry.sg
 
     curr_time = datetime.now().strftime("%Y%m%d_%H%M%S/")
     success = 0
@@ -156,7 +156,7 @@ if __name__ == "__main__":
 
         log_path = os.path.join(LOG_PATH(curr_time), "e_{:03}/".format(e))
         Path(log_path).mkdir(parents=True, exist_ok=True)
-        csg_qry = collapsed_sg(scene_qry)
+        csg_qry = index_qry.collapsed()
         # prompt_chain = []
         memory = set([])
         search_time, plan_time = 0., 0.
@@ -207,7 +207,7 @@ if __name__ == "__main__":
                     prompt_s = "Room {} has already been explored! Remaining unexplored rooms are: {}".format(
                         cmd[1], set(scene_qry["rooms"].keys()) - memory)
                 else:
-                    csg_qry = update_sg(csg_qry, scene_qry, cmd[0], cmd[1])
+                    csg_qry = index_qry.update(csg_qry, cmd[0], cmd[1])
                     memory.add(cmd[1])
                     prompt_s = "3D scene graph: {}\nMemory: {}".format(
                         csg_qry, memory)
@@ -238,7 +238,7 @@ if __name__ == "__main__":
                 # prompt_chain.append({"role": "user", "content": prompt_p})
             else:
                 print("Skipping scene graph search.")
-                scene_qry = prune_sg_with_item(scene_qry, items_keep_qry)
+                scene_qry = index_qry.prune(items_keep_qry)
                 output_exp = sayplan_plan_exp()
                 output_exp.pop("mode")
                 content_p, prompt_p = p.sayplan_prompt(add_obj_exp, add_act_exp, add_state_exp,
@@ -6,6 +6,7 @@
 
 
 import copy
+import functools
 
 
 ALLENSVILLE = {
@@ -2323,54 +2324,99 @@ OFFICE = {
 
 
 def load_scene_graph(scene: str):
-    return copy.deepcopy(eval(scene.upper()))
+    return copy.deepcopy(globals()[scene.upper()])
 
 
-def extract_accessible_items_from_sg(sg: dict):
-    accessible_items = []
-    for room_name, room_data in sg["rooms"].items():
-        if "assets" in room_data:
-            assets = room_data.get("assets", {})
-            for asset_name, asset_data in assets.items():
-                if asset_data.get("accessible", True):
-                    accessible_items_asset = []
+class SceneGraphIndex:
+    """Item counts and accessible items of a scene graph, computed in one pass.
+
+    The source graph is never copied. Graphs returned by ``prune``, ``collapsed`` and
+    ``update`` get fresh containers for what they change but share
+    everything else (leaf item records, unchanged rooms) with their inputs, so copy
+    a record before mutating it.
+    """
+
+    def __init__(self, sg: dict):
+        self.sg = sg
+        self.num_items = 0
+        self._accessible = []
+        for room_data in sg["rooms"].values():
+            if "assets" in room_data:
+                for asset_name, asset_data in room_data.get("assets", {}).items():
                     items = asset_data.get("items", {})
-                    for item_name, item_data in items.items():
-                        if item_data.get("accessible", True):
-                            accessible_items_asset.append(item_name)
-                    accessible_items.append(
-                        {"asset": asset_name, "items": accessible_items_asset})
-        else:
-            items = room_data.get("items", {})
-            for item_name, item_data in items.items():
-                if item_data.get("accessible", True):
-                    accessible_items.append(item_name)
-    return accessible_items
+                    self.num_items += len(items)
+                    if asset_data.get("accessible", True):
+                        self._accessible.append({"asset": asset_name, "items": [
+                            i for i, d in items.items() if d.get("accessible", True)]})
+            else:
+                items = room_data.get("items", {})
+                self.num_items += len(items)
+                for item_name, item_data in items.items():
+                    if item_data.get("accessible", True):
+                        self._accessible.append(item_name)
 
+    def count_rooms(self):
+        return len(self.sg["rooms"])
 
-def prune_sg_with_item(sg: dict, item_keep: list):
-    pruned_sg = copy.deepcopy(sg)
-    for room_name, room_data in pruned_sg["rooms"].items():
-        pruned_items = {}
-        if "assets" in room_data and any("asset" in elem for elem in item_keep):
-            pruned_assets = {}
-            assets = room_data.get("assets", {})
-            for asset_name, asset_data in assets.items():
-                if any(asset_name in elem["asset"] for elem in item_keep):
-                    pruned_assets[asset_name] = {}
-                    asset_items = asset_data.get("items", {})
-                    for item_name, item_data in asset_items.items():
-                        if any(item_name in elem["items"] for elem in item_keep):
-                            pruned_assets[asset_name][item_name] = item_data
+    def count_items(self):
+        return self.num_items
+
+    def accessible_items(self):
+        return [dict(e, items=list(e["items"])) if isinstance(e, dict) else e for e in self._accessible]
+
+    def prune(self, item_keep: list):
+        use_assets = any("asset" in elem for elem in item_keep)
+        keep_assets = [elem["asset"] for elem in item_keep if isinstance(elem, dict)]
+        keep_asset_items = {i for elem in item_keep if isinstance(elem, dict) for i in elem["items"]}
+        keep_items = {elem for elem in item_keep if isinstance(elem, str)}
+
+        pruned_sg = dict(self.sg)
+        pruned_sg["rooms"] = {}
+        for room_name, room_data in self.sg["rooms"].items():
+            room_data = dict(room_data)
+            if "assets" in room_data and use_assets:
+                pruned_assets = {}
+                for asset_name, asset_data in room_data["assets"].items():
+                    # Asset names are matched as substrings of the kept asset entries
+                    if any(asset_name in a for a in keep_assets):
+                        pruned_assets[asset_name] = {
+                            i: d for i, d in asset_data.get("items", {}).items() if i in keep_asset_items}
                 room_data["assets"] = pruned_assets
+            else:
+                room_data["items"] = {
+                    i: d for i, d in room_data.get("items", {}).items() if i in keep_items}
+            pruned_sg["rooms"][room_name] = room_data
+        return pruned_sg
+
+    def collapsed(self):
+        return collapsed_sg(self.sg)
+
+    def update(self, csg: dict, command: str, room: str):
+        """Like ``update_sg``, but returns an updated copy of the collapsed graph ``csg``."""
+        if command == "expand":
+            room_data = _expanded_room(csg["rooms"][room], self.sg["rooms"][room])
+        elif command == "contract":
+            room_data = _contracted_room(csg["rooms"][room])
         else:
-            room_items = room_data.get("items", {})
-            for item_name, item_data in room_items.items():
-                if item_name in item_keep:
-                    pruned_items[item_name] = item_data
-            room_data["items"] = pruned_items
+            raise Exception("Invalid command!")
+        updated = dict(csg)
+        updated["rooms"] = dict(csg["rooms"])
+        updated["rooms"][room] = room_data
+        return updated
+
 
-    return pruned_sg
+@functools.lru_cache(maxsize=None)
+def load_scene_graph_index(scene: str):
+    """Cached index of a built-in scene; pruning it never copies the scene constant."""
+    return SceneGraphIndex(globals()[scene.upper()])
+
+
+def extract_accessible_items_from_sg(sg: dict):
+    return SceneGraphIndex(sg).accessible_items()
+
+
+def prune_sg_with_item(sg: dict, item_keep: list):
+    return SceneGraphIndex(sg).prune(item_keep)
 
 
 def count_rooms(sg: dict):
@@ -2378,17 +2424,7 @@ def count_rooms(sg: dict):
 
 
 def count_items(sg: dict):
-    count = 0
-    for room_name, room_data in sg["rooms"].items():
-        if "assets" in room_data:
-            assets = room_data.get("assets", {})
-            for asset_name, asset_data in assets.items():
-                items = asset_data.get("items", {})
-                count += len(items)
-        else:
-            items = room_data.get("items", {})
-            count += len(items)
-    return count
+    return SceneGraphIndex(sg).count_items()
 
 
 def collapsed_sg(sg: dict):
@@ -2402,13 +2438,23 @@ def collapsed_sg(sg: dict):
     return cg
 
 
+def _expanded_room(room_data: dict, orig_room_data: dict):
+    assert room_data.get("items") == {} and "assets" not in room_data, "Room is not empty!"
+    if "assets" in orig_room_data:
+        return {"assets": orig_room_data["assets"], "neighbor": room_data["neighbor"]}
+    return dict(room_data, items=orig_room_data["items"])
+
+
+def _contracted_room(room_data: dict):
+    return {"items": {}, "neighbor": room_data["neighbor"]}
+
+
 def update_sg(sg: dict, orig_sg: dict, command: str, room: str):
+    """Expands/contracts ``room`` of the collapsed graph ``sg`` in place."""
     if command == "expand":
-        assert sg["rooms"][room]["items"] == {}, "Room is not empty!"
-        sg["rooms"][room]["items"] = orig_sg["rooms"][room]["items"]
+        sg["rooms"][room] = _expanded_room(sg["rooms"][room], orig_sg["rooms"][room])
     elif command == "contract":
-        # assert sg["rooms"][room]["items"] != {}, "Room is empty!"
-        sg["rooms"][room]["items"] = {}
+        sg["rooms"][room] = _contracted_room(sg["rooms"][room])
     else:
         raise Exception("Invalid command!")
     return sg
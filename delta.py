@@ -6,6 +6,7 @@ Supported Models: GPT-3.5-Turbo, GPT-4o, etc.
 """
 
 import argparse
+import functools
 import os
 import re
 import time
@@ -20,6 +21,7 @@ import llm.llm as llm
 from llm import llm_utils
 import planner
 import prompt as p
+from utils import pddl_ast
 
 # ---------- 定数・パス設定 ----------
 DEFAULT_LLM = "gpt-4o"
@@ -41,6 +43,13 @@ def ungroup_vars_logic(text: str) -> str:
     pattern = r"((?:\?[a-zA-Z0-9_-]+\s*)+)-\s*([a-zA-Z0-9_-]+)"
     return re.sub(pattern, replace_func, text)
 
+@functools.lru_cache(maxsize=16)
+def _domain_symbols(domain_pddl: str) -> frozenset:
+    """オブジェクトとして扱ってはいけない記号（述語名・アクション名・定数・論理記号）"""
+    dom = pddl_ast.parse_domain(domain_pddl)
+    return frozenset(dom.predicates) | frozenset(dom.actions) | \
+        frozenset(name for name, _ in dom.constants) | pddl_ast.LOGICAL
+
 def sanitize_pddl_optimized(raw_text: str, domain_pddl: str, domain_name: str) -> Tuple[str, int]:
     """
     GPT-4o等の出力を整形し、修正回数をカウントする。
@@ -53,58 +62,42 @@ def sanitize_pddl_optimized(raw_text: str, domain_pddl: str, domain_name: str) -
     text = text.replace("```", "").strip()
     if text != raw_text.strip(): correction_count += 1
 
-    # 2. 構文の正規化
-    text = text.replace("not(", "not (")
-    text = text.replace("( )", "") # 孤立した括弧の除去
-    text = ungroup_vars_logic(text).lower()
-
-    # 3. 述語リストの取得（オブジェクト混入防止用）
-    predicates = re.findall(r"\(\s*([a-z0-9_-]+)", domain_pddl.lower())
-    forbidden = set(predicates) | {
-        "and", "not", "or", "forall", "exists", "define", "domain", 
-        "problem", "objects", "init", "goal", "begin", "task", "item_in", "item_at"
-    }
-
-    # 4. セクション抽出 (堅牢な正規表現)
-    init_match = re.search(r":init\s*(.*?)\s*(?=:goal|\))", text, flags=re.DOTALL)
-    goal_match = re.search(r":goal\s*(.*?)\s*(?=\)\s*\)|$)", text, flags=re.DOTALL)
-    
-    init_body = init_match.group(1).strip() if init_match else ""
-    goal_body = goal_match.group(1).strip() if goal_match else "(and)"
+    # 2. 構文木へ変換（not( や孤立した括弧、閉じ忘れはパーサ側で吸収）
+    prob = pddl_ast.parse_problem(text)
+    prob.name, prob.domain = "task_replanned", domain_name
 
-    # 5. オブジェクトの抽出とフィルタリング
-    tokens = re.findall(r"\b[a-z][a-z0-9_]*\b", init_body + " " + goal_body)
-    valid_objs = sorted({t for t in tokens if t not in forbidden and len(t) > 1})
+    # 3. init / goal の正規化（goal の入れ子 and は平坦化）
+    prob.init = [e for e in prob.init if isinstance(e, list) and e]
+    prob.goal = ["and"] + pddl_ast.conjuncts(prob.goal)
 
-    # 6. 論理的補完 (経路とアフォーダンス)
-    if "neighbor" not in init_body:
-        init_body += "\n  (neighbor kitchen table) (neighbor table kitchen) (neighbor table basket) (neighbor basket table)"
+    # 4. 論理的補完 (経路とアフォーダンス)
+    if not any(e[0] == "neighbor" for e in prob.init):
+        prob.init += [["neighbor", "kitchen", "table"], ["neighbor", "table", "kitchen"],
+                      ["neighbor", "table", "basket"], ["neighbor", "basket", "table"]]
         correction_count += 1
 
-    # 7. 再構成
-    final_pddl = f"""(define (problem task_replanned)
-  (:domain {domain_name})
-  (:objects
-  {" ".join(valid_objs)}
-  )
-  (:init
-  {init_body}
-  )
-  (:goal
-  (and {goal_body.replace('(and', '').replace(')', '').strip()})
-  )
-)"""
-    return final_pddl, correction_count
+    # 5. オブジェクトの抽出とフィルタリング（原子式の引数のみ、宣言済みの型は保持）
+    forbidden = _domain_symbols(domain_pddl)
+    declared = dict(prob.objects)
+    used = dict.fromkeys(arg for e in prob.init + [prob.goal] for atom in pddl_ast.iter_atoms(e)
+                         for arg in atom[1:] if not arg.startswith("?") and arg not in forbidden)
+    prob.objects = [(obj, declared.get(obj)) for obj in sorted(used)]
+
+    return prob.to_pddl(), correction_count
 
 # ---------- 差分検知ロジック ----------
 
 def extract_facts(pddl_text: str) -> Set[str]:
-    facts = re.findall(r"\([a-z0-9_][a-z0-9_\s-]*\)", pddl_text.lower())
-    reserved = {"and", "not", "or", "forall", "exists"}
-    return {f for f in facts if f.strip("()").split()[0] not in reserved}
+    prob = pddl_ast.parse_problem(pddl_text)
+    return pddl_ast.facts(prob.init) | pddl_ast.facts(prob.goal)
+
+@functools.lru_cache(maxsize=16)
+def _ref_facts(ref_pddl: str) -> frozenset:
+    """参照PDDLは再計画ループ中に変わらないので、fact抽出を一度だけ行う"""
+    return frozenset(extract_facts(ref_pddl))
 
 def get_pddl_diff_summary(ref_pddl: str, cur_pddl: str) -> str:
-    ref_facts = extract_facts(ref_pddl)
+    ref_facts = _ref_facts(ref_pddl)
     cur_facts = extract_facts(cur_pddl)
     missing = ref_facts - cur_facts
     extra = cur_facts - ref_facts
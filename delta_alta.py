@@ -221,14 +221,9 @@ if __name__ == "__main__":
 
         if not args.no_plan:
             print(f"Planning with {args.domain}...")
-            # PDDLGymへのエクスポート
             try:
-                planner.export_domain_to_pddlgym(args.domain, d_tar_file)
-                planner.export_problem_to_pddlgym(args.domain, p_tar_file, p_idx="00", clear_dir=True)
-                planner.register_new_pddlgym_env(args.domain)
-                
                 # プランニング実行
-                _, plan_time, node, cost, exit_code = planner.query_pddlgym(args.domain, max_time=args.max_time)
+                _, plan_time, node, cost, exit_code = planner.query_pddlgym(domain_tar, problem_tar, max_time=args.max_time)
                 success = (exit_code == 1)
             except Exception as e:
                 print(f"🚨 Planning system error: {e}")
@@ -1,14 +1,17 @@
 import argparse
+import asyncio
 import json
-from data.scene_graph import load_scene_graph, prune_sg_with_item, extract_accessible_items_from_sg
+from data.scene_graph import SceneGraphIndex, load_scene_graph_index
 from data import example
 from datetime import datetime
 import llm.llm as llm
+from llm.llm_client import LLMClient, LLM_CACHE_DIR
 from llm import llm_utils
 import os
 import pandas as pd
 from pathlib import Path
 import planner
+from planner_service import PlannerService, PLAN_CACHE_DIR
 import prompt as p
 import time
 
@@ -124,6 +127,30 @@ if __name__ == "__main__":
     parser.add_argument("--scene-graph-json",
                         action="store", type=str, dest="scene_graph_json", default="",
                         help="Path to external scene graph JSON generated from vision")
+    parser.add_argument("--llm-cache",
+                        action="store_true", dest="llm_cache", default=False,
+                        help="Reuse temperature-0 LLM responses from earlier runs")
+    parser.add_argument("--llm-cache-dir",
+                        action="store", type=str, dest="llm_cache_dir", default=LLM_CACHE_DIR,
+                        help="Directory of the persistent LLM response cache")
+    parser.add_argument("--llm-retries",
+                        action="store", type=int, dest="llm_retries", default=2,
+                        help="Retries with exponential backoff for failed LLM requests")
+    parser.add_argument("--llm-concurrency",
+                        action="store", type=int, dest="llm_concurrency", default=4,
+                        help="Maximum number of LLM requests in flight (local models serve one at a time)")
+    parser.add_argument("--concurrent-episodes",
+                        action="store", type=int, dest="concurrent_episodes", default=1,
+                        help="Number of episodes run concurrently, each with its own prompt chain")
+    parser.add_argument("--plan-cache",
+                        action="store_true", dest="plan_cache", default=False,
+                        help="Reuse plans of identical domain/problem pairs from earlier runs")
+    parser.add_argument("--plan-cache-dir",
+                        action="store", type=str, dest="plan_cache_dir", default=PLAN_CACHE_DIR,
+                        help="Directory of the persistent plan cache")
+    parser.add_argument("--planner-workers",
+                        action="store", type=int, dest="planner_workers", default=0,
+                        help="Number of warm planner worker processes (0: plan in this process)")
     args = parser.parse_args()
     if "all" in args.experiment and any(x in ["domain", "problem", "decompose"] for x in args.experiment):
         raise argparse.ArgumentError("Duplicate experiments!")
@@ -174,19 +201,30 @@ if __name__ == "__main__":
     data_list = []
 
     # Loading LLM
-    model = llm.load_llm(args.model, args.temperature, args.top_p)
-
-    for e in range(args.episode):
+    llm_client = LLMClient(max_concurrency=args.llm_concurrency, max_retries=args.llm_retries,
+                           cache_dir=args.llm_cache_dir if args.llm_cache else None)
+    model = llm.load_llm(args.model, args.temperature, args.top_p, client=llm_client)
+    if isinstance(model, llm.Llama3):
+        llm_client.max_concurrency = 1
+    plan_service = None
+    if args.plan_cache or args.planner_workers > 0:
+        plan_service = PlannerService(args.plan_cache_dir, args.planner_workers, use_cache=args.plan_cache)
+    # The planner writes its intermediate files to the working directory, so episodes plan one at a time
+    plan_lock = asyncio.Lock()
+
+    async def run_episode(e: int, model: llm.LLMBase):
+        global success, success_orig
         model.reset()
 
         log_path = os.path.join(LOG_PATH(curr_time), "e_{:03}/".format(e))
         Path(log_path).mkdir(parents=True, exist_ok=True)
 
-        scene_exp = load_scene_graph(args.scene_example)
+        index_exp = load_scene_graph_index(args.scene_example)
         if args.scene_graph_json:
-            scene_qry = load_scene_graph_from_json(args.scene_graph_json)
+            index_qry = SceneGraphIndex(load_scene_graph_from_json(args.scene_graph_json))
         else:
-            scene_qry = load_scene_graph(args.scene)
+            index_qry = load_scene_graph_index(args.scene)
+        scene_exp, scene_qry = index_exp.sg, index_qry.sg
 
         domain_tar, problem_tar = None, None
         d_tar_file = os.path.join(
@@ -202,7 +240,7 @@ if __name__ == "__main__":
         subgoal_pddl_list = []
         item_keep = []
         start = time.time()
-        time.sleep(2)
+        await asyncio.sleep(2)
 
         ###################### Stage 1: Generating domain file ######################
         if "all" in args.experiment or "domain" in args.experiment:
@@ -215,7 +253,7 @@ if __name__ == "__main__":
                     log_path, "{}_domain.prompt".format(args.domain)))
             model.init_prompt_chain(content_d, prompt_d)
             d_start = time.time()
-            domain_tar = model.query_msg_chain()
+            domain_tar = await model.aquery_msg_chain()
             d_time = time.time() - d_start
             if args.print_response:
                 model.log(domain_tar, os.path.join(
@@ -226,10 +264,10 @@ if __name__ == "__main__":
             model.update_prompt_chain_w_response(domain_tar)
 
         ###################### Step 2: Pruning scene graph items ######################
-        time.sleep(1)
+        await asyncio.sleep(1)
         if "all" in args.experiment or "prune" in args.experiment:
-            items_exp = extract_accessible_items_from_sg(scene_exp)
-            items_qry = extract_accessible_items_from_sg(scene_qry)
+            items_exp = index_exp.accessible_items()
+            items_qry = index_qry.accessible_items()
             if domain_tar is None:
                 with open(SRC_DOMAIN_PATH(args.domain), "r") as df:
                     domain_tar = df.read()
@@ -246,7 +284,7 @@ if __name__ == "__main__":
             else:
                 model.init_prompt_chain(content_pr, prompt_pr)
             pr_start = time.time()
-            prune_tar = model.query_msg_chain()
+            prune_tar = await model.aquery_msg_chain()
             pr_time = time.time() - pr_start
             if args.print_response:
                 model.log(prune_tar, os.path.join(
@@ -256,8 +294,8 @@ if __name__ == "__main__":
             print(
                 "Response time for pruning scene graph: {:.2f}s".format(pr_time))
             model.update_prompt_chain_w_response(prune_tar)
-            scene_exp = prune_sg_with_item(scene_exp, item_keep_exp)
-            scene_qry = prune_sg_with_item(scene_qry, item_keep)
+            scene_exp = index_exp.prune(item_keep_exp)
+            scene_qry = index_qry.prune(item_keep)
 
         ###################### Stage 3: Generating problem file ######################
         if "all" in args.experiment or "problem" in args.experiment:
@@ -281,7 +319,7 @@ if __name__ == "__main__":
             else:
                 model.init_prompt_chain(content_p, prompt_p)
             p_start = time.time()
-            problem_tar = model.query_msg_chain()
+            problem_tar = await model.aquery_msg_chain()
             p_time = time.time() - p_start
             if args.print_response:
                 model.log(problem_tar, os.path.join(
@@ -321,7 +359,7 @@ if __name__ == "__main__":
                 model.log(content_dp + prompt_dp, os.path.join(
                     log_path, "{}_{}_decomp.prompt".format(args.scene, args.domain)))
             dp_start = time.time()
-            decomp_tar = model.query_msg_chain()
+            decomp_tar = await model.aquery_msg_chain()
             dp_time = time.time() - dp_start
             subgoal_pddl_list = llm_utils.export_subgoal_list(decomp_tar)
             if args.print_response:
@@ -336,62 +374,96 @@ if __name__ == "__main__":
             args.model, total_llm_time))
 
         if args.no_plan:
-            continue
+            return None
 
         ##################### Generating task plan(s) ######################
-        # Copy generated domain and (sub-)problem files in pddlgym directory
+        # Load generated domain and problem files (planned in memory, nothing is copied into pddlgym)
         if not os.path.isfile(d_tar_file):
             d_tar_file = SRC_DOMAIN_PATH(args.domain)
         if not os.path.isfile(p_tar_file):
             p_tar_file = SRC_PROBLEM_PATH(args.scene, args.domain)
-        planner.export_domain_to_pddlgym(args.domain, d_tar_file)
-        planner.export_problem_to_pddlgym(args.domain, p_tar_file, p_idx="00" if len(
-            str(len(subgoal_pddl_list))) > 1 else "0", clear_dir=True)
-        planner.register_new_pddlgym_env(args.domain)
-
-        # First execute planner with undecomposed problem to get planning time
-        plan, plan_time, node, cost, exit_code = planner.query_pddlgym(
-            args.domain, max_time=args.max_time)
-        if exit_code == 1:
-            with open(plan_file, "w") as pf:
-                pf.write("\n".join(plan))
-            is_valid, val_info = planner.validate(SRC_DOMAIN_PATH(
-                args.domain), SRC_PROBLEM_PATH(args.scene, args.domain), plan_file)
-            # if cost == gt_cost or is_valid:
-            if is_valid:
-                success_orig += 1
+        with open(d_tar_file, "r") as df:
+            d_tar_text = df.read()
+        with open(p_tar_file, "r") as pf:
+            p_tar_text = pf.read()
+
+        async with plan_lock:
+            # First execute planner with undecomposed problem to get planning time
+            if plan_service is None:
+                plan, plan_time, node, cost, exit_code = await asyncio.to_thread(
+                    planner.query_pddlgym, d_tar_text, p_tar_text, max_time=args.max_time)
             else:
-                exit_code = 0
-
-        # Hierarchical planning for sub-problems
-        if len(subgoal_pddl_list) > 0:
-            plans, times, nodes, costs, exit_code_decomp, completed_sp = planner.query_pddlgym_decompose(
-                args.domain, subgoal_pddl_list, save_path=log_path, max_time=args.max_time)
-            if exit_code_decomp == 1:
-                with open(plan_decomp_file, "w") as pdf:
-                    for sp in plans:
-                        pdf.writelines("\n".join(sp) + "\n\n")
-                is_valid_decomp, val_info_decomp = planner.validate(SRC_DOMAIN_PATH(
-                    args.domain), SRC_PROBLEM_PATH(args.scene, args.domain), plan_decomp_file)
-                # if sum(costs) == gt_cost or is_valid_decomp:
-                if is_valid_decomp:
-                    success += 1
+                plan, plan_time, node, cost, exit_code = await asyncio.to_thread(
+                    plan_service.query, d_tar_text, p_tar_text, max_time=args.max_time)
+            if exit_code == 1:
+                with open(plan_file, "w") as pf:
+                    pf.write("\n".join(plan))
+                is_valid, val_info = await asyncio.to_thread(planner.validate, SRC_DOMAIN_PATH(
+                    args.domain), SRC_PROBLEM_PATH(args.scene, args.domain), plan_file)
+                # if cost == gt_cost or is_valid:
+                if is_valid:
+                    success_orig += 1
                 else:
-                    exit_code_decomp = 0
-        else:
-            print("No decomposed subgoals!")
-            plans, times, nodes, costs, completed_sp = [], [], [], [], None
-            exit_code_decomp = 7
+                    exit_code = 0
+
+            # Hierarchical planning for sub-problems
+            if len(subgoal_pddl_list) > 0:
+                if plan_service is None:
+                    plans, times, nodes, costs, exit_code_decomp, completed_sp = await asyncio.to_thread(
+                        planner.query_pddlgym_decompose, d_tar_text, p_tar_text, subgoal_pddl_list,
+                        save_path=log_path, max_time=args.max_time)
+                else:
+                    plans, times, nodes, costs, exit_code_decomp, completed_sp = await asyncio.to_thread(
+                        plan_service.query_decompose, d_tar_text, p_tar_text, subgoal_pddl_list,
+                        save_path=log_path, max_time=args.max_time)
+                if exit_code_decomp == 1:
+                    with open(plan_decomp_file, "w") as pdf:
+                        for sp in plans:
+                            pdf.writelines("\n".join(sp) + "\n\n")
+                    is_valid_decomp, val_info_decomp = await asyncio.to_thread(planner.validate, SRC_DOMAIN_PATH(
+                        args.domain), SRC_PROBLEM_PATH(args.scene, args.domain), plan_decomp_file)
+                    # if sum(costs) == gt_cost or is_valid_decomp:
+                    if is_valid_decomp:
+                        success += 1
+                    else:
+                        exit_code_decomp = 0
+            else:
+                print("No decomposed subgoals!")
+                plans, times, nodes, costs, completed_sp = [], [], [], [], None
+                exit_code_decomp = 7
 
         print("==================== Episode {}/{}, Success Orig. {}, Total Success: {} ====================".format(
             e + 1, args.episode, success_orig, success))
-        data_list.append([e, exit_code, exit_code_decomp, success, success_orig, args.experiment, args.model, args.temperature,
-                          args.domain_example, args.scene_example, args.domain, args.scene,
-                          d_time, pr_time, p_time, dp_time,  total_llm_time,
-                          len(subgoal_pddl_list), completed_sp, plan_time, cost, node,
-                          sum(times), times, sum(nodes), nodes,
-                          sum(costs), costs, gt_cost, item_keep])
+        return [e, exit_code, exit_code_decomp, success, success_orig, args.experiment, args.model, args.temperature,
+                args.domain_example, args.scene_example, args.domain, args.scene,
+                d_time, pr_time, p_time, dp_time,  total_llm_time,
+                len(subgoal_pddl_list), completed_sp, plan_time, cost, node,
+                sum(times), times, sum(nodes), nodes,
+                sum(costs), costs, gt_cost, item_keep]
+
+    async def run_episodes():
+        # Each episode queries a fork of the model (own prompt chain, shared backend and LLM client)
+        slots = asyncio.Semaphore(args.concurrent_episodes)
+
+        async def run_in_slot(e: int):
+            async with slots:
+                return await run_episode(e, model.fork())
+
+        return await asyncio.gather(*(run_in_slot(e) for e in range(args.episode)))
+
+    rows = asyncio.run(run_episodes())
+    # Success columns are cumulative in episode order, whatever order the episodes finished in
+    success, success_orig = 0, 0
+    for row in rows:
+        if row is None:
+            continue
+        success += row[2] == 1
+        success_orig += row[1] == 1
+        row[3], row[4] = success, success_orig
+        data_list.append(row)
 
+    if plan_service is not None:
+        plan_service.close()
     if args.no_plan:
         quit()
 
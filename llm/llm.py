@@ -1,20 +1,24 @@
 import os
+from abc import ABC, abstractmethod
 import tiktoken
 import torch
 import requests
 import json
-from copy import deepcopy
-from transformers import pipeline
+from copy import copy, deepcopy
+from transformers import DynamicCache, pipeline
 from dotenv import load_dotenv
 from openai import OpenAI
+from llm.llm_client import LLMClient
 
 load_dotenv()
 MAX_NEW_TOKENS = 16384
 
-class LLMBase:
-    def __init__(self, temp: float = 0., top_p: float = 1.):
+class LLMBase(ABC):
+    def __init__(self, temp: float = 0., top_p: float = 1., client: LLMClient = None):
         self.temperature = temp
         self.top_p = top_p
+        self.model_id = None
+        self.llm_client = client if client is not None else LLMClient()
         self.prompt_chain = []
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
@@ -40,7 +44,21 @@ class LLMBase:
         pass
 
     def query_msg_chain(self):
-        pass
+        return self.llm_client.call(self.complete, self.model_id, self.temperature, self.prompt_chain)
+
+    async def aquery_msg_chain(self):
+        """Async query_msg_chain; concurrent calls share the client's concurrency cap and cache."""
+        return await self.llm_client.acall(self.complete, self.model_id, self.temperature, list(self.prompt_chain))
+
+    @abstractmethod
+    def complete(self, messages: list):
+        """Send one message chain to the backend and return the response text (no caching/retries)."""
+
+    def fork(self):
+        """Copy with its own empty prompt chain that shares the backend, e.g. one per concurrent episode."""
+        other = copy(self)
+        other.prompt_chain = []
+        return other
 
     @staticmethod
     def log(context: str, save_name: str):
@@ -48,26 +66,34 @@ class LLMBase:
             f.write(context)
 
 class Llama3(LLMBase):
-    def __init__(self, model_name: str, temp: float = 0., top_p: float = 1.):
-        super().__init__(temp, top_p)
-        self.model_id = "meta-llama/Meta-{}".format(model_name)
-        self.pipeline = pipeline(
-            "text-generation",
-            model=self.model_id,
-            model_kwargs={
+    def __init__(self, model_name: str, temp: float = 0., top_p: float = 1., client: LLMClient = None):
+        super().__init__(temp, top_p, client)
+        # Full hub ids (e.g. a small test model) are used as-is
+        self.model_id = model_name if "/" in model_name else "meta-llama/Meta-{}".format(model_name)
+        if torch.cuda.is_available():
+            model_kwargs = {
                 "torch_dtype": torch.float16,
                 "quantization_config": {
                     "load_in_4bit": True,
                     "bnb_4bit_compute_dtype": torch.bfloat16
                 },
                 "low_cpu_mem_usage": True,
-            },
-            device_map="auto"
+            }
+        else:
+            # bitsandbytes 4-bit needs CUDA; fall back to a plain fp32 model on CPU
+            model_kwargs = {"torch_dtype": torch.float32}
+        self.pipeline = pipeline(
+            "text-generation",
+            model=self.model_id,
+            model_kwargs=model_kwargs,
+            device_map="auto" if torch.cuda.is_available() else None
         )
         self.terminators = [
             self.pipeline.tokenizer.eos_token_id,
             self.pipeline.tokenizer.convert_tokens_to_ids("<|eot_id|>"),
         ]
+        self.terminators = [t for t in self.terminators if t is not None]
+        self._prefix_cache = {}
 
     def count_tokens(self, string: str):
         tokens = self.pipeline.tokenizer.tokenize(string)
@@ -98,9 +124,9 @@ class Llama3(LLMBase):
         torch.cuda.empty_cache()
         return output
 
-    def query_msg_chain(self):
+    def complete(self, messages: list):
         response = self.pipeline(
-            self.prompt_chain,
+            messages,
             max_new_tokens=MAX_NEW_TOKENS,
             eos_token_id=self.terminators,
             do_sample=True,
@@ -109,11 +135,113 @@ class Llama3(LLMBase):
         torch.cuda.empty_cache()
         return output
 
+    def _generate_kwargs(self, max_new_tokens: int):
+        tokenizer = self.pipeline.tokenizer
+        kwargs = {"max_new_tokens": max_new_tokens, "eos_token_id": self.terminators,
+                  "pad_token_id": tokenizer.pad_token_id if tokenizer.pad_token_id is not None else self.terminators[0]}
+        if self.temperature > 0:
+            kwargs.update(do_sample=True, temperature=self.temperature, top_p=self.top_p)
+        else:
+            kwargs.update(do_sample=False)
+        return kwargs
+
+    def _get_prefix_cache(self, prefix_text: str):
+        """KV cache of ``prefix_text``, computed once and reused by every prompt sharing it."""
+        if prefix_text not in self._prefix_cache:
+            model = self.pipeline.model
+            prefix_ids = self.pipeline.tokenizer(prefix_text, return_tensors="pt",
+                                                 add_special_tokens=False).input_ids.to(model.device)
+            with torch.no_grad():
+                past = model(prefix_ids, past_key_values=DynamicCache(), use_cache=True).past_key_values
+            self._prefix_cache = {prefix_text: (prefix_ids, past)}  # keep only the latest system prompt
+        return self._prefix_cache[prefix_text]
+
+    def _generate_padded(self, token_ids: list, gen_kwargs: dict, prefix=None):
+        """Greedy/sampled generation for a batch of token id lists, returning the decoded continuations.
+
+        Rows are left-padded. With ``prefix = (prefix_ids, past)`` the rows are suffixes of
+        ``prefix_ids``: the padding goes between prefix and suffix and ``past`` is expanded to the
+        batch, so every row continues from the same cached prefix at its own positions.
+        """
+        tokenizer, model = self.pipeline.tokenizer, self.pipeline.model
+        pad_id, length = gen_kwargs["pad_token_id"], max(len(ids) for ids in token_ids)
+        input_ids = torch.tensor([[pad_id] * (length - len(ids)) + ids for ids in token_ids])
+        attention_mask = torch.tensor([[0] * (length - len(ids)) + [1] * len(ids) for ids in token_ids])
+        past = None
+        if prefix is not None:
+            prefix_ids, prefix_past = prefix
+            input_ids = torch.cat([prefix_ids.cpu().expand(len(token_ids), -1), input_ids], dim=1)
+            attention_mask = torch.cat([torch.ones_like(input_ids[:, :prefix_ids.shape[1]]), attention_mask], dim=1)
+            past = deepcopy(prefix_past)
+            past.batch_repeat_interleave(len(token_ids))
+        with torch.no_grad():
+            out = model.generate(input_ids=input_ids.to(model.device), attention_mask=attention_mask.to(model.device),
+                                 past_key_values=past, **gen_kwargs)
+        return [tokenizer.decode(row[input_ids.shape[1]:], skip_special_tokens=True) for row in out]
+
+    def query_batch(self, prompt_chains: list, batch_size: int = 8, reuse_prefix: bool = False,
+                    max_new_tokens: int = MAX_NEW_TOKENS):
+        """Generate a response for every prompt chain, yielding ``(index, response)`` as they finish.
+
+        Responses already in the LLM client's cache are yielded first. The other chains are
+        length-sorted and left-padded into batches of ``batch_size``. With ``reuse_prefix``, chains
+        whose system message tokenizes to a shared prefix only feed their suffix, batched on top of
+        the cached KV of that prefix, which skips re-encoding the long few-shot prompt. Decoding is
+        greedy at temperature 0 so every mode gives the same output.
+        """
+        tokenizer = self.pipeline.tokenizer
+        gen_kwargs = self._generate_kwargs(max_new_tokens)
+        keys, pending = {}, []
+        for i, chain in enumerate(prompt_chains):
+            keys[i], response = self.llm_client.lookup(self.model_id, self.temperature, chain)
+            if response is not None:
+                yield i, response
+            else:
+                pending.append(i)
+
+        # (prefix text or None, index, token ids fed to the model)
+        jobs = []
+        for i in pending:
+            chain = prompt_chains[i]
+            text = tokenizer.apply_chat_template(chain, add_generation_prompt=True, tokenize=False)
+            ids = tokenizer(text, add_special_tokens=False).input_ids
+            prefix_text = None
+            if reuse_prefix and chain and chain[0]["role"] == "system":
+                prefix_text = tokenizer.apply_chat_template(chain[:1], tokenize=False)
+                prefix_ids = tokenizer(prefix_text, add_special_tokens=False).input_ids
+                # Tokenization at the prefix boundary can differ; only reuse an exact match
+                if len(prefix_ids) < len(ids) and ids[:len(prefix_ids)] == prefix_ids:
+                    ids = ids[len(prefix_ids):]
+                else:
+                    prefix_text = None
+            jobs.append((prefix_text, i, ids))
+
+        for prefix_text in dict.fromkeys(job[0] for job in jobs):
+            group = sorted((job for job in jobs if job[0] == prefix_text), key=lambda job: len(job[2]))
+            prefix = self._get_prefix_cache(prefix_text) if prefix_text is not None else None
+            for start in range(0, len(group), batch_size):
+                batch = group[start:start + batch_size]
+                responses = self._generate_padded([ids for _, _, ids in batch], gen_kwargs, prefix)
+                for (_, i, _), response in zip(batch, responses):
+                    self.llm_client.store(keys[i], response)
+                    yield i, response
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def query_msg_chains(self, prompt_chains: list, batch_size: int = 8, reuse_prefix: bool = False,
+                         max_new_tokens: int = MAX_NEW_TOKENS):
+        outputs = [None] * len(prompt_chains)
+        for i, output in self.query_batch(prompt_chains, batch_size, reuse_prefix, max_new_tokens):
+            outputs[i] = output
+        return outputs
+
 class GPT(LLMBase):
-    def __init__(self, model_name: str, temp: float = 0., top_p: float = 1.):
-        super().__init__(temp, top_p)
+    def __init__(self, model_name: str, temp: float = 0., top_p: float = 1., client: LLMClient = None,
+                 base_url: str = None):
+        super().__init__(temp, top_p, client)
         self.model_id = model_name
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # base_url points at any OpenAI-compatible server; retries are left to the LLMClient
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=base_url, max_retries=0)
 
     def count_tokens(self, string: str):
         encoding_name = deepcopy(self.model_id)
@@ -146,17 +274,19 @@ class GPT(LLMBase):
         )
         return response.choices[0].message.content
 
-    def query_msg_chain(self):
+    def complete(self, messages: list):
         response = self.client.chat.completions.create(
             model=self.model_id,
             temperature=self.temperature,
-            messages=self.prompt_chain
+            messages=messages
         )
         return response.choices[0].message.content
 
 class GeminiModel(LLMBase):
-    def __init__(self, model_name: str, temp: float = 0., top_p: float = 1.0):
-        super().__init__(temp, top_p)
+    def __init__(self, model_name: str, temp: float = 0., top_p: float = 1.0, client: LLMClient = None):
+        super().__init__(temp, top_p, client)
+        # 探索通信を完全に削除し、判明したモデル名を直打ちする
+        self.model_id = "models/gemini-2.5-flash"
         self.api_key = os.getenv("GOOGLE_API_KEY")
         if not self.api_key:
             raise ValueError("GOOGLE_API_KEY is not set.")
@@ -201,13 +331,11 @@ class GeminiModel(LLMBase):
         else:
             self.init_prompt_chain(content, prompt)
 
-    def query_msg_chain(self):
-        # 探索通信を完全に削除し、判明したモデル名を直打ちする
-        actual_model_name = "models/gemini-2.5-flash"
-        url = f"https://generativelanguage.googleapis.com/v1beta/{actual_model_name}:generateContent?key={self.api_key}"
+    def complete(self, messages: list):
+        url = f"https://generativelanguage.googleapis.com/v1beta/{self.model_id}:generateContent?key={self.api_key}"
 
         contents = []
-        for msg in self.prompt_chain:
+        for msg in messages:
             role = "user" if msg["role"] in ["user", "system"] else "model"
             contents.append({
                 "role": role,
@@ -229,19 +357,28 @@ class GeminiModel(LLMBase):
         
         if response.status_code == 200:
             res_json = response.json()
-            output_text = res_json['candidates'][0]['content']['parts'][0]['text']
-            self.prompt_chain.append({"role": "model", "content": output_text})
-            return output_text
+            return res_json['candidates'][0]['content']['parts'][0]['text']
         else:
             raise Exception(f"Gemini API Error: {response.status_code} - {response.text}")
+
+    def query_msg_chain(self):
+        output_text = super().query_msg_chain()
+        self.prompt_chain.append({"role": "model", "content": output_text})
+        return output_text
+
+    async def aquery_msg_chain(self):
+        output_text = await super().aquery_msg_chain()
+        self.prompt_chain.append({"role": "model", "content": output_text})
+        return output_text
             
-def load_llm(model_name: str, temp: float = 0., top_p: float = 1.):
+def load_llm(model_name: str, temp: float = 0., top_p: float = 1., client: LLMClient = None):
     m_lower = model_name.lower()
     if "llama" in m_lower:
-        return Llama3(model_name, temp, top_p)
+        return Llama3(model_name, temp, top_p, client)
     elif "gpt" in m_lower:
-        return GPT(model_name, temp, top_p)
+        return GPT(model_name, temp, top_p, client)
     elif "gemini" in m_lower:
-        return GeminiModel(model_name, temp, top_p)
+        return GeminiModel(model_name, temp, top_p, client)
     else:
-        raise Exception(f"Invalid model name: {model_name}")
\ No newline at end of file
+        raise Exception(f"Invalid model name: {model_name}")
+
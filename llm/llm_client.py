@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import tempfile
+import time
+import weakref
+
+LLM_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".llm_cache")
+
+
+class ResponseCache:
+    """Disk-backed LLM response cache, one JSON file per (model, temperature, messages) key."""
+
+    def __init__(self, cache_dir: str = LLM_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.hits, self.misses = 0, 0
+
+    @staticmethod
+    def key(model: str, temperature: float, messages: list):
+        payload = json.dumps({"model": model, "temperature": temperature, "messages": messages},
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key: str):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key), "r") as f:
+                response = json.load(f)["response"]
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return response
+
+    def put(self, key: str, response: str):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"response": response}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+class LLMClient:
+    """Request layer shared by the LLMBase backends.
+
+    Wraps a blocking ``fn(messages) -> str`` with a response cache, retries with
+    exponential backoff and, for the async path, a cap on in-flight requests.
+    Only temperature-0 responses are cached unless ``cache_all_temps`` is set,
+    so sampled runs keep their diversity.
+    """
+
+    def __init__(self, max_concurrency: int = 4, max_retries: int = 0, backoff: float = 1.,
+                 max_backoff: float = 60., cache_dir: str = None, cache_all_temps: bool = False):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self.cache_all_temps = cache_all_temps
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _cache_key(self, model: str, temperature: float, messages: list):
+        if self.cache is None or (temperature != 0 and not self.cache_all_temps):
+            return None
+        return ResponseCache.key(model, temperature, messages)
+
+    def lookup(self, model: str, temperature: float, messages: list):
+        """Cache key and cached response of a request; the key is None when the request is not cached."""
+        key = self._cache_key(model, temperature, messages)
+        return key, self.cache.get(key) if key is not None else None
+
+    def store(self, key: str, response: str):
+        if key is not None:
+            self.cache.put(key, response)
+
+    def _delay(self, attempt: int):
+        return min(self.max_backoff, self.backoff * 2 ** attempt) * (0.5 + random.random() / 2)
+
+    def _semaphore(self):
+        # asyncio primitives are bound to one event loop, so keep one per running loop
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[loop]
+
+    def call(self, fn, model: str, temperature: float, messages: list):
+        key, response = self.lookup(model, temperature, messages)
+        if response is not None:
+            return response
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = fn(messages)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._delay(attempt)
+                print(f"[LLM] Request failed ({e}), retrying in {delay:.1f}s...")
+                time.sleep(delay)
+        self.store(key, response)
+        return response
+
+    async def acall(self, fn, model: str, temperature: float, messages: list):
+        key, response = self.lookup(model, temperature, messages)
+        if response is not None:
+            return response
+        async with self._semaphore():
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await asyncio.to_thread(fn, messages)
+                    break
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        raise
+                    delay = self._delay(attempt)
+                    print(f"[LLM] Request failed ({e}), retrying in {delay:.1f}s...")
+                    await asyncio.sleep(delay)
+        self.store(key, response)
+        return response
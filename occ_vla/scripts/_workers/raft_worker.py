@@ -1,8 +1,8 @@
 """Runs in third_party/openpi/.venv (has torch+torchvision; the base/
 system Python that drives LIBERO does not -- see occ_vla/CLAUDE.md's
 "three incompatible dependency stacks" note). Loads RAFT once, then
-serves PKLP's three-frame patch-flow calls over the file-based RPC in
-rpc.py, the same pattern as pi05_worker.py / mmada_worker.py.
+serves PKLP's three-frame patch-flow calls over the socket RPC in
+rpc.py (file protocol as fallback), the same pattern as pi05_worker.py / mmada_worker.py.
 """
 
 import os
@@ -1,29 +1,209 @@
-"""Minimal file-based RPC so the demo orchestrator (running in the
+"""Minimal RPC so the demo orchestrator (running in the
 LIBERO/robosuite environment) can call pi0.5 (openpi's jax/torch==2.7.1
 venv) and MMaDA-8B (its own torch==2.5.1/transformers==4.46.0 venv)
 without merging three mutually-incompatible dependency pins into one
 Python environment — see README "Setup" for why each needs its own venv.
 
-Protocol: caller writes <id>.request.npz (+ .request.json for
+Two transports sit behind the same call()/serve() API:
+
+socket (default): the worker listens on <rpc_dir>/worker.sock. Each
+message is a length-prefixed JSON header (request id, fields, array
+specs) plus the raw bytes of small arrays; arrays of SHM_MIN_BYTES or
+more are written to a tmpfs buffer under /dev/shm and only its path is
+sent, so images never go through the socket or the disk. The receiver
+of a buffer unlinks it after copying. Responses carry the request id,
+so one connection can have several requests in flight (submit()) and
+the worker can answer them out of order when max_concurrency > 1.
+
+file (fallback): caller writes <id>.request.npz (+ .request.json for
 non-array fields), then <id>.request.ready as a marker; worker polls
 for *.request.ready, processes, writes <id>.response.npz(+.json) and
 <id>.response.ready; caller polls for that and cleans up all four
-files. Payloads are small (single images / short arrays) and MMaDA
-calls are already ~50s, so filesystem polling overhead is negligible.
+files. Adds up to 2 * POLL_INTERVAL_S per call, fine for ~50s MMaDA
+calls but not for RAFT every control step.
+
+A socket worker also keeps polling the file protocol, and call() falls
+back to files when no worker is listening on the socket, so either
+side can be switched independently. OCC_VLA_RPC_TRANSPORT=file forces
+the old behaviour on both sides.
 """
 
+import hashlib
 import json
+import os
+import socket
+import struct
+import tempfile
+import threading
 import time
+import traceback
 import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 
 import numpy as np
 
 POLL_INTERVAL_S = 0.2
+TRANSPORT = os.environ.get("OCC_VLA_RPC_TRANSPORT", "socket")
+SOCKET_NAME = "worker.sock"
+SHM_MIN_BYTES = 64 * 1024
+SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
 
+_HEADER = struct.Struct("!II")  # json header length, inline payload length
 
-def call(rpc_dir: str, arrays: dict, fields: dict, timeout_s: float = 600) -> tuple[dict, dict]:
-    """Client side: send a request, block until the response arrives."""
+
+# --- wire format -----------------------------------------------------------
+
+
+def _socket_path(rpc_dir) -> str:
+    path = str(Path(rpc_dir).resolve() / SOCKET_NAME)
+    if len(path.encode()) < 100:  # AF_UNIX paths are limited to ~108 bytes
+        return path
+    digest = hashlib.sha1(path.encode()).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), f"occ_vla_rpc_{digest}.sock")
+
+
+def _encode(arrays: dict, buffers: list) -> tuple[dict, bytes]:
+    """Array specs + inline payload; paths of tmpfs buffers written for large arrays go to `buffers`."""
+    specs, chunks, offset = {}, [], 0
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        spec = {"dtype": arr.dtype.str, "shape": list(arr.shape)}
+        if arr.nbytes >= SHM_MIN_BYTES:
+            path = os.path.join(SHM_DIR, f"occ_vla_rpc_{uuid.uuid4().hex}.bin")
+            buffers.append(path)
+            arr.tofile(path)
+            spec["shm"] = path
+        else:
+            spec["offset"] = offset
+            chunks.append(arr.tobytes())
+            offset += arr.nbytes
+        specs[name] = spec
+    return specs, b"".join(chunks)
+
+
+def _decode(specs: dict, payload: bytes) -> dict:
+    arrays = {}
+    for name, spec in specs.items():
+        dtype, shape = np.dtype(spec["dtype"]), tuple(spec["shape"])
+        if "shm" in spec:
+            arrays[name] = np.fromfile(spec["shm"], dtype=dtype).reshape(shape)
+            os.unlink(spec["shm"])
+        else:
+            count = int(np.prod(shape))
+            arrays[name] = np.frombuffer(payload, dtype, count, spec["offset"]).reshape(shape).copy()
+    return arrays
+
+
+def _discard(buffers: list) -> None:
+    for path in buffers:
+        Path(path).unlink(missing_ok=True)
+
+
+def _send(sock: socket.socket, meta: dict, payload: bytes = b"") -> None:
+    header = json.dumps(meta).encode()
+    sock.sendall(_HEADER.pack(len(header), len(payload)) + header + payload)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytearray:
+    buf = bytearray(n)
+    view, got = memoryview(buf), 0
+    while got < n:
+        k = sock.recv_into(view[got:], n - got)
+        if k == 0:
+            raise ConnectionError("RPC peer closed the connection")
+        got += k
+    return buf
+
+
+def _recv(sock: socket.socket) -> tuple[dict, bytearray]:
+    header_len, payload_len = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    meta = json.loads(_recv_exact(sock, header_len))
+    return meta, _recv_exact(sock, payload_len)
+
+
+# --- client ----------------------------------------------------------------
+
+
+class _Connection:
+    """One socket to one worker. A reader thread matches responses to
+    pending futures by request id, so requests can be pipelined."""
+
+    def __init__(self, path: str):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(path)
+        except OSError:
+            self.sock.close()
+            raise
+        self.closed = False
+        self._lock = threading.Lock()
+        self._pending: dict[str, Future] = {}
+        threading.Thread(target=self._read_loop, daemon=True).start()
+
+    def submit(self, arrays: dict, fields: dict) -> Future:
+        req_id, buffers = uuid.uuid4().hex, []
+        specs, payload = _encode(arrays, buffers)
+        future = Future()
+        # The worker unlinks buffers it has read; this only cleans up after a dropped request.
+        future.add_done_callback(lambda _: _discard(buffers))
+        with self._lock:
+            if self.closed:
+                _discard(buffers)
+                raise ConnectionError("RPC connection is closed")
+            self._pending[req_id] = future
+            try:
+                _send(self.sock, {"id": req_id, "fields": fields, "arrays": specs}, payload)
+            except OSError:
+                del self._pending[req_id]
+                _discard(buffers)
+                raise
+        return future
+
+    def _read_loop(self) -> None:
+        try:
+            while True:
+                meta, payload = _recv(self.sock)
+                with self._lock:
+                    future = self._pending.pop(meta["id"], None)
+                if "error" in meta:
+                    if future is not None:
+                        future.set_exception(RuntimeError(f"RPC handler failed: {meta['error']}"))
+                    continue
+                arrays = _decode(meta["arrays"], payload)  # always decode, so response buffers get unlinked
+                if future is not None:
+                    future.set_result((arrays, meta["fields"]))
+        except (OSError, ValueError) as e:
+            with self._lock:
+                self.closed = True
+                pending, self._pending = self._pending, {}
+            for future in pending.values():
+                future.set_exception(ConnectionError(f"RPC connection lost: {e}"))
+            self.sock.close()
+
+
+_CONNECTIONS: dict[str, _Connection] = {}
+_CONNECTIONS_LOCK = threading.Lock()
+_FILE_EXECUTOR = None
+
+
+def _connect(rpc_dir, transport: str | None) -> _Connection | None:
+    """Cached socket connection to the worker, or None to use the file protocol."""
+    if (transport or TRANSPORT) != "socket":
+        return None
+    path = _socket_path(rpc_dir)
+    with _CONNECTIONS_LOCK:
+        conn = _CONNECTIONS.get(path)
+        if conn is None or conn.closed:
+            try:
+                conn = _CONNECTIONS[path] = _Connection(path)
+            except OSError:
+                return None  # no socket worker listening (yet)
+        return conn
+
+
+def _file_call(rpc_dir: str, arrays: dict, fields: dict, timeout_s: float = 600) -> tuple[dict, dict]:
     rpc_dir = Path(rpc_dir)
     req_id = uuid.uuid4().hex
     np.savez(rpc_dir / f"{req_id}.request.npz", **arrays)
@@ -44,11 +224,105 @@ def call(rpc_dir: str, arrays: dict, fields: dict, timeout_s: float = 600) -> tu
     return resp_arrays, resp_fields
 
 
-def serve(rpc_dir: str, handler) -> None:
-    """Worker side: block forever, calling handler(arrays, fields) ->
-    (resp_arrays, resp_fields) for each request."""
-    rpc_dir = Path(rpc_dir)
-    print(f"[rpc worker] serving {rpc_dir}", flush=True)
+def call(rpc_dir: str, arrays: dict, fields: dict, timeout_s: float = 600,
+         transport: str | None = None) -> tuple[dict, dict]:
+    """Client side: send a request, block until the response arrives."""
+    conn = _connect(rpc_dir, transport)
+    if conn is None:
+        return _file_call(rpc_dir, arrays, fields, timeout_s)
+    try:
+        return conn.submit(arrays, fields).result(timeout_s)
+    except TimeoutError:
+        raise TimeoutError(f"RPC call to {rpc_dir} timed out after {timeout_s}s") from None
+
+
+def submit(rpc_dir: str, arrays: dict, fields: dict, timeout_s: float = 600,
+           transport: str | None = None) -> Future:
+    """Client side, non-blocking: returns a Future of (arrays, fields).
+    Several submits to one worker share its connection and are answered
+    as they finish; over the file fallback each runs in a thread."""
+    global _FILE_EXECUTOR
+    conn = _connect(rpc_dir, transport)
+    if conn is not None:
+        return conn.submit(arrays, fields)
+    with _CONNECTIONS_LOCK:
+        if _FILE_EXECUTOR is None:
+            _FILE_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rpc-file")
+    return _FILE_EXECUTOR.submit(_file_call, rpc_dir, arrays, fields, timeout_s)
+
+
+# --- worker ----------------------------------------------------------------
+
+
+class SocketServer:
+    """Socket side of serve(). Requests from every connection (and, via
+    handle(), from the file loop) share `max_concurrency` handler threads,
+    so a single-GPU model is never entered twice while the next request
+    is already being received."""
+
+    def __init__(self, rpc_dir: str, handler, max_concurrency: int = 1):
+        self.path = _socket_path(rpc_dir)
+        self.handler = handler
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="rpc-handler")
+        self._listener = None
+
+    def start(self) -> "SocketServer":
+        Path(self.path).unlink(missing_ok=True)  # stale socket from a previous worker
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(self.path)
+        self._listener.listen()
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def close(self) -> None:
+        if self._listener is not None:
+            self._listener.close()
+            Path(self.path).unlink(missing_ok=True)
+        self._executor.shutdown(wait=False)
+
+    def handle(self, arrays: dict, fields: dict) -> tuple[dict, dict]:
+        return self._executor.submit(self.handler, arrays, fields).result()
+
+    def _accept_loop(self) -> None:
+        while True:
+            try:
+                sock, _ = self._listener.accept()
+            except OSError:
+                return  # listener closed
+            threading.Thread(target=self._serve_connection, args=(sock,), daemon=True).start()
+
+    def _serve_connection(self, sock: socket.socket) -> None:
+        write_lock = threading.Lock()
+        try:
+            while True:
+                meta, payload = _recv(sock)
+                arrays = _decode(meta["arrays"], payload)
+                print(f"[rpc worker] handling {meta['id']}", flush=True)
+                future = self._executor.submit(self.handler, arrays, meta["fields"])
+                future.add_done_callback(partial(self._respond, sock, write_lock, meta["id"]))
+        except (OSError, ValueError, RuntimeError):
+            pass  # client went away, or executor shut down
+
+    def _respond(self, sock: socket.socket, write_lock: threading.Lock, req_id: str, future: Future) -> None:
+        buffers = []
+        try:
+            resp_arrays, resp_fields = future.result()
+            specs, payload = _encode(resp_arrays, buffers)
+            meta = {"id": req_id, "fields": resp_fields, "arrays": specs}
+        except Exception as e:
+            traceback.print_exc()
+            _discard(buffers)
+            buffers, meta, payload = [], {"id": req_id, "error": f"{type(e).__name__}: {e}"}, b""
+        try:
+            with write_lock:
+                _send(sock, meta, payload)
+        except OSError:
+            _discard(buffers)  # client is gone, nobody will unlink them
+            return
+        print(f"[rpc worker] done {req_id}", flush=True)
+
+
+def _serve_files(rpc_dir: Path, handler) -> None:
     while True:
         for ready_file in rpc_dir.glob("*.request.ready"):
             req_id = ready_file.name.removesuffix(".request.ready")
@@ -66,3 +340,16 @@ def serve(rpc_dir: str, handler) -> None:
             (rpc_dir / f"{req_id}.response.ready").touch()
             print(f"[rpc worker] done {req_id}", flush=True)
         time.sleep(POLL_INTERVAL_S)
+
+
+def serve(rpc_dir: str, handler, transport: str | None = None, max_concurrency: int = 1) -> None:
+    """Worker side: block forever, calling handler(arrays, fields) ->
+    (resp_arrays, resp_fields) for each request."""
+    rpc_dir = Path(rpc_dir)
+    rpc_dir.mkdir(parents=True, exist_ok=True)
+    if (transport or TRANSPORT) == "socket":
+        server = SocketServer(rpc_dir, handler, max_concurrency).start()
+        handler = server.handle  # file-protocol requests share the same handler threads
+        print(f"[rpc worker] serving {server.path} (+ file fallback)", flush=True)
+    print(f"[rpc worker] serving {rpc_dir}", flush=True)
+    _serve_files(rpc_dir, handler)
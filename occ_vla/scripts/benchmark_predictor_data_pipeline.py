@@ -0,0 +1,146 @@
+"""Data-side throughput of train_vjepa_predictor_multitask.py: the old
+synchronous per-step loop vs. the vjepa_predictor_data.py DataLoader.
+
+"loop" rebuilds each batch the way the training step used to, on the
+main thread: random.choice sampling, apply_irregular_edge_patch /
+apply_partial_patch_jittered / apply_partial_patch, the per-patch
+token-mask loops, and build_pixel_values_batch_multi for clean t, clean
+t-1 and corrupted t (agentview included). "loader" iterates the new
+DataLoader at each --num-workers (0 = the same work, vectorized, still
+on the main thread), with or without the clean frames (--no-clean,
+i.e. training with the clean-feature cache). No model forward -- this
+is the rate at which batches can be handed to the GPU.
+
+Run with the openvla-oft conda env (needs the checkpoint's processor):
+  python scripts/benchmark_predictor_data_pipeline.py \
+    --tasks "libero_10:8:oft_onpolicy_rollout_data" "libero_10:9:oft_onpolicy_rollout_data_mug" \
+    --mask diverse --batch-size 32 --num-batches 20 --num-workers 0 4 8
+"""
+
+import argparse
+import functools
+import os
+import random
+import sys
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPTS_DIR)
+
+import numpy as np  # noqa: E402
+import torch  # noqa: E402
+from torch.utils.data import DataLoader  # noqa: E402
+
+from train_vjepa_predictor_multitask import (  # noqa: E402
+    GRAY_FILL,
+    GRID_SIDE,
+    PARTIAL_PATCH_FRAC,
+    PATCH_PX,
+    GenerateConfig,
+    WristPixelPreprocessor,
+    apply_irregular_edge_patch,
+    apply_partial_patch,
+    apply_partial_patch_jittered,
+    build_patch_token_mask_256,
+    build_patch_token_mask_256_from_pixelmask,
+    build_pixel_values_batch_multi,
+    get_processor,
+    load_dataset,
+    normalize_proprio,
+    parse_task_spec,
+)
+from vjepa_predictor_data import MASK_DIVERSE, MASK_FIXED, MASK_JITTER, PredictorPairDataset, TaskPairBatchSampler  # noqa: E402
+
+MASK_SPECS = {
+    "fixed": {"kind": MASK_FIXED},
+    "jitter": {"kind": MASK_JITTER, "jitter_px": 20, "size_jitter_frac": 0.1},
+    "diverse": {
+        "kind": MASK_DIVERSE, "area_frac_range": (0.03, 0.20), "n_freq": 4, "radius_jitter": 0.6,
+        "edge_margin_range": (0.2, 0.9),
+    },
+}
+
+
+def legacy_batch(args, all_episodes, pairs_by_task, prompts, processor, norm_stats):
+    """One batch exactly as the pre-DataLoader training step built it (balanced sampling)."""
+    agentview_t, wrist_t, agentview_tm1, wrist_tm1, wrist_t_corrupted, proprio_t, batch_prompts, masks = ([] for _ in range(8))
+    for i in range(args.batch_size):
+        task_idx = i % len(pairs_by_task)
+        ep_idx, t = random.choice(pairs_by_task[task_idx])
+        ep = all_episodes[task_idx][ep_idx]
+        agentview_t.append(ep["agentview"][t])
+        wrist_t.append(ep["wrist"][t])
+        agentview_tm1.append(ep["agentview"][t - 1])
+        wrist_tm1.append(ep["wrist"][t - 1])
+        if args.mask == "diverse":
+            corrupted, pixel_mask = apply_irregular_edge_patch(ep["wrist"][t], random)
+            masks.append(build_patch_token_mask_256_from_pixelmask(pixel_mask))
+        elif args.mask == "jitter":
+            corrupted, bounds = apply_partial_patch_jittered(ep["wrist"][t], 20, 0.1, random)
+            masks.append(build_patch_token_mask_256(bounds))
+        else:
+            corrupted, bounds = apply_partial_patch(ep["wrist"][t])
+            masks.append(build_patch_token_mask_256(bounds))
+        wrist_t_corrupted.append(corrupted)
+        proprio_t.append(normalize_proprio(ep["proprio"][t], norm_stats))
+        batch_prompts.append(prompts[task_idx])
+    cpu, dtype = torch.device("cpu"), torch.bfloat16
+    build_pixel_values_batch_multi(agentview_t, wrist_t, batch_prompts, processor, cpu, dtype)
+    build_pixel_values_batch_multi(agentview_tm1, wrist_tm1, batch_prompts, processor, cpu, dtype)
+    build_pixel_values_batch_multi(agentview_t, wrist_t_corrupted, batch_prompts, processor, cpu, dtype)
+    np.stack(masks)
+    np.stack(proprio_t)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", nargs="+", required=True, help='"suite:task_id:data_dir" specs, as for training')
+    parser.add_argument("--checkpoint", default=os.path.expanduser("~/slocal1/Hoki/occ_vla/checkpoints/openvla-7b-oft-libero10-vjepa"))
+    parser.add_argument("--mask", choices=sorted(MASK_SPECS), default="diverse")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--num-batches", type=int, default=20)
+    parser.add_argument("--num-workers", type=int, nargs="+", default=[0, 4, 8])
+    parser.add_argument("--no-clean", action="store_true", help="Loader skips the clean t / t-1 frames (feature-cache training)")
+    args = parser.parse_args()
+
+    task_specs = [parse_task_spec(s) for s in args.tasks]
+    all_episodes, pairs_by_task = [], []
+    for _, _, data_dir in task_specs:
+        episodes, pairs = load_dataset(data_dir)
+        all_episodes.append(episodes)
+        pairs_by_task.append(pairs)
+    processor = get_processor(GenerateConfig(pretrained_checkpoint=args.checkpoint, task_suite_name=task_specs[0][0]))
+    prompts = [f"In: What action should the robot take to task {task_id}?\nOut:" for _, task_id, _ in task_specs]
+    # Benchmark only: the real stats come from the checkpoint, and normalization costs the same either way.
+    norm_stats = {"mask": np.ones(8, dtype=bool), "min": -np.ones(8), "max": np.ones(8), "q01": -np.ones(8), "q99": np.ones(8)}
+
+    n_samples = args.batch_size * args.num_batches
+    t0 = time.perf_counter()
+    for _ in range(args.num_batches):
+        legacy_batch(args, all_episodes, pairs_by_task, prompts, processor, norm_stats)
+    loop_rate = n_samples / (time.perf_counter() - t0)
+    print(f"mask={args.mask} batch_size={args.batch_size} batches={args.num_batches}")
+    print(f"{'pipeline':>24} {'samples/s':>10} {'speedup':>8}")
+    print(f"{'loop (main thread)':>24} {loop_rate:10.1f} {1.0:8.2f}")
+
+    dataset = PredictorPairDataset(
+        all_episodes, prompts, WristPixelPreprocessor(processor), functools.partial(normalize_proprio, norm_stats=norm_stats),
+        gray_fill=GRAY_FILL, patch_frac=PARTIAL_PATCH_FRAC, grid_side=GRID_SIDE, patch_px=PATCH_PX,
+        clean_pixels=not args.no_clean,
+    )
+    for num_workers in args.num_workers:
+        sampler = TaskPairBatchSampler(pairs_by_task, args.batch_size, args.num_batches, mask_spec=MASK_SPECS[args.mask])
+        loader = DataLoader(
+            dataset, batch_sampler=sampler, num_workers=num_workers, pin_memory=torch.cuda.is_available(),
+            prefetch_factor=2 if num_workers > 0 else None,
+        )
+        t0 = time.perf_counter()  # includes worker start-up, as a training run pays it once too
+        for _ in loader:
+            pass
+        rate = n_samples / (time.perf_counter() - t0)
+        name = f"loader workers={num_workers}" + (" no-clean" if args.no_clean else "")
+        print(f"{name:>24} {rate:10.1f} {rate / loop_rate:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Per-call latency of the two scripts/_workers/rpc.py transports.
+
+Starts an echo worker (no model, so only transport cost is measured) in
+a child process, then times sequential calls with a RAFT-sized payload
+(three 224x224x3 uint8 frames) and a small pi0.5-sized one (two images +
+state vector), plus pipelined throughput with --inflight requests
+outstanding via rpc.submit(). The file transport's floor is set by
+POLL_INTERVAL_S on both sides; the socket transport should take on
+the order of a millisecond, dominated by copying the frames.
+
+Run: python3 scripts/benchmark_rpc_latency.py --calls 200 --inflight 8
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "_workers"))
+
+import rpc  # noqa: E402
+
+
+def _echo(arrays, fields):
+    return arrays, fields
+
+
+def _worker(rpc_dir: str, transport: str) -> None:
+    sys.stdout = open(os.devnull, "w")  # the worker logs every request
+    rpc.serve(rpc_dir, _echo, transport=transport)
+
+
+def _payloads(rng: np.random.Generator) -> dict:
+    frame = lambda: rng.integers(0, 255, (224, 224, 3), dtype=np.uint8)  # noqa: E731
+    return {
+        "raft": {"frame_t2": frame(), "frame_t1": frame(), "frame_t0": frame()},
+        "pi05": {"base_image": frame(), "wrist_image": frame(), "state": rng.standard_normal(8).astype(np.float32)},
+    }
+
+
+def _wait_ready(rpc_dir: str, transport: str, payload: dict) -> None:
+    deadline = time.time() + 30
+    while True:
+        try:
+            rpc.call(rpc_dir, payload, {}, timeout_s=5, transport=transport)
+            return
+        except (TimeoutError, ConnectionError):
+            if time.time() > deadline:
+                raise
+
+
+def _bench(rpc_dir: str, transport: str, payload: dict, calls: int, inflight: int) -> dict:
+    latencies = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        rpc.call(rpc_dir, payload, {"prompt": "x"}, transport=transport)
+        latencies.append(time.perf_counter() - t0)
+    latencies = np.array(latencies) * 1e3
+
+    t0 = time.perf_counter()
+    pending = []
+    for _ in range(calls):
+        if len(pending) >= inflight:
+            pending.pop(0).result()
+        pending.append(rpc.submit(rpc_dir, payload, {"prompt": "x"}, transport=transport))
+    for future in pending:
+        future.result()
+    throughput = calls / (time.perf_counter() - t0)
+
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "mean_ms": float(latencies.mean()),
+        "pipelined_calls_per_s": throughput,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--file-calls", type=int, default=20, help="the file transport is ~0.2-0.4s/call")
+    parser.add_argument("--inflight", type=int, default=8)
+    parser.add_argument("--transports", nargs="+", default=["socket", "file"])
+    args = parser.parse_args()
+
+    payloads = _payloads(np.random.default_rng(0))
+    ctx = mp.get_context("spawn")
+    for transport in args.transports:
+        with tempfile.TemporaryDirectory() as rpc_dir:
+            proc = ctx.Process(target=_worker, args=(rpc_dir, transport), daemon=True)
+            proc.start()
+            try:
+                _wait_ready(rpc_dir, transport, payloads["pi05"])
+                calls = args.calls if transport == "socket" else args.file_calls
+                for name, payload in payloads.items():
+                    r = _bench(rpc_dir, transport, payload, calls, args.inflight)
+                    print(
+                        f"{transport:>6} {name:>4}: p50 {r['p50_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms  "
+                        f"mean {r['mean_ms']:8.2f} ms  pipelined {r['pipelined_calls_per_s']:8.1f} calls/s"
+                    )
+            finally:
+                proc.terminate()
+                proc.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -105,7 +105,8 @@ def main():
         obs, _, done, _ = occ_env.step(action.tolist())
         step += 1
 
-        arm_s_occ = occ_env.compute_arm_s_occ(obs)
+        occ_stats = occ_env.compute_occlusion_stats(obs)
+        arm_s_occ = occ_stats.arm
         stub = f"step{step:04d}"
         Image.fromarray(obs[AGENTVIEW_KEY]).save(OUT_DIR / f"{stub}_agentview.png")
         Image.fromarray(obs["robot0_eye_in_hand_image"]).save(OUT_DIR / f"{stub}_wrist.png")
@@ -127,7 +128,15 @@ def main():
                 "fovy_deg": float(sim.model.cam_fovy[cam_id]),
             }
 
-        manifest.append({"step": step, "arm_s_occ": arm_s_occ, "cam_poses": cam_poses})
+        manifest.append(
+            {
+                "step": step,
+                "arm_s_occ": arm_s_occ,
+                "scene_occ": occ_stats.scene,
+                "total_occ": occ_stats.total,
+                "cam_poses": cam_poses,
+            }
+        )
         if step % 10 == 0:
             print(f"step {step}: arm_s_occ={arm_s_occ:.4f}", flush=True)
 
@@ -17,9 +17,10 @@ hidden state (mean-pooled over the action-chunk dimension) -- already
 computed internally for every call, not a new forward pass. Captured via
 `get_vla_action(..., return_hidden_states=True)`.
 
-Saves one .npz per episode to --out-dir:
+Appends each episode to the episode store in --out-dir (episode_store.py;
+--npz writes one episode_XXX.npz per episode instead):
   activations: (n_calls, D) float32 -- one row per VLA-query step
-  success: bool, done_step: int, task_suite: str, task_id: int, condition: str
+  success: bool, done_step: int, n_calls: int, task_suite: str, task_id: int, condition: str
 
 Run with the openvla-oft conda env:
   python scripts/collect_failure_probe_data.py \
@@ -51,6 +52,7 @@ from experiments.robot.libero.run_libero_eval import GenerateConfig, TASK_MAX_ST
 from experiments.robot.openvla_utils import get_action_head, get_processor, get_proprio_projector, get_vla_action  # noqa: E402
 from experiments.robot.robot_utils import get_image_resize_size, get_model, set_seed_everywhere  # noqa: E402
 from experiments.robot.robot_utils import invert_gripper_action, normalize_gripper_action  # noqa: E402
+from episode_store import open_collection_store  # noqa: E402
 from run_oft_camera_dropout_eval import prepare_observation  # noqa: E402
 
 
@@ -139,9 +141,11 @@ def main():
              "vision_backbone.vjepa_predictor_dino/_siglip -- only meaningful with "
              "--condition wrist_partial_vjepa (same loading logic as run_oft_camera_dropout_eval.py)",
     )
+    parser.add_argument("--npz", action="store_true", help="write one compressed episode_XXX.npz per episode (the old layout) instead of appending to --out-dir's episode store")
     args = parser.parse_args()
 
     os.makedirs(args.out_dir, exist_ok=True)
+    store = None if args.npz else open_collection_store(args.out_dir)
 
     cfg = GenerateConfig(
         pretrained_checkpoint=args.checkpoint,
@@ -173,9 +177,13 @@ def main():
     max_steps = TASK_MAX_STEPS[TaskSuite(args.task_suite)]
     env, task_description = get_libero_env(task, cfg.model_family, resolution=cfg.env_img_res)
 
-    n_success = 0
+    n_success = n_run = 0
     end_episode = args.start_episode + args.num_episodes
+    store_task = f"{args.task_suite}:{args.task_id}"
     for ep in range(args.start_episode, end_episode):
+        if store is not None and ep in store.seeds(store_task):
+            print(f"ep{ep}: already in {args.out_dir}, skipping")
+            continue
         t0 = time.time()
         data = run_episode_and_collect(
             cfg, env, task_description, model, resize_size, processor, action_head, proprio_projector,
@@ -185,11 +193,18 @@ def main():
         data["task_id"] = args.task_id
         data["condition"] = args.condition
         n_success += int(data["success"])
-        out_path = os.path.join(args.out_dir, f"episode_{ep:03d}.npz")
-        np.savez_compressed(out_path, **data)
+        n_run += 1
+        if store is None:
+            out_path = os.path.join(args.out_dir, f"episode_{ep:03d}.npz")
+            np.savez_compressed(out_path, **data)
+        else:
+            store.append(
+                {"activations": data.pop("activations")}, task=store_task, seed=ep, **data
+            )
+            out_path = f"{args.out_dir} (store episode {len(store) - 1})"
         print(f"ep{ep}: success={data['success']} done_step={data['done_step']} n_calls={data['n_calls']} wall={time.time()-t0:.1f}s -> {out_path}")
 
-    print(f"\nDone: {n_success}/{args.num_episodes} succeeded under condition={args.condition} (episodes {args.start_episode}-{end_episode-1})")
+    print(f"\nDone: {n_success}/{n_run} succeeded under condition={args.condition} (episodes {args.start_episode}-{end_episode-1})")
 
 
 if __name__ == "__main__":
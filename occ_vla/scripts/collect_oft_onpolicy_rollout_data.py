@@ -8,12 +8,14 @@ occlusion_mask=None) OpenVLA-OFT checkpoint -- matches the deployment
 distribution exactly, per the user's own stated reasoning for choosing
 on-policy data over the RLDS demo dataset.
 
-Saves one .npz per episode to --out-dir. Each .npz holds:
+Appends each episode to the episode store in --out-dir (episode_store.py;
+--npz writes one episode_XXX.npz per episode instead). Each episode holds:
   agentview: (T, 224, 224, 3) uint8
   wrist:     (T, 224, 224, 3) uint8
   proprio:   (T, 8) float32  -- RAW (pre-normalization) state, matching
              obs["state"] in run_oft_camera_dropout_eval.py's prepare_observation
   success:   bool, done_step: int  -- for reference only, not used in training
+with task "<suite>:<task_id>" and seed = its initial_states index.
 
 Run with the openvla-oft conda env:
   /home/ubuntu/.pyenv/versions/miniforge3-latest/envs/openvla-oft/bin/python \
@@ -30,6 +32,7 @@ from collections import deque
 # path, "/home/ubuntu/slocal1/Hoki/occ_vla/thirdparty/openvla-oft" -- broke
 # on any other machine, e.g. a Kaggle clone under /root/oft_work/Hoki/...).
 SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPTS_DIR)
 OFT_ROOT = os.path.normpath(os.path.join(SCRIPTS_DIR, "..", "thirdparty", "openvla-oft"))
 sys.path.insert(0, OFT_ROOT)
 os.chdir(OFT_ROOT)
@@ -49,6 +52,7 @@ from experiments.robot.libero.run_libero_eval import GenerateConfig, TASK_MAX_ST
 from experiments.robot.openvla_utils import get_action_head, get_processor, get_proprio_projector, resize_image_for_policy  # noqa: E402
 from experiments.robot.robot_utils import get_action, get_image_resize_size, get_model, set_seed_everywhere  # noqa: E402
 from experiments.robot.robot_utils import invert_gripper_action, normalize_gripper_action  # noqa: E402
+from episode_store import open_collection_store  # noqa: E402
 
 
 def prepare_observation(obs, resize_size):
@@ -123,9 +127,11 @@ def main():
     parser.add_argument("--start-episode", type=int, default=0, help="episode index (and initial_states index) to start from -- use to append more episodes without recomputing/overwriting existing ones")
     parser.add_argument("--checkpoint", default=os.path.expanduser("~/slocal1/Hoki/occ_vla/checkpoints/openvla-7b-oft-libero10-vjepa"))
     parser.add_argument("--out-dir", default="oft_onpolicy_rollout_data")
+    parser.add_argument("--npz", action="store_true", help="write one compressed episode_XXX.npz per episode (the old layout) instead of appending to --out-dir's episode store")
     args = parser.parse_args()
 
     os.makedirs(args.out_dir, exist_ok=True)
+    store = None if args.npz else open_collection_store(args.out_dir)
 
     cfg = GenerateConfig(
         pretrained_checkpoint=args.checkpoint,
@@ -152,14 +158,25 @@ def main():
 
     total_samples = 0
     end_episode = args.start_episode + args.num_episodes
+    store_task = f"{args.task_suite}:{args.task_id}"
     for ep in range(args.start_episode, end_episode):
+        if store is not None and ep in store.seeds(store_task):
+            print(f"ep{ep}: already in {args.out_dir}, skipping")
+            continue
         t0 = time.time()
         data = run_episode_and_collect(
             cfg, env, task_description, model, resize_size, processor, action_head, proprio_projector,
             initial_states[ep], max_steps,
         )
-        out_path = os.path.join(args.out_dir, f"episode_{ep:03d}.npz")
-        np.savez_compressed(out_path, **data)
+        if store is None:
+            out_path = os.path.join(args.out_dir, f"episode_{ep:03d}.npz")
+            np.savez_compressed(out_path, **data)
+        else:
+            store.append(
+                {key: data[key] for key in ("agentview", "wrist", "proprio")},
+                task=store_task, seed=ep, success=data["success"], done_step=data["done_step"],
+            )
+            out_path = f"{args.out_dir} (store episode {len(store) - 1})"
         total_samples += len(data["proprio"])
         print(
             f"ep{ep}: success={data['success']} done_step={data['done_step']} "
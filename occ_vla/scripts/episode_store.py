@@ -0,0 +1,340 @@
+"""Append-only, memory-mapped episode store for the rollout collectors
+and the predictor / probe training scripts.
+
+The collectors used to write one np.savez_compressed file per episode
+and every loader decompressed all of them into RAM before its first
+step -- minutes and tens of GB on multi-task datasets. A store is
+instead a directory holding:
+  - episode_index.json: the per-key schema (dtype, per-frame shape) and,
+    per episode, its shard, first row, length, task, seed and scalar
+    attrs (success, done_step, ...);
+  - <key>-<shard>.bin: raw, uncompressed rows of each per-frame array,
+    episodes back to back. A new shard is started once any key's current
+    file would exceed shard_bytes, so no single file grows without bound.
+
+Appends write the rows first and then atomically replace the index, all
+under an flock, so several collectors can append to one store at once
+and a crashed append leaves nothing but ignored trailing bytes. Readers
+np.memmap the shards, so opening a store costs one JSON read and each
+frame is paged in only when a batch touches it.
+
+Kept numpy-only so the loaders and DataLoader workers stay light.
+
+Convert an existing directory of episode_*.npz files in place:
+  python scripts/episode_store.py oft_onpolicy_rollout_data failure_probe_data_moka
+"""
+
+import argparse
+import fcntl
+import glob
+import json
+import os
+import re
+from collections.abc import Mapping
+
+import numpy as np
+
+INDEX_NAME = "episode_index.json"
+LOCK_NAME = "episode_index.lock"
+STORE_VERSION = 1
+DEFAULT_SHARD_BYTES = 2 << 30
+
+_KEY_RE = re.compile(r"^\w+$")
+
+
+def is_episode_store(path):
+    return os.path.isfile(os.path.join(path, INDEX_NAME))
+
+
+def _row_bytes(spec):
+    return np.dtype(spec["dtype"]).itemsize * int(np.prod(spec["shape"]))
+
+
+def _json_scalar(value):
+    if isinstance(value, np.ndarray):
+        value = value.item()
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class EpisodeView(Mapping):
+    """One stored episode: its per-frame arrays (read-only memmap slices,
+    e.g. ep["wrist"][t]) and scalar attrs, under the same keys the
+    episode's .npz would have had."""
+
+    def __init__(self, store, idx):
+        self._store = store
+        self._idx = idx
+        self._entry = store._index["episodes"][idx]
+
+    @property
+    def name(self):
+        seed = self._entry["seed"]
+        return f"episode_{seed:03d}" if seed is not None else f"episode#{self._idx}"
+
+    @property
+    def task(self):
+        return self._entry["task"]
+
+    @property
+    def seed(self):
+        return self._entry["seed"]
+
+    def __len__(self):
+        return len(self._store.schema) + len(self._entry["attrs"])
+
+    def __iter__(self):
+        yield from self._store.schema
+        yield from self._entry["attrs"]
+
+    def __getitem__(self, key):
+        if key in self._store.schema:
+            entry = self._entry
+            shard = self._store._shard(key, entry["shard"])
+            return shard[entry["offset"] : entry["offset"] + entry["length"]]
+        return self._entry["attrs"][key]
+
+    def __repr__(self):
+        return f"EpisodeView({self.name}, length={self._entry['length']}, task={self.task!r})"
+
+
+class EpisodeStore:
+    """Directory-backed store of episodes; see the module docstring.
+
+    EpisodeStore(path) opens an existing store (create=True makes an empty
+    one if there is none). store[i] is a lazy EpisodeView; store.append()
+    adds an episode. Picklable without its data, so a list of views can go
+    to spawned DataLoader workers, which map the shards themselves.
+    """
+
+    def __init__(self, root, create=False, shard_bytes=DEFAULT_SHARD_BYTES):
+        self.root = root
+        self._shards = {}
+        if not is_episode_store(root):
+            if not create:
+                raise FileNotFoundError(f"No episode store in {root} (missing {INDEX_NAME})")
+            os.makedirs(root, exist_ok=True)
+            with self._locked():
+                if not is_episode_store(root):
+                    self._write_index({"version": STORE_VERSION, "shard_bytes": shard_bytes, "schema": {}, "episodes": []})
+        self._index = self._read_index()
+        if self._index["version"] != STORE_VERSION:
+            raise ValueError(f"{root}: episode store version {self._index['version']}, expected {STORE_VERSION}")
+
+    @property
+    def schema(self):
+        return self._index["schema"]
+
+    def __len__(self):
+        return len(self._index["episodes"])
+
+    def __getitem__(self, idx):
+        if not -len(self) <= idx < len(self):
+            raise IndexError(idx)
+        return EpisodeView(self, idx % len(self))
+
+    def __iter__(self):
+        return (EpisodeView(self, i) for i in range(len(self)))
+
+    def __getstate__(self):
+        return {"root": self.root, "_index": self._index, "_shards": {}}
+
+    def files(self):
+        """The index and every shard file, e.g. for fingerprinting the dataset."""
+        shards = {entry["shard"] for entry in self._index["episodes"]}
+        return [os.path.join(self.root, INDEX_NAME)] + [self._shard_path(key, s) for key in self.schema for s in sorted(shards)]
+
+    def seeds(self, task):
+        """Seeds of the episodes stored for `task`, read from the index on
+        disk so that appends by other collectors count too."""
+        return {e["seed"] for e in self._read_index()["episodes"] if e["task"] == task and e["seed"] is not None}
+
+    def append(self, arrays, task=None, seed=None, **attrs):
+        """Adds one episode: `arrays` maps key -> (T, ...) array, all with the
+        same T; scalar attrs are stored in the index. The first append fixes
+        the store's keys, dtypes and per-frame shapes, and a (task, seed)
+        pair is only stored once. Returns the episode's index."""
+        arrays = {key: np.ascontiguousarray(arr) for key, arr in arrays.items()}
+        lengths = {len(arr) for arr in arrays.values()}
+        if len(lengths) != 1:
+            raise ValueError(f"Per-frame arrays must share their first dimension, got {({k: len(a) for k, a in arrays.items()})}")
+        length = lengths.pop()
+        with self._locked():
+            index = self._read_index()
+            schema = index["schema"] or {
+                key: {"dtype": arr.dtype.str, "shape": list(arr.shape[1:])} for key, arr in sorted(arrays.items())
+            }
+            self._check_schema(schema, arrays)
+            seed = _json_scalar(seed)
+            if seed is not None and any(e["task"] == task and e["seed"] == seed for e in index["episodes"]):
+                raise ValueError(f"{self.root}: already holds seed {seed} of task {task!r}")
+
+            shard, offset = self._shard_end(index)
+            if offset > 0 and any((offset + length) * _row_bytes(spec) > index["shard_bytes"] for spec in schema.values()):
+                shard, offset = shard + 1, 0
+
+            for key in schema:
+                path = self._shard_path(key, shard)
+                with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                    f.seek(offset * _row_bytes(schema[key]))
+                    arrays[key].tofile(f)
+                    f.truncate()  # drops rows an interrupted append wrote but never indexed
+
+            index["schema"] = schema
+            index["episodes"].append({
+                "shard": shard,
+                "offset": offset,
+                "length": length,
+                "task": task,
+                "seed": seed,
+                "attrs": {k: _json_scalar(v) for k, v in attrs.items()},
+            })
+            self._write_index(index)
+            self._index = index
+            self._shards.clear()
+        return len(index["episodes"]) - 1
+
+    def _check_schema(self, schema, arrays):
+        if set(arrays) != set(schema):
+            raise ValueError(f"{self.root}: episode keys {sorted(arrays)} do not match the store's {sorted(schema)}")
+        for key, arr in arrays.items():
+            if not _KEY_RE.match(key):
+                raise ValueError(f"Array key {key!r} is not a valid shard file name")
+            if arr.dtype.str != schema[key]["dtype"] or list(arr.shape[1:]) != schema[key]["shape"]:
+                raise ValueError(
+                    f"{self.root}: {key} is {arr.dtype.str} {list(arr.shape[1:])} per frame, "
+                    f"store has {schema[key]['dtype']} {schema[key]['shape']}"
+                )
+
+    @staticmethod
+    def _shard_end(index):
+        """(last shard, its first free row) as recorded by the index."""
+        if not index["episodes"]:
+            return 0, 0
+        shard = index["episodes"][-1]["shard"]
+        return shard, max(e["offset"] + e["length"] for e in index["episodes"] if e["shard"] == shard)
+
+    def _shard_path(self, key, shard):
+        return os.path.join(self.root, f"{key}-{shard:04d}.bin")
+
+    def _shard(self, key, shard):
+        """Read-only memmap of one shard's indexed rows, opened on first use."""
+        if (key, shard) not in self._shards:
+            spec = self.schema[key]
+            n_rows = max((e["offset"] + e["length"] for e in self._index["episodes"] if e["shard"] == shard), default=0)
+            shape = (n_rows,) + tuple(spec["shape"])
+            if n_rows == 0:
+                self._shards[key, shard] = np.empty(shape, dtype=spec["dtype"])
+            else:
+                self._shards[key, shard] = np.memmap(self._shard_path(key, shard), dtype=spec["dtype"], mode="r", shape=shape)
+        return self._shards[key, shard]
+
+    def _locked(self):
+        return _FileLock(os.path.join(self.root, LOCK_NAME))
+
+    def _read_index(self):
+        with open(os.path.join(self.root, INDEX_NAME)) as f:
+            return json.load(f)
+
+    def _write_index(self, index):
+        path = os.path.join(self.root, INDEX_NAME)
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp, path)
+
+
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self._f = open(self.path, "a")
+        fcntl.flock(self._f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._f, fcntl.LOCK_UN)
+        self._f.close()
+
+
+class _NpzEpisode(dict):
+    """Legacy-layout episode: an episode_*.npz decompressed into a dict."""
+
+    def __init__(self, path, keys):
+        with np.load(path) as d:
+            super().__init__((key, d[key]) for key in (keys or d.files))
+        self.name = os.path.splitext(os.path.basename(path))[0]
+
+
+def npz_episode_paths(data_dir):
+    return sorted(glob.glob(os.path.join(data_dir, "episode_*.npz")))
+
+
+def load_episodes(data_dir, keys=None):
+    """Every episode of `data_dir`, in collection order: lazy EpisodeViews
+    if it holds an episode store, else its episode_*.npz files decompressed
+    into dicts (the layout collected before the store existed). `keys`
+    limits which .npz entries are decompressed; store views are lazy, so
+    every key stays available. Each episode has a `.name` such as
+    "episode_007"."""
+    if is_episode_store(data_dir):
+        return list(EpisodeStore(data_dir))
+    return [_NpzEpisode(path, keys) for path in npz_episode_paths(data_dir)]
+
+
+def dataset_files(data_dir):
+    """The files whose names, sizes and mtimes identify the dataset in
+    `data_dir` (for cache keys): the store's index and shards, else the
+    episode_*.npz files."""
+    if is_episode_store(data_dir):
+        return EpisodeStore(data_dir).files()
+    return npz_episode_paths(data_dir)
+
+
+def open_collection_store(out_dir):
+    """The store a collector appends to in `out_dir`, created if needed.
+    Refuses a directory that already holds legacy episode_*.npz files, so
+    one dataset never ends up split across both layouts."""
+    if not is_episode_store(out_dir) and npz_episode_paths(out_dir):
+        raise SystemExit(
+            f"{out_dir} already holds episode_*.npz files: convert it first "
+            f"(python scripts/episode_store.py {out_dir}) or pass --npz to keep writing .npz files"
+        )
+    return EpisodeStore(out_dir, create=True)
+
+
+def convert_npz_dir(data_dir, shard_bytes=DEFAULT_SHARD_BYTES):
+    """Appends every episode_*.npz in `data_dir` to a store in the same
+    directory (array entries as per-frame arrays, 0-d entries as attrs;
+    seed from the file's episode number, task from task_suite/task_id when
+    present). The .npz files are left in place; loaders prefer the store."""
+    if is_episode_store(data_dir):
+        raise ValueError(f"{data_dir} already holds an episode store")
+    paths = npz_episode_paths(data_dir)
+    if not paths:
+        raise FileNotFoundError(f"No episode_*.npz found in {data_dir}")
+    store = EpisodeStore(data_dir, create=True, shard_bytes=shard_bytes)
+    for path in paths:
+        with np.load(path) as d:
+            entries = {key: d[key] for key in d.files}
+        arrays = {key: v for key, v in entries.items() if v.ndim > 0}
+        attrs = {key: v for key, v in entries.items() if v.ndim == 0}
+        task = f"{attrs['task_suite']}:{attrs['task_id']}" if "task_suite" in attrs and "task_id" in attrs else None
+        seed = int(re.search(r"episode_(\d+)", os.path.basename(path)).group(1))
+        store.append(arrays, task=task, seed=seed, **attrs)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert directories of episode_*.npz files into episode stores, in place.")
+    parser.add_argument("data_dirs", nargs="+")
+    parser.add_argument("--shard-gb", type=float, default=DEFAULT_SHARD_BYTES / (1 << 30))
+    args = parser.parse_args()
+    for data_dir in args.data_dirs:
+        store = convert_npz_dir(data_dir, shard_bytes=int(args.shard_gb * (1 << 30)))
+        n_frames = sum(e["length"] for e in store._index["episodes"])
+        print(f"{data_dir}: {len(store)} episodes, {n_frames} frames, keys {sorted(store.schema)}")
+
+
+if __name__ == "__main__":
+    main()
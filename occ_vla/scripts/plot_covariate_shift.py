@@ -32,7 +32,6 @@ already present):
 """
 
 import argparse
-import glob
 import os
 
 import matplotlib
@@ -42,19 +41,19 @@ import matplotlib.pyplot as plt  # noqa: E402
 import numpy as np  # noqa: E402
 from sklearn.decomposition import PCA  # noqa: E402
 
+from episode_store import load_episodes  # noqa: E402
+
 SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
 OCC_VLA_ROOT = os.path.dirname(SCRIPTS_DIR)
 OFT_ROOT = os.path.join(OCC_VLA_ROOT, "thirdparty/openvla-oft")
 
 
 def load_activations(data_dir):
-    """One row per VLA call, pooled across all episode .npz files in data_dir."""
-    rows = []
-    for path in sorted(glob.glob(os.path.join(OFT_ROOT, data_dir, "episode_*.npz"))):
-        d = np.load(path)
-        rows.append(d["activations"].astype(np.float64))
+    """One row per VLA call, pooled across all episodes in data_dir (its
+    episode store, or its episode_*.npz files)."""
+    rows = [d["activations"].astype(np.float64) for d in load_episodes(os.path.join(OFT_ROOT, data_dir), keys=("activations",))]
     if not rows:
-        raise FileNotFoundError(f"No episode_*.npz found in {os.path.join(OFT_ROOT, data_dir)}")
+        raise FileNotFoundError(f"No episodes found in {os.path.join(OFT_ROOT, data_dir)}")
     return np.concatenate(rows, axis=0)
 
 
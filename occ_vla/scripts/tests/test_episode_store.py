@@ -0,0 +1,136 @@
+import os
+import pickle
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+from episode_store import (
+    EpisodeStore,
+    convert_npz_dir,
+    dataset_files,
+    is_episode_store,
+    load_episodes,
+    open_collection_store,
+)
+
+
+def _episode(rng, n):
+    return {
+        "wrist": rng.integers(0, 255, (n, 8, 8, 3), dtype=np.uint8),
+        "proprio": rng.standard_normal((n, 8)).astype(np.float32),
+    }
+
+
+def test_appended_episodes_read_back_lazily_after_reopen(tmp_path):
+    rng = np.random.default_rng(0)
+    episodes = [_episode(rng, n) for n in (5, 3, 7)]
+    store = EpisodeStore(str(tmp_path), create=True)
+    for seed, ep in enumerate(episodes):
+        store.append(ep, task="libero_10:8", seed=seed, success=np.bool_(seed % 2), done_step=np.int64(10 * seed))
+
+    reopened = load_episodes(str(tmp_path))
+    assert len(reopened) == 3
+    for seed, (view, ep) in enumerate(zip(reopened, episodes)):
+        assert isinstance(view["wrist"], np.memmap) and not view["wrist"].flags.writeable
+        assert (view["wrist"] == ep["wrist"]).all() and (view["proprio"] == ep["proprio"]).all()
+        assert (view["wrist"][2] == ep["wrist"][2]).all()
+        assert view["success"] is bool(seed % 2) and view["done_step"] == 10 * seed
+        assert view.name == f"episode_{seed:03d}" and view.task == "libero_10:8"
+        assert set(view) == {"wrist", "proprio", "success", "done_step"}
+
+
+def test_shards_roll_over_and_interrupted_appends_are_ignored(tmp_path):
+    rng = np.random.default_rng(0)
+    episodes = [_episode(rng, 4) for _ in range(5)]
+    # the limit applies to each key's file: 12 wrist rows fit, proprio rows are 6x smaller
+    store = EpisodeStore(str(tmp_path), create=True, shard_bytes=12 * 8 * 8 * 3)
+    for ep in episodes[:2]:
+        store.append(ep)
+    # bytes of an append that crashed before it could write the index
+    with open(os.path.join(str(tmp_path), "wrist-0000.bin"), "ab") as f:
+        f.write(b"\xff" * 1000)
+    for ep in episodes[2:]:
+        store.append(ep)
+
+    assert [e["shard"] for e in store._index["episodes"]] == [0, 0, 0, 1, 1]
+    assert os.path.getsize(os.path.join(str(tmp_path), "wrist-0000.bin")) == 12 * 8 * 8 * 3
+    assert os.path.getsize(os.path.join(str(tmp_path), "proprio-0000.bin")) == 12 * 8 * 4
+    reopened = EpisodeStore(str(tmp_path))
+    for view, ep in zip(reopened, episodes):
+        assert (view["wrist"] == ep["wrist"]).all() and (view["proprio"] == ep["proprio"]).all()
+    assert len(dataset_files(str(tmp_path))) == 1 + 2 * 2
+
+
+def test_schema_is_fixed_by_the_first_append(tmp_path):
+    rng = np.random.default_rng(0)
+    store = EpisodeStore(str(tmp_path), create=True)
+    store.append(_episode(rng, 3))
+
+    with pytest.raises(ValueError):
+        store.append({"wrist": np.zeros((3, 8, 8, 3), np.uint8)})
+    with pytest.raises(ValueError):
+        store.append({"wrist": np.zeros((3, 8, 8, 3), np.float32), "proprio": np.zeros((3, 8), np.float32)})
+    with pytest.raises(ValueError):
+        store.append({"wrist": np.zeros((3, 8, 8, 3), np.uint8), "proprio": np.zeros((2, 8), np.float32)})
+    assert len(EpisodeStore(str(tmp_path))) == 1
+
+
+def test_a_task_seed_pair_is_stored_once(tmp_path):
+    rng = np.random.default_rng(0)
+    store = EpisodeStore(str(tmp_path), create=True)
+    store.append(_episode(rng, 3), task="libero_10:8", seed=np.int64(0))
+    store.append(_episode(rng, 3), task="libero_10:8", seed=1)
+    store.append(_episode(rng, 3), task="libero_10:9", seed=0)
+    store.append(_episode(rng, 3))
+    store.append(_episode(rng, 3))
+
+    with pytest.raises(ValueError, match="seed 1"):
+        store.append(_episode(rng, 3), task="libero_10:8", seed=1)
+    # a second collector appending to the same directory sees the first one's seeds
+    other = EpisodeStore(str(tmp_path))
+    with pytest.raises(ValueError):
+        other.append(_episode(rng, 3), task="libero_10:8", seed=0)
+    store.append(_episode(rng, 3), task="libero_10:8", seed=2)
+    assert other.seeds("libero_10:8") == {0, 1, 2} and other.seeds("libero_10:9") == {0}
+    assert len(EpisodeStore(str(tmp_path))) == 6
+
+
+def test_views_pickle_without_their_data(tmp_path):
+    rng = np.random.default_rng(0)
+    ep = _episode(rng, 50)
+    store = EpisodeStore(str(tmp_path), create=True)
+    store.append(ep)
+    view = store[0]
+    view["wrist"]  # maps the shard
+
+    blob = pickle.dumps([view, view])
+    assert len(blob) < ep["wrist"].nbytes
+    a, b = pickle.loads(blob)
+    assert a._store is b._store
+    assert (a["wrist"] == ep["wrist"]).all()
+
+
+def test_npz_dirs_load_as_before_and_convert_in_place(tmp_path):
+    rng = np.random.default_rng(0)
+    data_dir = str(tmp_path)
+    episodes = [_episode(rng, n) for n in (4, 6)]
+    for ep_idx, ep in zip((3, 7), episodes):
+        np.savez_compressed(
+            os.path.join(data_dir, f"episode_{ep_idx:03d}.npz"), **ep, success=True, task_suite="libero_10", task_id=8
+        )
+
+    legacy = load_episodes(data_dir, keys=("wrist", "proprio"))
+    assert [ep.name for ep in legacy] == ["episode_003", "episode_007"] and set(legacy[0]) == {"wrist", "proprio"}
+    with pytest.raises(SystemExit):
+        open_collection_store(data_dir)
+
+    convert_npz_dir(data_dir)
+    assert is_episode_store(data_dir)
+    for view, old, ep in zip(load_episodes(data_dir), legacy, episodes):
+        assert view.name == old.name and view.task == "libero_10:8"
+        assert view["success"] is True and view["task_id"] == 8
+        assert (view["wrist"] == ep["wrist"]).all() and (view["proprio"] == ep["proprio"]).all()
+    assert len(open_collection_store(data_dir)) == 2
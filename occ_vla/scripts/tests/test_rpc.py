@@ -0,0 +1,125 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "_workers"))
+
+import numpy as np
+import pytest
+
+import rpc
+
+
+def _echo(arrays, fields):
+    """Handler used by every test: doubles each array and echoes fields
+    back with a marker, so a wrong-request/response pairing is visible."""
+    time.sleep(fields.get("sleep_s", 0.0))
+    return {name: arr * 2 for name, arr in arrays.items()}, {**fields, "handled": True}
+
+
+@pytest.fixture
+def socket_server(tmp_path):
+    server = rpc.SocketServer(tmp_path, _echo).start()
+    yield tmp_path, server
+    server.close()
+
+
+def _shm_buffers():
+    return {name for name in os.listdir(rpc.SHM_DIR) if name.startswith("occ_vla_rpc_")}
+
+
+def test_socket_roundtrip_small_and_large_arrays(socket_server):
+    rpc_dir, _ = socket_server
+    before = _shm_buffers()
+    image = np.random.default_rng(0).integers(0, 100, (224, 224, 3), dtype=np.uint8)
+    state = np.arange(8, dtype=np.float32)
+    assert image.nbytes >= rpc.SHM_MIN_BYTES > state.nbytes
+
+    resp_arrays, resp_fields = rpc.call(str(rpc_dir), {"image": image, "state": state}, {"prompt": "pick"})
+
+    np.testing.assert_array_equal(resp_arrays["image"], image * 2)
+    np.testing.assert_array_equal(resp_arrays["state"], state * 2)
+    assert resp_arrays["image"].dtype == np.uint8 and resp_arrays["state"].dtype == np.float32
+    assert resp_fields == {"prompt": "pick", "handled": True}
+    # Every tmpfs buffer is unlinked by whichever side read it.
+    assert _shm_buffers() == before
+    # Nothing went through the file protocol.
+    assert list(rpc_dir.glob("*.npz")) == []
+
+
+def test_pipelined_submits_are_matched_by_request_id(tmp_path):
+    server = rpc.SocketServer(tmp_path, _echo, max_concurrency=4).start()
+    try:
+        # Later requests finish first, so responses come back out of order.
+        futures = [
+            rpc.submit(str(tmp_path), {"x": np.full(3, i)}, {"i": i, "sleep_s": 0.05 * (4 - i)})
+            for i in range(4)
+        ]
+        for i, future in enumerate(futures):
+            arrays, fields = future.result(timeout=5)
+            assert fields["i"] == i
+            np.testing.assert_array_equal(arrays["x"], np.full(3, 2 * i))
+    finally:
+        server.close()
+
+
+def test_concurrent_callers_share_one_worker(socket_server):
+    rpc_dir, _ = socket_server
+    results = {}
+
+    def worker(i):
+        results[i] = rpc.call(str(rpc_dir), {"x": np.array([i])}, {"i": i})
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+    assert sorted(results) == list(range(8))
+    for i, (arrays, fields) in results.items():
+        assert fields["i"] == i and arrays["x"][0] == 2 * i
+
+
+def test_handler_error_is_raised_on_the_caller(tmp_path):
+    def broken(arrays, fields):
+        raise ValueError("bad frame")
+
+    server = rpc.SocketServer(tmp_path, broken).start()
+    try:
+        with pytest.raises(RuntimeError, match="bad frame"):
+            rpc.call(str(tmp_path), {"x": np.zeros(2)}, {})
+        # The connection stays usable after a failed request.
+        with pytest.raises(RuntimeError, match="bad frame"):
+            rpc.call(str(tmp_path), {"x": np.zeros(2)}, {})
+    finally:
+        server.close()
+
+
+def test_call_falls_back_to_files_without_a_socket_worker(tmp_path):
+    worker = threading.Thread(target=rpc._serve_files, args=(tmp_path, _echo), daemon=True)
+    worker.start()
+
+    resp_arrays, resp_fields = rpc.call(str(tmp_path), {"x": np.ones(4)}, {"a": 1}, timeout_s=5)
+
+    np.testing.assert_array_equal(resp_arrays["x"], np.full(4, 2.0))
+    assert resp_fields == {"a": 1, "handled": True}
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_socket_worker_still_answers_file_clients(socket_server):
+    rpc_dir, server = socket_server
+    worker = threading.Thread(target=rpc._serve_files, args=(rpc_dir, server.handle), daemon=True)
+    worker.start()
+
+    resp_arrays, _ = rpc.call(str(rpc_dir), {"x": np.ones(2)}, {}, timeout_s=5, transport="file")
+
+    np.testing.assert_array_equal(resp_arrays["x"], np.full(2, 2.0))
+
+
+def test_long_rpc_dir_uses_short_socket_path(tmp_path):
+    deep = tmp_path / ("d" * 60) / ("e" * 60)
+    deep.mkdir(parents=True)
+    path = rpc._socket_path(deep)
+    assert len(path.encode()) < 100
+    assert path == rpc._socket_path(str(deep))
@@ -0,0 +1,141 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+
+from vjepa_predictor_data import (
+    MASK_DIVERSE,
+    MASK_FIXED,
+    MASK_JITTER,
+    PredictorPairDataset,
+    TaskPairBatchSampler,
+    irregular_edge_mask,
+    partial_patch_bounds,
+    rect_pixel_mask,
+    token_mask_from_pixel_mask,
+)
+
+GRID_SIDE, PATCH_PX = 16, 14
+DIVERSE_SPEC = {
+    "kind": MASK_DIVERSE, "area_frac_range": (0.03, 0.20), "n_freq": 4, "radius_jitter": 0.6,
+    "edge_margin_range": (0.2, 0.9),
+}
+
+
+def _loop_token_mask(pixel_mask):
+    """build_patch_token_mask_256_from_pixelmask, verbatim."""
+    mask_grid = np.zeros((GRID_SIDE, GRID_SIDE), dtype=bool)
+    for i in range(GRID_SIDE):
+        for j in range(GRID_SIDE):
+            if pixel_mask[int(i * PATCH_PX + PATCH_PX / 2), int(j * PATCH_PX + PATCH_PX / 2)]:
+                mask_grid[i, j] = True
+    return mask_grid.reshape(-1)
+
+
+def _episodes(rng, lengths, size=224):
+    return [
+        {
+            "wrist": rng.integers(0, 255, (n, size, size, 3), dtype=np.uint8),
+            "proprio": rng.standard_normal((n, 8)).astype(np.float32),
+        }
+        for n in lengths
+    ]
+
+
+def _dataset(episodes_by_task, clean_pixels=True):
+    return PredictorPairDataset(
+        episodes_by_task,
+        prompts=["task a", "task b"],
+        preprocess=lambda img, prompt: torch.from_numpy(img).permute(2, 0, 1).float() / 255.0,
+        proprio_transform=lambda p: p * 2.0,
+        gray_fill=127,
+        patch_frac=0.59,
+        grid_side=GRID_SIDE,
+        patch_px=PATCH_PX,
+        clean_pixels=clean_pixels,
+    )
+
+
+def test_token_mask_matches_per_patch_loop():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        pixel_mask = irregular_edge_mask(224, 224, rng, (0.03, 0.20), 4, 0.6, (0.2, 0.9))
+        assert (token_mask_from_pixel_mask(pixel_mask, GRID_SIDE, PATCH_PX) == _loop_token_mask(pixel_mask)).all()
+
+    fixed = rect_pixel_mask(224, 224, partial_patch_bounds(224, 224, 0.59))
+    batched = token_mask_from_pixel_mask(np.stack([fixed, ~fixed]), GRID_SIDE, PATCH_PX)
+    assert batched.shape == (2, 256)
+    assert (batched[0] == _loop_token_mask(fixed)).all() and (batched[1] == ~batched[0]).all()
+
+
+def test_irregular_edge_mask_is_seeded_and_sized():
+    masks = [irregular_edge_mask(224, 224, np.random.default_rng(s), (0.05, 0.10), 2, 0.2, (0.6, 1.4)) for s in range(50)]
+    again = irregular_edge_mask(224, 224, np.random.default_rng(3), (0.05, 0.10), 2, 0.2, (0.6, 1.4))
+
+    assert (again == masks[3]).all()
+    area = np.array([m.mean() for m in masks])
+    assert (area > 0).all() and (area < 0.25).all()
+
+
+def test_balanced_sampler_splits_tasks_evenly_and_picks_up_new_mask_spec():
+    pairs_by_task = [[(0, t) for t in range(1, 50)], [(0, 1), (1, 1)]]
+    sampler = TaskPairBatchSampler(pairs_by_task, batch_size=8, num_batches=3, sampling="balanced", seed=0)
+
+    batches = []
+    for i, batch in enumerate(sampler):
+        batches.append(batch)
+        if i == 0:
+            sampler.mask_spec = {"kind": MASK_JITTER, "jitter_px": 5, "size_jitter_frac": 0.1}
+
+    assert len(batches) == len(sampler) == 3
+    for batch in batches:
+        assert [item[0] for item in batch] == [0, 1] * 4
+        assert all((e, t) in pairs_by_task[k] for k, e, t, _, _ in batch)
+    assert batches[0][0][4]["kind"] == MASK_FIXED
+    assert batches[1][0][4]["kind"] == MASK_JITTER
+
+
+def test_pooled_sampler_draws_in_proportion_to_pair_count():
+    pairs_by_task = [[(0, t) for t in range(1, 91)], [(0, t) for t in range(1, 11)]]
+    sampler = TaskPairBatchSampler(pairs_by_task, batch_size=100, num_batches=20, sampling="pooled", seed=0)
+
+    task_ids = np.array([item[0] for batch in sampler for item in batch])
+    assert 0.85 < (task_ids == 0).mean() < 0.95
+
+
+def test_dataset_corrupts_masked_pixels_only():
+    rng = np.random.default_rng(0)
+    episodes_by_task = [_episodes(rng, [4]), _episodes(rng, [3])]
+    dataset = _dataset(episodes_by_task)
+
+    sample = dataset[(1, 0, 2, 7, DIVERSE_SPEC)]
+    pixel_mask = dataset.corruption_mask(224, 224, DIVERSE_SPEC, np.random.default_rng(7))
+    corrupted = (sample["wrist_t_corrupted"] * 255.0).round().permute(1, 2, 0).numpy().astype(np.uint8)
+
+    assert (corrupted[pixel_mask] == 127).all()
+    assert (corrupted[~pixel_mask] == episodes_by_task[1][0]["wrist"][2][~pixel_mask]).all()
+    assert (sample["token_mask"].numpy() == _loop_token_mask(pixel_mask)).all()
+    assert torch.allclose(sample["proprio"], torch.from_numpy(episodes_by_task[1][0]["proprio"][2] * 2.0))
+    assert sample["frac_through_episode"] == 1.0
+    assert torch.equal(sample["wrist_tm1"], dataset.preprocess(episodes_by_task[1][0]["wrist"][1], "task b"))
+
+
+def test_worker_batches_match_single_process_batches():
+    rng = np.random.default_rng(0)
+    episodes_by_task = [_episodes(rng, [5, 4]), _episodes(rng, [6])]
+    pairs_by_task = [[(e, t) for e, ep in enumerate(eps) for t in range(1, len(ep["proprio"]))] for eps in episodes_by_task]
+    dataset = _dataset(episodes_by_task, clean_pixels=False)
+
+    def batches(num_workers):
+        sampler = TaskPairBatchSampler(pairs_by_task, batch_size=4, num_batches=5, seed=1, mask_spec=DIVERSE_SPEC)
+        return list(DataLoader(dataset, batch_sampler=sampler, num_workers=num_workers))
+
+    serial, parallel = batches(0), batches(2)
+    assert "wrist_t" not in serial[0]
+    for a, b in zip(serial, parallel):
+        assert a.keys() == b.keys()
+        assert all(torch.equal(a[key], b[key]) for key in a)
@@ -42,7 +42,6 @@ Run with the openvla-oft conda env:
 """
 
 import argparse
-import glob
 import json
 import os
 
@@ -51,6 +50,8 @@ from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import average_precision_score, roc_auc_score
 from sklearn.preprocessing import StandardScaler
 
+import episode_store
+
 SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
 OCC_VLA_ROOT = os.path.dirname(SCRIPTS_DIR)
 OFT_ROOT = os.path.join(OCC_VLA_ROOT, "thirdparty/openvla-oft")
@@ -70,22 +71,22 @@ def resolve_dir(d):
 
 
 def load_episodes(data_dir, label, max_calls=None):
-    """One entry per episode.npz: (activations (n_calls, D), label, episode_id, task_id, success).
+    """One entry per episode (of data_dir's episode store, or its episode_*.npz
+    files): (activations (n_calls, D), label, episode_id, task_id, success).
 
     max_calls: if set, truncate to the first N VLA-call rows only -- an
     "early warning" test (does the signal exist before a doomed episode
     has had time to just run long/hit timeout, which is a trivial giveaway
     a failed episode is 65/65 calls while a successful one stops early)."""
     episodes = []
-    for path in sorted(glob.glob(os.path.join(data_dir, "episode_*.npz"))):
-        d = np.load(path)
+    for d in episode_store.load_episodes(data_dir):
         acts = d["activations"].astype(np.float64)
         if max_calls is not None:
             acts = acts[:max_calls]
         episodes.append({
             "activations": acts,
             "label": label,
-            "path": path,
+            "path": os.path.join(data_dir, d.name),
             "task_id": int(d["task_id"]),
             "success": bool(d["success"]),
         })
@@ -30,6 +30,10 @@ apply_partial_patch, etc. are identical, just imported):
      different task instructions (needed for correct multimodal
      conditioning even though pixel_values itself is expected to be
      prompt-independent -- kept correct rather than relying on that).
+  4. The clean-feature cache (--feature-cache-dir, see
+     train_vjepa_predictor_scaled.py) is built per task, since each task
+     has its own data_dir; a mixed batch reads each sample from its own
+     task's cache.
 
 Run with the openvla-oft conda env:
   /home/ubuntu/.pyenv/versions/miniforge3-latest/envs/openvla-oft/bin/python \
@@ -39,7 +43,7 @@ Run with the openvla-oft conda env:
 """
 
 import argparse
-import glob
+import functools
 import json
 import os
 import random
@@ -60,6 +64,7 @@ os.environ.setdefault("LIBERO_CONFIG_PATH", os.path.expanduser("~/.libero_oft"))
 import numpy as np  # noqa: E402
 import torch  # noqa: E402
 from libero.libero import benchmark  # noqa: E402
+from torch.utils.data import DataLoader  # noqa: E402
 
 from experiments.robot.libero.libero_utils import get_libero_env  # noqa: E402
 from experiments.robot.libero.run_libero_eval import GenerateConfig, TASK_MAX_STEPS, TaskSuite, check_unnorm_key  # noqa: E402
@@ -72,11 +77,26 @@ from experiments.robot.openvla_utils import (  # noqa: E402
 )
 from experiments.robot.robot_utils import get_image_resize_size, get_model  # noqa: E402
 
+from episode_store import load_episodes  # noqa: E402
 from run_oft_camera_dropout_eval import run_episode as eval_run_episode  # noqa: E402
 from train_vjepa_predictor_scaled import (  # noqa: E402
+    GRAY_FILL,
+    GRID_SIDE,
+    PARTIAL_PATCH_FRAC,
+    PATCH_PX,
     apply_partial_patch,
     build_patch_token_mask_256,
+    build_wrist_pixel_values_batch,
+    load_or_build_wrist_feature_cache,
     run_vit_to_layer,
+    run_wrist_features,
+)
+from vjepa_predictor_data import (  # noqa: E402
+    MASK_DIVERSE,
+    MASK_FIXED,
+    MASK_JITTER,
+    PredictorPairDataset,
+    TaskPairBatchSampler,
 )
 
 _CfgStub = type("_CfgStub", (), {"center_crop": True})
@@ -97,11 +117,64 @@ def build_pixel_values_batch_multi(agentview_imgs, wrist_imgs, prompts, processo
     return torch.cat([primary_batch, wrist_batch], dim=1)
 
 
+class WristPixelPreprocessor:
+    """Per-sample wrist preprocessing for PredictorPairDataset, same as one
+    sample of build_wrist_pixel_values_batch: (6, 224, 224) pixel values.
+    A class rather than a closure so DataLoader workers can pickle it."""
+
+    def __init__(self, processor):
+        self.processor = processor
+
+    def __call__(self, img, prompt):
+        (wrist,) = prepare_images_for_vla([img], _CfgStub())
+        return self.processor(prompt, wrist)["pixel_values"][0]
+
+
+def mask_spec_from_args(args, curriculum_level):
+    """Training-time corruption geometry for TaskPairBatchSampler:
+    --mask-diverse (ADR-scheduled if --adr-curriculum) takes precedence
+    over --mask-jitter, else apply_partial_patch's fixed square."""
+    if args.mask_diverse:
+        if args.adr_curriculum:
+            p = adr_curriculum_params(curriculum_level, args)
+            return {
+                "kind": MASK_DIVERSE,
+                "area_frac_range": (p["area_min"], p["area_max"]),
+                "n_freq": max(1, round(p["n_freq"])),
+                "radius_jitter": p["radius_jitter"],
+                "edge_margin_range": (p["edge_margin_min"], p["edge_margin_max"]),
+            }
+        return {
+            "kind": MASK_DIVERSE,
+            "area_frac_range": (args.mask_diverse_area_min, args.mask_diverse_area_max),
+            "n_freq": args.mask_diverse_n_freq,
+            "radius_jitter": args.mask_diverse_radius_jitter,
+            "edge_margin_range": (args.mask_diverse_edge_margin_min, args.mask_diverse_edge_margin_max),
+        }
+    if args.mask_jitter:
+        return {"kind": MASK_JITTER, "jitter_px": args.mask_jitter_px, "size_jitter_frac": args.mask_jitter_size_frac}
+    return {"kind": MASK_FIXED}
+
+
+def read_cached_features(feature_caches, batch_samples, dt, device):
+    """Clean (dino, siglip) features of frame t+dt for every (task_idx,
+    ep_idx, t) sample, each read from its own task's cache, in batch
+    order."""
+    task_idx, ep_idx, t = (np.asarray(col) for col in zip(*batch_samples))
+    dino, siglip = [None] * len(batch_samples), [None] * len(batch_samples)
+    for k in np.unique(task_idx):
+        (rows,) = np.nonzero(task_idx == k)
+        f_dino, f_siglip = feature_caches[k].read(ep_idx[rows], t[rows] + dt, device)
+        for i, row in enumerate(rows):
+            dino[row], siglip[row] = f_dino[i], f_siglip[i]
+    return torch.stack(dino), torch.stack(siglip)
+
+
 def load_dataset(data_dir):
-    episodes = []
-    for path in sorted(glob.glob(os.path.join(data_dir, "episode_*.npz"))):
-        d = np.load(path)
-        episodes.append({"agentview": d["agentview"], "wrist": d["wrist"], "proprio": d["proprio"]})
+    """Episodes are lazy memory-mapped views when data_dir holds an episode
+    store (episode_store.py), so startup and RAM no longer scale with the
+    dataset; legacy episode_*.npz dirs still load eagerly."""
+    episodes = load_episodes(data_dir, keys=("agentview", "wrist", "proprio"))
     pairs = [(ep_idx, t) for ep_idx, ep in enumerate(episodes) for t in range(1, len(ep["proprio"]))]
     return episodes, pairs
 
@@ -498,6 +571,22 @@ def main():
     )
     parser.add_argument("--adr-threshold", type=float, default=0.3, help="Mean eval success rate (across all tasks) needed to widen the curriculum.")
     parser.add_argument("--adr-step", type=float, default=0.15, help="Curriculum level (0..1) change per eval checkpoint.")
+    parser.add_argument(
+        "--feature-cache-dir", default="vjepa_feature_cache",
+        help="Root of the clean wrist feature caches (one per task's data_dir, keyed by dataset, split layers "
+             "and checkpoint underneath). Built on first use, reused by every later run with the same key.",
+    )
+    parser.add_argument(
+        "--num-workers", type=int, default=4,
+        help="DataLoader worker processes sampling, masking and preprocessing batches ahead of the GPU "
+             "(0 = do it on the main thread).",
+    )
+    parser.add_argument("--prefetch-factor", type=int, default=2, help="Batches prefetched per DataLoader worker.")
+    parser.add_argument(
+        "--no-feature-cache", action="store_true",
+        help="Run the clean t / t-1 wrist frames through the featurizers every step instead (the original "
+             "behavior -- ~3x the per-step ViT work).",
+    )
     args = parser.parse_args()
 
     random.seed(args.seed)
@@ -578,6 +667,17 @@ def main():
     check_unnorm_key(_tmp_cfg, model)
     proprio_norm_stats = model.norm_stats[_tmp_cfg.unnorm_key]["proprio"]
 
+    feature_caches = None
+    if not args.no_feature_cache:
+        model.eval()
+        feature_caches = [
+            load_or_build_wrist_feature_cache(
+                args.feature_cache_dir, data_dir, args.checkpoint, all_episodes[task_idx], processor,
+                task_contexts[task_idx]["prompt"], vb, split_layer_dino, split_layer_siglip, device, dtype,
+            )
+            for task_idx, (_, _, data_dir) in enumerate(task_specs)
+        ]
+
     print("\n=== Eval before training (step 0) ===")
     _pretrain_results = eval_all_tasks(task_contexts, model, resize_size, processor, action_head, proprio_projector, args.eval_episodes)
 
@@ -585,107 +685,76 @@ def main():
     if args.adr_curriculum:
         curriculum_level = adr_update_level(_pretrain_results, curriculum_level, args)
 
-    task_order = list(range(len(task_specs)))
+    # Sampling, mask generation, token pooling and image preprocessing
+    # all run in DataLoader workers (vjepa_predictor_data.py); the step
+    # loop below only moves pinned batches to the GPU. Sample seeds come
+    # from the sampler, so batches don't depend on --num-workers.
+    sampler = TaskPairBatchSampler(
+        pairs_by_task, args.batch_size, args.num_steps, sampling=args.sampling, seed=args.seed,
+        mask_spec=mask_spec_from_args(args, curriculum_level),
+    )
+    dataset = PredictorPairDataset(
+        all_episodes,
+        [tc["prompt"] for tc in task_contexts],
+        WristPixelPreprocessor(processor),
+        functools.partial(normalize_proprio, norm_stats=proprio_norm_stats),
+        gray_fill=GRAY_FILL, patch_frac=PARTIAL_PATCH_FRAC, grid_side=GRID_SIDE, patch_px=PATCH_PX,
+        clean_pixels=feature_caches is None,
+    )
+    loader = DataLoader(
+        dataset, batch_sampler=sampler, num_workers=args.num_workers, pin_memory=device.type == "cuda",
+        persistent_workers=args.num_workers > 0, prefetch_factor=args.prefetch_factor if args.num_workers > 0 else None,
+    )
+    temporal_weight_rows = None
+    if temporal_weight_table is not None:
+        temporal_weight_rows = np.stack([temporal_weight_table[tn] for tn in task_names])  # (num_tasks, n_bins)
 
     losses, grad_norms = [], []
     saw_nan = False
     train_t0 = time.time()
 
-    for step in range(1, args.num_steps + 1):
+    for step, batch in enumerate(loader, start=1):
         model.train()
         vb.vjepa_predictor_dino.train()
         vb.vjepa_predictor_siglip.train()
 
-        if args.sampling == "balanced":
-            # Round-robin task assignment across the batch (e.g. batch_size=8,
-            # 2 tasks -> exactly 4:4 every single batch, not just in expectation),
-            # then a random pair within that task's own pool -- removes the
-            # ~58:42 skew pooled sampling had from moka_pots' larger pair count.
-            batch_samples = []
-            for i in range(args.batch_size):
-                task_idx = task_order[i % len(task_order)]
-                ep_idx, t = random.choice(pairs_by_task[task_idx])
-                batch_samples.append((task_idx, ep_idx, t))
+        task_idx_np = batch["task_idx"].numpy()
+        frac_through_episode = batch["frac_through_episode"].numpy()
+        batch_samples = list(zip(task_idx_np.tolist(), batch["ep_idx"].tolist(), batch["t"].tolist()))
+
+        # Timestep-based precision-phase proxy: no action data is collected in
+        # oft_onpolicy_rollout_data (only agentview/wrist/proprio), so the
+        # user's alternative "action-norm" trigger isn't available without a
+        # re-collection -- relative position within the episode is the cheapest
+        # signal available right now. ep_len-1 matches the max valid t (pairs
+        # are built over t in [1, len-1)).
+        is_precision_phase = frac_through_episode >= (1.0 - args.precision_phase_frac)
+        precision_weights = np.where(is_precision_phase, args.precision_weight, 1.0)
+
+        # Spatio-Temporal Adaptive Loss, time component: continuous, task-specific,
+        # derived from Step 2's real measured error-by-decile curve (see
+        # build_temporal_weight_table) rather than a hand-picked window.
+        if temporal_weight_rows is not None:
+            n_bins = temporal_weight_rows.shape[1]
+            decile = np.minimum((frac_through_episode * n_bins).astype(np.int64), n_bins - 1)
+            normalized_error = temporal_weight_rows[task_idx_np, decile]
+            temporal_weights = 1.0 + args.temporal_weight_strength * (normalized_error - 1.0)
         else:
-            batch_samples = [random.choice(all_pairs) for _ in range(args.batch_size)]
-        agentview_t, wrist_t, agentview_tm1, wrist_tm1, wrist_t_corrupted, proprio_t, prompts = [], [], [], [], [], [], []
-        mask_per_sample = []
-        precision_weights = []
-        temporal_weights = []
-        for task_idx, ep_idx, t in batch_samples:
-            ep = all_episodes[task_idx][ep_idx]
-            tc = task_contexts[task_idx]
-            agentview_t.append(ep["agentview"][t])
-            wrist_t.append(ep["wrist"][t])
-            agentview_tm1.append(ep["agentview"][t - 1])
-            wrist_tm1.append(ep["wrist"][t - 1])
-            if args.mask_diverse:
-                if args.adr_curriculum:
-                    p = adr_curriculum_params(curriculum_level, args)
-                    corrupted, pixel_mask = apply_irregular_edge_patch(
-                        ep["wrist"][t], random,
-                        area_frac_range=(p["area_min"], p["area_max"]),
-                        n_freq=max(1, round(p["n_freq"])),
-                        radius_jitter=p["radius_jitter"],
-                        edge_margin_range=(p["edge_margin_min"], p["edge_margin_max"]),
-                    )
-                else:
-                    corrupted, pixel_mask = apply_irregular_edge_patch(
-                        ep["wrist"][t], random,
-                        area_frac_range=(args.mask_diverse_area_min, args.mask_diverse_area_max),
-                        n_freq=args.mask_diverse_n_freq,
-                        radius_jitter=args.mask_diverse_radius_jitter,
-                        edge_margin_range=(args.mask_diverse_edge_margin_min, args.mask_diverse_edge_margin_max),
-                    )
-                sample_mask_256 = build_patch_token_mask_256_from_pixelmask(pixel_mask)
-            elif args.mask_jitter:
-                corrupted, pixel_bounds = apply_partial_patch_jittered(
-                    ep["wrist"][t], args.mask_jitter_px, args.mask_jitter_size_frac, random
-                )
-                sample_mask_256 = build_patch_token_mask_256(pixel_bounds)
-            else:
-                corrupted, pixel_bounds = apply_partial_patch(ep["wrist"][t])
-                sample_mask_256 = build_patch_token_mask_256(pixel_bounds)
-            wrist_t_corrupted.append(corrupted)
-            proprio_t.append(normalize_proprio(ep["proprio"][t], proprio_norm_stats))
-            prompts.append(tc["prompt"])
-            mask_per_sample.append(sample_mask_256)
-
-            # Timestep-based precision-phase proxy: no action data is collected in
-            # oft_onpolicy_rollout_data (only agentview/wrist/proprio), so the
-            # user's alternative "action-norm" trigger isn't available without a
-            # re-collection -- relative position within the episode is the cheapest
-            # signal available right now. ep_len-1 matches the max valid t (pairs
-            # are built over t in [1, len-1)).
-            ep_len = len(ep["proprio"])
-            frac_through_episode = t / max(ep_len - 1, 1)
-            is_precision_phase = frac_through_episode >= (1.0 - args.precision_phase_frac)
-            precision_weights.append(args.precision_weight if is_precision_phase else 1.0)
-
-            # Spatio-Temporal Adaptive Loss, time component: continuous, task-specific,
-            # derived from Step 2's real measured error-by-decile curve (see
-            # build_temporal_weight_table) rather than a hand-picked window.
-            if temporal_weight_table is not None:
-                n_bins = len(temporal_weight_table[task_names[task_idx]])
-                decile = min(int(frac_through_episode * n_bins), n_bins - 1)
-                normalized_error = temporal_weight_table[task_names[task_idx]][decile]
-                temporal_weights.append(1.0 + args.temporal_weight_strength * (normalized_error - 1.0))
-            else:
-                temporal_weights.append(1.0)
+            temporal_weights = np.ones(len(batch_samples))
 
         B = args.batch_size
         if args.mask_jitter:
             # Per-sample geometry now (Solution 3) -- mask_256 is (B, 256, 1), not
             # broadcast from a single shared mask.
-            mask_256_np = np.stack(mask_per_sample)  # (B, 256)
-            mask_256 = torch.from_numpy(mask_256_np).to(device=device, dtype=dtype).reshape(B, -1, 1)
+            mask_256_np = batch["token_mask"].numpy()  # (B, 256)
+            mask_256 = batch["token_mask"].to(device=device, dtype=dtype).reshape(B, -1, 1)
         else:
             # apply_partial_patch uses a FIXED geometry (PARTIAL_PATCH_FRAC, centered) that
             # doesn't depend on image content, so mask_256 is identical across samples/tasks --
-            # keep the per-sample list only for clarity/future-proofing, but broadcasting a single
+            # keep the per-sample masks only for clarity/future-proofing, but broadcasting a single
             # mask (like the single-task script does) is equivalent and cheaper.
-            mask_256_np = mask_per_sample[0]
-            mask_256 = torch.from_numpy(mask_256_np).to(device=device, dtype=dtype).reshape(1, -1, 1)
+            mask_256_np = batch["token_mask"][0].numpy()
+            mask_256 = batch["token_mask"][:1].to(device=device, dtype=dtype).reshape(1, -1, 1)
 
         # Spatio-Temporal Adaptive Loss, space component: boost patches at the
         # occlusion-mask boundary (Step 2's spatial heatmap showed error concentrates
@@ -704,25 +773,19 @@ def main():
             w_space = 1.0
 
         with torch.no_grad():
-            pv_clean_t = build_pixel_values_batch_multi(agentview_t, wrist_t, prompts, processor, device, dtype)
-            _, wrist_clean_t = torch.split(pv_clean_t, [6, 6], dim=1)
-            wrist_reg_clean_t, wrist_fused_clean_t = torch.split(wrist_clean_t, [3, 3], dim=1)
-            f_gt_dino = run_vit_to_layer(vb.featurizer, wrist_reg_clean_t, split_layer_dino)
-            f_gt_siglip = run_vit_to_layer(vb.fused_featurizer, wrist_fused_clean_t, split_layer_siglip)
-
-            pv_clean_tm1 = build_pixel_values_batch_multi(agentview_tm1, wrist_tm1, prompts, processor, device, dtype)
-            _, wrist_clean_tm1 = torch.split(pv_clean_tm1, [6, 6], dim=1)
-            wrist_reg_clean_tm1, wrist_fused_clean_tm1 = torch.split(wrist_clean_tm1, [3, 3], dim=1)
-            past_dino = run_vit_to_layer(vb.featurizer, wrist_reg_clean_tm1, split_layer_dino)
-            past_siglip = run_vit_to_layer(vb.fused_featurizer, wrist_fused_clean_tm1, split_layer_siglip)
-
-            pv_corrupted_t = build_pixel_values_batch_multi(agentview_t, wrist_t_corrupted, prompts, processor, device, dtype)
-            _, wrist_corrupted_t = torch.split(pv_corrupted_t, [6, 6], dim=1)
-            wrist_reg_corrupted_t, wrist_fused_corrupted_t = torch.split(wrist_corrupted_t, [3, 3], dim=1)
-            f_input_dino = run_vit_to_layer(vb.featurizer, wrist_reg_corrupted_t, split_layer_dino)
-            f_input_siglip = run_vit_to_layer(vb.fused_featurizer, wrist_fused_corrupted_t, split_layer_siglip)
-
-        proprio_tensor = torch.tensor(np.stack(proprio_t), device=device, dtype=dtype)  # (B, 8)
+            if feature_caches is not None:
+                f_gt_dino, f_gt_siglip = read_cached_features(feature_caches, batch_samples, 0, device)
+                past_dino, past_siglip = read_cached_features(feature_caches, batch_samples, -1, device)
+            else:
+                pv_clean_t = batch["wrist_t"].to(device, dtype=dtype, non_blocking=True)
+                f_gt_dino, f_gt_siglip = run_wrist_features(vb, pv_clean_t, split_layer_dino, split_layer_siglip)
+                pv_clean_tm1 = batch["wrist_tm1"].to(device, dtype=dtype, non_blocking=True)
+                past_dino, past_siglip = run_wrist_features(vb, pv_clean_tm1, split_layer_dino, split_layer_siglip)
+
+            pv_corrupted_t = batch["wrist_t_corrupted"].to(device, dtype=dtype, non_blocking=True)
+            f_input_dino, f_input_siglip = run_wrist_features(vb, pv_corrupted_t, split_layer_dino, split_layer_siglip)
+
+        proprio_tensor = batch["proprio"].to(device, dtype=dtype, non_blocking=True)  # (B, 8)
 
         residual_dino = vb.vjepa_predictor_dino(f_input_dino, past_dino, proprio_tensor)
         f_final_dino = f_input_dino + mask_256 * residual_dino
@@ -733,9 +796,7 @@ def main():
         # w_time.sum()==B and w_space==1 when both new mechanisms are off, so
         # combined_weight reduces to exactly mask_256 broadcast over B and every
         # earlier run's numbers are exactly reproducible, not just approximately.
-        w_time = torch.tensor(
-            [p * tw for p, tw in zip(precision_weights, temporal_weights)], device=device, dtype=dtype,
-        ).reshape(-1, 1, 1)
+        w_time = torch.from_numpy(precision_weights * temporal_weights).to(device=device, dtype=dtype).reshape(-1, 1, 1)
         combined_weight = mask_256 * w_time * w_space  # (B, 256, 1)
 
         norm_dino = combined_weight.sum() * f_final_dino.shape[-1]
@@ -770,7 +831,7 @@ def main():
             task_counts = {}
             for task_idx, _, _ in batch_samples:
                 task_counts[task_idx] = task_counts.get(task_idx, 0) + 1
-            n_precision = sum(1 for pw in precision_weights if pw > 1.0)
+            n_precision = int((precision_weights > 1.0).sum())
             mean_w_time = float(np.mean(temporal_weights))
             mean_mask_size = mask_256.sum().item() / B  # per-sample mean; == exact per-sample count unless --mask-jitter
             print(
@@ -786,6 +847,8 @@ def main():
             _step_results = eval_all_tasks(task_contexts, model, resize_size, processor, action_head, proprio_projector, args.eval_episodes)
             if args.adr_curriculum:
                 curriculum_level = adr_update_level(_step_results, curriculum_level, args)
+                # Batches already prefetched by the workers keep the old geometry.
+                sampler.mask_spec = mask_spec_from_args(args, curriculum_level)
             ckpt_path = f"{args.save_path}.step{step}"
             torch.save({"dino": vb.vjepa_predictor_dino.state_dict(), "siglip": vb.vjepa_predictor_siglip.state_dict()}, ckpt_path)
             print(f"  saved checkpoint to {ckpt_path}\n")
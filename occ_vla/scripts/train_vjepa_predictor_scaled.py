@@ -16,6 +16,12 @@ PrismaticVisionBackbone). Adds three things the 300-step smoke test
      8/10 oracle (split_frac=0.67).
   3. Explicit GPU/cache cleanup at the end (del + torch.cuda.empty_cache()),
      on top of the natural cleanup from the process exiting.
+  4. A clean-feature cache (--feature-cache-dir): the frozen DINO/SigLIP
+     featurizers' split-layer output for every CLEAN wrist frame never
+     changes during training, so it is computed once up front into
+     memory-mapped .npy files (see build_wrist_feature_cache) and read
+     back per step -- only the corrupted wrist frame goes through the ViT,
+     one forward per featurizer per step instead of three.
 
 Run with the openvla-oft conda env:
   /home/ubuntu/.pyenv/versions/miniforge3-latest/envs/openvla-oft/bin/python \
@@ -25,8 +31,11 @@ Run with the openvla-oft conda env:
 
 import argparse
 import glob
+import hashlib
+import json
 import os
 import random
+import shutil
 import sys
 import time
 
@@ -56,6 +65,7 @@ from experiments.robot.openvla_utils import (  # noqa: E402
 )
 from experiments.robot.robot_utils import get_image_resize_size, get_model  # noqa: E402
 
+from episode_store import dataset_files, load_episodes  # noqa: E402
 from run_oft_camera_dropout_eval import run_episode as eval_run_episode  # noqa: E402
 
 NUM_PATCHES_PER_IMAGE = 256
@@ -117,15 +127,155 @@ def run_vit_to_layer(featurizer, x_pixels, layer_idx):
     raise ValueError(f"layer_idx {layer_idx} out of range")
 
 
+def build_wrist_pixel_values_batch(wrist_imgs, processor, prompts, device, dtype):
+    """Wrist half of build_pixel_values_batch, (B, 6, 224, 224) -- the
+    predictors only ever consume wrist features, and
+    prepare_images_for_vla treats each image independently, so the
+    agentview image doesn't need processing at all. `prompts`: one
+    string shared by the batch, or a per-sample list."""
+    if isinstance(prompts, str):
+        prompts = [prompts] * len(wrist_imgs)
+    wrist_tensors = []
+    for wr, prompt in zip(wrist_imgs, prompts):
+        (wrist,) = prepare_images_for_vla([wr], _CfgStub())
+        wrist_tensors.append(processor(prompt, wrist)["pixel_values"])
+    return torch.cat(wrist_tensors, dim=0).to(device, dtype=dtype)
+
+
+def run_wrist_features(vb, wrist_pixel_values, split_layer_dino, split_layer_siglip):
+    """(B, 6, 224, 224) wrist pixel values -> (dino, siglip) split-layer
+    patch features, each (B, 256, D)."""
+    wrist_reg, wrist_fused = torch.split(wrist_pixel_values, [3, 3], dim=1)
+    return (
+        run_vit_to_layer(vb.featurizer, wrist_reg, split_layer_dino),
+        run_vit_to_layer(vb.fused_featurizer, wrist_fused, split_layer_siglip),
+    )
+
+
 def load_dataset(data_dir):
-    episodes = []
-    for path in sorted(glob.glob(os.path.join(data_dir, "episode_*.npz"))):
-        d = np.load(path)
-        episodes.append({"agentview": d["agentview"], "wrist": d["wrist"], "proprio": d["proprio"]})
+    """Episodes are lazy memory-mapped views when data_dir holds an episode
+    store (episode_store.py), so startup and RAM no longer scale with the
+    dataset; legacy episode_*.npz dirs still load eagerly."""
+    episodes = load_episodes(data_dir, keys=("agentview", "wrist", "proprio"))
     pairs = [(ep_idx, t) for ep_idx, ep in enumerate(episodes) for t in range(1, len(ep["proprio"]))]
     return episodes, pairs
 
 
+# Bump whenever what's stored per frame changes (preprocessing, layout),
+# so stale caches are never silently reused.
+FEATURE_CACHE_VERSION = 1
+
+
+def _files_fingerprint(paths):
+    """Cheap content fingerprint: names, sizes and mtimes, not bytes --
+    hashing a 7B checkpoint's shards on every launch would cost more than
+    the cache saves."""
+    h = hashlib.sha1()
+    for path in sorted(paths):
+        st = os.stat(path)
+        h.update(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()[:12]
+
+
+def feature_cache_dir(cache_root, data_dir, checkpoint, split_layer_dino, split_layer_siglip):
+    """Cache location keyed by dataset (its episode store / episode files),
+    split layers and checkpoint, e.g.
+    <root>/oft_onpolicy_rollout_data-1a2b.../dino16_siglip18-3c4d.../"""
+    episode_files = dataset_files(data_dir)
+    if os.path.isdir(checkpoint):
+        checkpoint_files = [p for p in glob.glob(os.path.join(checkpoint, "**"), recursive=True) if os.path.isfile(p)]
+        checkpoint_key = _files_fingerprint(checkpoint_files)
+    elif os.path.isfile(checkpoint):
+        checkpoint_key = _files_fingerprint([checkpoint])
+    else:
+        # HF Hub repo id -- nothing local to stat, so the id itself is the key
+        checkpoint_key = hashlib.sha1(checkpoint.encode()).hexdigest()[:12]
+    dataset_key = f"{os.path.basename(os.path.normpath(data_dir))}-{_files_fingerprint(episode_files)}"
+    model_key = f"dino{split_layer_dino}_siglip{split_layer_siglip}-{checkpoint_key}"
+    return os.path.join(cache_root, dataset_key, model_key)
+
+
+class WristFeatureCache:
+    """Clean wrist split-layer features for every frame of a dataset,
+    memory-mapped read-only. bf16 activations are stored bit-for-bit as
+    int16 (numpy has no bfloat16), so cached features are exactly what the
+    featurizers returned."""
+
+    def __init__(self, cache_dir):
+        with open(os.path.join(cache_dir, "meta.json")) as f:
+            meta = json.load(f)
+        self.episode_offsets = np.asarray(meta["episode_offsets"], dtype=np.int64)
+        self.dino = np.load(os.path.join(cache_dir, "wrist_dino.npy"), mmap_mode="r")
+        self.siglip = np.load(os.path.join(cache_dir, "wrist_siglip.npy"), mmap_mode="r")
+
+    def read(self, ep_indices, ts, device):
+        """Features of frames (ep_indices[i], ts[i]) -> (dino, siglip) bf16
+        tensors on `device`, each (B, 256, D)."""
+        rows = self.episode_offsets[np.asarray(ep_indices)] + np.asarray(ts)
+        return tuple(
+            torch.from_numpy(np.ascontiguousarray(arr[rows])).view(torch.bfloat16).to(device, non_blocking=True)
+            for arr in (self.dino, self.siglip)
+        )
+
+
+def build_wrist_feature_cache(
+    cache_dir, episodes, processor, prompt, vb, split_layer_dino, split_layer_siglip, device, dtype, batch_size=64
+):
+    """Runs every episode's clean wrist frames through both featurizers
+    once and writes them to `cache_dir` (wrist_dino.npy / wrist_siglip.npy,
+    rows in episode order, plus meta.json with each episode's first row).
+    Written to a temp dir and renamed into place, so an interrupted build
+    never leaves a half-written cache behind."""
+    lengths = [len(ep["wrist"]) for ep in episodes]
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+    frames = [(ep_idx, t) for ep_idx, n in enumerate(lengths) for t in range(n)]
+    tmp_dir = f"{cache_dir}.tmp{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    dino_out = siglip_out = None
+    with torch.no_grad():
+        for start in range(0, len(frames), batch_size):
+            chunk = frames[start : start + batch_size]
+            pv = build_wrist_pixel_values_batch([episodes[e]["wrist"][t] for e, t in chunk], processor, prompt, device, dtype)
+            f_dino, f_siglip = run_wrist_features(vb, pv, split_layer_dino, split_layer_siglip)
+            if dino_out is None:
+                dino_out = np.lib.format.open_memmap(
+                    os.path.join(tmp_dir, "wrist_dino.npy"), mode="w+", dtype=np.int16, shape=(len(frames),) + tuple(f_dino.shape[1:])
+                )
+                siglip_out = np.lib.format.open_memmap(
+                    os.path.join(tmp_dir, "wrist_siglip.npy"), mode="w+", dtype=np.int16, shape=(len(frames),) + tuple(f_siglip.shape[1:])
+                )
+            dino_out[start : start + len(chunk)] = f_dino.to(torch.bfloat16).view(torch.int16).cpu().numpy()
+            siglip_out[start : start + len(chunk)] = f_siglip.to(torch.bfloat16).view(torch.int16).cpu().numpy()
+    dino_out.flush()
+    siglip_out.flush()
+    del dino_out, siglip_out
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump({"version": FEATURE_CACHE_VERSION, "episode_offsets": offsets.tolist(), "episode_lengths": lengths}, f)
+    os.makedirs(os.path.dirname(cache_dir), exist_ok=True)
+    os.replace(tmp_dir, cache_dir)
+
+
+def load_or_build_wrist_feature_cache(
+    cache_root, data_dir, checkpoint, episodes, processor, prompt, vb, split_layer_dino, split_layer_siglip, device, dtype
+):
+    cache_dir = feature_cache_dir(cache_root, data_dir, checkpoint, split_layer_dino, split_layer_siglip)
+    meta_path = os.path.join(cache_dir, "meta.json")
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("version") == FEATURE_CACHE_VERSION and meta["episode_lengths"] == [len(ep["wrist"]) for ep in episodes]:
+            print(f"Using clean wrist feature cache {cache_dir}")
+            return WristFeatureCache(cache_dir)
+        print(f"Stale clean wrist feature cache {cache_dir}, rebuilding")
+        shutil.rmtree(cache_dir)
+    t0 = time.time()
+    n_frames = sum(len(ep["wrist"]) for ep in episodes)
+    print(f"Building clean wrist feature cache {cache_dir} ({n_frames} frames)...")
+    build_wrist_feature_cache(cache_dir, episodes, processor, prompt, vb, split_layer_dino, split_layer_siglip, device, dtype)
+    print(f"  built in {time.time() - t0:.1f}s")
+    return WristFeatureCache(cache_dir)
+
+
 def run_rollout_eval(cfg, env, task_description, model, resize_size, processor, action_head, proprio_projector, initial_states, n_episodes, max_steps):
     """In-process eval reusing run_oft_camera_dropout_eval.py's run_episode,
     against the ALREADY-LOADED model (whatever its current predictor weights
@@ -159,6 +309,16 @@ def main():
     parser.add_argument("--final-eval-episodes", type=int, default=10)
     parser.add_argument("--seed", type=int, default=0)
     parser.add_argument("--save-path", default="vjepa_predictor_scaled.pt")
+    parser.add_argument(
+        "--feature-cache-dir", default="vjepa_feature_cache",
+        help="Root of the clean wrist feature cache (keyed by dataset, split layers and checkpoint underneath). "
+             "Built on first use, reused by every later run with the same key.",
+    )
+    parser.add_argument(
+        "--no-feature-cache", action="store_true",
+        help="Run the clean t / t-1 wrist frames through the featurizers every step instead (the original "
+             "behavior -- ~3x the per-step ViT work).",
+    )
     args = parser.parse_args()
 
     random.seed(args.seed)
@@ -209,6 +369,14 @@ def main():
     optimizer = torch.optim.AdamW(trainable_params, lr=args.lr)
     proprio_norm_stats = model.norm_stats[cfg.unnorm_key]["proprio"]
 
+    feature_cache = None
+    if not args.no_feature_cache:
+        model.eval()
+        feature_cache = load_or_build_wrist_feature_cache(
+            args.feature_cache_dir, args.data_dir, args.checkpoint, episodes, processor, prompt, vb,
+            split_layer_dino, split_layer_siglip, device, dtype,
+        )
+
     print(f"\n=== Eval before training (step 0, untrained/whatever checkpoint state) ===")
     n_succ, n_tot = run_rollout_eval(cfg, env, task_description, model, resize_size, processor, action_head, proprio_projector, initial_states, args.eval_episodes, max_steps)
     print(f"  step 0 eval: {n_succ}/{n_tot}")
@@ -223,13 +391,11 @@ def main():
         vb.vjepa_predictor_siglip.train()
 
         batch_pairs = [random.choice(pairs) for _ in range(args.batch_size)]
-        agentview_t, wrist_t, agentview_tm1, wrist_tm1, wrist_t_corrupted, proprio_t = [], [], [], [], [], []
+        wrist_t, wrist_tm1, wrist_t_corrupted, proprio_t = [], [], [], []
         pixel_bounds = None
         for ep_idx, t in batch_pairs:
             ep = episodes[ep_idx]
-            agentview_t.append(ep["agentview"][t])
             wrist_t.append(ep["wrist"][t])
-            agentview_tm1.append(ep["agentview"][t - 1])
             wrist_tm1.append(ep["wrist"][t - 1])
             corrupted, pixel_bounds = apply_partial_patch(ep["wrist"][t])
             wrist_t_corrupted.append(corrupted)
@@ -240,23 +406,18 @@ def main():
         B = args.batch_size
 
         with torch.no_grad():
-            pv_clean_t = build_pixel_values_batch(agentview_t, wrist_t, processor, prompt, device, dtype)
-            _, wrist_clean_t = torch.split(pv_clean_t, [6, 6], dim=1)
-            wrist_reg_clean_t, wrist_fused_clean_t = torch.split(wrist_clean_t, [3, 3], dim=1)
-            f_gt_dino = run_vit_to_layer(vb.featurizer, wrist_reg_clean_t, split_layer_dino)
-            f_gt_siglip = run_vit_to_layer(vb.fused_featurizer, wrist_fused_clean_t, split_layer_siglip)
-
-            pv_clean_tm1 = build_pixel_values_batch(agentview_tm1, wrist_tm1, processor, prompt, device, dtype)
-            _, wrist_clean_tm1 = torch.split(pv_clean_tm1, [6, 6], dim=1)
-            wrist_reg_clean_tm1, wrist_fused_clean_tm1 = torch.split(wrist_clean_tm1, [3, 3], dim=1)
-            past_dino = run_vit_to_layer(vb.featurizer, wrist_reg_clean_tm1, split_layer_dino)
-            past_siglip = run_vit_to_layer(vb.fused_featurizer, wrist_fused_clean_tm1, split_layer_siglip)
-
-            pv_corrupted_t = build_pixel_values_batch(agentview_t, wrist_t_corrupted, processor, prompt, device, dtype)
-            _, wrist_corrupted_t = torch.split(pv_corrupted_t, [6, 6], dim=1)
-            wrist_reg_corrupted_t, wrist_fused_corrupted_t = torch.split(wrist_corrupted_t, [3, 3], dim=1)
-            f_input_dino = run_vit_to_layer(vb.featurizer, wrist_reg_corrupted_t, split_layer_dino)
-            f_input_siglip = run_vit_to_layer(vb.fused_featurizer, wrist_fused_corrupted_t, split_layer_siglip)
+            if feature_cache is not None:
+                ep_indices, ts = np.array(batch_pairs).T
+                f_gt_dino, f_gt_siglip = feature_cache.read(ep_indices, ts, device)
+                past_dino, past_siglip = feature_cache.read(ep_indices, ts - 1, device)
+            else:
+                pv_clean_t = build_wrist_pixel_values_batch(wrist_t, processor, prompt, device, dtype)
+                f_gt_dino, f_gt_siglip = run_wrist_features(vb, pv_clean_t, split_layer_dino, split_layer_siglip)
+                pv_clean_tm1 = build_wrist_pixel_values_batch(wrist_tm1, processor, prompt, device, dtype)
+                past_dino, past_siglip = run_wrist_features(vb, pv_clean_tm1, split_layer_dino, split_layer_siglip)
+
+            pv_corrupted_t = build_wrist_pixel_values_batch(wrist_t_corrupted, processor, prompt, device, dtype)
+            f_input_dino, f_input_siglip = run_wrist_features(vb, pv_corrupted_t, split_layer_dino, split_layer_siglip)
 
         proprio_tensor = torch.tensor(np.stack(proprio_t), device=device, dtype=dtype)  # (B, 8)
 
@@ -27,7 +27,6 @@ Run with the openvla-oft conda env:
 """
 
 import argparse
-import glob
 import os
 import random
 import sys
@@ -37,6 +36,7 @@ import sys
 # on any other machine, e.g. a Kaggle clone under /root/oft_work/Hoki/...).
 SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
 OFT_ROOT = os.path.normpath(os.path.join(SCRIPTS_DIR, "..", "thirdparty", "openvla-oft"))
+sys.path.insert(0, SCRIPTS_DIR)
 sys.path.insert(0, OFT_ROOT)
 os.chdir(OFT_ROOT)
 os.environ.setdefault("LIBERO_CONFIG_PATH", os.path.expanduser("~/.libero_oft"))
@@ -53,6 +53,8 @@ from experiments.robot.openvla_utils import (  # noqa: E402
 )
 from experiments.robot.robot_utils import get_model  # noqa: E402
 
+from episode_store import load_episodes  # noqa: E402
+
 NUM_PATCHES_PER_IMAGE = 256
 GRID_SIDE = 16  # 224 / 14
 PATCH_PX = 14
@@ -105,10 +107,7 @@ cfg_stub = _CfgStub()
 
 
 def load_dataset(data_dir):
-    episodes = []
-    for path in sorted(glob.glob(os.path.join(data_dir, "episode_*.npz"))):
-        d = np.load(path)
-        episodes.append({"agentview": d["agentview"], "wrist": d["wrist"], "proprio": d["proprio"]})
+    episodes = load_episodes(data_dir, keys=("agentview", "wrist", "proprio"))
     pairs = []  # (episode_idx, t) for t >= 1
     for ep_idx, ep in enumerate(episodes):
         for t in range(1, len(ep["proprio"])):
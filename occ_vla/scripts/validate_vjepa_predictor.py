@@ -46,6 +46,7 @@ from experiments.robot.openvla_utils import get_action_head, get_processor, get_
 from experiments.robot.robot_utils import get_model  # noqa: E402
 
 from scripts.collect_oft_onpolicy_rollout_data import prepare_observation  # noqa: E402
+from scripts.episode_store import load_episodes  # noqa: E402
 from scripts.train_vjepa_predictor_smoke_test import apply_partial_patch, build_patch_token_mask, build_pixel_values  # noqa: E402
 
 CHECKPOINT = os.path.expanduser("~/slocal1/Hoki/occ_vla/checkpoints/openvla-7b-oft-libero10-vjepa")
@@ -212,7 +213,7 @@ def main():
     env, _ = get_libero_env(task, cfg.model_family, resolution=cfg.env_img_res)
 
     # === Load in-sample (already collected, used in training) episode 0 ===
-    in_sample_ep = dict(np.load(os.path.join(DATA_DIR, "episode_000.npz")))
+    in_sample_ep = dict(load_episodes(DATA_DIR)[0])
 
     # === Collect ONE fresh held-out episode (init_state index 5 -- never
     # trained on; training only used episodes 0-4 / init_states 0-4) ===
@@ -0,0 +1,221 @@
+"""Background data pipeline for train_vjepa_predictor_multitask.py.
+
+The training loop used to draw its batch, corrupt every wrist frame,
+pool the corrupted region into a patch-token mask and run the processor
+on each image one sample at a time, on the main thread, while the GPU
+waited. This module splits that into:
+  - TaskPairBatchSampler: balanced / pooled sampling of (task, episode,
+    t) pairs, run in the main process by the DataLoader, which also
+    stamps every sample with its own RNG seed and the mask geometry
+    current at the time it was drawn (so the ADR curriculum, which
+    changes between eval checkpoints, reaches worker processes without
+    restarting them).
+  - PredictorPairDataset: one sample = corrupted wrist frame + token mask
+    (+ optionally the clean t / t-1 frames), preprocessed in DataLoader
+    workers and collated into pinned CPU tensors.
+  - Vectorized mask generation (irregular_edge_mask, rect_pixel_mask)
+    and token pooling (token_mask_from_pixel_mask), replacing the
+    per-patch Python loops of build_patch_token_mask_256(_from_pixelmask).
+
+Kept free of libero/openvla imports (geometry constants and the image
+preprocessor are passed in) so DataLoader workers stay light and the
+module is testable on its own.
+"""
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset, Sampler
+
+MASK_FIXED = "fixed"
+MASK_JITTER = "jitter"
+MASK_DIVERSE = "diverse"
+
+_ANCHORS = ("top", "bottom", "left", "right", "tl", "tr", "bl", "br")
+_N_THETA = 64
+_THETAS = np.linspace(0, 2 * np.pi, _N_THETA, endpoint=False)
+
+
+def partial_patch_bounds(h, w, frac):
+    """Centered square of frac*h x frac*w (apply_partial_patch's geometry)."""
+    ph, pw = int(h * frac), int(w * frac)
+    r0, c0 = (h - ph) // 2, (w - pw) // 2
+    return r0, r0 + ph, c0, c0 + pw
+
+
+def jittered_patch_bounds(h, w, frac, jitter_px, size_jitter_frac, rng):
+    """apply_partial_patch_jittered's geometry: the centered square with
+    its size scaled by up to +/-size_jitter_frac and its corner offset by
+    up to +/-jitter_px, clipped to the image."""
+    base_ph, base_pw = int(h * frac), int(w * frac)
+    scale = 1.0 + rng.uniform(-size_jitter_frac, size_jitter_frac)
+    ph, pw = max(int(base_ph * scale), 1), max(int(base_pw * scale), 1)
+    base_r0, base_c0 = (h - base_ph) // 2, (w - base_pw) // 2
+    r0 = min(max(base_r0 + int(rng.integers(-jitter_px, jitter_px + 1)), 0), h - ph)
+    c0 = min(max(base_c0 + int(rng.integers(-jitter_px, jitter_px + 1)), 0), w - pw)
+    return r0, r0 + ph, c0, c0 + pw
+
+
+def rect_pixel_mask(h, w, bounds):
+    r0, r1, c0, c1 = bounds
+    mask = np.zeros((h, w), dtype=bool)
+    mask[r0:r1, c0:c1] = True
+    return mask
+
+
+_polar_grids = {}
+
+
+def _polar_grid(h, w):
+    """Pixel-center row/col grids, built once per image size."""
+    if (h, w) not in _polar_grids:
+        _polar_grids[h, w] = np.mgrid[0:h, 0:w].astype(np.float32)
+    return _polar_grids[h, w]
+
+
+def irregular_edge_mask(h, w, rng, area_frac_range, n_freq, radius_jitter, edge_margin_range):
+    """apply_irregular_edge_patch's mask (edge-anchored blob whose polar
+    radius is modulated by n_freq random harmonics), with the harmonics
+    summed as one (n_freq, 64) array op and the pixel grid reused across
+    calls."""
+    area_frac = rng.uniform(*area_frac_range)
+    base_radius = np.sqrt(area_frac * h * w / np.pi)
+
+    anchor = _ANCHORS[rng.integers(len(_ANCHORS))]
+    edge_margin = base_radius * rng.uniform(*edge_margin_range)
+    cy = {"top": edge_margin, "tl": edge_margin, "tr": edge_margin,
+          "bottom": h - edge_margin, "bl": h - edge_margin, "br": h - edge_margin}.get(anchor)
+    cx = {"left": edge_margin, "tl": edge_margin, "bl": edge_margin,
+          "right": w - edge_margin, "tr": w - edge_margin, "br": w - edge_margin}.get(anchor)
+    if cy is None:
+        cy = rng.uniform(0, h)
+    if cx is None:
+        cx = rng.uniform(0, w)
+
+    k = np.arange(1, n_freq + 1)[:, None]
+    amp = rng.uniform(0, radius_jitter / k)
+    phase = rng.uniform(0, 2 * np.pi, size=(n_freq, 1))
+    radius_theta = 1.0 + (amp * np.sin(k * _THETAS + phase)).sum(axis=0)
+    radius_theta = base_radius * np.clip(radius_theta, 0.3, 2.0)
+
+    yy, xx = _polar_grid(h, w)
+    dy, dx = yy - cy, xx - cx
+    theta = np.arctan2(dy, dx) % (2 * np.pi)
+    r_boundary = np.interp(theta, _THETAS, radius_theta, period=2 * np.pi)
+    return dy * dy + dx * dx <= r_boundary * r_boundary
+
+
+def token_mask_from_pixel_mask(pixel_mask, grid_side, patch_px):
+    """A patch token is masked iff the pixel at its center is -- the
+    convention of build_patch_token_mask_256(_from_pixelmask) -- read
+    with one strided gather instead of a grid_side^2 Python loop.
+    Works on (H, W) or batched (..., H, W) masks; returns (..., grid_side^2)."""
+    centers = (np.arange(grid_side) * patch_px + patch_px / 2).astype(np.int64)
+    pooled = pixel_mask[..., centers[:, None], centers[None, :]]
+    return pooled.reshape(pixel_mask.shape[:-2] + (grid_side * grid_side,))
+
+
+class TaskPairBatchSampler(Sampler):
+    """Yields `num_batches` batches of (task_idx, ep_idx, t, seed, mask_spec).
+
+    balanced: batch slot i belongs to task i % num_tasks (e.g. exactly
+    4:4 for batch_size=8 and 2 tasks), with a uniform pair within that
+    task. pooled: uniform over the union of all tasks' pairs.
+    `mask_spec` is read when each batch is drawn, so assigning a new one
+    (ADR curriculum) applies to every batch not yet prefetched.
+    """
+
+    def __init__(self, pairs_by_task, batch_size, num_batches, sampling="balanced", seed=0, mask_spec=None):
+        assert sampling in ("balanced", "pooled"), sampling
+        self.pairs_by_task = [np.asarray(pairs, dtype=np.int64).reshape(-1, 2) for pairs in pairs_by_task]
+        self.batch_size = batch_size
+        self.num_batches = num_batches
+        self.sampling = sampling
+        self.mask_spec = mask_spec or {"kind": MASK_FIXED}
+        self._rng = np.random.default_rng(seed)
+        self._pooled = np.concatenate(
+            [np.column_stack([np.full(len(p), k), p]) for k, p in enumerate(self.pairs_by_task)]
+        )
+
+    def __len__(self):
+        return self.num_batches
+
+    def __iter__(self):
+        for _ in range(self.num_batches):
+            if self.sampling == "balanced":
+                tasks = np.arange(self.batch_size) % len(self.pairs_by_task)
+                picks = np.empty((self.batch_size, 3), dtype=np.int64)
+                picks[:, 0] = tasks
+                for k in np.unique(tasks):
+                    rows = np.nonzero(tasks == k)[0]
+                    picks[rows, 1:] = self.pairs_by_task[k][self._rng.integers(len(self.pairs_by_task[k]), size=len(rows))]
+            else:
+                picks = self._pooled[self._rng.integers(len(self._pooled), size=self.batch_size)]
+            seeds = self._rng.integers(2**63 - 1, size=self.batch_size)
+            mask_spec = dict(self.mask_spec)
+            yield [(int(k), int(e), int(t), int(s), mask_spec) for (k, e, t), s in zip(picks, seeds)]
+
+
+class PredictorPairDataset(Dataset):
+    """Indexed by the sampler's (task_idx, ep_idx, t, seed, mask_spec)
+    items. Returns the corrupted wrist frame at t (preprocessed), its
+    patch-token mask, the normalized proprio at t and the sample's
+    position in its episode; with clean_pixels=True also the clean t and
+    t-1 wrist frames (unneeded when clean features come from the
+    feature cache).
+
+    preprocess(img, prompt) -> pixel-value tensor; proprio_transform(p) ->
+    normalized proprio. mask_spec["kind"] is MASK_FIXED, MASK_JITTER
+    (+ jitter_px, size_jitter_frac) or MASK_DIVERSE (+ area_frac_range,
+    n_freq, radius_jitter, edge_margin_range).
+    """
+
+    def __init__(self, episodes_by_task, prompts, preprocess, proprio_transform, gray_fill, patch_frac, grid_side, patch_px,
+                 clean_pixels=True):
+        self.episodes_by_task = episodes_by_task
+        self.prompts = prompts
+        self.preprocess = preprocess
+        self.proprio_transform = proprio_transform
+        self.gray_fill = gray_fill
+        self.patch_frac = patch_frac
+        self.grid_side = grid_side
+        self.patch_px = patch_px
+        self.clean_pixels = clean_pixels
+
+    def __len__(self):
+        return sum(len(ep["proprio"]) - 1 for episodes in self.episodes_by_task for ep in episodes)
+
+    def corruption_mask(self, h, w, mask_spec, rng):
+        kind = mask_spec["kind"]
+        if kind == MASK_DIVERSE:
+            return irregular_edge_mask(
+                h, w, rng, mask_spec["area_frac_range"], mask_spec["n_freq"], mask_spec["radius_jitter"],
+                mask_spec["edge_margin_range"],
+            )
+        if kind == MASK_JITTER:
+            bounds = jittered_patch_bounds(h, w, self.patch_frac, mask_spec["jitter_px"], mask_spec["size_jitter_frac"], rng)
+        else:
+            bounds = partial_patch_bounds(h, w, self.patch_frac)
+        return rect_pixel_mask(h, w, bounds)
+
+    def __getitem__(self, item):
+        task_idx, ep_idx, t, seed, mask_spec = item
+        ep = self.episodes_by_task[task_idx][ep_idx]
+        prompt = self.prompts[task_idx]
+        wrist = ep["wrist"][t]
+        pixel_mask = self.corruption_mask(wrist.shape[0], wrist.shape[1], mask_spec, np.random.default_rng(seed))
+        corrupted = wrist.copy()
+        corrupted[pixel_mask] = self.gray_fill
+
+        sample = {
+            "task_idx": task_idx,
+            "ep_idx": ep_idx,
+            "t": t,
+            "frac_through_episode": t / max(len(ep["proprio"]) - 1, 1),
+            "wrist_t_corrupted": self.preprocess(corrupted, prompt),
+            "token_mask": torch.from_numpy(token_mask_from_pixel_mask(pixel_mask, self.grid_side, self.patch_px)),
+            "proprio": torch.as_tensor(np.asarray(self.proprio_transform(ep["proprio"][t]), dtype=np.float32)),
+        }
+        if self.clean_pixels:
+            sample["wrist_t"] = self.preprocess(wrist, prompt)
+            sample["wrist_tm1"] = self.preprocess(ep["wrist"][t - 1], prompt)
+        return sample
@@ -1,6 +1,6 @@
 from occ_vla.eval.occluder import OccluderPlacer, OccluderSpec
 from occ_vla.eval.metrics import SoccMetric, Difficulty
-from occ_vla.eval.libero_occ_env import LiberoOccEnv, LiberoOccEnvConfig
+from occ_vla.eval.libero_occ_env import LiberoOccEnv, LiberoOccEnvConfig, OcclusionStats
 
 __all__ = [
     "OccluderPlacer",
@@ -9,4 +9,5 @@ __all__ = [
     "Difficulty",
     "LiberoOccEnv",
     "LiberoOccEnvConfig",
+    "OcclusionStats",
 ]
@@ -36,13 +36,14 @@ see scripts/setup_third_party.sh):
 """
 
 from dataclasses import dataclass
+from pathlib import Path
 from typing import Any
 
 import cv2
 import numpy as np
 
 from occ_vla.eval.metrics import Difficulty, SoccMetric
-from occ_vla.eval.occluder import OccluderPlacer
+from occ_vla.eval.occluder import OccluderPlacer, OccluderSpecCache
 
 AGENTVIEW_KEY = "agentview_image"
 WRIST_KEY = "robot0_eye_in_hand_image"
@@ -53,6 +54,73 @@ LIBERO_CONTROL_HZ = 20
 # 224 input -- not a direct 224 render -- so this wrapper renders at the
 # same 256 by default and leaves the resize step to the caller.
 DEFAULT_CAMERA_RESOLUTION = 256
+# Bit flags of a segmentation lookup table entry (see segmentation_lookup).
+SEG_TARGET = 1
+SEG_ROBOT = 2
+_NUM_FLAGS = (SEG_TARGET | SEG_ROBOT) + 1
+
+
+@dataclass
+class OcclusionStats:
+    """Fractions of the target's clear/baseline footprint that are not
+    visible this step. total = arm + scene: `arm` is covered by the
+    robot, `scene` by anything else (a placed occluder, another
+    object, or the target having moved)."""
+
+    arm: float
+    scene: float
+    total: float
+
+
+def segmentation_lookup(robot_id: int, target_value: int | None) -> np.ndarray:
+    """Table from instance-segmentation pixel value to SEG_TARGET /
+    SEG_ROBOT flags, equivalent to what
+    `SegmentationRenderEnv.get_segmentation_instances` computes for just
+    these two instances: it clamps every value above `robot_id` to
+    `robot_id + 1` (gripper, mount and robot all become "robot"), and an
+    object's mask is the pixels equal to its `instance_to_id` value
+    after that clamp. Values past the end of the table share its last
+    entry -- decode with `np.take(table, seg, mode="clip")`."""
+    lookup = np.zeros(robot_id + 2, dtype=np.uint8)
+    lookup[robot_id + 1] = SEG_ROBOT
+    if target_value is not None and target_value <= robot_id + 1:
+        lookup[target_value] |= SEG_TARGET
+    return lookup
+
+
+def occlusion_stats_batch(
+    segmentation_images: list[np.ndarray] | np.ndarray,
+    lookups: list[np.ndarray],
+    clear_masks: list[np.ndarray] | np.ndarray,
+) -> list[OcclusionStats]:
+    """OcclusionStats for a batch of same-sized segmentation images
+    (e.g. one per vectorized env), each decoded with its own env's
+    lookup table in a single gather over the whole batch."""
+    seg = np.asarray(segmentation_images)
+    if seg.ndim == 4:
+        seg = seg[..., 0]
+    size = max(len(lookup) for lookup in lookups)
+    # Pad every table with its own last entry, so clamping to the
+    # common size reproduces each table's "past the end" value, and
+    # lay them out as rows of one flattened (B * size) table. Only the
+    # clear-footprint pixels are decoded.
+    table = np.concatenate([np.pad(lookup, (0, size - len(lookup)), mode="edge") for lookup in lookups])
+    clear = np.asarray(clear_masks, dtype=bool)
+    image_idx = np.repeat(np.arange(len(lookups)), clear.sum(axis=(1, 2)))
+    flags = table[image_idx * size + np.clip(seg[clear], 0, size - 1)]
+    counts = np.bincount(image_idx * _NUM_FLAGS + flags, minlength=len(lookups) * _NUM_FLAGS)
+    return [_occlusion_stats_from_counts(row) for row in counts.reshape(len(lookups), _NUM_FLAGS).tolist()]
+
+
+def _occlusion_stats_from_counts(counts: list[int]) -> OcclusionStats:
+    """Clear-footprint pixel counts per flag value -> OcclusionStats.
+    Pixels still showing the target are never occluded, whatever else
+    they are tagged with."""
+    area = sum(counts)
+    if area == 0:
+        return OcclusionStats(arm=0.0, scene=0.0, total=0.0)
+    arm, scene = counts[SEG_ROBOT], counts[0]
+    return OcclusionStats(arm=arm / area, scene=scene / area, total=(arm + scene) / area)
 
 
 @dataclass
@@ -88,6 +156,10 @@ class LiberoOccEnvConfig:
     # it takes effect -- see that method's docstring.
     pixel_mask: bool = False
     pixel_mask_dilate_px: int = 0
+    # Directory for the on-disk cache of converged occluder specs (one
+    # JSON file shared by every task/init state/difficulty). None
+    # searches at every reset, as before.
+    occluder_cache_dir: str | None = None
 
 
 class LiberoOccEnv:
@@ -97,7 +169,10 @@ class LiberoOccEnv:
     def __init__(self, config: LiberoOccEnvConfig, libero_root: str):
         self.config = config
         self.libero_root = libero_root  # third_party/openpi/third_party/libero
-        self.occluder_placer = OccluderPlacer()
+        cache = None
+        if config.occluder_cache_dir is not None:
+            cache = OccluderSpecCache(Path(config.occluder_cache_dir) / "occluder_specs.json")
+        self.occluder_placer = OccluderPlacer(cache=cache)
         self.metric = SoccMetric()
         self._env: Any = None
         self._benchmark: Any = None
@@ -105,10 +180,10 @@ class LiberoOccEnv:
         self.target_body_name: str | None = None
         self._target_mask_clear: np.ndarray | None = None
         self._pixel_mask_region: np.ndarray | None = None
+        self._segmentation_lookup: np.ndarray | None = None
 
     def _build_env(self):
         import sys  # noqa: PLC0415
-        from pathlib import Path  # noqa: PLC0415
 
         libero_pkg = str(Path(self.libero_root))
         if libero_pkg not in sys.path:
@@ -160,22 +235,35 @@ class LiberoOccEnv:
         # A new episode invalidates any previously captured baseline.
         self._target_mask_clear = None
         self._pixel_mask_region = None
+        self._segmentation_lookup = None
 
         if not self.config.place_occluder:
             self.last_s_occ = None
             baseline_state = self._env.get_sim_state()
             return self._env.regenerate_obs_from_state(baseline_state)
 
-        spec = self.occluder_placer.place(self._env, self.target_body_name, self.config.difficulty)
+        spec = self.occluder_placer.place(
+            self._env, self.target_body_name, self.config.difficulty, cache_key=self.occluder_cache_key()
+        )
         self.last_s_occ = spec.achieved_s_occ
 
-        # occluder_placer.search() leaves self._env reset onto the winning
-        # trial XML already (see occluder.py::OccluderPlacer.place
+        # occluder_placer.place() leaves self._env with the winning
+        # occluder already in the scene (see occluder.py::OccluderPlacer.place
         # docstring) — regenerate the observation from the held-fixed
         # init state one more time to hand back a clean obs dict.
         baseline_state = self._env.get_sim_state()
         return self._env.regenerate_obs_from_state(baseline_state)
 
+    def occluder_cache_key(self) -> str:
+        """What a converged occluder spec depends on: the scene (suite,
+        task, init state), the requested band, and the render resolution
+        S_occ was measured at."""
+        c = self.config
+        return (
+            f"{c.benchmark_suite}/task{c.task_id}/init{c.init_state_idx}/"
+            f"{c.difficulty.value}/{c.camera_resolution}px"
+        )
+
     def capture_clear_baseline(self, obs: dict) -> None:
         """Snapshot the target's clear/unoccluded segmentation footprint,
         to diff future frames against (CLAUDE.md item 7: clear-baseline
@@ -187,17 +275,18 @@ class LiberoOccEnv:
         dummy `step()` calls to let dropped objects finish falling) --
         not right at `reset()` -- so the "clear" footprint reflects the
         object's actual resting pose, not its initial drop position.
-        Required before `pixel_mask`, `compute_arm_s_occ`, or
-        `compute_total_occ` are used.
+        Required before `pixel_mask`, `compute_occlusion_stats`,
+        `compute_arm_s_occ`, or `compute_total_occ` are used.
         """
         if self._env is None or self.target_body_name is None:
             raise RuntimeError("call reset() first")
-        seg_dict = self._env.get_segmentation_instances(obs[AGENTVIEW_SEGMENTATION_KEY])
-        target_mask_raw = seg_dict.get(self.target_body_name)
-        if target_mask_raw is None:
-            self._target_mask_clear = np.zeros(obs[AGENTVIEW_SEGMENTATION_KEY].shape[:2], dtype=bool)
-        else:
-            self._target_mask_clear = target_mask_raw.squeeze(-1) != 0
+        # Built once per episode: the instance ids only change on reset().
+        self._segmentation_lookup = segmentation_lookup(
+            self._env.segmentation_robot_id, self._env.instance_to_id.get(self.target_body_name)
+        )
+        # A target missing from the id mapping gets an all-False footprint,
+        # so every occlusion fraction is 0.0 for it.
+        self._target_mask_clear = (self._segmentation_flags(obs) & SEG_TARGET) != 0
 
         region = self._target_mask_clear
         if self.config.pixel_mask_dilate_px > 0:
@@ -205,31 +294,48 @@ class LiberoOccEnv:
             region = cv2.dilate(region.astype(np.uint8), kernel).astype(bool)
         self._pixel_mask_region = region
 
+    def _segmentation_flags(self, obs: dict) -> np.ndarray:
+        """Decode the agentview segmentation image once into per-pixel
+        SEG_TARGET / SEG_ROBOT flags (no per-instance masks)."""
+        seg = obs[AGENTVIEW_SEGMENTATION_KEY]
+        if seg.ndim == 3:
+            seg = seg[..., 0]
+        return np.take(self._segmentation_lookup, seg, mode="clip")
+
+    def compute_occlusion_stats(self, obs: dict) -> OcclusionStats:
+        """Arm, scene and total occlusion of the target's clear/baseline
+        footprint from one decode of this step's segmentation image."""
+        if self._target_mask_clear is None:
+            raise RuntimeError("call capture_clear_baseline() first")
+        seg = obs[AGENTVIEW_SEGMENTATION_KEY]
+        if seg.ndim == 3:
+            seg = seg[..., 0]
+        flags = np.take(self._segmentation_lookup, seg[self._target_mask_clear], mode="clip")
+        return _occlusion_stats_from_counts(np.bincount(flags, minlength=_NUM_FLAGS).tolist())
+
+    @staticmethod
+    def compute_occlusion_stats_batch(envs: list["LiberoOccEnv"], observations: list[dict]) -> list[OcclusionStats]:
+        """compute_occlusion_stats for several envs' observations of the
+        same resolution in one vectorized pass."""
+        for env in envs:
+            if env._target_mask_clear is None:  # noqa: SLF001
+                raise RuntimeError("call capture_clear_baseline() first")
+        return occlusion_stats_batch(
+            [obs[AGENTVIEW_SEGMENTATION_KEY] for obs in observations],
+            [env._segmentation_lookup for env in envs],  # noqa: SLF001
+            [env._target_mask_clear for env in envs],  # noqa: SLF001
+        )
+
     def compute_arm_s_occ(self, obs: dict) -> float:
         """Fraction of the target's clear/baseline footprint currently
         occluded specifically by the arm (not any other occluder)."""
-        if self._target_mask_clear is None:
-            raise RuntimeError("call capture_clear_baseline() first")
-        seg_dict = self._env.get_segmentation_instances(obs[AGENTVIEW_SEGMENTATION_KEY])
-        target_mask_now_raw = seg_dict.get(self.target_body_name)
-        if target_mask_now_raw is None:
-            return 0.0
-        target_mask_now = target_mask_now_raw.squeeze(-1) != 0
-        arm_mask = seg_dict["robot"].squeeze(-1) != 0
-        return self.metric.compute(self._target_mask_clear, (~target_mask_now) & arm_mask)
+        return self.compute_occlusion_stats(obs).arm
 
     def compute_total_occ(self, obs: dict) -> float:
         """Fraction of the target's clear/baseline footprint no longer
         visible right now, regardless of what's blocking it (arm,
         placed scene occluder, or both)."""
-        if self._target_mask_clear is None:
-            raise RuntimeError("call capture_clear_baseline() first")
-        seg_dict = self._env.get_segmentation_instances(obs[AGENTVIEW_SEGMENTATION_KEY])
-        target_mask_now_raw = seg_dict.get(self.target_body_name)
-        if target_mask_now_raw is None:
-            return 0.0
-        target_mask_now = target_mask_now_raw.squeeze(-1) != 0
-        return self.metric.compute(self._target_mask_clear, ~target_mask_now)
+        return self.compute_occlusion_stats(obs).total
 
     def step(self, action):
         if self._env is None:
@@ -12,7 +12,11 @@ Grounded on Lifelong-Robot-Learning/LIBERO's env API:
   modified XML — the injection point: insert a *static* (no `<joint>`,
   so it doesn't add DOF and `set_state()` with the pre-edit state vector
   stays valid) `<body>` with a box `<geom>`, then reset from the edited
-  XML.
+  XML. That is a full MuJoCo model recompile, so it happens once per
+  search; every trial after that resizes/moves the already-compiled box
+  through the model arrays (`sim.model.geom_size` / `body_pos`, plus the
+  geom's bounding volume so collision detection sees the new size),
+  which `mj_forward` in `regenerate_obs_from_state()` picks up.
 - `SegmentationRenderEnv.get_segmentation_instances(seg_image)` (same
   file) returns a `{instance_name: mask}` dict directly — exactly what
   S_occ needs, so `libero_occ_env.py` uses `SegmentationRenderEnv`, not
@@ -31,9 +35,17 @@ Each candidate is also rejected if MuJoCo reports it in contact with
 anything at the (otherwise unchanged) initial pose — a cheap,
 reset-time-only safety check; it does not guarantee the occluder stays
 clear of the robot for the whole episode, since the arm moves.
+
+Converged specs can be kept on disk (`OccluderSpecCache`, keyed by the
+caller — `LiberoOccEnv` uses suite/task/init state/difficulty/resolution):
+the search is deterministic given the init state, so a cache hit skips
+it and only compiles the box in at the stored size and position.
 """
 
-from dataclasses import dataclass
+import json
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
 from typing import Any
 
 import numpy as np
@@ -44,6 +56,11 @@ CAMERA_TARGET_FRACTION = 0.85  # how far from camera to target the occluder sits
 MIN_HALF_EXTENT = 0.01  # meters
 MAX_HALF_EXTENT = 0.15  # meters
 MAX_SEARCH_ITERS = 12
+OCCLUDER_BODY_NAME = "occluder"
+OCCLUDER_GEOM_NAME = "occluder_geom"
+# Where the compiled box waits while the clear (unoccluded) baseline is
+# rendered: far below the table, out of every camera and every contact.
+PARKED_POSITION = (0.0, 0.0, -10.0)
 
 
 @dataclass
@@ -54,10 +71,56 @@ class OccluderSpec:
     achieved_s_occ: float = 0.0  # measured S_occ at the winning trial; set by search()
 
 
+class OccluderSpecCache:
+    """Converged OccluderSpecs in one JSON file, keyed by an opaque
+    string. Every put() rewrites the file atomically (temp file +
+    os.replace) after merging in whatever another process wrote since
+    it was loaded, so parallel benchmark workers can share one path."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._specs: dict[str, dict] = self._load()
+
+    def _load(self) -> dict[str, dict]:
+        if not self.path.exists():
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def get(self, key: str) -> OccluderSpec | None:
+        entry = self._specs.get(key)
+        if entry is None:
+            return None
+        return OccluderSpec(
+            size=tuple(entry["size"]),
+            position=tuple(entry["position"]),
+            target_difficulty=Difficulty(entry["target_difficulty"]),
+            achieved_s_occ=entry["achieved_s_occ"],
+        )
+
+    def put(self, key: str, spec: OccluderSpec) -> None:
+        entry = asdict(spec)
+        entry["size"] = [float(v) for v in spec.size]
+        entry["position"] = [float(v) for v in spec.position]
+        entry["target_difficulty"] = spec.target_difficulty.value
+        self._specs = {**self._load(), key: entry}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self._specs, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
 class OccluderPlacer:
-    def __init__(self, metric: SoccMetric | None = None, max_search_iters: int = MAX_SEARCH_ITERS):
+    def __init__(
+        self,
+        metric: SoccMetric | None = None,
+        max_search_iters: int = MAX_SEARCH_ITERS,
+        cache: OccluderSpecCache | None = None,
+    ):
         self.metric = metric or SoccMetric()
         self.max_search_iters = max_search_iters
+        self.cache = cache
 
     def build_occluder_xml_fragment(self, spec: OccluderSpec) -> str:
         """MJCF `<body>` snippet for a static box geom at `spec.position`.
@@ -67,8 +130,8 @@ class OccluderPlacer:
         sx, sy, sz = spec.size
         x, y, z = spec.position
         return (
-            f'<body name="occluder" pos="{x} {y} {z}">'
-            f'<geom name="occluder_geom" type="box" size="{sx} {sy} {sz}" '
+            f'<body name="{OCCLUDER_BODY_NAME}" pos="{x} {y} {z}">'
+            f'<geom name="{OCCLUDER_GEOM_NAME}" type="box" size="{sx} {sy} {sz}" '
             f'rgba="0.3 0.3 0.3 1" group="1" density="500"/>'
             f"</body>"
         )
@@ -103,13 +166,49 @@ class OccluderPlacer:
         occluder resting against a static table/wall isn't a problem, the
         occluder overlapping the robot or a manipulable object is."""
         sim = env.env.sim
-        occluder_geom_id = sim.model.geom_name2id("occluder_geom")
+        occluder_geom_id = sim.model.geom_name2id(OCCLUDER_GEOM_NAME)
         for i in range(sim.data.ncon):
             contact = sim.data.contact[i]
             if occluder_geom_id in (contact.geom1, contact.geom2):
                 return True
         return False
 
+    def _has_occluder(self, env: Any) -> bool:
+        try:
+            env.sim.model.geom_name2id(OCCLUDER_GEOM_NAME)
+        except (KeyError, ValueError):
+            return False
+        return True
+
+    def _compile_occluder(self, env: Any, spec: OccluderSpec) -> None:
+        """The one XML reload: add the box to the current scene. Resets the
+        sim, so callers restore their held-fixed state afterwards."""
+        xml = self._insert_before_worldbody_close(env.sim.model.get_xml(), self.build_occluder_xml_fragment(spec))
+        env.reset_from_xml_string(xml)
+
+    def _set_occluder(self, env: Any, size: tuple[float, float, float], position: tuple[float, float, float]) -> None:
+        """Resize/move the compiled box in place; takes effect at the next
+        mj_forward (regenerate_obs_from_state)."""
+        model = env.sim.model
+        geom_id = model.geom_name2id(OCCLUDER_GEOM_NAME)
+        model.geom_size[geom_id] = size
+        model.body_pos[model.body_name2id(OCCLUDER_BODY_NAME)] = position
+        # collision broad/mid-phase bounds are computed at compile time
+        model.geom_rbound[geom_id] = float(np.linalg.norm(size))
+        geom_aabb = getattr(model, "geom_aabb", None)  # mujoco >= 3.0
+        if geom_aabb is not None:
+            geom_aabb[geom_id] = (0.0, 0.0, 0.0, *size)
+
+    def apply(self, env: Any, spec: OccluderSpec) -> None:
+        """Put the occluder of an already-known spec (e.g. a cache hit)
+        into the scene, keeping the current sim state."""
+        baseline_state = env.get_sim_state()
+        if self._has_occluder(env):
+            self._set_occluder(env, spec.size, spec.position)
+        else:
+            self._compile_occluder(env, spec)
+        env.regenerate_obs_from_state(baseline_state)
+
     def search(
         self,
         env: Any,
@@ -122,6 +221,13 @@ class OccluderPlacer:
         position = tuple(camera_pos + CAMERA_TARGET_FRACTION * (target_pos - camera_pos))
 
         baseline_state = env.get_sim_state()
+        parked = OccluderSpec(
+            size=(MAX_HALF_EXTENT,) * 3, position=PARKED_POSITION, target_difficulty=target_difficulty
+        )
+        if self._has_occluder(env):
+            self._set_occluder(env, parked.size, parked.position)
+        else:
+            self._compile_occluder(env, parked)
         baseline_obs = env.regenerate_obs_from_state(baseline_state)
         target_mask_clear = self._target_mask(env, target_body_name, baseline_obs[f"{camera_name}_segmentation_instance"])
         if not target_mask_clear.any():
@@ -130,7 +236,6 @@ class OccluderPlacer:
                 "cannot place an occluder against it"
             )
 
-        base_xml = env.sim.model.get_xml()
         band_lo, band_hi = DIFFICULTY_BANDS[target_difficulty]
         lo, hi = MIN_HALF_EXTENT, MAX_HALF_EXTENT
         last_s_occ = None
@@ -138,8 +243,7 @@ class OccluderPlacer:
         for _ in range(self.max_search_iters):
             half_extent = (lo + hi) / 2
             spec = OccluderSpec(size=(half_extent,) * 3, position=position, target_difficulty=target_difficulty)
-            trial_xml = self._insert_before_worldbody_close(base_xml, self.build_occluder_xml_fragment(spec))
-            env.reset_from_xml_string(trial_xml)
+            self._set_occluder(env, spec.size, spec.position)
             trial_obs = env.regenerate_obs_from_state(baseline_state)
 
             if self._occluder_in_contact(env):
@@ -167,10 +271,24 @@ class OccluderPlacer:
         )
 
     def place(
-        self, env: Any, target_body_name: str, target_difficulty: Difficulty, camera_name: str = "agentview"
+        self,
+        env: Any,
+        target_body_name: str,
+        target_difficulty: Difficulty,
+        camera_name: str = "agentview",
+        cache_key: str | None = None,
     ) -> OccluderSpec:
-        """search()'s last trial reset already leaves `env` in the
-        winning configuration (the loop returns immediately on success),
-        so this just runs the search — kept as a separate method since
-        `libero_occ_env.py` calls it for its name, not its side effect."""
-        return self.search(env, target_body_name, target_difficulty, camera_name=camera_name)
+        """search()'s last trial already leaves `env` in the winning
+        configuration (the loop returns immediately on success), so
+        without a cache this just runs the search. With `self.cache` and
+        a `cache_key`, a stored spec is applied instead of searching, and
+        a freshly converged one is stored."""
+        if self.cache is not None and cache_key is not None:
+            spec = self.cache.get(cache_key)
+            if spec is not None:
+                self.apply(env, spec)
+                return spec
+        spec = self.search(env, target_body_name, target_difficulty, camera_name=camera_name)
+        if self.cache is not None and cache_key is not None:
+            self.cache.put(cache_key, spec)
+        return spec
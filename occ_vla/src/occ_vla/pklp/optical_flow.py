@@ -5,8 +5,16 @@ PKLP needs flow between three consecutive frames (o_{t-2}, o_{t-1},
 o_t) to get two velocity samples (for the finite-difference
 acceleration in kinematics.py::estimate_state), computed here as two
 pairwise RAFT calls: (o_{t-2} -> o_{t-1}) and (o_{t-1} -> o_t).
+
+Consecutive control steps share a pair -- step t's (o_{t-1} -> o_t) is
+step t+1's (o_{t-2} -> o_{t-1}) -- so RaftFlowEstimator keeps a small
+LRU cache of patch-pooled pair flows keyed by frame content and only
+runs RAFT on pairs it hasn't seen, batching up to max_batch_pairs of
+them into one forward (e.g. both pairs on the first step).
 """
 
+import hashlib
+from collections import OrderedDict
 from dataclasses import dataclass
 
 import numpy as np
@@ -44,13 +52,34 @@ def patch_pool_flow(flow: np.ndarray, patch_size: int = DEFAULT_PATCH_SIZE) -> P
     return PatchFlow(patch_centers=centers, flow=pooled.reshape(-1, 2), grid_shape=(rows, cols))
 
 
+def frame_key(frame: np.ndarray) -> bytes:
+    """Content key for a frame. Content rather than id(): the RAFT worker
+    receives a fresh copy of each frame on every RPC call."""
+    frame = np.ascontiguousarray(frame)
+    h = hashlib.blake2b(frame.data, digest_size=16)
+    h.update(repr((frame.shape, frame.dtype.str)).encode())
+    return h.digest()
+
+
 class RaftFlowEstimator:
-    def __init__(self, patch_size: int = DEFAULT_PATCH_SIZE, variant: str = "raft_large", device: str = "cuda"):
+    def __init__(
+        self,
+        patch_size: int = DEFAULT_PATCH_SIZE,
+        variant: str = "raft_large",
+        device: str = "cuda",
+        cache_size: int = 8,
+        max_batch_pairs: int = 2,
+    ):
         self.patch_size = patch_size
         self.variant = variant
         self.device = device
+        self.cache_size = cache_size  # pair flows kept; 0 disables reuse across calls
+        self.max_batch_pairs = max_batch_pairs  # pairs per RAFT forward when several are missing
         self._model = None
         self._transforms = None
+        self._cache: OrderedDict[tuple[bytes, bytes], PatchFlow] = OrderedDict()
+        self.pairs_computed = 0
+        self.pairs_reused = 0
 
     def load(self) -> None:
         from torchvision.models.optical_flow import (  # noqa: PLC0415
@@ -71,32 +100,71 @@ class RaftFlowEstimator:
         self._model = self._model.to(self.device).eval()
         self._transforms = weights.transforms()
 
-    def _pair_flow(self, frame_a: np.ndarray, frame_b: np.ndarray) -> np.ndarray:
-        """frame_{a,b}: HWC uint8, same shape. Returns dense flow (H, W, 2)
-        at the original resolution."""
+    def reset(self) -> None:
+        """Drop cached pair flows, e.g. at an episode boundary."""
+        self._cache.clear()
+
+    def _batch_pair_flow(self, frames_a: list[np.ndarray], frames_b: list[np.ndarray]) -> np.ndarray:
+        """frames_{a,b}: equal-length lists of HWC uint8 frames, all the
+        same shape. Returns dense flows (B, H, W, 2) at the original
+        resolution, from one RAFT forward."""
         if self._model is None:
             raise RuntimeError("call load() first")
-        h, w = frame_a.shape[:2]
-        a = torch.from_numpy(frame_a).permute(2, 0, 1).unsqueeze(0).to(self.device)
-        b = torch.from_numpy(frame_b).permute(2, 0, 1).unsqueeze(0).to(self.device)
+        h, w = frames_a[0].shape[:2]
+        a = torch.from_numpy(np.stack(frames_a)).permute(0, 3, 1, 2).to(self.device)
+        b = torch.from_numpy(np.stack(frames_b)).permute(0, 3, 1, 2).to(self.device)
         a, b = self._transforms(a, b)
         with torch.no_grad():
             flow_predictions = self._model(a, b)
-        flow = flow_predictions[-1][0]  # (2, H', W'), last (most refined) iteration
+        flow = flow_predictions[-1]  # (B, 2, H', W'), last (most refined) iteration
         # RAFT's transform resizes to a multiple of 8; resize flow back and
         # rescale magnitudes to the original pixel grid.
-        flow = torch.nn.functional.interpolate(
-            flow.unsqueeze(0), size=(h, w), mode="bilinear", align_corners=False
-        )[0]
+        flow = torch.nn.functional.interpolate(flow, size=(h, w), mode="bilinear", align_corners=False)
         scale_x, scale_y = w / a.shape[-1], h / a.shape[-2]
-        flow[0] *= scale_x
-        flow[1] *= scale_y
-        return flow.permute(1, 2, 0).cpu().numpy()  # (H, W, 2)
+        flow[:, 0] *= scale_x
+        flow[:, 1] *= scale_y
+        return flow.permute(0, 2, 3, 1).cpu().numpy()  # (B, H, W, 2)
+
+    def _pair_flow(self, frame_a: np.ndarray, frame_b: np.ndarray) -> np.ndarray:
+        """frame_{a,b}: HWC uint8, same shape. Returns dense flow (H, W, 2)
+        at the original resolution."""
+        return self._batch_pair_flow([frame_a], [frame_b])[0]
+
+    def sequence_patch_flow(self, frames: list[np.ndarray]) -> list[PatchFlow]:
+        """Patch-pooled flow for each consecutive pair of `frames`
+        (len(frames) - 1 results, oldest first). Pairs already in the cache
+        are reused; the rest go through RAFT max_batch_pairs at a time."""
+        keys = [frame_key(f) for f in frames]
+        pairs = list(zip(keys[:-1], keys[1:]))
+        results: dict[tuple[bytes, bytes], PatchFlow] = {}
+        missing = []
+        for i, pair in enumerate(pairs):
+            if pair in self._cache:
+                self._cache.move_to_end(pair)
+                results[pair] = self._cache[pair]
+                self.pairs_reused += 1
+            elif pair not in results:
+                missing.append(i)
+                results[pair] = None  # filled below; a repeated pair is computed once
+
+        step = max(1, self.max_batch_pairs)
+        for start in range(0, len(missing), step):
+            chunk = missing[start : start + step]
+            dense = self._batch_pair_flow([frames[i] for i in chunk], [frames[i + 1] for i in chunk])
+            for i, flow in zip(chunk, dense):
+                results[pairs[i]] = patch_pool_flow(flow, self.patch_size)
+                self.pairs_computed += 1
+                if self.cache_size > 0:
+                    self._cache[pairs[i]] = results[pairs[i]]
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return [results[pair] for pair in pairs]
 
     def three_frame_patch_flow(
         self, frame_t2: np.ndarray, frame_t1: np.ndarray, frame_t0: np.ndarray
     ) -> tuple[PatchFlow, PatchFlow]:
-        """Returns (flow[t-2 -> t-1], flow[t-1 -> t]), both patch-pooled."""
-        flow_a = self._pair_flow(frame_t2, frame_t1)
-        flow_b = self._pair_flow(frame_t1, frame_t0)
-        return patch_pool_flow(flow_a, self.patch_size), patch_pool_flow(flow_b, self.patch_size)
+        """Returns (flow[t-2 -> t-1], flow[t-1 -> t]), both patch-pooled.
+        When called once per step on a sliding window, only the newest
+        pair is computed; the older one comes from the previous call."""
+        flow_a, flow_b = self.sequence_patch_flow([frame_t2, frame_t1, frame_t0])
+        return flow_a, flow_b
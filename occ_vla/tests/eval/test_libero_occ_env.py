@@ -2,20 +2,36 @@ import re
 
 import numpy as np
 
-from occ_vla.eval.libero_occ_env import AGENTVIEW_KEY, AGENTVIEW_SEGMENTATION_KEY, LiberoOccEnv, LiberoOccEnvConfig
+from occ_vla.eval.libero_occ_env import (
+    AGENTVIEW_KEY,
+    AGENTVIEW_SEGMENTATION_KEY,
+    SEG_ROBOT,
+    SEG_TARGET,
+    LiberoOccEnv,
+    LiberoOccEnvConfig,
+    segmentation_lookup,
+)
 from occ_vla.eval.metrics import DIFFICULTY_BANDS, Difficulty
 
 TARGET_MASK = np.ones((8, 8), dtype=bool)
 
 
 class _FakeModel:
+    def __init__(self):
+        self.has_occluder = False
+        self.geom_size = np.zeros((100, 3))
+        self.geom_rbound = np.zeros(100)
+        self.body_pos = np.zeros((3, 3))
+
     def body_name2id(self, name):
-        return {"table": 0, "target_obj": 1}[name]
+        return {"table": 0, "target_obj": 1, "occluder": 2}[name]
 
     def camera_name2id(self, name):
         return 0
 
     def geom_name2id(self, name):
+        if not self.has_occluder:
+            raise ValueError(f"no geom {name!r}")
         return 99
 
     def get_xml(self):
@@ -49,7 +65,8 @@ class _FakeLiberoEnv:
         self.bddl_file_name = bddl_file_name
         self.env = _FakeDomainEnv()
         self.obj_of_interest = ["target_obj"]
-        self.segmentation_robot_id = 0
+        self.segmentation_robot_id = 1
+        self.instance_to_id = {"target_obj": 1}
         self._last_half_extent = 0.0
         self.step_calls = 0
         self.arm_occluding = False  # tests flip this to simulate the arm covering the target
@@ -68,33 +85,49 @@ class _FakeLiberoEnv:
         return "state"
 
     def reset_from_xml_string(self, xml):
-        match = re.search(r'size="([\d.]+) ([\d.]+) ([\d.]+)"', xml)
-        self._last_half_extent = float(match.group(1)) if match else 0.0
+        match = re.search(r'pos="(\S+) (\S+) (\S+)"><geom [^>]*size="(\S+) (\S+) (\S+)"', xml)
+        model = self.env.sim.model
+        model.has_occluder = True
+        model.body_pos[2] = [float(v) for v in match.groups()[:3]]
+        model.geom_size[99] = [float(v) for v in match.groups()[3:]]
 
     def regenerate_obs_from_state(self, state):
-        return {AGENTVIEW_SEGMENTATION_KEY: None}
+        # "render": the occluder's current size, unless it is parked out of view
+        model = self.env.sim.model
+        if model.has_occluder:
+            self._last_half_extent = float(model.geom_size[99][0]) if model.body_pos[2][2] > -1.0 else 0.0
+        return {AGENTVIEW_SEGMENTATION_KEY: self._segmentation_image()}
 
-    def get_segmentation_instances(self, segmentation_image):
+    def _segmentation_image(self):
         occlusion_fraction = min(1.0, 3.0 * self._last_half_extent)
         n_occluded = int(round(occlusion_fraction * TARGET_MASK.sum()))
         mask = TARGET_MASK.copy().reshape(-1)
         mask[:n_occluded] = False
         target_mask_now = mask.reshape(TARGET_MASK.shape)
-        # Arm mask covers whatever part of the target is currently not
-        # visible, if arm_occluding is set -- otherwise all-False (the
-        # occlusion, if any, is attributed to something else, e.g. a
-        # placed physical occluder).
-        robot_mask = (~target_mask_now) if self.arm_occluding else np.zeros_like(target_mask_now)
-        return {
-            "target_obj": target_mask_now[..., None],
-            "robot": robot_mask[..., None],
-        }
+        seg = np.zeros(TARGET_MASK.shape + (1,), dtype=np.int32)
+        seg[target_mask_now, 0] = self.instance_to_id["target_obj"]
+        # The arm covers whatever part of the target is currently not
+        # visible, if arm_occluding is set -- otherwise the occlusion, if
+        # any, is attributed to something else (e.g. a placed physical
+        # occluder). A gripper id above segmentation_robot_id + 1 is
+        # clamped to "robot", as upstream does.
+        if self.arm_occluding:
+            seg[~target_mask_now, 0] = self.segmentation_robot_id + 3
+        return seg
+
+    def get_segmentation_instances(self, segmentation_image):
+        # libero's SegmentationRenderEnv.get_segmentation_instances
+        segmentation_image = segmentation_image.copy()
+        segmentation_image[segmentation_image > self.segmentation_robot_id] = self.segmentation_robot_id + 1
+        masks = {name: segmentation_image == value for name, value in self.instance_to_id.items()}
+        masks["robot"] = segmentation_image == self.segmentation_robot_id + 1
+        return masks
 
     def step(self, action):
         self.step_calls += 1
         obs = {
             AGENTVIEW_KEY: np.full(TARGET_MASK.shape + (3,), 100, dtype=np.uint8),
-            AGENTVIEW_SEGMENTATION_KEY: None,
+            AGENTVIEW_SEGMENTATION_KEY: self._segmentation_image(),
         }
         return obs, 0.0, False, {}
 
@@ -163,6 +196,58 @@ def test_arm_s_occ_reflects_arm_occlusion_against_clear_baseline():
     assert occ_env.compute_total_occ(obs_now) == 1.0
 
 
+def test_occlusion_stats_split_scene_and_arm_occlusion():
+    config = LiberoOccEnvConfig(
+        benchmark_suite="libero_spatial", task_id=0, difficulty=Difficulty.LIGHT, place_occluder=False
+    )
+    occ_env = _build_env_with_fakes(config)
+    obs = occ_env.reset()
+    occ_env.capture_clear_baseline(obs)
+
+    occ_env._env._last_half_extent = 0.125  # noqa: SLF001 -- 3 * 0.125 = 37.5% covered by a non-arm occluder
+    stats = occ_env.compute_occlusion_stats(occ_env._env.regenerate_obs_from_state("state"))  # noqa: SLF001
+    assert (stats.arm, stats.scene, stats.total) == (0.0, 0.375, 0.375)
+
+    occ_env._env.arm_occluding = True  # noqa: SLF001
+    stats = occ_env.compute_occlusion_stats(occ_env._env.regenerate_obs_from_state("state"))  # noqa: SLF001
+    assert (stats.arm, stats.scene, stats.total) == (0.375, 0.0, 0.375)
+
+
+def test_segmentation_lookup_matches_get_segmentation_instances():
+    fake = _FakeLiberoEnv(bddl_file_name="/fake/task.bddl", camera_names=[])
+    fake.segmentation_robot_id = 4
+    fake.instance_to_id = {"target_obj": 3}
+    seg = np.random.default_rng(0).integers(0, 9, size=(16, 16, 1)).astype(np.int32)
+
+    lookup = segmentation_lookup(fake.segmentation_robot_id, fake.instance_to_id["target_obj"])
+    flags = np.take(lookup, seg[..., 0], mode="clip")
+    masks = fake.get_segmentation_instances(seg)
+
+    assert (((flags & SEG_TARGET) != 0) == masks["target_obj"][..., 0]).all()
+    assert (((flags & SEG_ROBOT) != 0) == masks["robot"][..., 0]).all()
+
+
+def test_occlusion_stats_batch_matches_per_env():
+    config = LiberoOccEnvConfig(
+        benchmark_suite="libero_spatial", task_id=0, difficulty=Difficulty.LIGHT, place_occluder=False
+    )
+    envs, observations = [], []
+    for half_extent, arm_occluding, robot_id in [(0.0, False, 1), (0.125, False, 1), (0.25, True, 5)]:
+        occ_env = _build_env_with_fakes(config)
+        occ_env._env.segmentation_robot_id = robot_id  # noqa: SLF001 -- tables of different sizes
+        occ_env.capture_clear_baseline(occ_env.reset())
+        occ_env._env._last_half_extent = half_extent  # noqa: SLF001
+        occ_env._env.arm_occluding = arm_occluding  # noqa: SLF001
+        envs.append(occ_env)
+        observations.append(occ_env._env.regenerate_obs_from_state("state"))  # noqa: SLF001
+
+    batched = LiberoOccEnv.compute_occlusion_stats_batch(envs, observations)
+
+    assert batched == [env.compute_occlusion_stats(obs) for env, obs in zip(envs, observations)]
+    assert [s.total for s in batched] == [0.0, 0.375, 0.75]
+    assert [s.arm for s in batched] == [0.0, 0.0, 0.75]
+
+
 def test_compute_arm_s_occ_requires_baseline_first():
     config = LiberoOccEnvConfig(
         benchmark_suite="libero_spatial", task_id=0, difficulty=Difficulty.LIGHT, place_occluder=False
@@ -201,3 +286,23 @@ def test_pixel_mask_blackens_clear_footprint_after_baseline_captured():
     # footprint blackens every pixel -- the point being it's masked at
     # all (and wasn't, above, before capture_clear_baseline).
     assert (obs2[AGENTVIEW_KEY] == 0).all()
+
+
+def test_reset_reuses_cached_occluder_spec(tmp_path):
+    config = LiberoOccEnvConfig(
+        benchmark_suite="libero_spatial",
+        task_id=0,
+        difficulty=Difficulty.MEDIUM,
+        occluder_cache_dir=str(tmp_path),
+    )
+    occ_env = _build_env_with_fakes(config)
+    occ_env.reset()
+    first_s_occ = occ_env.last_s_occ
+
+    fresh_env = _build_env_with_fakes(config)
+    fresh_env.occluder_placer.search = None  # a cache hit must not search
+    fresh_env.reset()
+
+    assert fresh_env.last_s_occ == first_s_occ
+    assert (tmp_path / "occluder_specs.json").exists()
+    assert occ_env.occluder_cache_key() == "libero_spatial/task0/init0/medium/256px"
@@ -4,7 +4,13 @@ import numpy as np
 import pytest
 
 from occ_vla.eval.metrics import DIFFICULTY_BANDS, Difficulty
-from occ_vla.eval.occluder import CAMERA_TARGET_FRACTION, OccluderPlacer, OccluderSpec
+from occ_vla.eval.occluder import (
+    CAMERA_TARGET_FRACTION,
+    PARKED_POSITION,
+    OccluderPlacer,
+    OccluderSpec,
+    OccluderSpecCache,
+)
 
 
 def test_build_occluder_xml_fragment_contains_pose_and_size():
@@ -29,9 +35,17 @@ def test_insert_before_worldbody_close_raises_without_worldbody():
 
 
 class _FakeModel:
+    """Model arrays the placer writes to; the occluder body/geom only
+    exist once an XML containing them has been loaded."""
+
     def __init__(self):
         self._bodies = {"table": 0, "target_obj": 1}
+        self._geoms = {}
         self._cameras = {"agentview": 0}
+        self.geom_size = np.zeros((100, 3))
+        self.geom_rbound = np.zeros(100)
+        self.body_pos = np.zeros((3, 3))
+        self.xml = "<mujoco><worldbody><body name=\"table\"/></worldbody></mujoco>"
 
     def body_name2id(self, name):
         return self._bodies[name]
@@ -40,11 +54,21 @@ class _FakeModel:
         return self._cameras[name]
 
     def geom_name2id(self, name):
-        assert name == "occluder_geom"
-        return 99
+        if name not in self._geoms:
+            raise ValueError(f"no geom {name!r}")
+        return self._geoms[name]
 
     def get_xml(self):
-        return "<mujoco><worldbody><body name=\"table\"/></worldbody></mujoco>"
+        return self.xml
+
+    def load_xml(self, xml):
+        self.xml = xml
+        match = re.search(r'<body name="occluder" pos="(\S+) (\S+) (\S+)"><geom [^>]*size="(\S+) (\S+) (\S+)"', xml)
+        if match:
+            self._bodies["occluder"] = 2
+            self._geoms["occluder_geom"] = 99
+            self.body_pos[2] = [float(v) for v in match.groups()[:3]]
+            self.geom_size[99] = [float(v) for v in match.groups()[3:]]
 
 
 class _FakeContact:
@@ -80,33 +104,41 @@ class _FakeSegmentationEnv:
     """Occlusion grows monotonically with the requested occluder
     half-extent: at half_extent, `occlusion_fraction * 64` of the
     target's 64 pixels are covered. `occlusion_fraction` is read back
-    out of the XML the placer builds, so this exercises the real
-    binary-search loop end to end."""
+    out of the model arrays the placer writes (as the renderer would),
+    so this exercises the real binary-search loop end to end."""
 
     def __init__(self, occlusion_per_half_extent: float, always_in_contact: bool = False):
         self.env = _FakeDomainEnv()
         self._occlusion_per_half_extent = occlusion_per_half_extent
         self._always_in_contact = always_in_contact
-        self._last_half_extent = 0.0
+        self.xml_reloads = 0
 
     @property
     def sim(self):
         return self.env.sim
 
+    @property
+    def _half_extent(self):
+        model = self.env.sim.model
+        if "occluder_geom" not in model._geoms or model.body_pos[2][2] == PARKED_POSITION[2]:  # noqa: SLF001
+            return 0.0
+        return float(model.geom_size[99][0])
+
     def get_sim_state(self):
         return "baseline_state"
 
     def reset_from_xml_string(self, xml):
-        match = re.search(r'size="([\d.]+) ([\d.]+) ([\d.]+)"', xml)
-        self._last_half_extent = float(match.group(1)) if match else 0.0
-        self.env.sim.data.ncon = 1 if self._always_in_contact else 0
-        self.env.sim.data.contact = [_FakeContact(99, 0)] if self._always_in_contact else []
+        self.xml_reloads += 1
+        self.env.sim.model.load_xml(xml)
 
     def regenerate_obs_from_state(self, state):
+        in_contact = self._always_in_contact and self._half_extent > 0
+        self.env.sim.data.ncon = 1 if in_contact else 0
+        self.env.sim.data.contact = [_FakeContact(99, 0)] if in_contact else []
         return {"agentview_segmentation_instance": None}
 
     def get_segmentation_instances(self, segmentation_image):
-        occlusion_fraction = min(1.0, self._occlusion_per_half_extent * self._last_half_extent)
+        occlusion_fraction = min(1.0, self._occlusion_per_half_extent * self._half_extent)
         n_occluded = int(round(occlusion_fraction * TARGET_MASK.sum()))
         mask = TARGET_MASK.copy().reshape(-1)
         mask[:n_occluded] = False
@@ -155,3 +187,48 @@ def test_search_raises_when_band_unreachable_within_size_bounds():
     env = _FakeSegmentationEnv(occlusion_per_half_extent=0.001)
     with pytest.raises(RuntimeError, match="did not converge"):
         OccluderPlacer(max_search_iters=6).search(env, "target_obj", Difficulty.HEAVY)
+
+
+def test_search_compiles_the_occluder_once_and_resizes_it_in_place():
+    env = _FakeSegmentationEnv(occlusion_per_half_extent=3.0)
+    spec = OccluderPlacer().search(env, "target_obj", Difficulty.MEDIUM)
+
+    assert env.xml_reloads == 1
+    model = env.sim.model
+    np.testing.assert_allclose(model.geom_size[99], spec.size)
+    np.testing.assert_allclose(model.body_pos[2], spec.position)
+    assert model.geom_rbound[99] == pytest.approx(np.linalg.norm(spec.size))
+
+    # a second search on the same scene reuses the compiled box
+    OccluderPlacer().search(env, "target_obj", Difficulty.LIGHT)
+    assert env.xml_reloads == 1
+
+
+def test_spec_cache_round_trips_through_disk(tmp_path):
+    spec = OccluderSpec(
+        size=(0.05, 0.05, 0.05), position=(0.1, 0.2, 0.3), target_difficulty=Difficulty.HEAVY, achieved_s_occ=0.7
+    )
+    OccluderSpecCache(tmp_path / "specs.json").put("suite/task0/init0/heavy/256px", spec)
+
+    cache = OccluderSpecCache(tmp_path / "specs.json")
+    assert cache.get("suite/task0/init0/heavy/256px") == spec
+    assert cache.get("suite/task0/init1/heavy/256px") is None
+
+
+def test_place_with_cache_searches_once_then_applies_stored_spec(tmp_path):
+    placer = OccluderPlacer(cache=OccluderSpecCache(tmp_path / "specs.json"))
+    first_env = _FakeSegmentationEnv(occlusion_per_half_extent=3.0)
+    spec = placer.place(first_env, "target_obj", Difficulty.MEDIUM, cache_key="k")
+
+    def no_search(*args, **kwargs):
+        raise AssertionError("cache hit should not search")
+
+    cached_placer = OccluderPlacer(cache=OccluderSpecCache(tmp_path / "specs.json"))
+    cached_placer.search = no_search
+    second_env = _FakeSegmentationEnv(occlusion_per_half_extent=3.0)
+    cached_spec = cached_placer.place(second_env, "target_obj", Difficulty.MEDIUM, cache_key="k")
+
+    assert cached_spec == spec
+    assert second_env.xml_reloads == 1
+    np.testing.assert_allclose(second_env.sim.model.geom_size[99], spec.size)
+    np.testing.assert_allclose(second_env.sim.model.body_pos[2], spec.position)
@@ -1,7 +1,7 @@
 import numpy as np
 import pytest
 
-from occ_vla.pklp.optical_flow import patch_pool_flow
+from occ_vla.pklp.optical_flow import RaftFlowEstimator, patch_pool_flow
 
 
 def test_patch_pool_flow_uniform_field():
@@ -34,3 +34,80 @@ def test_patch_pool_flow_rejects_non_divisible_shape():
     flow = np.zeros((30, 32, 2), dtype=np.float32)
     with pytest.raises(ValueError):
         patch_pool_flow(flow, patch_size=16)
+
+
+class _FakeRaft:
+    """Stand-in for torchvision's RAFT: flow is the per-pixel brightness
+    difference b - a (same value in x and y), and every forward's batch
+    size is recorded."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def __call__(self, a, b):
+        self.batch_sizes.append(a.shape[0])
+        diff = (b - a).mean(dim=1, keepdim=True)
+        return [diff.repeat(1, 2, 1, 1)]
+
+
+def _estimator(**kwargs):
+    estimator = RaftFlowEstimator(patch_size=16, device="cpu", **kwargs)
+    estimator._model = _FakeRaft()
+    estimator._transforms = lambda a, b: (a.float(), b.float())
+    return estimator
+
+
+def _frames(n):
+    return [np.full((32, 32, 3), 10 * i, dtype=np.uint8) for i in range(n)]
+
+
+def test_three_frame_patch_flow_reuses_previous_pair():
+    estimator = _estimator()
+    f = _frames(4)
+
+    earlier, latest = estimator.three_frame_patch_flow(f[0], f[1], f[2])
+    np.testing.assert_allclose(earlier.flow, 10.0)
+    np.testing.assert_allclose(latest.flow, 10.0)
+    assert estimator._model.batch_sizes == [2]  # both pairs in one forward on the first step
+
+    # Next step: fresh copies of the shared frames (as the RPC worker
+    # sees them) still hit the cache; only the newest pair runs RAFT.
+    earlier2, latest2 = estimator.three_frame_patch_flow(f[1].copy(), f[2].copy(), f[3])
+    assert estimator._model.batch_sizes == [2, 1]
+    assert earlier2 is latest
+    assert (estimator.pairs_computed, estimator.pairs_reused) == (3, 1)
+
+
+def test_sequence_patch_flow_batches_missing_pairs():
+    estimator = _estimator(max_batch_pairs=3)
+    flows = estimator.sequence_patch_flow(_frames(6))
+    assert estimator._model.batch_sizes == [3, 2]
+    assert len(flows) == 5
+    for flow in flows:
+        np.testing.assert_allclose(flow.flow, 10.0)
+
+
+def test_cached_flow_matches_uncached():
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (32, 48, 3), dtype=np.uint8) for _ in range(4)]
+    cached, uncached = _estimator(), _estimator(cache_size=0)
+    for t in range(2, 4):
+        for a, b in zip(cached.three_frame_patch_flow(*frames[t - 2 : t + 1]),
+                        uncached.three_frame_patch_flow(*frames[t - 2 : t + 1])):
+            np.testing.assert_allclose(a.flow, b.flow)
+            assert a.grid_shape == b.grid_shape == (2, 3)
+    assert uncached.pairs_computed == 4 and cached.pairs_computed == 3
+
+
+def test_cache_is_bounded_and_resettable():
+    estimator = _estimator(cache_size=2)
+    estimator.sequence_patch_flow(_frames(5))
+    assert len(estimator._cache) == 2
+    estimator.reset()
+    assert len(estimator._cache) == 0
+
+
+def test_pair_flow_requires_load():
+    estimator = RaftFlowEstimator(device="cpu")
+    with pytest.raises(RuntimeError):
+        estimator.three_frame_patch_flow(*_frames(3))
@@ -1,15 +1,16 @@
 import os
-from pathlib import Path
-import pddlgym
+import re
+from pddlgym.core import PDDLEnv
+from pddlgym.parser import PDDLDomain, PDDLDomainParser, PDDLProblemParser
+from pddlgym.structs import State
 from pddlgym_planners.fd import FD
-import shutil
 import subprocess
-import utils.utils as utils
+import time as timer
 import traceback
 
 PLANNER = "./downward/fast-downward.py "
 MAX_ERR_MSG_LEN = 10000000
-PDDLGYM_PATH = os.path.dirname(pddlgym.__file__)
+MEMORY_FNAME = "<memory>"
 
 def SEARCH_CONFIG(mt): 
     return "--search 'astar(lmcut(), max_time={})' ".format(mt)
@@ -32,39 +33,90 @@ def query(domain_path: str, problem_path: str, plan_file: str, print_plan: False
         exit_code = 1
     return plan, cost, plan_time, exit_code, err.decode()
 
-def export_domain_to_pddlgym(domain: str, src_domain_file: str):
-    dst = os.path.join(PDDLGYM_PATH, f"pddl/{domain}.pddl")
-    if os.path.isfile(dst): os.remove(dst)
-    shutil.copyfile(src_domain_file, dst)
-
-def export_problem_to_pddlgym(domain: str, src_problem_file: str, p_idx: str, clear_dir=False):
-    dst_path = os.path.join(PDDLGYM_PATH, f"pddl/{domain}/")
-    Path(dst_path).mkdir(parents=True, exist_ok=True)
-    if clear_dir:
-        for f in os.listdir(dst_path): os.remove(os.path.join(dst_path, f))
-    shutil.copyfile(src_problem_file, os.path.join(dst_path, f"problem{p_idx}.pddl"))
-
-def register_new_pddlgym_env(new_domain: str):
-    new_env = (new_domain, {'operators_as_actions': True, 'dynamic_action_space': True})
-    new_line = "\t\t" + str(new_env) + ",\n"
-    with open(os.path.join(PDDLGYM_PATH, "__init__.py"), "r+") as file:
-        lines = file.readlines()
-        if new_line not in lines:
-            for i, line in enumerate(lines):
-                if "for env_name, kwargs in [" in line:
-                    lines.insert(i + 1, new_line)
-                    file.seek(0)
-                    file.writelines(lines)
-                    break
-
-def query_pddlgym(domain: str, p_idx: int = 0, max_time: float = 120):
+class TextPDDLDomainParser(PDDLDomainParser):
+    """PDDLDomainParser that reads the domain from a string instead of a file."""
+    def __init__(self, domain_text: str, expect_action_preds=True, operators_as_actions=False):
+        PDDLDomain.__init__(self, operators_as_actions=operators_as_actions)
+        self.domain_fname = MEMORY_FNAME
+        self.domain = domain_text.lower()
+        self.is_probabilistic = ("probabilistic" in self.domain)
+        if expect_action_preds:
+            self.actions = self._parse_actions()
+        self.domain = self._purge_comments(self.domain)
+        assert ";" not in self.domain
+        self._parse_domain()
+        if operators_as_actions:
+            assert not expect_action_preds
+            self.actions = self._create_actions_from_operators()
+        elif not expect_action_preds:
+            self.actions = set()
+
+class TextPDDLProblemParser(PDDLProblemParser):
+    """PDDLProblemParser that reads the problem from a string instead of a file."""
+    def __init__(self, problem_text: str, domain_name, types, predicates, action_names, constants=None):
+        self.problem_fname = MEMORY_FNAME
+        self.domain_name = domain_name
+        self.types = types
+        self.predicates = predicates
+        self.action_names = action_names
+        self.uses_typing = not ("default" in self.types)
+        self.constants = constants or []
+        self.problem_name, self.objects, self.initial_state, self.goal = None, None, None, None
+        self.problem = self._purge_comments(problem_text.lower())
+        assert ";" not in self.problem
+        self._parse_problem()
+
+    def parse_goal(self, goal_text: str):
+        """Parse a stand-alone ``(:goal ...)`` block against this problem's objects."""
+        goal = self._purge_comments(goal_text.lower())
+        goal = self._find_balanced_expression(goal, re.search(r"\(:goal", goal).start())
+        return self._parse_into_literal(goal[6:-1].strip(), {obj.name: obj.var_type for obj in self.objects})
+
+class InMemoryPDDLEnv(PDDLEnv):
+    """PDDLEnv built from PDDL strings, so nothing is written into the installed pddlgym package.
+
+    Each process owns its env, which lets decomposition runs plan concurrently.
+    """
+    def __init__(self, domain_text: str, problem_texts: list = (), **kwargs):
+        super().__init__(domain_text, list(problem_texts), **kwargs)
+
+    @staticmethod
+    def load_pddl(domain_text, problem_texts, operators_as_actions=False):
+        domain = TextPDDLDomainParser(domain_text, expect_action_preds=(not operators_as_actions),
+                                      operators_as_actions=operators_as_actions)
+        return domain, [parse_problem(domain, p) for p in problem_texts]
+
+    def add_problem(self, problem_text: str):
+        self.problems.append(parse_problem(self.domain, problem_text))
+        return len(self.problems) - 1
+
+    def reset_to(self, problem: PDDLProblemParser, literals, goal):
+        """Start an episode on ``problem``'s objects from the given literals and goal, without reparsing."""
+        self._problem = problem
+        state = self._handle_derived_literals(State(frozenset(literals), frozenset(problem.objects), goal))
+        self.set_state(state)
+        self._goal = goal
+        self._action_space.reset_initial_state(state)
+        return state
+
+def parse_domain(domain_text: str):
+    return TextPDDLDomainParser(domain_text, expect_action_preds=False, operators_as_actions=True)
+
+def parse_problem(domain: PDDLDomain, problem_text: str):
+    return TextPDDLProblemParser(problem_text, domain.domain_name, domain.types,
+                                 domain.predicates, domain.actions, domain.constants)
+
+def make_pddlgym_env(domain_text: str, problem_texts: list = ()):
+    return InMemoryPDDLEnv(domain_text, problem_texts, operators_as_actions=True, dynamic_action_space=True)
+
+def query_pddlgym(domain_text: str, problem_text: str, max_time: float = 120):
     plan, cost, node, time, exit_code = None, 0, 0, 0., 0
     print("Planning with undecomposed problem...")
     try:
         fd_planner = FD()
         fd_planner._alias = "seq-sat-lama-2011" # バグ回避のための属性直接指定
-        env = pddlgym.make(f"PDDLEnv{domain.capitalize()}-v0")
-        env.fix_problem_index(p_idx)
+        env = make_pddlgym_env(domain_text, [problem_text])
+        env.fix_problem_index(0)
         state, _ = env.reset()
         plan = fd_planner(env.domain, state, timeout=max_time)
         stat = fd_planner.get_statistics()
@@ -77,34 +129,49 @@ def query_pddlgym(domain: str, p_idx: int = 0, max_time: float = 120):
         exit_code = 3 if "timed out" in err else 2
     return [p.pddl_str() for p in plan] if exit_code == 1 else None, time, node, cost, exit_code
 
-def query_pddlgym_decompose(domain: str, subgoal_pddl_list: list, save_path: str = None, max_time: float = 120):
+def query_pddlgym_decompose(domain_text: str, problem_text: str, subgoal_pddl_list: list, save_path: str = None,
+                            max_time: float = 120, return_timings: bool = False):
     digits = 2 if len(subgoal_pddl_list) >= 10 else 1
-    p_0_file = os.path.join(PDDLGYM_PATH, f"pddl/{domain}/problem{str(0).zfill(digits)}.pddl")
     print("Planning with decomposed problems...")
-    plans, times, nodes, costs, final_state, exit_code, completed_sp = [], [], [], [], [], 0, 0
-    
+    plans, times, nodes, costs, exit_code, completed_sp = [], [], [], [], 0, 0
+    timings = {"parse": 0., "setup": [], "search": [], "execute": []}
+
     fd_planner = FD()
     fd_planner._alias = "seq-sat-lama-2011"
 
+    # Domain and base problem are parsed once; every subgoal starts from the literal set
+    # the previous subgoal's plan ended in, so nothing is written back to PDDL and reparsed.
+    try:
+        t = timer.perf_counter()
+        env = make_pddlgym_env(domain_text, [problem_text])
+        problem = env.problems[0]
+        literals = problem.initial_state
+        timings["parse"] = timer.perf_counter() - t
+    except Exception:
+        print(f"Could not parse problem!\n{traceback.format_exc()}")
+        return (plans, times, nodes, costs, 2, completed_sp) + ((timings,) if return_timings else ())
+
     for idx, sgp in enumerate(subgoal_pddl_list, start=1):
-        sp_file = os.path.join(PDDLGYM_PATH, f"pddl/{domain}/problem{str(idx).zfill(digits)}.pddl")
-        shutil.copyfile(p_0_file, sp_file)
         try:
-            utils.set_pddl_problem_goal(sp_file, sgp)
-            if idx > 1: utils.set_pddl_problem_init(sp_file, final_state)
-        except Exception as e: print(f"Error writing PDDL: {e}")
-
-        if save_path: shutil.copyfile(sp_file, os.path.join(save_path, f"p{str(idx).zfill(digits)}.pddl"))
+            t = timer.perf_counter()
+            goal = problem.parse_goal(sgp)
+            state = env.reset_to(problem, literals, goal)
+            if save_path:
+                PDDLProblemParser.create_pddl_file(
+                    os.path.join(save_path, f"p{str(idx).zfill(digits)}.pddl"), problem.objects, literals,
+                    problem.problem_name, problem.domain_name, goal)
+            timings["setup"].append(timer.perf_counter() - t)
 
-        try:
-            env = pddlgym.make(f"PDDLEnv{domain.capitalize()}-v0")
-            env.fix_problem_index(idx)
-            state, _ = env.reset()
+            t = timer.perf_counter()
             plan = fd_planner(env.domain, state, timeout=max_time)
+            timings["search"].append(timer.perf_counter() - t)
             stat = fd_planner.get_statistics()
             print(f"Subgoal {idx}: {stat['total_time']}s")
+
+            t = timer.perf_counter()
             for act in plan: state, _, _, _, _ = env.step(act)
-            final_state = sorted([lit.pddl_str() for lit in state.literals if not lit.is_negative])
+            literals = frozenset(lit for lit in state.literals if not lit.is_negative)
+            timings["execute"].append(timer.perf_counter() - t)
             completed_sp += 1
             exit_code = 1
             plans.append([p.pddl_str() for p in plan])
@@ -112,7 +179,9 @@ def query_pddlgym_decompose(domain: str, subgoal_pddl_list: list, save_path: str
         except Exception:
             print(f"Subgoal {idx} failed!\n{traceback.format_exc()}")
             exit_code = 2; break
-    return plans, times, nodes, costs, exit_code, completed_sp
+    print("Decomposition overhead: parse {:.3f}s, setup {:.3f}s, execute {:.3f}s; search {:.3f}s".format(
+        timings["parse"], sum(timings["setup"]), sum(timings["execute"]), sum(timings["search"])))
+    return (plans, times, nodes, costs, exit_code, completed_sp) + ((timings,) if return_timings else ())
 
 def validate(domain_file: str, problem_file: str, plan_file: str):
     cmd = f"Validate -v {domain_file} {problem_file} {plan_file}"
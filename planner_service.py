@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from pddlgym.core import get_successor_state
+from pddlgym.structs import State
+from pddlgym_planners.fd import FD
+import planner
+import utils.utils as utils
+
+FD_ALIAS = "seq-sat-lama-2011"
+PLAN_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".plan_cache")
+
+# Per-process planner state: one warm FD instance and every domain parsed so far,
+# keyed by the hash of its normalized text.
+_FD_PLANNER = None
+_DOMAINS = {}
+
+
+def normalize_pddl(text: str):
+    text = re.sub(r";[^\n]*", "", text.lower())
+    text = re.sub(r"\s+", " ", text)
+    return re.sub(r"\s*([()])\s*", r"\1", text).strip()
+
+
+def _digest(*parts: str):
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+def plan_key(domain_text: str, problem_text: str):
+    return _digest(FD_ALIAS, normalize_pddl(domain_text), normalize_pddl(problem_text))
+
+
+class PlanCache:
+    """Content-addressed store of planner results, one JSON file per (domain, problem) pair."""
+
+    def __init__(self, cache_dir: str = PLAN_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.hits, self.misses = 0, 0
+
+    def _path(self, key: str):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str):
+        path = self._path(key)
+        if not os.path.isfile(path):
+            self.misses += 1
+            return None
+        try:
+            with open(path, "r") as f: record = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return record
+
+    def put(self, key: str, record: dict):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so concurrent sweeps never read a half-written entry
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f: json.dump(record, f)
+        os.replace(tmp, path)
+
+
+def _get_domain(domain_text: str):
+    key = _digest(normalize_pddl(domain_text))
+    if key not in _DOMAINS:
+        _DOMAINS[key] = planner.parse_domain(domain_text)
+    return _DOMAINS[key]
+
+
+def _get_planner():
+    global _FD_PLANNER
+    if _FD_PLANNER is None:
+        _FD_PLANNER = FD()
+        _FD_PLANNER._alias = FD_ALIAS  # バグ回避のための属性直接指定
+    return _FD_PLANNER
+
+
+def solve(domain_text: str, problem_text: str, max_time: float = 120):
+    """Plan one problem with this process's warm planner; returns a JSON-serializable record."""
+    record = {"plan": None, "time": 0., "node": 0, "cost": 0, "exit_code": 0, "final_state": None}
+    try:
+        domain = _get_domain(domain_text)
+        problem = planner.parse_problem(domain, problem_text)
+        state = State(frozenset(problem.initial_state), frozenset(problem.objects), problem.goal)
+        fd_planner = _get_planner()
+        plan = fd_planner(domain, state, timeout=max_time)
+        stat = fd_planner.get_statistics()
+        for act in plan: state = get_successor_state(state, act, domain)
+        record.update(plan=[p.pddl_str() for p in plan], time=stat["total_time"],
+                      node=stat["num_node_expansions"], cost=stat["plan_cost"], exit_code=1,
+                      final_state=sorted([lit.pddl_str() for lit in state.literals if not lit.is_negative]))
+    except Exception:
+        err = traceback.format_exc()
+        print(f"Could not find solution!\n\n=== 🚨 ERROR DETAILS 🚨 ===\n{err}\n===========================\n")
+        record["exit_code"] = 3 if "timed out" in err else 2
+    return record
+
+
+class PlannerService:
+    """Plan cache in front of a pool of warm Fast Downward workers.
+
+    ``num_workers=0`` plans in the calling process, which still reuses parsed domains
+    across calls. Only solved problems are cached: a failure (exit code 2) may be a parse
+    error, a broken FD build or a planner crash rather than an unsolvable problem, and
+    timeouts (exit code 3) depend on ``max_time``.
+    """
+
+    def __init__(self, cache_dir: str = PLAN_CACHE_DIR, num_workers: int = 0, use_cache: bool = True):
+        self.cache = PlanCache(cache_dir) if use_cache else None
+        self.pool = ProcessPoolExecutor(max_workers=num_workers) if num_workers > 0 else None
+
+    def _lookup(self, domain_text: str, problem_text: str):
+        if self.cache is None: return None, None
+        key = plan_key(domain_text, problem_text)
+        return key, self.cache.get(key)
+
+    def _store(self, key: str, record: dict):
+        if self.cache is not None and record["exit_code"] == 1:
+            self.cache.put(key, record)
+
+    def solve(self, domain_text: str, problem_text: str, max_time: float = 120):
+        key, record = self._lookup(domain_text, problem_text)
+        if record is not None: return record
+        if self.pool is None:
+            record = solve(domain_text, problem_text, max_time)
+        else:
+            record = self.pool.submit(solve, domain_text, problem_text, max_time).result()
+        self._store(key, record)
+        return record
+
+    def solve_many(self, problems: list, max_time: float = 120):
+        """Plan a list of (domain_text, problem_text) pairs, fanning cache misses out to the pool."""
+        records, pending = [None] * len(problems), {}
+        for i, (domain_text, problem_text) in enumerate(problems):
+            key, records[i] = self._lookup(domain_text, problem_text)
+            if records[i] is not None: continue
+            if self.pool is None:
+                records[i] = solve(domain_text, problem_text, max_time)
+                self._store(key, records[i])
+            else:
+                pending[i] = (key, self.pool.submit(solve, domain_text, problem_text, max_time))
+        for i, (key, future) in pending.items():
+            records[i] = future.result()
+            self._store(key, records[i])
+        return records
+
+    def query(self, domain_text: str, problem_text: str, max_time: float = 120):
+        """Same return values as ``planner.query_pddlgym``."""
+        print("Planning with undecomposed problem...")
+        r = self.solve(domain_text, problem_text, max_time)
+        if r["exit_code"] == 1: print(f"Found solution in {r['time']}s with cost {r['cost']}")
+        return r["plan"], r["time"], r["node"], r["cost"], r["exit_code"]
+
+    def query_decompose(self, domain_text: str, problem_text: str, subgoal_pddl_list: list,
+                        save_path: str = None, max_time: float = 120):
+        """Same return values as ``planner.query_pddlgym_decompose``."""
+        digits = 2 if len(subgoal_pddl_list) >= 10 else 1
+        print("Planning with decomposed problems...")
+        plans, times, nodes, costs, final_state, exit_code, completed_sp = [], [], [], [], [], 0, 0
+
+        for idx, sgp in enumerate(subgoal_pddl_list, start=1):
+            sp_text = problem_text
+            try:
+                sp_text = utils.replace_pddl_problem_goal(sp_text, sgp)
+                if idx > 1: sp_text = utils.replace_pddl_problem_init(sp_text, final_state)
+            except Exception as e: print(f"Error writing PDDL: {e}")
+
+            if save_path:
+                with open(os.path.join(save_path, f"p{str(idx).zfill(digits)}.pddl"), "w") as f: f.write(sp_text)
+
+            r = self.solve(domain_text, sp_text, max_time)
+            if r["exit_code"] != 1:
+                print(f"Subgoal {idx} failed!")
+                exit_code = 2; break
+            print(f"Subgoal {idx}: {r['time']}s")
+            final_state = r["final_state"]
+            completed_sp += 1
+            exit_code = 1
+            plans.append(r["plan"])
+            times.append(r["time"]); nodes.append(r["node"]); costs.append(r["cost"])
+        return plans, times, nodes, costs, exit_code, completed_sp
+
+    def close(self):
+        if self.pool is not None: self.pool.shutdown()
+        if self.cache is not None:
+            print(f"Plan cache: {self.cache.hits} hits, {self.cache.misses} misses")
@@ -25,85 +25,185 @@ def flatten_scene_graph(sg):
     # 2. Rooms traverse
     if "rooms" in sg:
         for room_name, room_data in sg["rooms"].items():
-            # A. Direct Items (Allensville style)
-            if "items" in room_data:
-                for item_id, item_data in room_data["items"].items():
+            flat_data.update(flatten_room(room_name, room_data))
+    return flat_data
+
+def flatten_room(room_name, room_data):
+    """
+    1部屋分だけをフラット化する (flatten_scene_graph と差分更新の共通部分)。
+    """
+    flat_data = {}
+    # A. Direct Items (Allensville style)
+    if "items" in room_data:
+        for item_id, item_data in room_data["items"].items():
+            flat_data[item_id] = {
+                "room": room_name,
+                "parent": None, # 部屋に直置き
+                "state": item_data.get("state", "unknown"),
+                "accessible": item_data.get("accessible", True)
+            }
+
+    # B. Assets and Items inside Assets (Office style)
+    if "assets" in room_data:
+        for asset_id, asset_data in room_data["assets"].items():
+            # Asset自体 (Desk, Cabinet etc.)
+            flat_data[asset_id] = {
+                "room": room_name,
+                "parent": None,
+                "state": asset_data.get("state", "unknown"),
+                "accessible": asset_data.get("accessible", True)
+            }
+
+            # Items inside the Asset
+            if "items" in asset_data:
+                for item_id, item_data in asset_data["items"].items():
                     flat_data[item_id] = {
                         "room": room_name,
-                        "parent": None, # 部屋に直置き
+                        "parent": asset_id, # 家具の中にある
                         "state": item_data.get("state", "unknown"),
-                        "accessible": item_data.get("accessible", True)
+                        "accessible": item_data.get("accessible", True),
+                        "relation": item_data.get("relation", "in") # in or on
                     }
-
-            # B. Assets and Items inside Assets (Office style)
-            if "assets" in room_data:
-                for asset_id, asset_data in room_data["assets"].items():
-                    # Asset自体 (Desk, Cabinet etc.)
-                    flat_data[asset_id] = {
-                        "room": room_name,
-                        "parent": None,
-                        "state": asset_data.get("state", "unknown"),
-                        "accessible": asset_data.get("accessible", True)
-                    }
-                    
-                    # Items inside the Asset
-                    if "items" in asset_data:
-                        for item_id, item_data in asset_data["items"].items():
-                            flat_data[item_id] = {
-                                "room": room_name,
-                                "parent": asset_id, # 家具の中にある
-                                "state": item_data.get("state", "unknown"),
-                                "accessible": item_data.get("accessible", True),
-                                "relation": item_data.get("relation", "in") # in or on
-                            }
     return flat_data
 
 def compare_scene_graphs(ideal_sg, current_sg):
     """
     理想(ideal)と現実(current)を比較し、差分レポートを返す
+    (SceneGraphDiff の一回限りの利用。毎ティック比較する場合は SceneGraphDiff を保持して差分更新する)
+    """
+    return SceneGraphDiff(ideal_sg, current_sg).report()
+
+# 状態名 -> PDDL述語 (ドメインに合わせて追加可能)
+STATE_PREDICATES = {
+    "dirty": "item_dirty",
+    "clean": "item_clean",
+    "open": "item_open",
+    "closed": "item_closed",
+    "on": "item_on",
+    "empty": "item_empty",
+}
+
+def object_facts(obj_id, props, agent_name="robot"):
+    """
+    フラット化した1物体の属性を PDDL の fact 集合に変換する。
     """
-    ideal_flat = flatten_scene_graph(ideal_sg)
-    current_flat = flatten_scene_graph(current_sg)
-
-    diff_report = {
-        "state_changes": [],      # 状態変化 (Dirty, Closed...)
-        "location_changes": [],   # 場所移動 (Different Room, Inside different obj)
-        "missing_objects": [],    # なくなった物体
-        "new_objects": []         # 未知の物体 (障害物)
-    }
-
-    # 1. Check Ideal objects (Missing, Moved, Changed)
-    for obj_id, ideal_props in ideal_flat.items():
-        if obj_id not in current_flat:
-            diff_report["missing_objects"].append(obj_id)
-            continue
-        
-        curr_props = current_flat[obj_id]
-
-        # Check Location (Room or Parent Container)
-        if (ideal_props["room"] != curr_props["room"]) or (ideal_props["parent"] != curr_props["parent"]):
-            diff_report["location_changes"].append({
-                "object": obj_id,
-                "from": {"room": ideal_props["room"], "parent": ideal_props["parent"]},
-                "to": {"room": curr_props["room"], "parent": curr_props["parent"]}
-            })
-        
-        # Check State (Closed/Open, Clean/Dirty, etc.)
-        if ideal_props["state"] != curr_props["state"]:
-            diff_report["state_changes"].append({
-                "object": obj_id,
-                "expected": ideal_props["state"],
-                "actual": curr_props["state"]
-            })
-
-    # 2. Check New objects
-    for obj_id in current_flat:
-        if obj_id not in ideal_flat:
-            diff_report["new_objects"].append({
-                "object": obj_id,
-                "location": current_flat[obj_id]["room"],
-                "parent": current_flat[obj_id]["parent"],
-                "state": current_flat[obj_id]["state"]
-            })
-
-    return diff_report
\ No newline at end of file
+    if obj_id == "AGENT":
+        return {f"(agent_at {agent_name} {props['room']})"} if props["room"] else set()
+    if obj_id.startswith("HUMAN_"):
+        return set()
+    facts = {f"(item_at {obj_id} {props['room']})"}
+    if props["parent"] is not None:
+        facts.add(f"(item_{props.get('relation', 'in')} {obj_id} {props['parent']})")
+    if props["state"] in STATE_PREDICATES:
+        facts.add(f"({STATE_PREDICATES[props['state']]} {obj_id})")
+    if props.get("accessible", True):
+        facts.add(f"(item_accessible {obj_id})")
+    return facts
+
+class SceneGraphDiff:
+    """
+    理想シーングラフを一度だけフラット化して保持し、現実側の差分更新を受け付ける差分エンジン。
+    物体ごとに比較キー (属性タプル) を保持する。
+    update_objects / update_room は変化した物体数に比例する時間で差分と PDDL fact 差分を更新する。
+    report() は compare_scene_graphs と同じ形式を返す。
+    """
+
+    def __init__(self, ideal_sg, current_sg=None, agent_name="robot"):
+        self.agent_name = agent_name
+        self.ideal = flatten_scene_graph(ideal_sg)
+        self._order = {obj_id: i for i, obj_id in enumerate(self.ideal)}
+        self._ideal_keys = {obj_id: self._key(p) for obj_id, p in self.ideal.items()}
+        self.current = {}
+        self._room_objects = {}   # room -> 現実側でその部屋に属する物体
+        # 物体ごとの差分 (型ごと)
+        self.state_changes, self.location_changes, self.new_objects = {}, {}, {}
+        self.missing_objects = set(self.ideal)
+        # 物体ごとの PDDL fact 差分: obj -> (追加すべき fact, 削除すべき fact)
+        self.fact_deltas = {}
+        for obj_id in self.ideal:
+            self._refresh(obj_id)
+        if current_sg is not None:
+            self.set_current(current_sg)
+
+    @staticmethod
+    def _key(props):
+        # hash() ではなくタプル自体で比較する (ハッシュ衝突で変化を見落とさない)
+        return (props["room"], props["parent"], props["state"], props.get("accessible", True),
+                props.get("relation"))
+
+    def _refresh(self, obj_id):
+        ideal, curr = self.ideal.get(obj_id), self.current.get(obj_id)
+        for d in (self.state_changes, self.location_changes, self.new_objects, self.fact_deltas):
+            d.pop(obj_id, None)
+        self.missing_objects.discard(obj_id)
+        if ideal is None and curr is None:
+            return
+        if ideal is not None and curr is not None and self._ideal_keys[obj_id] == self._key(curr):
+            return
+        if curr is None:
+            self.missing_objects.add(obj_id)
+        elif ideal is None:
+            self.new_objects[obj_id] = {"object": obj_id, "location": curr["room"],
+                                        "parent": curr["parent"], "state": curr["state"]}
+        else:
+            if (ideal["room"] != curr["room"]) or (ideal["parent"] != curr["parent"]):
+                self.location_changes[obj_id] = {
+                    "object": obj_id,
+                    "from": {"room": ideal["room"], "parent": ideal["parent"]},
+                    "to": {"room": curr["room"], "parent": curr["parent"]}
+                }
+            if ideal["state"] != curr["state"]:
+                self.state_changes[obj_id] = {"object": obj_id, "expected": ideal["state"],
+                                              "actual": curr["state"]}
+        ideal_facts = object_facts(obj_id, ideal, self.agent_name) if ideal is not None else set()
+        curr_facts = object_facts(obj_id, curr, self.agent_name) if curr is not None else set()
+        if ideal_facts != curr_facts:
+            self.fact_deltas[obj_id] = (ideal_facts - curr_facts, curr_facts - ideal_facts)
+
+    def _set(self, obj_id, props):
+        prev = self.current.get(obj_id)
+        if prev is not None and prev["room"] in self._room_objects:
+            self._room_objects[prev["room"]].discard(obj_id)
+        if props is None:
+            self.current.pop(obj_id, None)
+        else:
+            self.current[obj_id] = props
+            if obj_id != "AGENT" and not obj_id.startswith("HUMAN_"):  # position は部屋の中身ではない
+                self._room_objects.setdefault(props["room"], set()).add(obj_id)
+        self._refresh(obj_id)
+
+    def set_current(self, current_sg):
+        """現実シーングラフ全体を置き換える (初期化用、全物体を再計算)。"""
+        for obj_id in list(self.current):
+            self._set(obj_id, None)
+        self.update_objects(flatten_scene_graph(current_sg))
+
+    def update_objects(self, changes):
+        """changes: {obj_id: フラット化した属性 or None(消失)}。変化した物体だけ差分を更新する。"""
+        for obj_id, props in changes.items():
+            self._set(obj_id, props)
+
+    def update_room(self, room_name, room_data):
+        """1部屋の観測で、その部屋にあった物体と新たに観測された物体だけを更新する。"""
+        observed = flatten_room(room_name, room_data)
+        changes = {obj_id: None for obj_id in self._room_objects.get(room_name, ()) if obj_id not in observed}
+        changes.update({obj_id: p for obj_id, p in observed.items() if self.current.get(obj_id) != p})
+        self.update_objects(changes)
+        return changes
+
+    def report(self):
+        by_ideal = lambda d: [d[k] for k in sorted(d, key=self._order.__getitem__)]
+        return {
+            "state_changes": by_ideal(self.state_changes),
+            "location_changes": by_ideal(self.location_changes),
+            "missing_objects": sorted(self.missing_objects, key=self._order.__getitem__),
+            "new_objects": list(self.new_objects.values())
+        }
+
+    def pddl_delta(self):
+        """(理想にあって現実にない fact, 現実にあって理想にない fact)"""
+        missing, extra = set(), set()
+        for m, e in self.fact_deltas.values():
+            missing |= m
+            extra |= e
+        return missing, extra
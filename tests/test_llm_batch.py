@@ -0,0 +1,80 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import torch
+from tokenizers import Tokenizer, decoders, models, pre_tokenizers
+from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+from llm.llm import Llama3
+from llm.llm_client import LLMClient
+
+CHAT_TEMPLATE = ("{{ bos_token }}{% for m in messages %}<|start_header_id|>{{ m['role'] }}<|end_header_id|>\n\n"
+                 "{{ m['content'] }}<|eot_id|>{% endfor %}{% if add_generation_prompt %}"
+                 "<|start_header_id|>assistant<|end_header_id|>\n\n{% endif %}")
+SYSTEM = {"role": "system", "content": "You translate scene graphs into PDDL problem files. " * 3}
+REQUESTS = ["pc", "Put the laundry into the washing machine and start it.", "dining", "Clean the office desk."]
+MAX_NEW_TOKENS = 12
+
+
+@pytest.fixture(scope="module")
+def tiny_llama(tmp_path_factory):
+    """Randomly initialized 2-layer Llama with a byte-level tokenizer and a Llama-3 style chat template."""
+    path = str(tmp_path_factory.mktemp("tiny-llama"))
+    tokenizer = Tokenizer(models.BPE(vocab={c: i for i, c in enumerate(pre_tokenizers.ByteLevel.alphabet())},
+                                     merges=[]))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    tokenizer.add_special_tokens(["<|begin_of_text|>", "<|start_header_id|>", "<|end_header_id|>", "<|eot_id|>"])
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=tokenizer, bos_token="<|begin_of_text|>",
+                                        eos_token="<|eot_id|>")
+    tokenizer.chat_template = CHAT_TEMPLATE
+    tokenizer.save_pretrained(path)
+    torch.manual_seed(0)
+    config = LlamaConfig(vocab_size=len(tokenizer), hidden_size=32, intermediate_size=64, num_hidden_layers=2,
+                         num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=512,
+                         initializer_range=0.5, bos_token_id=tokenizer.bos_token_id,
+                         eos_token_id=tokenizer.eos_token_id)
+    LlamaForCausalLM(config).save_pretrained(path)
+    return path
+
+
+def reference(llm, chain):
+    """Unpadded, uncached greedy generation of a single prompt chain."""
+    tokenizer, model = llm.pipeline.tokenizer, llm.pipeline.model
+    text = tokenizer.apply_chat_template(chain, add_generation_prompt=True, tokenize=False)
+    input_ids = tokenizer(text, return_tensors="pt", add_special_tokens=False).input_ids
+    with torch.no_grad():
+        out = model.generate(input_ids=input_ids, attention_mask=torch.ones_like(input_ids),
+                             **llm._generate_kwargs(MAX_NEW_TOKENS))
+    return tokenizer.decode(out[0, input_ids.shape[1]:], skip_special_tokens=True)
+
+
+@pytest.mark.parametrize("reuse_prefix", [False, True])
+def test_batched_generation_matches_per_prompt_generation(tiny_llama, reuse_prefix, monkeypatch):
+    llm = Llama3(tiny_llama)
+    chains = [[SYSTEM, {"role": "user", "content": r}] for r in REQUESTS] + [[{"role": "user", "content": "home"}]]
+    expected = [reference(llm, chain) for chain in chains]
+    assert len(set(expected)) > 1
+
+    model, batch_sizes = llm.pipeline.model, []
+    generate = model.generate
+    monkeypatch.setattr(model, "generate", lambda input_ids, **kw: batch_sizes.append(len(input_ids))
+                        or generate(input_ids=input_ids, **kw))
+    assert llm.query_msg_chains(chains, batch_size=3, reuse_prefix=reuse_prefix,
+                                max_new_tokens=MAX_NEW_TOKENS) == expected
+    # with reuse_prefix the four system-prompted chains are batched on the prefix cache, the fifth runs alone
+    assert batch_sizes == ([3, 1, 1] if reuse_prefix else [3, 2])
+
+
+def test_batched_generation_uses_the_client_cache(tiny_llama, tmp_path):
+    llm = Llama3(tiny_llama, client=LLMClient(cache_dir=str(tmp_path)))
+    chains = [[SYSTEM, {"role": "user", "content": r}] for r in REQUESTS]
+    first = llm.query_msg_chains(chains[:2], reuse_prefix=True, max_new_tokens=MAX_NEW_TOKENS)
+    assert llm.llm_client.cache.hits == 0
+
+    outputs = dict(llm.query_batch(chains, reuse_prefix=True, max_new_tokens=MAX_NEW_TOKENS))
+    assert llm.llm_client.cache.hits == 2
+    assert [outputs[i] for i in range(4)] == first + [reference(llm, chain) for chain in chains[2:]]
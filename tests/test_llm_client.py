@@ -0,0 +1,178 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openai
+import pytest
+import requests
+
+from llm.llm import GPT
+from llm.llm_client import LLMClient
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Chat endpoint that echoes the last message, following the server's scripted (status, delay) replies.
+
+    POSTs to /chat take a bare message list; /chat/completions speaks the OpenAI chat completions format.
+    """
+
+    def do_POST(self):
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        openai_format = self.path.endswith("/chat/completions")
+        messages = request["messages"] if openai_format else request
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            status, delay = server.script.pop(0) if server.script else (200, server.delay)
+        time.sleep(delay)
+        with server.lock:
+            server.in_flight -= 1
+        text = "echo: " + messages[-1]["content"]
+        if openai_format:
+            reply = {"id": "chatcmpl-stub", "object": "chat.completion", "created": 0, "model": request["model"],
+                     "choices": [{"index": 0, "finish_reason": "stop",
+                                  "message": {"role": "assistant", "content": text}}]}
+        else:
+            reply = {"text": text}
+        body = json.dumps(reply).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:  # the client already gave up on a delayed reply
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.lock = threading.Lock()
+    server.requests, server.in_flight, server.max_in_flight = 0, 0, 0
+    server.script, server.delay = [], 0.
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def complete_fn(server, timeout=5.):
+    url = f"http://127.0.0.1:{server.server_address[1]}/chat"
+
+    def complete(messages):
+        response = requests.post(url, json=messages, timeout=timeout)
+        response.raise_for_status()
+        return response.json()["text"]
+
+    return complete
+
+
+MESSAGES = [{"role": "system", "content": "You are a planner."}, {"role": "user", "content": "pddl"}]
+
+
+def test_cached_responses_skip_the_server(stub_server, tmp_path):
+    fn = complete_fn(stub_server)
+    client = LLMClient(cache_dir=str(tmp_path))
+    assert client.call(fn, "gpt-4o", 0., MESSAGES) == "echo: pddl"
+    assert client.call(fn, "gpt-4o", 0., MESSAGES) == "echo: pddl"
+    # a fresh client (e.g. the next run) reads the same disk cache
+    assert LLMClient(cache_dir=str(tmp_path)).call(fn, "gpt-4o", 0., MESSAGES) == "echo: pddl"
+    assert stub_server.requests == 1 and client.cache.hits == 1
+
+    # other models and sampled (temperature > 0) requests are not served from the cache
+    client.call(fn, "gpt-4", 0., MESSAGES)
+    client.call(fn, "gpt-4o", 0.7, MESSAGES)
+    client.call(fn, "gpt-4o", 0.7, MESSAGES)
+    assert stub_server.requests == 4
+    assert asyncio.run(client.acall(fn, "gpt-4o", 0., MESSAGES)) == "echo: pddl"
+    assert stub_server.requests == 4
+
+
+def test_server_errors_are_retried(stub_server):
+    fn = complete_fn(stub_server)
+    stub_server.script = [(503, 0.), (500, 0.)]
+    assert LLMClient(max_retries=2, backoff=0.01).call(fn, "gpt-4o", 0., MESSAGES) == "echo: pddl"
+    assert stub_server.requests == 3
+
+    stub_server.script = [(503, 0.), (503, 0.)]
+    with pytest.raises(requests.HTTPError):
+        LLMClient(max_retries=1, backoff=0.01).call(fn, "gpt-4o", 0., MESSAGES)
+    assert stub_server.requests == 5
+
+
+def test_timeouts_are_retried(stub_server):
+    fn = complete_fn(stub_server, timeout=0.2)
+    stub_server.script = [(200, 1.)]
+    assert asyncio.run(LLMClient(max_retries=1, backoff=0.01).acall(fn, "gpt-4o", 0., MESSAGES)) == "echo: pddl"
+    assert stub_server.requests == 2
+
+    stub_server.script = [(200, 1.)]
+    with pytest.raises(requests.Timeout):
+        LLMClient(max_retries=0).call(fn, "gpt-4o", 0., MESSAGES)
+
+
+def test_concurrent_requests_are_capped(stub_server):
+    fn = complete_fn(stub_server)
+    stub_server.delay = 0.1
+    client = LLMClient(max_concurrency=3)
+
+    async def run():
+        chains = [[{"role": "user", "content": str(i)}] for i in range(10)]
+        return await asyncio.gather(*(client.acall(fn, "gpt-4o", 0., chain) for chain in chains))
+
+    assert asyncio.run(run()) == [f"echo: {i}" for i in range(10)]
+    assert stub_server.requests == 10 and stub_server.max_in_flight == 3
+
+
+@pytest.fixture
+def gpt_factory(stub_server, monkeypatch):
+    """GPT backends talking to the stub server through the real OpenAI client."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    base_url = f"http://127.0.0.1:{stub_server.server_address[1]}/v1"
+    return lambda client, temp=0.: GPT("gpt-4o", temp=temp, client=client, base_url=base_url)
+
+
+def test_gpt_backend_through_client(stub_server, gpt_factory, tmp_path):
+    client = LLMClient(max_concurrency=3, cache_dir=str(tmp_path))
+    llms = [gpt_factory(client).fork() for _ in range(10)]
+    for i, llm in enumerate(llms):
+        llm.init_prompt_chain("You are a planner.", str(i))
+    stub_server.delay = 0.1
+
+    async def run():
+        return await asyncio.gather(*(llm.aquery_msg_chain() for llm in llms))
+
+    assert asyncio.run(run()) == [f"echo: {i}" for i in range(10)]
+    assert stub_server.requests == 10 and stub_server.max_in_flight == 3
+
+    # repeated temperature-0 chains are served from the cache; the sync path shares it
+    assert asyncio.run(run()) == [f"echo: {i}" for i in range(10)]
+    assert llms[0].query_msg_chain() == "echo: 0"
+    assert stub_server.requests == 10
+
+
+def test_gpt_backend_errors_are_retried_by_client(stub_server, gpt_factory):
+    llm = gpt_factory(LLMClient(max_retries=1, backoff=0.01))
+    llm.init_prompt_chain("You are a planner.", "pddl")
+    stub_server.script = [(503, 0.)]
+    assert llm.query_msg_chain() == "echo: pddl"
+    assert stub_server.requests == 2
+
+    # the OpenAI client does not retry on its own, so the client's retry budget is the only one
+    stub_server.script = [(503, 0.), (503, 0.)]
+    with pytest.raises(openai.InternalServerError):
+        llm.query_msg_chain()
+    assert stub_server.requests == 4
@@ -0,0 +1,47 @@
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import pddl_ast, utils
+
+PROBLEM_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "pddl", "problem")
+
+
+def marker_section(text, name):
+    start = text.index(f"; Begin {name}\n") + len(f"; Begin {name}\n")
+    return text[start:text.index(f"\n    ; End {name}", start)]
+
+
+def test_problem_sections_round_trip_through_the_serialized_markers():
+    for fname in sorted(os.listdir(PROBLEM_DIR)):
+        with open(os.path.join(PROBLEM_DIR, fname)) as f:
+            problem = f.read()
+        # Strip the markers (and other comments), as in LLM output, so the getters have to parse
+        unmarked = re.sub(r";[^\n]*", "", problem)
+        text = pddl_ast.parse_problem(problem).to_pddl()
+        for name, get in [("objects", utils.get_pddl_problem_objects), ("init", utils.get_pddl_problem_init),
+                          ("goal", utils.get_pddl_problem_goal)]:
+            assert get(unmarked) == get(text) == marker_section(text, name)
+            if f"; Begin {name}" in problem:
+                assert get(problem) == marker_section(problem, name)
+
+
+def test_marked_sections_keep_their_source_text():
+    with open(os.path.join(PROBLEM_DIR, "allensville_clean_problem.pddl")) as f:
+        problem = f.read()
+    init = utils.get_pddl_problem_init(problem)
+    assert "; Connections" in init and init == marker_section(problem, "init")
+    assert pddl_ast.parse_sexpr(init) == [":init"] + pddl_ast.parse_problem(problem).init
+
+
+def test_replaced_init_and_goal_are_read_back():
+    with open(os.path.join(PROBLEM_DIR, "allensville.pddl")) as f:
+        problem = f.read()
+    problem = utils.replace_pddl_problem_init(problem, ["(agent_at panda basket)", "(neighbor table basket)"])
+    problem = utils.replace_pddl_problem_goal(problem, "(:goal (and (item_at bottle_0 table)))")
+    assert utils.get_pddl_problem_init(problem) == (
+        "    (:init\n        (agent_at panda basket)\n        (neighbor table basket)\n    )")
+    assert utils.get_pddl_problem_goal(problem) == "    (:goal\n        (and (item_at bottle_0 table))\n    )"
+    assert "bottle_2 - item" in utils.get_pddl_problem_objects(problem)
@@ -0,0 +1,31 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+pytest.importorskip("pddlgym_planners")
+
+import planner_service
+from planner_service import PlannerService
+
+DOMAIN = "(define (domain d) (:predicates (p)))"
+
+
+def test_only_solved_problems_are_cached(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_solve(domain_text, problem_text, max_time=120):
+        calls.append(problem_text)
+        exit_code = {"solved": 1, "failed": 2, "timeout": 3}[problem_text[len("(define (problem "):-2]]
+        return {"plan": [] if exit_code == 1 else None, "time": 0., "node": 0, "cost": 0,
+                "exit_code": exit_code, "final_state": None}
+
+    monkeypatch.setattr(planner_service, "solve", fake_solve)
+    service = PlannerService(cache_dir=str(tmp_path))
+    problems = [(DOMAIN, f"(define (problem {outcome}))") for outcome in ("solved", "failed", "timeout")]
+    assert [r["exit_code"] for r in service.solve_many(problems)] == [1, 2, 3]
+    assert [r["exit_code"] for r in service.solve_many(problems)] == [1, 2, 3]
+    # failures may be parse errors or planner crashes, so they are planned again like timeouts
+    assert calls == [problem for _, problem in problems] + [problem for _, problem in problems[1:]]
@@ -0,0 +1,35 @@
+import copy
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data import scene_graph
+from data.scene_graph import collapsed_sg, load_scene_graph_index, update_sg
+
+
+def test_index_update_matches_update_sg_without_mutating_the_scene():
+    before = copy.deepcopy(scene_graph.KEMBLESVILLE)
+    index = load_scene_graph_index("kemblesville")
+    assert load_scene_graph_index("kemblesville") is index
+
+    csg, csg_in_place = index.collapsed(), collapsed_sg(scene_graph.KEMBLESVILLE)
+    for command, room in [("expand", "kitchen"), ("expand", "bedroom_1"), ("contract", "kitchen"),
+                          ("expand", "kitchen")]:
+        previous = copy.deepcopy(csg)
+        updated = index.update(csg, command, room)
+        assert csg == previous
+        csg = updated
+        assert repr(csg) == repr(update_sg(csg_in_place, scene_graph.KEMBLESVILLE, command, room))
+    assert csg["rooms"]["kitchen"]["items"] == scene_graph.KEMBLESVILLE["rooms"]["kitchen"]["items"]
+    assert csg["rooms"]["bathroom"]["items"] == {}
+    assert scene_graph.KEMBLESVILLE == before
+
+
+def test_asset_rooms_expand_to_their_assets():
+    index = load_scene_graph_index("office")
+    room = next(r for r, d in scene_graph.OFFICE["rooms"].items() if "assets" in d)
+    csg = index.update(index.collapsed(), "expand", room)
+    assert csg["rooms"][room]["assets"] == scene_graph.OFFICE["rooms"][room]["assets"]
+    assert index.update(csg, "contract", room)["rooms"][room] == {
+        "items": {}, "neighbor": scene_graph.OFFICE["rooms"][room]["neighbor"]}
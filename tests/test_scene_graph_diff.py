@@ -0,0 +1,86 @@
+import copy
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.scene_graph import load_scene_graph
+from scene_graph_diff import SceneGraphDiff, compare_scene_graphs
+
+
+def test_item_edits_produce_typed_diffs_and_fact_deltas():
+    ideal = load_scene_graph("allensville")
+    current = copy.deepcopy(ideal)
+    rooms = current["rooms"]
+    rooms["kitchen"]["items"]["mop"] = rooms["bathroom_1"]["items"].pop("mop")
+    rooms["bedroom_1"]["items"]["glass"]["state"] = "dirty"
+    del rooms["bathroom_1"]["items"]["psu"]
+    rooms["lobby"]["items"]["box"] = {"accessible": False}
+    current["agent"]["position"] = "kitchen"
+
+    diff = SceneGraphDiff(ideal, current)
+    assert diff.report() == compare_scene_graphs(ideal, current) == {
+        "state_changes": [{"object": "glass", "expected": "free", "actual": "dirty"}],
+        "location_changes": [
+            {"object": "AGENT", "from": {"room": "living_room", "parent": None},
+             "to": {"room": "kitchen", "parent": None}},
+            {"object": "mop", "from": {"room": "bathroom_1", "parent": None},
+             "to": {"room": "kitchen", "parent": None}},
+        ],
+        "missing_objects": ["psu"],
+        "new_objects": [{"object": "box", "location": "lobby", "parent": None, "state": "unknown"}],
+    }
+    assert diff.pddl_delta() == (
+        {"(agent_at robot living_room)", "(item_at mop bathroom_1)", "(item_at psu bathroom_1)",
+         "(item_accessible psu)"},
+        {"(agent_at robot kitchen)", "(item_at mop kitchen)", "(item_dirty glass)", "(item_at box lobby)"},
+    )
+
+
+def test_asset_edits_produce_container_and_state_facts():
+    ideal = load_scene_graph("office")
+    current = copy.deepcopy(ideal)
+    assets = current["rooms"]["peters_office"]["assets"]
+    assets["desk_2"]["items"]["phone"] = assets["cabinet_2"]["items"].pop("phone")
+    assets["cabinet_2"]["state"] = "open"
+
+    diff = SceneGraphDiff(ideal, current)
+    assert diff.report()["location_changes"] == [
+        {"object": "phone", "from": {"room": "peters_office", "parent": "cabinet_2"},
+         "to": {"room": "peters_office", "parent": "desk_2"}}]
+    assert diff.pddl_delta() == ({"(item_in phone cabinet_2)", "(item_closed cabinet_2)"},
+                                 {"(item_in phone desk_2)", "(item_open cabinet_2)"})
+
+
+def test_room_updates_match_a_full_rediff():
+    ideal = load_scene_graph("kemblesville")
+    current = copy.deepcopy(ideal)
+    kitchen, other = current["rooms"]["kitchen"], next(r for r in current["rooms"] if r != "kitchen")
+    moved = next(iter(kitchen["items"]))
+    current["rooms"][other]["items"][moved] = kitchen["items"].pop(moved)
+    kitchen["items"]["obstacle"] = {"state": "free"}
+
+    diff = SceneGraphDiff(ideal)
+    diff.set_current(ideal)
+    assert diff.pddl_delta() == (set(), set())
+    for room in ("kitchen", other):
+        changes = diff.update_room(room, current["rooms"][room])
+        assert set(changes) <= {moved, "obstacle"}
+    full = SceneGraphDiff(ideal, current)
+    assert diff.report() == full.report() and diff.pddl_delta() == full.pddl_delta()
+
+    diff.update_room("kitchen", ideal["rooms"]["kitchen"])
+    diff.update_room(other, ideal["rooms"][other])
+    assert diff.report() == SceneGraphDiff(ideal, ideal).report()
+    assert diff.pddl_delta() == (set(), set())
+
+
+def test_changes_with_colliding_hashes_are_detected():
+    # hash(-1) == hash(-2) in CPython, so these attribute tuples collide
+    ideal = {"rooms": {"lab": {"items": {"sensor": {"state": -1}}, "neighbor": []}}}
+    current = copy.deepcopy(ideal)
+    current["rooms"]["lab"]["items"]["sensor"]["state"] = -2
+    assert hash(("lab", None, -1, True, None)) == hash(("lab", None, -2, True, None))
+
+    assert SceneGraphDiff(ideal, current).report()["state_changes"] == [
+        {"object": "sensor", "expected": -1, "actual": -2}]
@@ -0,0 +1,221 @@
+"""Linear-time S-expression parser, typed AST and serializer for PDDL domains and problems.
+
+Expressions are nested Python lists of lowercase string tokens, e.g.
+``["item_at", "cpu", "kitchen"]``. Parsing is one left-to-right scan and is
+tolerant of LLM output: comments are dropped, stray ``)`` are ignored and
+unclosed ``(`` are closed at the end of the text.
+"""
+import re
+from dataclasses import dataclass, field
+
+LOGICAL = {"and", "not", "or", "forall", "exists", "imply", "when"}
+_TOKEN = re.compile(r";[^\n]*|[()]|[^\s()]+")
+
+
+def parse_sexprs(text: str):
+    """All top-level expressions in ``text``."""
+    stack, top = [], []
+    for m in _TOKEN.finditer(text.lower()):
+        tok = m.group()
+        if tok[0] == ";":
+            continue
+        if tok == "(":
+            stack.append([])
+        elif tok == ")":
+            if not stack:
+                continue
+            expr = stack.pop()
+            (stack[-1] if stack else top).append(expr)
+        else:
+            (stack[-1] if stack else top).append(tok)
+    while stack:
+        expr = stack.pop()
+        (stack[-1] if stack else top).append(expr)
+    return top
+
+
+def parse_sexpr(text: str):
+    """First list expression in ``text`` (e.g. a ``(define ...)`` block)."""
+    return next((e for e in parse_sexprs(text) if isinstance(e, list)), [])
+
+
+def to_str(expr):
+    if isinstance(expr, str):
+        return expr
+    return "(" + " ".join(to_str(e) for e in expr) + ")"
+
+
+def iter_atoms(expr):
+    """Ground or lifted atoms in ``expr``, skipping logical connectives and quantifier bindings."""
+    if not isinstance(expr, list) or not expr:
+        return
+    head = expr[0]
+    if isinstance(head, list):
+        body = expr
+    elif head in ("forall", "exists"):
+        body = expr[2:]  # the first argument binds variables, only the body holds atoms
+    elif head.startswith(":") or head in LOGICAL or not all(isinstance(e, str) for e in expr):
+        body = expr[1:]
+    else:
+        yield expr
+        return
+    for sub in body:
+        yield from iter_atoms(sub)
+
+
+def conjuncts(expr):
+    """Flatten nested ``(and ...)`` into a list of conjuncts, dropping empty ``()``."""
+    if not isinstance(expr, list) or not expr:
+        return []
+    if expr[0] == "and":
+        return [c for sub in expr[1:] for c in conjuncts(sub)]
+    return [expr]
+
+
+def facts(expr):
+    return {to_str(a) for a in iter_atoms(expr)}
+
+
+def parse_typed_list(tokens: list):
+    """``a b - t c`` -> ``[(a, t), (b, t), (c, None)]``; handles grouped ``?x ?y - t`` variables."""
+    typed, pending, i = [], [], 0
+    while i < len(tokens):
+        tok = tokens[i]
+        if tok == "-" and i + 1 < len(tokens):
+            typed.extend((name, tokens[i + 1]) for name in pending)
+            pending, i = [], i + 2
+            continue
+        pending.append(tok)
+        i += 1
+    return typed + [(name, None) for name in pending]
+
+
+def typed_list_str(typed: list):
+    return " ".join(name if t is None else f"{name} - {t}" for name, t in typed)
+
+
+def _sections(define: list):
+    """``(define (problem p) (:domain d) (:init ...))`` -> ``{":domain": [...], ":init": [...]}``.
+
+    A section left unclosed swallows the ones after it, so nested sections are hoisted back out.
+    """
+    def is_section(e):
+        return isinstance(e, list) and e and isinstance(e[0], str) and e[0].startswith(":")
+
+    sections, todo = {}, [e for e in define[2:] if is_section(e)]
+    while todo:
+        e = todo.pop(0)
+        sections.setdefault(e[0], [c for c in e[1:] if not is_section(c)])
+        todo.extend(c for c in e[1:] if is_section(c))
+    return sections
+
+
+@dataclass
+class Problem:
+    name: str
+    domain: str
+    objects: list = field(default_factory=list)  # [(name, type or None)]
+    init: list = field(default_factory=list)     # [expr]
+    goal: list = None                            # expr
+    extra: dict = field(default_factory=dict)    # other sections, kept verbatim
+
+    def object_names(self):
+        return [name for name, _ in self.objects]
+
+    def init_facts(self):
+        return {to_str(e) for e in self.init}
+
+    def objects_pddl(self):
+        lines = ["    (:objects"]
+        lines += [f"        {name}" if t is None else f"        {name} - {t}" for name, t in self.objects]
+        return "\n".join(lines + ["    )"])
+
+    def init_pddl(self):
+        return "\n".join(["    (:init"] + [f"        {to_str(e)}" for e in self.init] + ["    )"])
+
+    def goal_pddl(self):
+        goal = [] if self.goal is None else [f"        {to_str(self.goal)}"]
+        return "\n".join(["    (:goal"] + goal + ["    )"])
+
+    def to_pddl(self):
+        # Same layout and "; Begin/End" markers as data/pddl/problem; each section is what
+        # utils.get_pddl_problem_* returns for it
+        lines = [f"(define (problem {self.name})", f"    (:domain {self.domain})", "",
+                 "    ; Begin objects", self.objects_pddl(), "    ; End objects", "",
+                 "    ; Begin init", self.init_pddl(), "    ; End init", "",
+                 "    ; Begin goal", self.goal_pddl(), "    ; End goal", ""]
+        lines += [f"    {to_str([k] + v)}" for k, v in self.extra.items()]
+        lines.append(")")
+        return "\n".join(lines) + "\n"
+
+
+@dataclass
+class Domain:
+    name: str
+    requirements: list = field(default_factory=list)
+    types: list = field(default_factory=list)        # [(name, parent or None)]
+    constants: list = field(default_factory=list)    # [(name, type or None)]
+    predicates: dict = field(default_factory=dict)   # name -> [(var, type or None)]
+    actions: dict = field(default_factory=dict)      # name -> {":parameters": [...], ":precondition": expr, ...}
+    extra: dict = field(default_factory=dict)
+
+    def to_pddl(self):
+        lines = [f"(define (domain {self.name})"]
+        if self.requirements:
+            lines.append(f"    (:requirements {' '.join(self.requirements)})")
+        lines.append(f"    (:types {typed_list_str(self.types)})")
+        if self.constants:
+            lines.append(f"    (:constants {typed_list_str(self.constants)})")
+        lines.append("    (:predicates")
+        lines += [f"        ({name}{' ' if params else ''}{typed_list_str(params)})"
+                  for name, params in self.predicates.items()]
+        lines.append("    )")
+        lines += [f"    {to_str([k] + v)}" for k, v in self.extra.items()]
+        for name, body in self.actions.items():
+            lines.append(f"    (:action {name}")
+            for key, value in body.items():
+                value = f"({typed_list_str(value)})" if key == ":parameters" else to_str(value)
+                lines.append(f"        {key} {value}")
+            lines.append("    )")
+        lines.append(")")
+        return "\n".join(lines) + "\n"
+
+
+def parse_problem(text: str):
+    define = parse_sexpr(text)
+    header = define[1] if len(define) > 1 and isinstance(define[1], list) else []
+    sections = _sections(define)
+    goal = sections.pop(":goal", [])
+    return Problem(
+        name=header[1] if len(header) > 1 else "",
+        domain=(sections.pop(":domain", None) or [""])[0],
+        objects=parse_typed_list(sections.pop(":objects", [])),
+        init=sections.pop(":init", []),
+        goal=goal[0] if goal else None,
+        extra=sections)
+
+
+def parse_domain(text: str):
+    define = parse_sexpr(text)
+    header = define[1] if len(define) > 1 and isinstance(define[1], list) else []
+    domain = Domain(name=header[1] if len(header) > 1 else "")
+    for e in define[2:]:
+        if not isinstance(e, list) or not e or not isinstance(e[0], str):
+            continue
+        key, body = e[0], e[1:]
+        if key == ":requirements":
+            domain.requirements = body
+        elif key == ":types":
+            domain.types = parse_typed_list(body)
+        elif key == ":constants":
+            domain.constants = parse_typed_list(body)
+        elif key == ":predicates":
+            domain.predicates = {p[0]: parse_typed_list(p[1:]) for p in body if isinstance(p, list) and p}
+        elif key == ":action" and body:
+            fields = {body[i]: body[i + 1] for i in range(1, len(body) - 1, 2)}
+            if ":parameters" in fields:
+                fields[":parameters"] = parse_typed_list(fields[":parameters"])
+            domain.actions[body[0]] = fields
+        else:
+            domain.extra[key] = body
+    return domain
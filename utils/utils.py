@@ -1,5 +1,7 @@
 import os
 
+from utils import pddl_ast
+
 
 def get_pddl_domain_types(domain: str):
     start = domain.find("; Begin types\n") + len("; Begin types\n")
@@ -22,50 +24,59 @@ def get_pddl_domain_actions(domain: str):
     return actions
 
 
+def _marked_problem_section(problem: str, name: str):
+    """Source text between ``; Begin <name>`` and ``; End <name>``, or None if the markers are missing."""
+    start = problem.find(f"; Begin {name}\n")
+    end = problem.find(f"\n    ; End {name}", start) if start >= 0 else -1
+    return problem[start + len(f"; Begin {name}\n"):end] if end >= 0 else None
+
+
+# The problem getters return the original source between the "; Begin/End" markers (comments and layout kept, as in
+# data/pddl/problem). Problems without markers, e.g. raw LLM output, are parsed instead and the section is
+# re-serialized in Problem.to_pddl's layout: one object or fact per line, comments dropped.
+
 def get_pddl_problem_objects(problem: str):
-    start = problem.find("; Begin objects\n") + len("; Begin objects\n")
-    end = problem.find("\n    ; End objects", start)
-    objects = problem[start:end]
-    return objects
+    section = _marked_problem_section(problem, "objects")
+    return section if section is not None else pddl_ast.parse_problem(problem).objects_pddl()
 
 
 def get_pddl_problem_init(problem: str):
-    start = problem.find("; Begin init\n") + len("; Begin init\n")
-    end = problem.find("\n    ; End init", start)
-    init = problem[start:end]
-    return init
+    section = _marked_problem_section(problem, "init")
+    return section if section is not None else pddl_ast.parse_problem(problem).init_pddl()
 
 
-def set_pddl_problem_init(p_path: str, new_init: list):
-    new_init_str = "\t\t" + "\n\t\t".join(new_init) + "\n"
+def replace_pddl_problem_init(problem: str, new_init: list):
+    """The whole problem re-serialized by ``Problem.to_pddl`` (markers kept, comments dropped) with ``new_init``."""
+    prob = pddl_ast.parse_problem(problem)
+    prob.init = [e for fact in new_init for e in pddl_ast.parse_sexprs(fact) if isinstance(e, list)]
+    return prob.to_pddl()
 
-    with open(p_path, 'r') as pf:
-        content = pf.readlines()
 
-    # 【修正】完全一致の index() ではなく、柔軟な in 検索に変更
-    start_idx = next(i for i, line in enumerate(content) if "(:init" in line) + 1
-    end_idx = next(i for i, line in enumerate(content) if "; End init" in line) - 1
-    content[start_idx:end_idx] = [new_init_str]
+def set_pddl_problem_init(p_path: str, new_init: list):
+    with open(p_path, 'r') as pf:
+        problem = pf.read()
 
     with open(p_path, 'w') as pf:
-        pf.writelines(content)
+        pf.write(replace_pddl_problem_init(problem, new_init))
 
 
 def get_pddl_problem_goal(problem: str):
-    start = problem.find("; Begin goal\n") + len("; Begin goal\n")
-    end = problem.find("\n    ; End goal", start)
-    goal = problem[start:end]
-    return goal
+    section = _marked_problem_section(problem, "goal")
+    return section if section is not None else pddl_ast.parse_problem(problem).goal_pddl()
+
+
+def replace_pddl_problem_goal(problem: str, new_goal: str):
+    """Like ``replace_pddl_problem_init``; ``new_goal`` may be a whole ``(:goal ...)`` block or just the goal
+    expression."""
+    prob = pddl_ast.parse_problem(problem)
+    goal = pddl_ast.parse_sexpr(new_goal)
+    prob.goal = goal[1] if goal[:1] == [":goal"] and len(goal) > 1 else goal
+    return prob.to_pddl()
 
 
 def set_pddl_problem_goal(p_path: str, new_goal: str):
     with open(p_path, 'r') as pf:
-        content = pf.readlines()
-
-    # 【修正】完全一致の index() ではなく、柔軟な in 検索に変更
-    start_idx = next(i for i, line in enumerate(content) if "; Begin goal" in line) + 1
-    end_idx = next(i for i, line in enumerate(content) if "; End goal" in line)
-    content[start_idx:end_idx] = [new_goal]
+        problem = pf.read()
 
     with open(p_path, 'w') as pf:
-        pf.writelines(content)
\ No newline at end of file
+        pf.write(replace_pddl_problem_goal(problem, new_goal))